@@ -0,0 +1,977 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the Facility Overview page of our web-app.
+
+# Imports.
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.express as px
+from engine import cache, calibration, epidemic, facility, export, floorplan, history, itinerary, models, optimiser, presets, visuals
+
+# Page configurations.
+st.set_page_config(layout = "wide",
+                   page_title = "IARA",
+                   initial_sidebar_state = "expanded")
+
+# Title.
+st.title("Facility Overview 📘")
+
+# Tabs.
+tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["Overview", "Daily Exposure", "Mitigation Planner", "Quanta Calibration", "Community Spread", "Itineraries", "History"])
+
+# Shown instead of the parts of the other tabs that use the timetable, when the timetable of the Daily Exposure tab is not valid.
+fac_invalid = "The timetable on the Daily Exposure tab is not valid. Fix the error shown there to see this section."
+
+#====================================================================================================================================================
+# OVERVIEW TAB:
+#====================================================================================================================================================
+
+# An overview of the page.
+with tab1:
+
+    st.write("### ❓ What Is The Facility Overview")
+
+    st.write("")
+    st.write("")
+
+    st.write("The Facility Overview assesses every room in a building or estate at once, rather than one room and one visit at a time.")
+    st.write("Each session in the timetable is assessed with the traditional Wells-Riley model, and the results are combined per room and across the whole facility.")
+
+    st.divider()
+
+    st.write("### 📝 Timetable Columns")
+
+    st.write("")
+    st.write("")
+
+    st.write("**room:** The name or number of the room.")
+    st.write("**start / end:** The start and end time of the session, in hours (e.g. 9.5 for 09:30).")
+    st.write("**occupants:** The total number of people in the session, infected and non-infected alike.")
+    st.write("**infectors:** The number (or expected number) of infectors in the session.")
+    st.write("**quanta:** The quanta emission rate per infector, per hour.")
+    st.write("**ventilation:** The room ventilation rate in m³/h. Alternatively, provide **ach** and **volume** (m³).")
+    st.write("**breathing (optional):** The breathing rate of the susceptibles in m³/h. Defaults to 0.465 m³/h.")
+    st.write("**volume (optional):** The room volume in m³, needed to check the changeover gaps between sessions.")
+    st.caption("Instead of giving the ventilation and volume of each room, you can upload a floor plan in GeoJSON, with one polygon per room and the properties **room**, **height** (m) and **category** (a setting of the Room Ventilation Rate presets, e.g. Classrooms). The volume of each room is calculated from its floor area, and its ventilation rate from the recommended ACH of its category, or from an **ach** property.")
+
+    st.divider()
+
+    st.write("### 🛠️ Mitigation Planner")
+
+    st.write("")
+    st.write("")
+
+    st.write("Given the highest acceptable risk, the Mitigation Planner finds the cheapest combination of mask policy, ventilation uplift, air cleaners, occupancy cap and session length.")
+    st.write("Every combination is assessed, and the combinations where no cheaper option has a lower risk (the Pareto front) are shown.")
+    st.write("Costs are per day. Masks, extra ventilation and lost occupant-hours are paid for every session, and air cleaners once a day, so each room gets one plan for all of its sessions.")
+    st.caption("The costs are indicative placeholders, and can be adjusted to local prices.")
+
+    st.divider()
+
+    st.write("### 🧪 Quanta Calibration")
+
+    st.write("")
+    st.write("")
+
+    st.write("The quanta emission rates used on every page are literature values. The Quanta Calibration infers them instead from outbreaks you have observed: rooms where infectors shared the air with susceptibles, some of whom became infected.")
+    st.write("Outbreak files need the columns **disease**, **activity**, **duration** (hours), **infectors**, **susceptibles**, **cases** (or **attack_rate**), and **ventilation** (m³/h, or **ach** and **volume**). **breathing** and **mask** are optional.")
+
+    st.divider()
+
+    st.write("### 🦠 Community Spread")
+
+    st.write("")
+    st.write("")
+
+    st.write("The other tabs take the number of infectors in each session as given. Community Spread follows a whole community through an epidemic instead, day by day.")
+    st.write("Every day, the community attends the sessions in the timetable. The infectors in each session are drawn from the community, so their number rises and falls with the prevalence, and every infection caught in a session adds to the next day's prevalence.")
+    st.caption("The community is split into Susceptible, Exposed (infected but not yet infectious), Infectious and Recovered individuals, a SEIR model.")
+
+    st.divider()
+
+    st.write("### 🚶 Itineraries")
+
+    st.write("")
+    st.write("")
+
+    st.write("A person's real exposure is the sum of the doses from every room they visit. Itineraries follow each person through their day, room by room, and add up their dose.")
+    st.write("Itineraries need two files. The rooms file needs the columns **room**, **volume** (m³) and **ventilation** (m³/h, or **ach**). The itinerary file needs one row per visit with the columns **person**, **room**, **arrival** and **departure** (hours), and **quanta** (the quanta emission rate of infectors, 0 for everyone else). **breathing** is optional.")
+    st.caption("Each room starts the day empty, and quanta left by an infector linger after they leave, as on the Residual Risk page.")
+
+    st.divider()
+
+    st.write("### 🗂️ History")
+
+    st.write("")
+    st.write("")
+
+    st.write("Assessments saved from the Wells-Riley and Residual Risk pages, or from every session of the timetable at once, are kept in a local history, tagged with their building and room. The History tab follows the risk of the portfolio day by day, and lists the riskiest rooms.")
+    st.caption("The history is kept in the file set by the IARA_HISTORY_DB environment variable (iara_history.db by default).")
+
+#====================================================================================================================================================
+# DAILY EXPOSURE TAB:
+#====================================================================================================================================================
+
+# This tab aggregates the daily exposure across every room in the timetable.
+with tab2:
+
+#======================================================================
+# TIMETABLE:
+#======================================================================
+
+    st.write("### 🗓️ Timetable")
+
+    st.write("")
+    st.write("")
+
+    fac_upload = st.file_uploader("Upload the facility timetable (CSV)", type = "csv")
+
+    if fac_upload is not None:
+        fac_timetable = pd.read_csv(fac_upload)
+    else:
+        st.info("No timetable uploaded, an example timetable of 2,000 rooms is shown instead.")
+        fac_timetable = facility.example_timetable()
+
+    # A floor plan gives the volume and ventilation rate of each room from its geometry and usage category.
+    fac_plan_upload = st.file_uploader("Upload the floor plan (GeoJSON, optional)", type = ["geojson", "json"],
+                                       help = "One polygon per room, with the properties 'room', 'height' (m) and 'category' (e.g. Classrooms).")
+
+    if fac_plan_upload is not None:
+
+        @st.cache_data(max_entries = cache.MAX_PAGE_ENTRIES, ttl = cache.DEFAULT_TTL) # Cache the geometry to avoid recomputing when the same floor plan is reused.
+        def fac_read_floorplan(fac_plan_bytes, fac_default_height, fac_geographic):
+            """
+            This function reads the rooms of a floor plan.
+
+            Args:
+                fac_plan_bytes (bytes): The GeoJSON file.
+                fac_default_height (float): The ceiling height (m) of rooms without one.
+                fac_geographic (bool): Whether the coordinates are longitudes and latitudes. None to follow the file.
+
+            Returns:
+                Pandas DataFrame: The rooms, see floorplan.read_floorplan.
+            """
+            return floorplan.read_floorplan(fac_plan_bytes, default_height = fac_default_height, geographic = fac_geographic)
+
+        fac_plan_col1, fac_plan_col2 = st.columns(2)
+        with fac_plan_col1:
+            fac_default_height = st.number_input("Ceiling height of rooms without one (m)", min_value = 1.0, value = 2.7)
+        with fac_plan_col2:
+            # GeoJSON coordinates are longitudes and latitudes, but floor plans exported from drawings are often in metres.
+            fac_plan_units = st.radio("Coordinates", ["As in the file", "Longitude and latitude", "Metres"], horizontal = True,
+                                      help = "GeoJSON files are in longitude and latitude, unless their 'crs' member says otherwise.")
+
+        try:
+            fac_rooms = fac_read_floorplan(fac_plan_upload.getvalue(), fac_default_height,
+                                           {"As in the file": None, "Longitude and latitude": True, "Metres": False}[fac_plan_units])
+            fac_timetable = floorplan.attach(fac_timetable, fac_rooms)
+        except (ValueError, KeyError) as err: # The floor plan is not valid GeoJSON, or a room has no ventilation rate.
+            st.error(str(err))
+            fac_timetable = None
+        else:
+            fac_unknown = fac_rooms["sector"].isna()
+            st.write(f"**{len(fac_rooms):,} rooms** in the floor plan, with a total floor area of **{fac_rooms['area'].sum():,.0f} m²** and volume of **{fac_rooms['volume'].sum():,.0f} m³**.")
+            if fac_unknown.any():
+                st.warning(f"{fac_unknown.sum():,} rooms have a category that is not in our ventilation data, see the Room Ventilation Rate presets. "
+                           "Their ventilation rate is taken from their 'ach' property, or from the timetable.")
+            st.dataframe(fac_rooms.head(visuals.MAX_TABLE_ROWS).rename(columns = {
+                "building": "Building",
+                "room": "Room",
+                "category": "Category",
+                "sector": "Sector",
+                "area": "Area (m²)",
+                "height": "Height (m)",
+                "volume": "Volume (m³)",
+                "ach": "ACH",
+                "ventilation": "Ventilation (m³/h)"
+            }), hide_index = True)
+            if len(fac_rooms) > visuals.MAX_TABLE_ROWS:
+                st.caption(f"Showing the first {visuals.MAX_TABLE_ROWS:,} of {len(fac_rooms):,} rooms. Download the rooms to see every room.")
+            st.download_button("Download the rooms (CSV)", data = fac_rooms.to_csv(index = False), file_name = "rooms.csv", mime = "text/csv",
+                               help = "Also usable as the rooms file of the Itineraries tab.")
+
+    @st.cache_data(max_entries = cache.MAX_PAGE_ENTRIES, ttl = cache.DEFAULT_TTL) # Cache the aggregation to avoid recomputing when the same timetable is reused.
+    def fac_daily_exposure(fac_timetable, fac_k):
+        """
+        This function aggregates the daily exposure of a timetable.
+
+        Args:
+            fac_timetable (Pandas DataFrame): The timetable.
+            fac_k (int): The number of highest-risk rooms to highlight.
+
+        Returns:
+            dict: The per-room and facility-level results, see facility.daily_exposure.
+        """
+        return facility.daily_exposure(fac_timetable, k = fac_k)
+
+    fac_k = st.number_input("Number of highest-risk rooms to highlight", min_value = 1, max_value = 100, value = 10)
+
+    if fac_timetable is not None:
+        try:
+            fac_results = fac_daily_exposure(fac_timetable, fac_k)
+        except ValueError as err: # The timetable is missing columns, or has invalid sessions.
+            st.error(str(err))
+            fac_timetable = None
+
+    # Only the rest of this tab, and the parts of the other tabs that use the timetable, are skipped when it is not valid.
+    if fac_timetable is not None:
+        st.divider()
+
+#======================================================================
+# FACILITY SUMMARY:
+#======================================================================
+
+        st.write("### 🏢 Facility Summary")
+
+        st.write("")
+        st.write("")
+
+        fac_summary = fac_results["facility"]
+        fac_col1, fac_col2, fac_col3, fac_col4 = st.columns(4)
+        with fac_col1:
+            st.metric("**Rooms:**", f"{fac_summary['rooms']:,}")
+        with fac_col2:
+            st.metric("**Sessions:**", f"{fac_summary['sessions']:,}")
+        with fac_col3:
+            st.metric("**Expected Daily Infections:**", f"{fac_summary['expected_infections']:.1f}")
+        with fac_col4:
+            st.metric("**Mean Session Risk:**", f"{fac_summary['mean_session_risk']*100:.2f}%")
+
+        st.write("")
+        st.write("**Daily risk per room, by percentile:**")
+        st.dataframe(pd.DataFrame({
+            "Percentile": [f"P{pc}" for pc in fac_summary["daily_risk_percentiles"]],
+            "Daily Risk (%)": [risk * 100 for risk in fac_summary["daily_risk_percentiles"].values()]
+        }), hide_index = True)
+
+        st.divider()
+
+#======================================================================
+# HIGHEST-RISK ROOMS:
+#======================================================================
+
+        st.write("### 🚨 Highest-Risk Rooms")
+
+        st.write("")
+        st.write("")
+
+        # Rooms are ranked by their expected number of daily infections.
+        fac_rooms = pd.DataFrame(fac_results["rooms"])
+        fac_top = fac_rooms.iloc[fac_results["top_rooms"]]
+        st.dataframe(fac_top.rename(columns = {
+            "room": "Room",
+            "sessions": "Sessions",
+            "occupant_hours": "Occupant Hours",
+            "expected_infections": "Expected Infections",
+            "max_session_risk": "Highest Session Risk",
+            "daily_risk": "Daily Risk"
+        }), hide_index = True)
+
+        # The per-room results can be downloaded for use in other tools.
+        st.download_button("Download per-room results (Parquet)",
+                           data = export.to_parquet_bytes(fac_results["rooms"], {"model": "Wells-Riley", "aggregation": "daily per room"}),
+                           file_name = "facility_rooms.parquet",
+                           mime = "application/vnd.apache.parquet")
+
+        st.divider()
+
+#======================================================================
+# CHANGEOVER GAPS:
+#======================================================================
+
+        st.write("### 🚪 Changeover Gaps")
+
+        st.write("")
+        st.write("")
+
+        st.write("Is the gap between each session and the next one in the same room long enough for the air to clear?")
+
+        fac_re_threshold = st.number_input("Highest acceptable risk for the next session (%)", min_value = 0.001, max_value = 50.0,
+                                           value = 0.1, step = 0.05, format = "%.3f") / 100
+
+        try:
+            fac_gaps = facility.changeover_gaps(fac_timetable, fac_re_threshold)
+        except ValueError as err: # The timetable has no room volumes.
+            st.info(str(err))
+        else:
+            fac_gaps_table = pd.DataFrame(fac_gaps)
+            fac_short = fac_gaps_table[~fac_gaps_table["safe"]]
+
+            fac_gap_col1, fac_gap_col2 = st.columns(2)
+            with fac_gap_col1:
+                st.metric("**Changeovers:**", f"{len(fac_gaps_table):,}")
+            with fac_gap_col2:
+                st.metric("**Changeovers Too Short:**", f"{len(fac_short):,}")
+
+            # The changeovers that are furthest from being long enough are shown first.
+            fac_short = fac_short.assign(shortfall = fac_short["required_wait"] - fac_short["gap"]).nlargest(visuals.MAX_TABLE_ROWS, "shortfall")
+            st.dataframe(fac_short.rename(columns = {
+                "room": "Room",
+                "end": "Session Ends (h)",
+                "next_start": "Next Session Starts (h)",
+                "gap": "Gap (h)",
+                "required_wait": "Required Gap (h)",
+                "safe": "Long Enough",
+                "shortfall": "Shortfall (h)"
+            }), hide_index = True)
+            st.caption("Each changeover is checked on its own: quanta left over from earlier sessions are not carried forward. See Carry-Over Between Sessions below.")
+
+        st.divider()
+
+#======================================================================
+# CARRY-OVER BETWEEN SESSIONS:
+#======================================================================
+
+        st.write("### 🔁 Carry-Over Between Sessions")
+
+        st.write("")
+        st.write("")
+
+        st.write("When the timetable repeats every day or every week, quanta left over from earlier sessions, including those of the day before, carry into each session.")
+
+        fac_period = st.radio("The timetable repeats", ["Every day", "Every week"], horizontal = True,
+                              help = "For a weekly timetable, start and end times are in hours since Monday 00:00 (e.g. 33.5 for Tuesday 09:30).")
+
+        try:
+            fac_periodic = facility.periodic_exposure(fac_timetable, period = 24.0 if fac_period == "Every day" else 168.0)
+        except ValueError as err: # The timetable has no room volumes, or its sessions overlap.
+            st.info(str(err))
+        else:
+            fac_periodic_table = pd.DataFrame(fac_periodic)
+            fac_added_infections = fac_periodic_table["expected_infections"].sum() - fac_periodic_table.pop("fresh_expected_infections").sum()
+
+            fac_per_col1, fac_per_col2 = st.columns(2)
+            with fac_per_col1:
+                st.metric("**Expected Infections Per Period:**", f"{fac_periodic_table['expected_infections'].sum():.1f}",
+                          delta = f"{fac_added_infections:+.2f} from carry-over", delta_color = "inverse")
+            with fac_per_col2:
+                st.metric("**Sessions Affected By Carry-Over:**", f"{int((fac_periodic_table['risk'] > fac_periodic_table['fresh_risk'] * 1.01).sum()):,}",
+                          help = "Sessions whose risk is at least 1% higher than if the room started the session empty.")
+
+            # The sessions where the carry-over adds the most risk are shown first.
+            fac_periodic_table = fac_periodic_table.assign(added_risk = fac_periodic_table["risk"] - fac_periodic_table["fresh_risk"])
+            st.dataframe(fac_periodic_table.nlargest(fac_k, "added_risk").rename(columns = {
+                "room": "Room",
+                "start": "Start (h)",
+                "end": "End (h)",
+                "carryover": "Starting Concentration (quanta/m³)",
+                "risk": "Risk With Carry-Over",
+                "fresh_risk": "Risk From An Empty Room",
+                "expected_infections": "Expected Infections",
+                "added_risk": "Risk Added By Carry-Over"
+            }), hide_index = True)
+            st.caption("The repeating concentration is solved in closed form from one period of the timetable, rather than by simulating many periods.")
+
+#====================================================================================================================================================
+# MITIGATION PLANNER TAB:
+#====================================================================================================================================================
+
+# This tab finds the cheapest mitigation plans that meet a risk cap, for one room and for every session in the timetable.
+with tab3:
+
+#======================================================================
+# RISK CAP AND COSTS:
+#======================================================================
+
+    st.write("### 🎯 Risk Cap And Costs")
+
+    st.write("")
+    st.write("")
+
+    # The highest acceptable probability of infection for one susceptible individual.
+    mit_risk_cap = st.slider("Highest acceptable risk of infection (%)", min_value = 0.1, max_value = 10.0, value = 1.0, step = 0.1) / 100
+
+    # The costs start from our presets, and can be adjusted.
+    mit_costs = presets.mitigation_cost_dict
+    mit_cost_col1, mit_cost_col2 = st.columns(2)
+    with mit_cost_col1:
+        mit_vent_cost = st.number_input("Cost of one additional m³/h of outdoor air, per hour (£)", min_value = 0.0, value = mit_costs["ventilation"], format = "%.4f")
+    with mit_cost_col2:
+        mit_hour_cost = st.number_input("Value of one lost occupant-hour (£)", min_value = 0.0, value = mit_costs["occupant_hour"])
+    mit_costs = {**mit_costs, "ventilation": mit_vent_cost, "occupant_hour": mit_hour_cost}
+
+    st.divider()
+
+#======================================================================
+# SINGLE ROOM:
+#======================================================================
+
+    st.write("### 🚪 Single Room")
+
+    st.write("")
+    st.write("")
+
+    mit_col1, mit_col2, mit_col3 = st.columns(3)
+    with mit_col1:
+        mit_occupants = st.number_input("Usual number of people", min_value = 2, value = 30)
+        mit_infectors = st.number_input("Number of infectors", min_value = 1, value = 1)
+    with mit_col2:
+        mit_disease = st.selectbox("Which disease are you modelling for?", list(presets.quanta_em_dict))
+        mit_activity = st.selectbox("What activity are majority of the infectors taking part in?", list(presets.quanta_em_dict[mit_disease]))
+    with mit_col3:
+        mit_hours = st.number_input("Usual session length (hours)", min_value = 0.25, value = 2.0, step = 0.25)
+        mit_per_day = st.number_input("Sessions per day", min_value = 1, value = 1,
+                                      help = "Masks, extra ventilation and lost hours are paid for every session. Air cleaners are paid for once a day.")
+        mit_ach = st.number_input("Current ventilation rate (ACH)", min_value = 0.1, value = 3.0)
+        mit_vol = st.number_input("Room volume (m³)", min_value = 1.0, value = 200.0)
+
+    @st.cache_data(max_entries = cache.MAX_PAGE_ENTRIES, ttl = cache.DEFAULT_TTL) # Cache the optimisation to avoid recomputing when previous inputs are used.
+    def mit_optimise(occupants, infectors, p, q, t, Q, risk_cap, costs, sessions):
+        """
+        This function finds the cheapest mitigation plans under the risk cap, for a room with identical sessions.
+
+        Args:
+            occupants, infectors, p, q, t, Q (float): The room inputs, see optimiser.evaluate.
+            risk_cap (float): The highest acceptable risk for one susceptible.
+            costs (dict): The costs of each mitigation.
+            sessions (int): The number of sessions a day.
+
+        Returns:
+            dict: The cheapest plan and Pareto front, see optimiser.optimise.
+        """
+        return optimiser.optimise(occupants, infectors, p, q, t, Q, risk_cap, costs = costs, sessions = sessions)
+
+    mit_room = mit_optimise(mit_occupants, mit_infectors, facility.DEFAULT_BREATHING_RATE, presets.quanta_em_dict[mit_disease][mit_activity],
+                            mit_hours, mit_ach * mit_vol, mit_risk_cap, mit_costs, mit_per_day)
+    st.caption(f"{mit_room['plans']:,} mitigation plans were assessed.")
+
+    if mit_room["best"]["feasible"][0]:
+        st.write(f"**The cheapest plan costs £{mit_room['best']['cost'][0]:.2f} per day, with a risk of {mit_room['best']['risk'][0]*100:.2f}% per session:**")
+        st.write(" • ".join(f"{name.replace('_', ' ').capitalize()}: {mit_room['best'][name][0]}" for name in optimiser.AXES))
+    else:
+        st.warning("None of the mitigation plans meet the risk cap for this room.")
+
+    # Plot the Pareto front of cost vs. risk.
+    mit_front = pd.DataFrame(mit_room["front"]).drop(columns = "room")
+    mit_front["risk"] = mit_front["risk"] * 100
+    mit_fig = px.line(mit_front, x = "cost", y = "risk", markers = True, hover_data = optimiser.AXES,
+                      labels = {"cost": "Cost per day (£)", "risk": "Risk of infection per session (%)"})
+    mit_fig.add_hline(y = mit_risk_cap * 100, line_dash = "dash", line_color = "#ff6b6b")
+    st.plotly_chart(mit_fig, use_container_width = True)
+
+    st.divider()
+
+#======================================================================
+# ESTATE:
+#======================================================================
+
+    st.write("### 🏢 Estate")
+
+    st.write("")
+    st.write("")
+
+    st.write("The cheapest plan for every room in the timetable from the Daily Exposure tab, applied to all of the room's sessions of the day, so that every session meets the risk cap. Sessions without infectors are assessed with one infector.")
+
+    if fac_timetable is None:
+        st.info(fac_invalid)
+    else:
+        @st.cache_data(max_entries = cache.MAX_PAGE_ENTRIES, ttl = cache.DEFAULT_TTL) # Cache the optimisation to avoid recomputing when previous inputs are used.
+        def mit_optimise_days(room, occupants, infectors, p, q, t, Q, risk_cap, costs):
+            """
+            This function finds the cheapest mitigation plan for the day of every room of a timetable.
+
+            Args:
+                room (NumPy array): The room of each session.
+                occupants, infectors, p, q, t, Q (NumPy array): The session inputs, see optimiser.evaluate.
+                risk_cap (float): The highest acceptable risk for one susceptible, in any session.
+                costs (dict): The costs of each mitigation.
+
+            Returns:
+                dict: The cheapest plan of each room, see optimiser.optimise_days.
+            """
+            return optimiser.optimise_days(room, occupants, infectors, p, q, t, Q, risk_cap, costs = costs)
+
+        # Every room of the timetable is optimised in one batch.
+        mit_sessions = facility.timetable_arrays(fac_timetable)
+        mit_estate = mit_optimise_days(mit_sessions["room"], mit_sessions["occupants"], np.maximum(mit_sessions["infectors"], 1), mit_sessions["breathing"],
+                                       mit_sessions["quanta"], mit_sessions["duration"], mit_sessions["ventilation"], mit_risk_cap, mit_costs)["best"]
+
+        mit_est_col1, mit_est_col2, mit_est_col3 = st.columns(3)
+        with mit_est_col1:
+            st.metric("**Rooms Assessed:**", f"{mit_estate['room'].size:,}")
+        with mit_est_col2:
+            st.metric("**Rooms Meeting The Cap:**", f"{mit_estate['feasible'].mean()*100:.1f}%")
+        with mit_est_col3:
+            st.metric("**Total Cost Per Day:**", f"£{np.nansum(mit_estate['cost']):,.2f}")
+
+        mit_estate_table = pd.DataFrame(mit_estate)
+        # Only the most expensive rooms are shown, so the table stays the same size for any timetable. The full table can be downloaded.
+        st.dataframe(mit_estate_table.nlargest(visuals.MAX_TABLE_ROWS, "cost").rename(columns = {"cost": "cost per day", "risk": "risk of the riskiest session"}),
+                     hide_index = True)
+        if len(mit_estate_table) > visuals.MAX_TABLE_ROWS:
+            st.caption(f"Showing the {visuals.MAX_TABLE_ROWS:,} most expensive of {len(mit_estate_table):,} rooms. Download the table to see every room.")
+
+        st.download_button("Download estate plans (Parquet)",
+                           data = export.to_parquet_bytes(mit_estate_table.to_dict("series"), {"risk_cap": mit_risk_cap, "costs": mit_costs}),
+                           file_name = "mitigation_plans.parquet",
+                           mime = "application/vnd.apache.parquet")
+
+#====================================================================================================================================================
+# QUANTA CALIBRATION TAB:
+#====================================================================================================================================================
+
+# This tab infers the quanta emission rate of each disease and activity from observed outbreaks, for use as presets on the model pages.
+with tab4:
+
+#======================================================================
+# OUTBREAK EVENTS:
+#======================================================================
+
+    st.write("### 🧾 Outbreak Events")
+
+    st.write("")
+    st.write("")
+
+    cal_upload = st.file_uploader("Upload the outbreak events (CSV)", type = "csv")
+
+    if cal_upload is not None:
+        cal_events = pd.read_csv(cal_upload)
+    else:
+        st.info("No outbreak events uploaded, 2,000 events simulated from the literature values are shown instead.")
+        cal_events = calibration.example_events()
+
+    cal_prior = st.radio("Prior", ["Flat", "Around the literature values"], horizontal = True,
+                         help = "A flat prior lets the outbreaks speak for themselves. The literature prior pulls groups with few outbreaks towards the literature values.")
+
+    @st.cache_data(max_entries = cache.MAX_PAGE_ENTRIES, ttl = cache.DEFAULT_TTL) # Cache the calibration to avoid recomputing when the same events are reused.
+    def cal_calibrate(cal_events, cal_prior):
+        """
+        This function calibrates the quanta emission rates on a set of outbreak events.
+
+        Args:
+            cal_events (Pandas DataFrame): The outbreak events.
+            cal_prior (str): The prior, "flat" or "literature".
+
+        Returns:
+            dict: The posterior distributions and their summaries, see calibration.calibrate.
+        """
+        return calibration.calibrate(cal_events, prior = cal_prior)
+
+    try:
+        cal_result = cal_calibrate(cal_events, "flat" if cal_prior == "Flat" else "literature")
+    except ValueError as err: # The events are missing columns or are inconsistent.
+        st.error(str(err))
+    else:
+        st.divider()
+
+#======================================================================
+# CALIBRATED QUANTA EMISSION RATES:
+#======================================================================
+
+        st.write("### 📐 Calibrated Quanta Emission Rates")
+
+        st.write("")
+        st.write("")
+
+        cal_summary = pd.DataFrame(cal_result["summary"])
+        st.dataframe(cal_summary.rename(columns = {
+            "disease": "Disease",
+            "activity": "Activity",
+            "events": "Outbreaks",
+            "literature": "Literature (/h)",
+            "q_map": "Most Likely (/h)",
+            "q_median": "Median (/h)",
+            "q_mean": "Mean (/h)",
+            "q_low": "2.5% (/h)",
+            "q_high": "97.5% (/h)"
+        }), hide_index = True)
+
+        # Plot the posterior distribution of one group.
+        cal_labels = [f"{d} | {a}" for d, a in zip(cal_summary["disease"], cal_summary["activity"])]
+        cal_group = st.selectbox("Show the posterior distribution of", cal_labels)
+        cal_row = cal_labels.index(cal_group)
+        cal_fig = px.line(x = cal_result["grid"], y = cal_result["posterior"][cal_row], log_x = True,
+                          labels = {"x": "Quanta emission rate (/h)", "y": "Posterior probability"})
+        if not np.isnan(cal_summary["literature"][cal_row]):
+            cal_fig.add_vline(x = cal_summary["literature"][cal_row], line_dash = "dash", line_color = "#ff6b6b", annotation_text = "Literature")
+        st.plotly_chart(cal_fig, use_container_width = True)
+
+        # The calibrated medians can replace the literature values in the Quanta Emission sections of the model pages, for this session.
+        if st.button("Use the calibrated values on the model pages"):
+            st.session_state.calibrated_quanta = calibration.calibrated_presets(cal_result)
+        if "calibrated_quanta" in st.session_state:
+            st.success("Calibrated quanta emission rates are available in the Quanta Emission sections of the model pages.")
+
+#====================================================================================================================================================
+# COMMUNITY SPREAD TAB:
+#====================================================================================================================================================
+
+# This tab simulates an epidemic in a community that attends the sessions of the timetable every day.
+with tab5:
+
+#======================================================================
+# COMMUNITY:
+#======================================================================
+
+    st.write("### 👥 Community")
+
+    st.write("")
+    st.write("")
+
+    # Every session of the timetable from the Daily Exposure tab is a room class, attended every day.
+    if fac_timetable is None:
+        st.info(fac_invalid)
+    else:
+        epi_rooms = epidemic.room_classes(fac_timetable)
+
+        epi_visits = int(np.ceil(epi_rooms["occupants"].sum()))
+        st.write(f"The timetable has **{epi_rooms['occupants'].size:,} sessions** and **{epi_visits:,} room visits** a day.")
+
+        epi_col1, epi_col2 = st.columns(2)
+        with epi_col1:
+            epi_population = st.number_input("Community size", min_value = max(epi_visits, 1), value = max(epi_visits, 1), step = 1000,
+                                             help = "Everyone who may attend the sessions. Each visit is made by a different member of the community.")
+            epi_initial = st.number_input("Infectious individuals on day 0", min_value = 1, value = 10, step = 1)
+            epi_days = st.slider("Days to simulate", min_value = 30, max_value = 730, value = 365, step = 5)
+        with epi_col2:
+            epi_latent = st.number_input("Latent period (days)", min_value = 0.5, max_value = 30.0, value = epidemic.DEFAULT_LATENT_DAYS, step = 0.5,
+                                         help = "The mean number of days from infection to becoming infectious.")
+            epi_infectious = st.number_input("Infectious period (days)", min_value = 0.5, max_value = 30.0, value = epidemic.DEFAULT_INFECTIOUS_DAYS, step = 0.5)
+            epi_attendance = st.slider("Infectious individuals who still attend (%)", min_value = 0, max_value = 100, value = 100,
+                                       help = "Lower this if some infectious individuals isolate at home.") / 100
+
+        epi_model = st.radio("Room model", ["Wells-Riley", "Residual Risk"], horizontal = True,
+                             help = "The Residual Risk model lets the concentration build up from zero in each session, and needs the room volumes.")
+        epi_runs = st.number_input("Random runs", min_value = 0, max_value = 1000, value = 0, step = 10,
+                                   help = "With 0, the expected numbers are shown. Otherwise each run draws the infections at random, and the spread of the runs is shown.")
+
+        @st.cache_data(max_entries = cache.MAX_PAGE_ENTRIES, ttl = cache.DEFAULT_TTL) # Cache the simulation to avoid recomputing when the same inputs are reused.
+        def epi_simulate(epi_rooms, epi_population, epi_days, epi_initial, epi_latent, epi_infectious, epi_attendance, epi_model, epi_runs):
+            """
+            This function simulates the epidemic, once with the expected numbers or several times at random.
+
+            Args:
+                epi_rooms (dict): The room classes.
+                epi_population (int): The size of the community.
+                epi_days (int): The number of days to simulate.
+                epi_initial (int): The number of infectious individuals on day 0.
+                epi_latent (float): The mean latent period in days.
+                epi_infectious (float): The mean infectious period in days.
+                epi_attendance (float): The fraction of infectious individuals who still attend.
+                epi_model (str): The room model, "wells_riley" or "residual".
+                epi_runs (int): The number of random runs, or 0 for the expected numbers.
+
+            Returns:
+                dict: The simulation, see epidemic.simulate.
+            """
+            return epidemic.simulate(epi_rooms, epi_population, epi_days, initial_infected = np.full(max(epi_runs, 1), epi_initial),
+                                     latent = epi_latent, infectious = epi_infectious, attendance = epi_attendance,
+                                     model = epi_model, seed = 0 if epi_runs else None)
+
+        try:
+            epi_result = epi_simulate(epi_rooms, epi_population, epi_days, epi_initial, epi_latent, epi_infectious, epi_attendance,
+                                      "wells_riley" if epi_model == "Wells-Riley" else "residual", epi_runs)
+        except ValueError as err: # The timetable has no room volumes for the Residual Risk model.
+            st.error(str(err))
+        else:
+            st.divider()
+
+#======================================================================
+# EPIDEMIC CURVE:
+#======================================================================
+
+            st.write("### 📈 Epidemic Curve")
+
+            st.write("")
+            st.write("")
+
+            # The basic reproduction number is the daily force of infection per unit of prevalence, times the mean infectious period.
+            epi_R0 = float(np.median(epi_result["contact_rate"])) * epi_infectious
+            epi_total = epi_result["incidence"].sum(axis = 1)
+            epi_peak = epi_result["I"].max(axis = 1)
+
+            epi_col3, epi_col4, epi_col5 = st.columns(3)
+            with epi_col3:
+                st.metric("**Reproduction Number (R₀):**", f"{epi_R0:.2f}")
+            with epi_col4:
+                st.metric("**Total Infections:**", f"{np.median(epi_total):,.0f}")
+            with epi_col5:
+                st.metric("**Peak Infectious:**", f"{np.median(epi_peak):,.0f}")
+
+            if epi_R0 < 1:
+                st.caption("R₀ is below 1, so each infection causes less than one more on average and the epidemic dies out.")
+
+            # The median of the runs is plotted, with the 5th to 95th percentile of the runs as a band.
+            epi_curves = []
+            for epi_comp, epi_name in [("S", "Susceptible"), ("E", "Exposed"), ("I", "Infectious"), ("R", "Recovered")]:
+                epi_low, epi_mid, epi_high = np.percentile(epi_result[epi_comp], [5, 50, 95], axis = 0)
+                epi_curves.append(pd.DataFrame({"Day": epi_result["day"], "Compartment": epi_name, "People": epi_mid, "Low": epi_low, "High": epi_high}))
+            epi_curves = pd.concat(epi_curves)
+
+            epi_fig = px.line(epi_curves, x = "Day", y = "People", color = "Compartment", labels = {"People": "Number of people"})
+            if epi_runs:
+                for epi_trace in list(epi_fig.data):
+                    epi_band = epi_curves[epi_curves["Compartment"] == epi_trace.name]
+                    epi_fig.add_scatter(x = np.concatenate([epi_band["Day"], epi_band["Day"][::-1]]), y = np.concatenate([epi_band["High"], epi_band["Low"][::-1]]),
+                                        fill = "toself", fillcolor = epi_trace.line.color, opacity = 0.2, line_width = 0, showlegend = False, hoverinfo = "skip")
+            st.plotly_chart(epi_fig, use_container_width = True)
+
+            st.download_button("Download the epidemic curve (Parquet)",
+                               data = export.to_parquet_bytes({col: epi_curves[col].to_numpy() for col in epi_curves.columns},
+                                                              {"model": f"SEIR with {epi_model} rooms", "runs": str(epi_runs)}),
+                               file_name = "community_spread.parquet",
+                               mime = "application/vnd.apache.parquet")
+
+            st.divider()
+
+#======================================================================
+# WHERE INFECTIONS ARE CAUGHT:
+#======================================================================
+
+            st.write("### 🚨 Where Infections Are Caught")
+
+            st.write("")
+            st.write("")
+
+            # The sessions where the most infections are caught over the whole epidemic, on average across the runs.
+            epi_sessions = facility.timetable_arrays(fac_timetable)
+            epi_room_infections = epi_result["room_infections"].mean(axis = 0)
+            epi_top = facility.top_k(epi_room_infections, fac_k)
+            st.dataframe(pd.DataFrame({
+                "Room": epi_sessions["room"][epi_top],
+                "Session Starts (h)": epi_sessions["start"][epi_top],
+                "Occupants": epi_sessions["occupants"][epi_top],
+                "Infections Caught": epi_room_infections[epi_top]
+            }), hide_index = True)
+
+#====================================================================================================================================================
+# ITINERARIES TAB:
+#====================================================================================================================================================
+
+# This tab adds up the dose of every person across every room in their itinerary.
+with tab6:
+
+#======================================================================
+# ROOMS AND ITINERARY:
+#======================================================================
+
+    st.write("### 🗺️ Rooms And Itinerary")
+
+    st.write("")
+    st.write("")
+
+    iti_col1, iti_col2 = st.columns(2)
+    with iti_col1:
+        iti_rooms_upload = st.file_uploader("Upload the rooms (CSV)", type = "csv")
+    with iti_col2:
+        iti_visits_upload = st.file_uploader("Upload the itinerary (CSV)", type = "csv")
+
+    if iti_rooms_upload is not None and iti_visits_upload is not None:
+        iti_rooms, iti_visits = pd.read_csv(iti_rooms_upload), pd.read_csv(iti_visits_upload)
+    else:
+        st.info("No rooms and itinerary uploaded, an example day of 100,000 people visiting 60 rooms is shown instead.")
+        iti_rooms, iti_visits = itinerary.example_itinerary()
+
+    @st.cache_data(max_entries = cache.MAX_PAGE_ENTRIES, ttl = cache.DEFAULT_TTL) # Cache the simulation to avoid recomputing when the same itinerary is reused.
+    def iti_simulate(iti_rooms, iti_visits):
+        """
+        This function calculates the dose and risk of every person in the itinerary.
+
+        Args:
+            iti_rooms (Pandas DataFrame): The rooms.
+            iti_visits (Pandas DataFrame): The itinerary.
+
+        Returns:
+            dict: The results per person and per room, see itinerary.simulate.
+        """
+        return itinerary.simulate(iti_rooms, iti_visits)
+
+    try:
+        iti_result = iti_simulate(iti_rooms, iti_visits)
+    except ValueError as err: # The files are missing columns or are inconsistent.
+        st.error(str(err))
+    else:
+        st.divider()
+
+#======================================================================
+# PERSONAL RISK:
+#======================================================================
+
+        st.write("### 👤 Personal Risk")
+
+        st.write("")
+        st.write("")
+
+        iti_summary = iti_result["summary"]
+        iti_col3, iti_col4, iti_col5, iti_col6 = st.columns(4)
+        with iti_col3:
+            st.metric("**People:**", f"{iti_summary['people']:,}")
+        with iti_col4:
+            st.metric("**Infectors:**", f"{iti_summary['infectors']:,}")
+        with iti_col5:
+            st.metric("**Expected Infections:**", f"{iti_summary['expected_infections']:.1f}")
+        with iti_col6:
+            st.metric("**Mean Risk:**", f"{iti_summary['mean_risk']*100:.2f}%")
+
+        # The spread of the personal risk, for everyone who is not an infector.
+        # The risks are binned here, so the chart sends 60 bars to the browser rather than one value per person.
+        iti_people = pd.DataFrame(iti_result["people"])
+        iti_susceptible = iti_people[~iti_people["infector"]]
+        iti_counts, iti_edges = np.histogram(iti_susceptible["risk"].to_numpy() * 100, bins = 60)
+        iti_bins = pd.DataFrame({"risk": (iti_edges[:-1] + iti_edges[1:]) / 2, "people": iti_counts})
+        iti_hist = px.bar(iti_bins, x = "risk", y = "people", log_y = True,
+                          labels = {"risk": "Probability of infection over the day (%)", "people": "People"})
+        iti_hist.update_traces(width = iti_edges[1] - iti_edges[0])
+        st.plotly_chart(iti_hist, use_container_width = True)
+
+        st.write("**People with the highest risk:**")
+        st.dataframe(iti_susceptible.nlargest(fac_k, "risk").drop(columns = "infector").rename(columns = {
+            "person": "Person",
+            "visits": "Visits",
+            "hours": "Hours",
+            "dose": "Quanta Inhaled",
+            "risk": "Risk"
+        }), hide_index = True)
+
+        st.download_button("Download per-person results (Parquet)",
+                           data = export.to_parquet_bytes(iti_result["people"], {"model": "Residual Risk", "aggregation": "daily per person"}),
+                           file_name = "itinerary_people.parquet",
+                           mime = "application/vnd.apache.parquet")
+
+        st.divider()
+
+#======================================================================
+# ROOMS:
+#======================================================================
+
+        st.write("### 🚨 Where Infections Are Caught")
+
+        st.write("")
+        st.write("")
+
+        # Each person's risk is split across the rooms they visited, in proportion to the dose inhaled there.
+        iti_room_table = pd.DataFrame(iti_result["rooms"])
+        st.dataframe(iti_room_table.nlargest(fac_k, "expected_infections").rename(columns = {
+            "room": "Room",
+            "visits": "Visits",
+            "dose": "Quanta Inhaled",
+            "expected_infections": "Expected Infections"
+        }), hide_index = True)
+
+#====================================================================================================================================================
+# HISTORY TAB:
+#====================================================================================================================================================
+
+# This tab follows the saved assessments of every building and room over time.
+with tab7:
+
+#======================================================================
+# SAVE THE TIMETABLE:
+#======================================================================
+
+    st.write("### 💾 Save The Timetable")
+
+    st.write("")
+    st.write("")
+
+    st.write("Save every session of the timetable from the Daily Exposure tab as an assessment of its room, assessed with the traditional Wells-Riley model.")
+
+    hist_save_building = st.text_input("Building", key = "hist_save_building").strip()
+
+    if fac_timetable is None:
+        st.info(fac_invalid)
+    if st.button("Save every session of the timetable", disabled = fac_timetable is None):
+        hist_sessions = facility.timetable_arrays(fac_timetable)
+        hist_P = models.wells_riley_risk(hist_sessions["infectors"], hist_sessions["breathing"], hist_sessions["quanta"], hist_sessions["duration"],
+                                         hist_sessions["ventilation"])
+        hist_store = history.shared()
+        hist_store.add_many({
+            "model": "facility",
+            "building": hist_save_building,
+            "room": hist_sessions["room"],
+            "infectors": hist_sessions["infectors"],
+            "breathing": hist_sessions["breathing"],
+            "quanta": hist_sessions["quanta"],
+            "ventilation": hist_sessions["ventilation"],
+            "volume": hist_sessions["volume"],
+            "duration": hist_sessions["duration"],
+            "traditional": np.where(hist_sessions["infectors"] > 0, hist_P, 0.0) # Sessions without infectors carry no risk.
+        })
+        hist_store.flush()
+        st.success(f"Saved {hist_P.size:,} sessions.")
+
+    st.divider()
+
+#======================================================================
+# PORTFOLIO:
+#======================================================================
+
+    st.write("### 📈 Portfolio")
+
+    st.write("")
+    st.write("")
+
+    hist_store = history.shared()
+    hist_summary = hist_store.summary()
+
+    if not hist_summary["assessments"]:
+        st.info("No assessments saved yet. Save one from the Wells-Riley or Residual Risk pages, or save the timetable above.")
+    else:
+        hist_col1, hist_col2, hist_col3, hist_col4 = st.columns(4)
+        with hist_col1:
+            st.metric("**Assessments:**", f"{hist_summary['assessments']:,}")
+        with hist_col2:
+            st.metric("**Buildings:**", f"{hist_summary['buildings']:,}")
+        with hist_col3:
+            st.metric("**Rooms:**", f"{hist_summary['rooms']:,}")
+        with hist_col4:
+            st.metric("**Last Saved:**", f"{hist_summary['last']:%Y-%m-%d}")
+
+        hist_col5, hist_col6, hist_col7 = st.columns(3)
+        with hist_col5:
+            hist_building = st.text_input("Only this building", key = "hist_building", help = "Leave empty for every building.").strip() or None
+        with hist_col6:
+            hist_room = st.text_input("Only this room", key = "hist_room", help = "Leave empty for every room.").strip() or None
+        with hist_col7:
+            hist_since = st.date_input("Since", value = hist_summary["first"].date(), key = "hist_since")
+
+        # The risk of each day, from the daily summaries (or from the room's own assessments, for one room).
+        hist_trend = hist_store.trend(hist_building, hist_room, since = hist_since)
+        if len(hist_trend):
+            hist_trend[["mean_risk", "max_risk"]] *= 100
+            st.plotly_chart(px.line(hist_trend, x = "day", y = ["mean_risk", "max_risk"], markers = True,
+                                    labels = {"day": "Day", "value": "Probability of infection (%)", "variable": ""}), use_container_width = True)
+        else:
+            st.caption("No saved assessments match these filters.")
+
+        st.divider()
+
+#======================================================================
+# RISKIEST ROOMS:
+#======================================================================
+
+        st.write("### 🚨 Riskiest Rooms")
+
+        st.write("")
+        st.write("")
+
+        hist_by = st.radio("Rank the rooms by their", ["Highest risk", "Mean risk", "Latest risk"], horizontal = True)
+        hist_top = hist_store.top_rooms(fac_k, by = {"Highest risk": "max", "Mean risk": "mean", "Latest risk": "latest"}[hist_by], building = hist_building)
+        hist_top[["mean_risk", "max_risk", "latest_risk"]] *= 100
+        st.dataframe(hist_top.rename(columns = {
+            "building": "Building",
+            "room": "Room",
+            "assessments": "Assessments",
+            "mean_risk": "Mean Risk (%)",
+            "max_risk": "Highest Risk (%)",
+            "latest_risk": "Latest Risk (%)",
+            "last_assessed": "Last Assessed"
+        }), hide_index = True)
+
+        st.divider()
+
+#======================================================================
+# RECENT ASSESSMENTS:
+#======================================================================
+
+        st.write("### 🕒 Recent Assessments")
+
+        st.write("")
+        st.write("")
+
+        hist_recent = hist_store.assessments(hist_building, hist_room, since = hist_since, limit = 200)
+        st.dataframe(hist_recent.drop(columns = "id"), hide_index = True)
+        st.caption("Inputs are in hours and m³: breathing (m³/h), quanta (quanta/h), ventilation (m³/h), volume (m³), duration whilst infectors are present (h) and time after they leave (h).")
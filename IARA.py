@@ -1,15 +1,31 @@
 # This is the main script for our web-app. In this script, the various pages will be declared and navigation will be setup.
 
 # Importing Streamlit.
+import os
 import streamlit as st
+from tools import trace
+from engine import metrics
 
 # Defining the pages for our web-app. More pages will be added as needed throughout development.
 home_page = st.Page("home_page.py", title = "Home", icon = "🏠")
 Wells_Riley_page = st.Page("Wls_Rly_page.py", title = "The Wells-Riley Model", icon = "📕")
 Scn_One_page = st.Page("Scn_One_page.py", title = "Residual Risk Model", icon = "📗")
+Facility_page = st.Page("Facility_page.py", title = "Facility Overview", icon = "📘")
+
+# The Server Status page is only shown to administrators.
+pages = [home_page, Wells_Riley_page, Scn_One_page, Facility_page]
+if os.environ.get("IARA_ADMIN"):
+    pages.append(st.Page("admin_page.py", title = "Server Status", icon = "🛠️"))
 
 # Navigation between pages.
-all_pgs = st.navigation([home_page, Wells_Riley_page, Scn_One_page])
+all_pgs = st.navigation(pages)
+
+# Recording the session's widget changes for load testing (only when IARA_TRACE_DIR is set).
+trace.record(all_pgs)
+
+# Serving the production metrics (only when IARA_METRICS_PORT is set). The endpoint is started once per server process.
+metrics.start()
 
-# Running pages.
-all_pgs.run()
\ No newline at end of file
+# Running pages. Each rerun is timed by page, for the metrics.
+with metrics.timed("iara_rerun_seconds", page = trace.page_file(all_pgs.url_path)):
+    all_pgs.run()
\ No newline at end of file
@@ -10,6 +10,7 @@ import numpy as np
 import pandas as pd
 import math
 import plotly.express as px
+from engine import models, export, presets, superposition, losses, visuals, cache, backend, mixtures, prevalence, comparison, history, whatif
 
 # Page configurations.
 st.set_page_config(layout = "wide",
@@ -82,13 +83,15 @@ with tab1:
     st.write("**Risk After Departure:** The risk of infection after the infector has left due to remaining infectious particles within the space.") 
     st.write("**Total Combined Risk:** The total combined risk of infection, including the risk whilst the infector is present and the risk after the infector has left.")
     st.write("**Indefinite Risk:** The risk of infection for an unknown duration after the infector has left the space.")
-    st.write("**🆚 Model Comparison:** A comparison between the risk estimates produced by the traditional Wells-Riley model and the enhanced Wells-Riley model.")
+    st.write("**🆚 Model Comparison:** A comparison between the risk estimates produced by the traditional Wells-Riley model, the enhanced Wells-Riley model, and the near-field / far-field model, which gives a separate risk for people in close contact with the infectors.")
 
     st.write("")
 
     st.write("**📊 Bar-Chart:** A bar-chart that plots all four risk estimates produced by the enhanced Wells-Riley model beside each other.")
     st.write("**🥧 Pie-Chart:** A pie-chart dividing the total combined risk between the risk whilst the infector is present and the residual risk after the infector has left.")
     st.write("**📈 Estimated Infection Risk Graph:** A graph that showcases the estimated infection risk at various discrete time points whilst the infector is present and after the infector has departed.")
+    st.write("**🔀 What If?:** The graph above, overlaid with the curves you would get if one of your inputs were different. Pick an input and up to ten multipliers or values to compare.")
+    st.write("**🚶 Staggered Infectors:** A graph of the infection risk when groups of infectors arrive and depart at different times, each with their own quanta emission rate and mask.")
 
 #====================================================================================================================================================
 # MODEL TAB:
@@ -106,6 +109,14 @@ with tab2:
     st.write("")
     st.write("")
 
+    # A live headcount can be passed in the page address (e.g. '?headcount=250'), by a people counter or building system.
+    # Each new headcount replaces the total, but the user can still change it until the next headcount arrives.
+    scnone_headcount = st.query_params.get("headcount")
+    if scnone_headcount is not None and scnone_headcount != st.session_state.get("scnone_headcount_last"):
+        st.session_state.scnone_headcount_last = scnone_headcount
+        if scnone_headcount.isdigit():
+            st.session_state.scnone_all = max(int(scnone_headcount), 2)
+
     # Numerical input for the total number of individuals.
     st.number_input("Total number of individuals within the space",
                     min_value = 2,
@@ -113,6 +124,8 @@ with tab2:
                     help = "There must be at least one infector and one susceptible individual within the space.")
     st.write("")
     st.write(f"**There is a total number of {st.session_state.scnone_all} individuals within the space.**")
+    if scnone_headcount is not None:
+        st.caption(f"The live headcount from the page address is {scnone_headcount}.")
 
     st.divider()
 
@@ -125,16 +138,32 @@ with tab2:
     st.write("")
     st.write("")
     
-    # Numerical input for the number of infectors.
-    st.number_input("Number of infectious individuals within the space",
-                    min_value = 1,
-                    key = "scnone_infectors",
-                    help = "There must be at least one infector within the space.")
-    st.write("")
-    if st.session_state.scnone_infectors == 1:
-        st.write("**There is 1 infector within the space.**")
+    # If the number of infectors is not known, it can be estimated from the prevalence of the disease in the community.
+    scnone_from_prevalence = st.toggle("Estimate the infectors from community prevalence", value = False,
+                                       help = "*Each individual is assumed to be infectious with a probability equal to the prevalence*")
+    st.write("")
+
+    if not scnone_from_prevalence:
+        # Numerical input for the number of infectors.
+        st.number_input("Number of infectious individuals within the space",
+                        min_value = 1,
+                        key = "scnone_infectors",
+                        help = "There must be at least one infector within the space.")
+        st.write("")
+        if st.session_state.scnone_infectors == 1:
+            st.write("**There is 1 infector within the space.**")
+        else:
+            st.write(f"**There are {st.session_state.scnone_infectors} infectors within the space.**")
     else:
-        st.write(f"**There are {st.session_state.scnone_infectors} infectors within the space.**")
+        scnone_prevalence = st.number_input("Prevalence of the disease in the community (%)", min_value = 0.0, max_value = 100.0, value = 1.0,
+                                            step = 0.1, format = "%.3f", key = "scnone_prevalence_pct") / 100
+        # The number of infectors is Binomial(total, prevalence). The graphs and other sections use the expected number, rounded and at least 1,
+        # and the Infections From Community Prevalence section sums the equations over every possible number of infectors.
+        scnone_expected_infectors = st.session_state.scnone_all * scnone_prevalence
+        st.session_state.scnone_infectors = max(1, min(round(scnone_expected_infectors), st.session_state.scnone_all - 1))
+        st.write("")
+        st.write(f"**On average, {scnone_expected_infectors:.2f} of the {st.session_state.scnone_all} individuals are infectious.**")
+        st.caption(f"The other sections assume {st.session_state.scnone_infectors} infector(s). The Risk Assessment tab also shows the risk averaged over every possible number of infectors.")
 
     # This if-statement checks that the number of infectors is not greater than or equal to the total number of individuals.
     if st.session_state.scnone_infectors >= st.session_state.scnone_all:
@@ -155,12 +184,10 @@ with tab2:
     st.write("")
 
     # Dictionary containing breathing rate data (m³/h).
-    scnone_breathing_dict = {
-        "Adult": {"Sleep": 0.385, "Sitting/Resting": 0.465, "Light activity (Standing/Walking)": 1.375, "Heavy activity (Exercise/Sports)": 2.85},
-        "15 Years Old": {"Sleep": 0.385, "Sitting/Resting": 0.44, "Light activity (Standing/Walking)": 1.34, "Heavy activity (Exercise/Sports)": 2.745},
-        "10 Years Old": {"Sleep": 0.31, "Sitting/Resting": 0.38, "Light activity (Standing/Walking)": 1.12, "Heavy activity (Exercise/Sports)": 2.03},
-        "5 Years Old": {"Sleep": 0.24, "Sitting/Resting": 0.32, "Light activity (Standing/Walking)": 0.57}
-    }
+    scnone_breathing_dict = presets.breathing_dict
+
+    # The susceptible groups, if the user describes a mix of age-groups and activities. None means one group with the breathing rate 'scnone_p'.
+    scnone_sus_groups = None
 
     # Defining an empty area that will contain presets.
     scnone_dflt_txt_breathing = st.empty()
@@ -180,6 +207,8 @@ with tab2:
 
             # The user can choose to use presets, this is turned off by default.
             scnone_breathing_adjust = st.checkbox("Adjust the default Pulmonary Breathing Rate by selecting the age-group and activity of the population", False)
+            # Alternatively, the population can be described as a mix of age-groups and activities, each with its own breathing rate.
+            scnone_breathing_mix = st.checkbox("Describe the population as a mix of age-groups and activities instead", False, disabled = scnone_breathing_adjust)
             st.write("")
             if scnone_breathing_adjust: # If the user would like to use our presets...
                 # ... they will select the majority age group and activity of the population.
@@ -211,6 +240,28 @@ with tab2:
 
                     # Convert and asign this value to scnone_P, for the equations.
                     scnone_p = st.session_state.scnone_breathing_dflt / 60
+            elif scnone_breathing_mix: # If the user will describe the population as a mix of groups...
+                # ... each row is a group of susceptibles, with its age-group, activity and number of people.
+                scnone_sus_table = st.data_editor(mixtures.default_susceptibles(max(st.session_state.scnone_all - st.session_state.scnone_infectors, 1)),
+                                                  num_rows = "dynamic", hide_index = True, key = "scnone_sus_mix",
+                                                  column_config = {
+                                                      "Age group": st.column_config.SelectboxColumn(options = list(scnone_breathing_dict), required = True),
+                                                      "Activity": st.column_config.SelectboxColumn(options = list(scnone_breathing_dict["Adult"]), required = True),
+                                                      "People": st.column_config.NumberColumn(min_value = 0, step = 1, required = True)
+                                                  })
+                try:
+                    scnone_sus_groups = mixtures.susceptible_arrays(scnone_sus_table)
+                except ValueError as err: # No people, or a breathing rate that is not available (Heavy activity for 5 year olds).
+                    st.error(str(err))
+                    scnone_p = 0.00775
+                else:
+                    # The graphs over time use the average breathing rate, and the Risk By Group section uses each group's own rate.
+                    scnone_p = mixtures.weighted_mean(scnone_sus_groups["breathing"], scnone_sus_groups["people"]) / 60
+                    if scnone_sus_groups["people"].sum() != st.session_state.scnone_all - st.session_state.scnone_infectors:
+                        st.caption("The groups do not add up to the number of susceptibles, so they are used as proportions of the susceptibles.")
+                st.write("")
+                st.write(f"**The average Pulmonary Breathing Rate of the population is {scnone_p * 60:.3f}m³/h.**")
+                st.write("")
             else: # If the user will not be using our presets...
                 scnone_p = 0.00775 # ... asign the default breathing rate to scnone_p.
                 st.write("**The Pulmonary Breathing Rate for your risk assessment is 0.465m³/h.**")
@@ -263,21 +314,16 @@ with tab2:
     st.write("")
 
     # Dictionary containing quanta emission data.
-    scnone_quanta_em_dict = {
-        "SARS-CoV-2/COVID-19": {"Resting/Oral Breathing": 0.55, "Standing/Speaking": 2.7, "Light Activity/Speaking Loudly": 46},
-        "Influenza": {"Resting/Oral Breathing": 0.035, "Standing/Speaking": 0.17, "Light Activity/Speaking Loudly": 3.0},
-        "TB (On Treatment)": {"Resting/Oral Breathing": 0.020, "Standing/Speaking": 0.098, "Light Activity/Speaking Loudly": 1.7},
-        "TB (Untreated)": {"Resting/Oral Breathing": 0.62, "Standing/Speaking": 3.1, "Light Activity/Speaking Loudly": 52}
-    }
+    scnone_quanta_em_dict = presets.quanta_em_dict
 
     # Dictionary containing mask efficiency data.
-    scnone_msk_eff_dict = {
-        "KN95": 0.05, # 95% efficiency.
-        "R95": 0.04, # 96% efficiency.
-        "Blue surgical mask": 0.53, # 47% efficiency.
-        "Cloth mask": 0.6, # 40% efficiency.
-        "No mask": 1.0 # 0% efficiency.
-    }
+    scnone_msk_eff_dict = presets.msk_eff_dict
+
+    # The infector groups, if the user describes each group's activity and mask. None means 'scnone_I' infectors with the rate 'scnone_q'.
+    scnone_inf_groups = None
+
+    # The user's (disease, activity, mask), if they picked a single preset. It is highlighted in the comparison matrix on the output tab.
+    scnone_quanta_selection = None
 
     # Defining an empty area that will allow the user to pick presets.
     scnone_dflt_quanta_em_space = st.empty()
@@ -293,19 +339,48 @@ with tab2:
             
             # The user will select what disease, the activity of the infector(s), and mask usage. 
             scnone_quanta_disease_choice = st.selectbox("Which disease are you modelling for?", ["SARS-CoV-2/COVID-19", "Influenza", "TB (On Treatment)", "TB (Untreated)"])
-            if scnone_I == 1:
+            # With several infectors, each group of infectors can have its own activity and mask.
+            scnone_quanta_mix = scnone_I > 1 and st.checkbox("Describe the activity and mask of each group of infectors", False)
+            if scnone_quanta_mix:
+                scnone_inf_table = st.data_editor(mixtures.default_infectors(scnone_I), num_rows = "dynamic", hide_index = True, key = "scnone_inf_mix",
+                                                  column_config = {
+                                                      "Activity": st.column_config.SelectboxColumn(options = list(scnone_quanta_em_dict[scnone_quanta_disease_choice]), required = True),
+                                                      "Mask": st.column_config.SelectboxColumn(options = list(scnone_msk_eff_dict), required = True),
+                                                      "Infectors": st.column_config.NumberColumn(min_value = 0, step = 1, required = True)
+                                                  })
+            elif scnone_I == 1:
                 scnone_quanta_activity_choice = st.selectbox("What activity is the infectious individual taking part in?", ["Resting/Oral Breathing", "Standing/Speaking", "Light Activity/Speaking Loudly"])
             else:
                 scnone_quanta_activity_choice = st.selectbox("What activity are majority of the infectors taking part in?", ["Resting/Oral Breathing", "Standing/Speaking", "Light Activity/Speaking Loudly"])
-            scnone_quanta_mask_usage = st.selectbox("What type of mask is being worn?", ["KN95", "R95", "Blue surgical mask", "Cloth mask", "No mask"],
-                                             help = "Mask efficiency is calculated in the context of COVID-19, but is assumed to be broadly applicable to other airborne diseases.")
+            if not scnone_quanta_mix:
+                scnone_quanta_mask_usage = st.selectbox("What type of mask is being worn?", ["KN95", "R95", "Blue surgical mask", "Cloth mask", "No mask"],
+                                                        help = "Mask efficiency is calculated in the context of COVID-19, but is assumed to be broadly applicable to other airborne diseases.")
 
             st.write("")
 
-            # Find the values in the dictionaries. Convert and calculate final quanta emission rate incorporating mask usage.
-            scnone_init_quanta = scnone_quanta_em_dict[scnone_quanta_disease_choice][scnone_quanta_activity_choice]
-            st.session_state.scnone_quanta_dflt = scnone_init_quanta * (scnone_msk_eff_dict[scnone_quanta_mask_usage])
-            st.write(f"**The Quanta emission rate is {st.session_state.scnone_quanta_dflt:.4f}/h.**")
+            # If quanta emission rates have been calibrated on the Facility Overview page, the user can use them instead of the literature values.
+            if "calibrated_quanta" in st.session_state:
+                if st.radio("Quanta emission data", ["Literature values", "Calibrated from outbreaks"], horizontal = True) == "Calibrated from outbreaks":
+                    scnone_quanta_em_dict = st.session_state.calibrated_quanta
+                st.write("")
+
+            if scnone_quanta_mix:
+                try:
+                    scnone_inf_groups = mixtures.infector_arrays(scnone_inf_table, scnone_quanta_disease_choice, scnone_quanta_em_dict)
+                except ValueError as err: # No infectors in the groups.
+                    st.error(str(err))
+                    st.stop()
+                # The equations use the average quanta emission rate per infector, so that 'scnone_I' infectors emit the same total as the groups.
+                st.session_state.scnone_quanta_dflt = mixtures.weighted_mean(scnone_inf_groups["emission"], scnone_inf_groups["infectors"])
+                if scnone_inf_groups["infectors"].sum() != scnone_I:
+                    st.caption("The groups do not add up to the number of infectors, so they are used as proportions of the infectors.")
+                st.write(f"**The average Quanta emission rate per infector is {st.session_state.scnone_quanta_dflt:.4f}/h.**")
+            else:
+                # Find the values in the dictionaries. Convert and calculate final quanta emission rate incorporating mask usage.
+                scnone_init_quanta = scnone_quanta_em_dict[scnone_quanta_disease_choice][scnone_quanta_activity_choice]
+                st.session_state.scnone_quanta_dflt = scnone_init_quanta * (scnone_msk_eff_dict[scnone_quanta_mask_usage])
+                scnone_quanta_selection = (scnone_quanta_disease_choice, scnone_quanta_activity_choice, scnone_quanta_mask_usage)
+                st.write(f"**The Quanta emission rate is {st.session_state.scnone_quanta_dflt:.4f}/h.**")
             st.write("")
 
             # Asign this value to scnone_q, for the equations.
@@ -339,14 +414,7 @@ with tab2:
     st.write("")
 
     # Dictionary containing room ventilation rate data (ACH).
-    scnone_ventilation_dict = {
-        "Education": {"Assembly Halls": 4, "Classrooms": 6, "Computer Rooms": 15},
-        "Healthcare": {"Dental Centres": 8, "Pharmacies": 6, "Hospital Rooms (Sterilising)": 15, "Hospital Rooms (Wards)": 6, "Hospital Rooms (X-Ray)": 10, "Medical Centres": 8, "Medical Clinics": 8, "Medical Offices": 8},
-        "Hospitality": {"Bars": 20, "Cafeterias": 12, "Cocktail Lounges": 20, "Lunch Rooms": 12, "Nightclubs": 20, "Restaurants (Dining Area)": 8, "Restaurants (Food Staging)": 10, "Restaurants (Kitchens)": 30, "Restaurants (Bars)": 15, "Tavern": 20},
-        "Commercial": {"Banks": 4, "Court Houses": 4, "Conference Rooms": 8, "Fire Stations": 4, "Offices (Public)": 3, "Offices (Business)": 6, "Office Lunch Rooms": 7, "Police Stations": 4, "Post Offices": 4, "Retail": 6, "Shopping Centres": 6, "Supermarkets": 4},
-        "Recreational": {"Auditoriums": 12, "Bowling Alleys": 10, "Clubhouses": 20, "Dance Halls": 6, "Gyms": 6, "Museums": 12, "Swimming Pools": 20, "Theatres": 8},
-        "Industrial/Technical": {"Factory Buildings": 2, "Factory Buildings with Fumes/Moisture": 10, "Laboratories": 6, "Pig Houses": 6, "Poultry Houses": 6, "Warehouses": 6}
-    }
+    scnone_ventilation_dict = presets.ventilation_dict
 
     # Defining an empty area where the user can pick a preset ACH.
     scnone_dflt_vent_space = st.empty()
@@ -438,7 +506,7 @@ with tab2:
     st.write("")
     st.write("")
 
-    scnone_fiat500_size = 8.65
+    scnone_fiat500_size = presets.fiat500_size_m3
     # This is the size of a FIAT 500 in m³, rounded to two decimal places.
 
     # Defining an empty area where the user can describe their Room Volume using FIAT 500's.
@@ -529,6 +597,58 @@ with tab2:
 
     st.divider()
 
+#======================================================================
+# ADDITIONAL REMOVAL:
+#======================================================================
+
+    st.write("### 🌀 Additional Removal")
+
+    st.write("")
+    st.write("")
+
+    st.write("Besides ventilation, infectious particles are removed by air cleaners, filters, settling onto surfaces and natural decay.")
+    st.write("These are combined with the room ventilation rate into an **equivalent ventilation rate**, which is then used by the equations.")
+    st.write("")
+
+    # Dictionaries containing air cleaner and filter data.
+    scnone_air_cleaner_dict = presets.air_cleaner_dict
+    scnone_filter_eff_dict = presets.filter_eff_dict
+
+    scnone_rmvl_col1, scnone_rmvl_col2 = st.columns(2)
+    with scnone_rmvl_col1:
+        # Pick the type and number of portable air cleaners.
+        scnone_cleaner_choice = st.selectbox("Which portable air cleaners are in the space?", list(scnone_air_cleaner_dict))
+        scnone_cleaner_num = st.number_input("Number of air cleaners", min_value = 0, value = 1)
+    with scnone_rmvl_col2:
+        # Pick the filter grade and airflow of any recirculating ventilation system.
+        scnone_filter_choice = st.selectbox("Which filter does the recirculating ventilation system use?", list(scnone_filter_eff_dict))
+        scnone_recirc = st.number_input("Recirculated airflow in m³/h", min_value = 0.0)
+
+    scnone_deposition = st.checkbox(f"Include surface deposition ({presets.deposition_rate}/h)", False)
+    scnone_decay = st.number_input("Biological decay rate (/h)", min_value = 0.0,
+                                   help = "SARS-CoV-2 decays at roughly 0.63/h, which is a half-life of 1.1 hours.")
+
+    # The removal rates are per hour, so convert the ventilation rate to m³/h and back to m³/min for the equations.
+    scnone_removal = {"v": scnone_v,
+                      "cadr": scnone_air_cleaner_dict[scnone_cleaner_choice] * scnone_cleaner_num,
+                      "recirculation": scnone_recirc,
+                      "filter_eff": scnone_filter_eff_dict[scnone_filter_choice],
+                      "deposition": presets.deposition_rate if scnone_deposition else 0.0,
+                      "decay": scnone_decay}
+    scnone_breakdown = losses.removal_breakdown(scnone_Q * 60, **scnone_removal)
+    scnone_Q = float(losses.equivalent_ventilation(scnone_Q * 60, **scnone_removal)) / 60
+
+    st.write("")
+    st.write(f"**The equivalent ventilation rate is {scnone_Q * 60:.2f}m³/h.**")
+
+    # How much each removal mechanism adds to the equivalent ventilation rate.
+    st.bar_chart(pd.DataFrame({"Equivalent ventilation rate (m³/h)": scnone_breakdown}).rename_axis("Removal mechanism"), horizontal = True)
+
+# Reference for deposition rate: Buonanno, 2020, "Estimation of airborne viral emission: Quanta emission rate of SARS-CoV-2 for infection risk assessment", Environment International, Volume 141.
+# Reference for filter efficiencies: ANSI/ASHRAE Standard 52.2-2017.
+
+    st.divider()
+
 #======================================================================
 # TIME INFECTORS ARE PRESENT:
 #======================================================================
@@ -649,7 +769,7 @@ with tab3:
     st.write("")
     st.write("")
 
-    @st.cache_data # Cache model output to avoid recomputation for reused inputs.
+    @cache.cached # Cache model output in the shared cache, to avoid recomputation for inputs reused by any user.
     def scnone_equations(scnone_I, scnone_T, scnone_p, scnone_q, scnone_Q, scnone_v, scnone_t = None):
         """
         This function calculates the risks of infection using an enhanced Wells-Riley model from Edwards et al. (2024).
@@ -671,36 +791,19 @@ with tab3:
             float: Infection risk if susceptibles remain indefinitely (P_inf)
         """
 
-        try:
-        
-            # Equation 9: Risk whilst infector is present
-            exp_p1 = (scnone_p * scnone_q * scnone_I / scnone_Q**2) * (scnone_v * (1 - math.exp(-(scnone_Q / scnone_v) * scnone_T)) - scnone_Q * scnone_T)
-            P1 = 1 - math.exp(exp_p1)
+        # If the ventilation rate or room volume equals 0, instead of ZeroDivisionError's, return 0's.
+        if scnone_Q == 0 or scnone_v == 0:
+            return 0, 0, 0, 0
 
-            # Equation 14: Indefinite time risk
-            exp_inf = -(scnone_p * scnone_q * scnone_I / scnone_Q) * scnone_T
-            P_inf = 1 - math.exp(exp_inf)
+        # Equations 9, 11, 13 and 14 are evaluated by the shared model equations, on the compute backend that suits the size of the inputs.
+        P1, P2, P_comb, P_inf = backend.residual_risk(scnone_I, scnone_T, scnone_p, scnone_q, scnone_Q, scnone_v, scnone_t)
 
-            # If scnone_t is None (modelling for indefinite time), return the above, skip Equations 11 and 13.
-            if scnone_t == None:
-                return P1, None, None, P_inf
+        # If scnone_t is None (modelling for indefinite time), Equations 11 and 13 are skipped and P2 and P_comb are None.
+        if scnone_t == None:
+            return float(P1), None, None, float(P_inf)
 
-            # Equation 11: Risk after the infector leaves
-            exp_p2 = -((scnone_p * scnone_q * scnone_v * scnone_I)/scnone_Q**2) * (1-math.exp(-(scnone_Q / scnone_v) * scnone_T)) * (1-math.exp(-(scnone_Q / scnone_v) * scnone_t))
-            P2 = 1 - math.exp(exp_p2)
-
-            # Equation 13: Combined risk
-            exp_comb = ((scnone_p * scnone_q * scnone_v * scnone_I) / scnone_Q**2) * ((math.exp(-(scnone_Q / scnone_v) * scnone_t)) * (1 - math.exp(-(scnone_Q / scnone_v) * scnone_T)) - (scnone_Q / scnone_v) * scnone_T)
-            P_comb = 1 - math.exp(exp_comb)
-
-            # If scnone_t is not None (modelling for fixed time duration), return all.
-            return P1, P2, P_comb, P_inf
-        
-        except ZeroDivisionError: # If any value equals 0, instead of ZeroDivisionError's, return 0's.
-        
-            P1, P2, P_comb, P_inf = 0, 0, 0, 0
-        
-        return P1, P2, P_comb, P_inf # Return respective values in case of ZeroDivisionError.
+        # If scnone_t is not None (modelling for fixed time duration), return all.
+        return float(P1), float(P2), float(P_comb), float(P_inf)
 
     # If scnone_t is used, call function and asign.
     if not scnone_inf_time:
@@ -752,6 +855,156 @@ with tab3:
 
     st.divider()
 
+#======================================================================
+# INFECTIONS FROM COMMUNITY PREVALENCE:
+#======================================================================
+
+    # This section is only shown when the infectors are estimated from the community prevalence.
+    if scnone_from_prevalence:
+
+        st.write("### 🎲 Infections From Community Prevalence")
+
+        st.write("")
+        st.write("")
+
+        st.write("The number of infectors is uncertain, so every possible number is assessed and weighted by how likely it is.")
+
+        # The risk from one infector: the total combined risk, or the risk whilst infectors are present if the susceptibles leave with them.
+        scnone_one = scnone_equations(1, scnone_T, scnone_p, scnone_q, scnone_Q, scnone_v, None if scnone_inf_time else scnone_t)
+        scnone_prev = prevalence.outcomes(st.session_state.scnone_all, scnone_prevalence, scnone_one[0] if scnone_inf_time else scnone_one[2])
+
+        scnone_prev_col1, scnone_prev_col2, scnone_prev_col3, scnone_prev_col4 = st.columns(4)
+        with scnone_prev_col1:
+            st.metric("**Average Risk:**", f"{scnone_prev['mean_risk']*100:.2f}%")
+        with scnone_prev_col2:
+            st.metric("**Expected New Infections:**", f"{scnone_prev['expected_infections']:.2f}")
+        with scnone_prev_col3:
+            st.metric("**Chance Of No Infectors:**", f"{scnone_prev['prob_no_infector']:.1%}")
+        with scnone_prev_col4:
+            st.metric("**Chance Of At Least One Infection:**", f"{1 - scnone_prev['infection_pmf'][scnone_prev['infections'] == 0].sum():.1%}")
+
+        # The distribution of the number of new infections, over every possible number of infectors.
+        st.bar_chart(pd.DataFrame({"New Infections": scnone_prev["infections"], "Probability (%)": scnone_prev["infection_pmf"] * 100}),
+                     x = "New Infections", y = "Probability (%)", x_label = "Number of new infections", y_label = "Probability (%)")
+
+        st.divider()
+
+#======================================================================
+# RISK BY GROUP:
+#======================================================================
+
+    # This section is only shown when the susceptibles or infectors are described as a mix of groups.
+    if scnone_sus_groups is not None or scnone_inf_groups is not None:
+
+        st.write("### 👪 Risk By Group")
+
+        st.write("")
+        st.write("")
+
+        # Every susceptible group is assessed with its own breathing rate (per minute), in one vectorised call of the same equations.
+        scnone_diff = max(st.session_state.scnone_all - st.session_state.scnone_infectors, 0) # Susceptible.
+        scnone_sus = scnone_sus_groups or {"label": np.array(["Everyone"]), "breathing": np.array([scnone_p * 60]), "people": np.array([1.0])}
+        scnone_sus = dict(scnone_sus, people = scnone_sus["people"] * scnone_diff / scnone_sus["people"].sum()) # The groups are proportions of the susceptibles.
+        scnone_inf = scnone_inf_groups or {"label": np.array(["All infectors"]), "emission": np.array([scnone_q * 60]), "infectors": np.array([float(scnone_I)])}
+        scnone_group_P1, _, scnone_group_comb, _ = backend.residual_risk(scnone_I, scnone_T, scnone_sus["breathing"] / 60, scnone_q,
+                                                                         scnone_Q, scnone_v, None if scnone_inf_time else scnone_t)
+        # The expected infections use the total combined risk, or the risk whilst infectors are present if the susceptibles leave with them.
+        scnone_group_total = scnone_group_P1 if scnone_inf_time else scnone_group_comb
+        scnone_group_infs = mixtures.expected_infections(scnone_group_total, scnone_sus, scnone_inf)
+
+        st.dataframe(pd.DataFrame({
+            "Susceptibles": scnone_sus["label"],
+            "People": scnone_sus["people"],
+            "Breathing Rate (m³/h)": scnone_sus["breathing"],
+            ("Risk Whilst Infectors Present (%)" if scnone_inf_time else "Total Combined Risk (%)"): scnone_group_total * 100,
+            "Expected Infections": scnone_group_infs["by_group"]
+        }), hide_index = True)
+
+        # Which groups drive the infections: each susceptible group's expected infections, split by the infector groups that cause them.
+        scnone_drivers = pd.DataFrame(scnone_group_infs["matrix"], index = scnone_sus["label"], columns = scnone_inf["label"])
+        scnone_drivers = scnone_drivers.rename_axis("Susceptibles").reset_index().melt(id_vars = "Susceptibles", var_name = "Infectors", value_name = "Expected Infections")
+        st.plotly_chart(px.bar(scnone_drivers, x = "Susceptibles", y = "Expected Infections", color = "Infectors"), use_container_width = True)
+
+        st.write(f"The estimated number of new infections is: **{math.ceil(round(scnone_group_infs['by_group'].sum(), 9))}**")
+        st.write(f"Most infections are expected among: **{scnone_sus['label'][np.argmax(scnone_group_infs['by_group'])]}**")
+        if scnone_inf_groups is not None:
+            st.write(f"Most infections are caused by the infectors in the group: **{scnone_inf['label'][np.argmax(scnone_group_infs['by_infector'])]}**")
+
+        st.divider()
+
+#======================================================================
+# COMPARISON MATRIX:
+#======================================================================
+
+    st.write("### 🧮 Every Disease, Activity And Mask")
+
+    st.write("")
+    st.write("")
+
+    # The matrix shows the total combined risk, or the risk whilst infectors are present if the susceptibles leave with them.
+    if scnone_inf_time:
+        st.write("The risk whilst infectors are present in your room, for every disease, infector activity and mask we hold data for.")
+    else:
+        st.write("The total combined risk in your room, for every disease, infector activity and mask we hold data for.")
+
+    # Every preset is evaluated in one broadcast call, with the rest of the inputs held at their current values.
+    # The quanta emission rates are converted from quanta/h to quanta/min.
+    scnone_presets = comparison.preset_emissions(scnone_quanta_em_dict, scnone_msk_eff_dict)
+    if scnone_Q == 0 or scnone_v == 0: # As above, return 0's instead of ZeroDivisionError's.
+        scnone_matrix_risk = np.zeros_like(scnone_presets["emission"])
+    else:
+        scnone_matrix_P1, _, scnone_matrix_comb, _ = backend.residual_risk(scnone_I, scnone_T, scnone_p, scnone_presets["emission"] / 60,
+                                                                            scnone_Q, scnone_v, None if scnone_inf_time else scnone_t)
+        scnone_matrix_risk = scnone_matrix_P1 if scnone_inf_time else scnone_matrix_comb
+    scnone_matrix = comparison.matrix_table(scnone_matrix_risk, scnone_presets)
+    st.table(comparison.styled_matrix(scnone_matrix, scnone_quanta_selection))
+
+    if scnone_quanta_selection is not None:
+        st.caption("Your selection is outlined. Colours run from teal (lowest risk) to red (highest risk), on a logarithmic scale.")
+    else:
+        st.caption("Colours run from teal (lowest risk) to red (highest risk), on a logarithmic scale. Pick a single disease, activity and mask to see your selection outlined.")
+
+    st.divider()
+
+#======================================================================
+# ASSESSMENT HISTORY:
+#======================================================================
+
+    st.write("### 🗂️ Assessment History")
+
+    st.write("")
+    st.write("")
+
+    st.write("Save this assessment to the local history, to follow how the risk of a room changes over time. The Facility page lists the riskiest rooms across every building.")
+
+    scnone_hist_col1, scnone_hist_col2 = st.columns(2)
+    with scnone_hist_col1:
+        scnone_hist_building = st.text_input("Building", key = "scnone_hist_building").strip()
+    with scnone_hist_col2:
+        scnone_hist_room = st.text_input("Room", key = "scnone_hist_room").strip()
+
+    # The history is kept in hours, so the per-minute inputs are converted before saving.
+    if st.button("Save this assessment", key = "scnone_hist_save", disabled = not scnone_hist_room):
+        history.shared().add("residual", scnone_hist_building, scnone_hist_room, infectors = scnone_I, breathing = scnone_p * 60, quanta = scnone_q * 60,
+                             ventilation = scnone_Q * 60, volume = scnone_v, duration = scnone_T / 60, after = None if scnone_inf_time else scnone_t / 60,
+                             P1 = P1, P2 = P2, P_comb = P_comb, P_inf = P_inf,
+                             traditional = float(backend.wells_riley_risk(scnone_I, scnone_p, scnone_q, scnone_T, scnone_Q)) if scnone_Q > 0 else None)
+        st.success(f"Saved the assessment of {scnone_hist_room}" + (f" ({scnone_hist_building})." if scnone_hist_building else "."))
+
+    # The saved risk of the room, day by day.
+    if scnone_hist_room:
+        scnone_hist_trend = history.shared().trend(scnone_hist_building, scnone_hist_room)
+        if len(scnone_hist_trend):
+            scnone_hist_trend[["mean_risk", "max_risk"]] *= 100
+            st.plotly_chart(px.line(scnone_hist_trend, x = "day", y = ["mean_risk", "max_risk"], markers = True,
+                                    labels = {"day": "Day", "value": "Probability of infection (%)", "variable": ""}), use_container_width = True)
+        else:
+            st.caption("No saved assessments for this room yet.")
+    else:
+        st.caption("Enter a room to save this assessment and see its history.")
+
+    st.divider()
+
     # If modelling for a fixed post-departure time, plot a pie chart breaking down the total combined risk.
     if not scnone_inf_time:
 
@@ -800,8 +1053,21 @@ with tab3:
     # Calculate traditional Wells-Riley risk.
     scnone_trad_risk = 1 - math.exp(- (scnone_I * scnone_p * scnone_q * scnone_T) / scnone_Q)
 
+    # The near-field / far-field model separates people in close contact with the infectors from the rest of the room.
+    with st.expander("Near-field settings"):
+        scnone_nf_col1, scnone_nf_col2 = st.columns(2)
+        with scnone_nf_col1:
+            scnone_nf_r = st.number_input("Near-field radius (m)", min_value = 0.1, value = presets.near_field_radius,
+                                          help = "People within this distance of the infectors are in close contact.")
+        with scnone_nf_col2:
+            scnone_nf_s = st.number_input("Random air speed (m/s)", min_value = 0.001, value = presets.near_field_air_speed, format = "%.3f",
+                                          help = "Around 0.05 m/s in a typical occupied room, and higher with fans or draughts.")
+    scnone_v_n, scnone_beta = models.near_field_geometry(scnone_nf_r, scnone_nf_s * 60) # Air speed converted to m/min.
+    scnone_near, scnone_far = models.two_box_risk(scnone_I, scnone_T, scnone_p, scnone_q, scnone_Q, scnone_v, scnone_v_n, scnone_beta,
+                                                  None if scnone_inf_time else scnone_t)
+
     # Columns for output.
-    scnone_comp_col1, scnone_comp_col2 = st.columns(2)
+    scnone_comp_col1, scnone_comp_col2, scnone_comp_col3 = st.columns(3)
 
     with scnone_comp_col1: # Output traditional risk.
         st.write("**Traditional Wells-Riley Model:**")
@@ -820,6 +1086,17 @@ with tab3:
             st.write(f"• During presence: {P1*100:.2f}%")
             st.write(f"• Staying indefinitely: {P_inf*100:.2f}%")
 
+    with scnone_comp_col3:
+        st.write("**Near-Field / Far-Field Model:**")
+        # The same total risk as the enhanced model, for a susceptible close to the infectors and one elsewhere in the room.
+        scnone_total = 2 if not scnone_inf_time else 3
+        st.metric("Close Contact Risk Estimate", f"{float(scnone_near[scnone_total])*100:.2f}%")
+        st.write(f"• Rest of the room: {float(scnone_far[scnone_total])*100:.2f}%")
+        if scnone_v_n >= scnone_v:
+            st.caption("• The near-field is larger than the room, reduce the near-field radius")
+        else:
+            st.caption(f"• Close contact within {scnone_nf_r:g}m of the infectors")
+
     st.divider()
 
 #======================================================================
@@ -840,12 +1117,14 @@ with tab3:
         scnone_max_time = scnone_T + 120
     # We want a time point every five minutes.
     scnone_time_res = 5
-    # We need to calculate the number of time points we need across our time range.
-    scnone_num_time_points = int(scnone_max_time / scnone_time_res) + 1 # Add one to ensure that the final time point is included.
     # Finally, create a NumPy array containing the entire range of time points.
-    scnone_time_range = np.linspace(0, scnone_max_time, scnone_num_time_points)
+    # For very long times, the number of time points is capped so that the graph stays the same size.
+    scnone_time_range = visuals.time_grid(scnone_max_time, scnone_time_res)
+
+    # The curve is served from the shared cache, which is capped in size and expires old entries (see engine/cache.py).
+    # Only the calculation is cached: the chart itself is drawn on every rerun.
+    scnone_curve = cache.cached(models.residual_risk_curve)
 
-    @st.cache_data
     def scnone_rsk_plot(scnone_time_range, scnone_I, scnone_T, scnone_p, scnone_q, scnone_Q, scnone_v, scnone_t = None):
         """
         This function produces an area chart that plots the estimated risk of infection at different time points using an enhanced Wells-Riley model from Edwards et al. (2024).
@@ -860,27 +1139,19 @@ with tab3:
             scnone_Q (float): The ventilation rate.
             scnone_v (float): The Room Volume.
             scnone_t (float, optional): Modelling time after the infectors leave. Defaults to None.
-        """
-
-        scnone_list_probs = [] # Create an empty list to store the risk of infection at each time point.
 
-        for time in scnone_time_range:
-            # Loop over each time point in our time range.
+        Returns:
+            NumPy array: The risk of infection at each time point.
+        """
 
-            if time <= scnone_T:
-                # If the current time falls within the time that the infector is present, calculate the risk using the appropriate equation and append to the list as a percentage.
-                P1_at_time, _, _, _ = scnone_equations(scnone_I, time, scnone_p, scnone_q, scnone_Q, scnone_v)
-                scnone_list_probs.append(P1_at_time * 100)
-            else:
-                # If the current time falls within the time after the infector departs, calculate the time since departure and do the same as above using the appropriate equation.
-                scnone_post_time = time - scnone_T
-                _, P2_at_time, _, _ = scnone_equations(scnone_I, scnone_T, scnone_p, scnone_q, scnone_Q, scnone_v, scnone_post_time)
-                scnone_list_probs.append(P2_at_time * 100)
+        # Calculate the risk at every time point in one vectorised call.
+        # Time points whilst the infector is present use Equation 9, time points after the infector departs use Equation 11.
+        scnone_probs = scnone_curve(scnone_time_range, scnone_I, scnone_T, scnone_p, scnone_q, scnone_Q, scnone_v)
 
         # Pandas DataFrame containing all time points in the time range, and their respective risks.
         scnone_riskvtime_data = pd.DataFrame({
             "Time (minutes)": scnone_time_range,
-            "Risk Of Infection": scnone_list_probs})
+            "Risk Of Infection": scnone_probs * 100})
 
         # Plot the DataFrame
         st.area_chart(
@@ -891,13 +1162,193 @@ with tab3:
             y_label = "Risk of Infection (%)"
         )
 
+        return scnone_probs
+
     # Call the above function to produce the plot.
     if not scnone_inf_time:
         # If we are NOT modelling for indefinite time...
-        scnone_rsk_plot(scnone_time_range, scnone_I, scnone_T, scnone_p, scnone_q, scnone_Q, scnone_v, scnone_t)
+        scnone_curve_probs = scnone_rsk_plot(scnone_time_range, scnone_I, scnone_T, scnone_p, scnone_q, scnone_Q, scnone_v, scnone_t)
     else:
         # If we ARE modelling for indefinite time...
-        scnone_rsk_plot(scnone_time_range, scnone_I, scnone_T, scnone_p, scnone_q, scnone_Q, scnone_v)
+        scnone_curve_probs = scnone_rsk_plot(scnone_time_range, scnone_I, scnone_T, scnone_p, scnone_q, scnone_Q, scnone_v)
+
+    # The time range and risks behind the graph can be downloaded for use in other tools.
+    scnone_export_cols = {"time_minutes": scnone_time_range, "risk_of_infection": scnone_curve_probs}
+    scnone_export_meta = {"model": "Residual Risk", "units": {"time_minutes": "min", "risk_of_infection": "fraction"},
+                          "inputs": {"I": scnone_I, "T_min": scnone_T, "p_m3min": scnone_p, "q_per_min": scnone_q, "Q_m3min": scnone_Q, "v_m3": scnone_v,
+                                     "t_min": None if scnone_inf_time else scnone_t}}
+    scnone_dl_col1, scnone_dl_col2 = st.columns(2)
+    with scnone_dl_col1:
+        st.download_button("Download graph data (Parquet)",
+                           data = export.to_parquet_bytes(scnone_export_cols, scnone_export_meta),
+                           file_name = "residual_risk_curve.parquet",
+                           mime = "application/vnd.apache.parquet")
+    with scnone_dl_col2:
+        st.download_button("Download graph data (Arrow IPC)",
+                           data = export.to_ipc_bytes(scnone_export_cols, scnone_export_meta),
+                           file_name = "residual_risk_curve.arrow",
+                           mime = "application/vnd.apache.arrow.file")
+
+    st.divider()
+
+#======================================================================
+# WHAT IF?:
+#======================================================================
+
+    st.write("### 🔀 What If?")
+
+    st.write("")
+    st.write("")
+
+    st.write("What would this graph look like if your data was different? Pick one of your inputs, and the values to compare it with.")
+
+    # The inputs that can be changed, with their names on this page.
+    scnone_whatif_names = {
+        "q": "Quanta Emission Rate",
+        "Q": "Room Ventilation Rate",
+        "v": "Room Volume",
+        "T": "Time Infectors Are Present",
+        "I": "Number Of Infectors",
+        "p": "Pulmonary Breathing Rate"
+    }
+    scnone_whatif_inputs = {"I": scnone_I, "T": scnone_T, "p": scnone_p, "q": scnone_q, "Q": scnone_Q, "v": scnone_v}
+
+    scnone_wi_col1, scnone_wi_col2, scnone_wi_col3 = st.columns(3)
+    with scnone_wi_col1:
+        scnone_whatif_param = st.selectbox("Input to change", list(scnone_whatif_names), format_func = lambda key: scnone_whatif_names[key],
+                                           key = "scnone_whatif_param")
+    with scnone_wi_col2:
+        scnone_whatif_mode = st.radio("Compare with", ["multiply", "set"], horizontal = True, key = "scnone_whatif_mode",
+                                      format_func = lambda mode: "Multiples of your value" if mode == "multiply" else "Other values")
+    with scnone_wi_col3:
+        scnone_whatif_text = st.text_input("Multipliers" if scnone_whatif_mode == "multiply" else "Values", "0.5, 2, 10", key = "scnone_whatif_values",
+                                           help = f"Up to {whatif.MAX_OVERLAYS}, separated by commas. Rates are per minute and times in minutes, as above.")
+
+    try:
+        scnone_whatif_values = whatif.parse_values(scnone_whatif_text)
+    except ValueError as err:
+        st.error(str(err))
+        scnone_whatif_values = None
+
+    if scnone_whatif_values is not None:
+        # Your own curve and every scenario are evaluated together, in one broadcast call over (scenarios, time points).
+        scnone_whatif_labels = ["Your inputs"] + whatif.scenario_labels(scnone_whatif_names[scnone_whatif_param], scnone_whatif_values, scnone_whatif_mode)
+        scnone_whatif_base = scnone_whatif_inputs.pop(scnone_whatif_param)
+        scnone_whatif_curves = cache.cached(whatif.overlay_curves)(
+            "residual", scnone_time_range, scnone_whatif_param,
+            np.append(scnone_whatif_base, whatif.scenario_values(scnone_whatif_base, scnone_whatif_values, scnone_whatif_mode)), **scnone_whatif_inputs)
+
+        st.plotly_chart(px.line(whatif.overlay_table(scnone_time_range, scnone_whatif_curves, scnone_whatif_labels), x = "time", y = "risk", color = "scenario",
+                                labels = {"time": "Exposure Time (minutes)", "risk": "Risk of Infection (%)", "scenario": ""}), use_container_width = True)
+
+        if scnone_whatif_param == "T":
+            st.caption("The time axis is kept the same for every curve, so a longer presence may run past the end of the graph.")
+
+    st.divider()
+
+#======================================================================
+# SAFE RE-ENTRY TIME:
+#======================================================================
+
+    st.write("### 🚪 Safe Re-Entry Time")
+
+    st.write("")
+    st.write("")
+
+    st.write("After the infectors leave, how long should the room be left empty before the next group can safely come in?")
+
+    scnone_re_col1, scnone_re_col2 = st.columns(2)
+    with scnone_re_col1:
+        scnone_re_threshold = st.number_input("Highest acceptable risk for someone entering the room (%)", min_value = 0.001, max_value = 50.0,
+                                              value = 0.1, step = 0.05, format = "%.3f") / 100
+    with scnone_re_col2:
+        scnone_re_stay = st.number_input("How long the next group stays in minutes", min_value = 1, value = 60)
+
+    # The waiting time is solved for in closed form from Equation 11.
+    scnone_re_wait = float(models.reentry_time(scnone_I, scnone_T, scnone_p, scnone_q, scnone_Q, scnone_v, scnone_re_threshold, stay = scnone_re_stay))
+
+    if np.isinf(scnone_re_wait):
+        st.warning("Without any ventilation, the room never becomes safe to re-enter.")
+    elif scnone_re_wait == 0:
+        st.write("**The room is already safe to re-enter as soon as the infectors leave.**")
+    else:
+        st.write(f"**The room is safe to re-enter {scnone_re_wait:.0f} minutes after the infectors leave.**")
+
+    # The same question, for every preset setting and a range of room volumes, in one vectorised call.
+    if st.checkbox("Show the safe re-entry time for every setting and room size", False):
+        scnone_re_settings = pd.DataFrame([(cat, stng, ach) for cat, stngs in scnone_ventilation_dict.items() for stng, ach in stngs.items()],
+                                          columns = ["Category", "Setting", "ACH"])
+        scnone_re_vols = np.array([50, 100, 200, 500, 1000])
+        scnone_re_ach = scnone_re_settings["ACH"].to_numpy(dtype = float)[:, None]
+        scnone_re_table = models.reentry_time(scnone_I, scnone_T, scnone_p, scnone_q, scnone_re_ach / 60 * scnone_re_vols, scnone_re_vols,
+                                              scnone_re_threshold, stay = scnone_re_stay) # ACH converted to air changes per minute.
+        for scnone_re_vol, scnone_re_col in zip(scnone_re_vols, scnone_re_table.T):
+            scnone_re_settings[f"{scnone_re_vol}m³ (min)"] = np.ceil(scnone_re_col)
+        st.dataframe(scnone_re_settings, hide_index = True)
+        st.caption("Minutes to wait after the infectors leave, with the infectors, activity and exposure time entered above.")
+
+    st.divider()
+
+#======================================================================
+# STAGGERED INFECTORS:
+#======================================================================
+
+    st.write("### 🚶 Staggered Infectors")
+
+    st.write("")
+    st.write("")
+
+    st.write("The risk assessment above assumes that every infector arrives at the start and leaves together after the same time.")
+    st.write("Below, you can give each group of infectors its own arrival time, departure time, quanta emission rate and mask.")
+    st.caption("Each row is a group of identical infectors. The first row starts as your current inputs.")
+
+    # Each row of the table is one infector event. By default, the table describes the inputs from the Model tab.
+    scnone_events = st.data_editor(
+        pd.DataFrame({
+            "Infectors": [scnone_I],
+            "Arrival (minutes)": [0.0],
+            "Departure (minutes)": [float(scnone_T)],
+            "Quanta emission rate (/h)": [scnone_q * 60], # Already includes any mask chosen in the Model tab.
+            "Mask": ["No mask"]
+        }),
+        num_rows = "dynamic",
+        column_config = {
+            "Infectors": st.column_config.NumberColumn("Infectors", min_value = 0),
+            "Arrival (minutes)": st.column_config.NumberColumn("Arrival (minutes)", min_value = 0.0),
+            "Departure (minutes)": st.column_config.NumberColumn("Departure (minutes)", min_value = 0.0),
+            "Quanta emission rate (/h)": st.column_config.NumberColumn("Quanta emission rate (/h)", min_value = 0.0),
+            "Mask": st.column_config.SelectboxColumn("Mask", options = list(scnone_msk_eff_dict), required = True)
+        },
+        key = "scnone_events"
+    ).dropna()
+
+    # Groups that leave before they arrive are left out, as they would take dose away from the others.
+    scnone_backwards = scnone_events["Departure (minutes)"] < scnone_events["Arrival (minutes)"]
+    if scnone_backwards.any():
+        st.error(f"Rows {', '.join(str(i + 1) for i in np.flatnonzero(scnone_backwards))} depart before they arrive, and are left out. Give them a departure time after their arrival time.")
+        scnone_events = scnone_events[~scnone_backwards]
+
+    # The time range is extended, if needed, to two hours after the last infector departs.
+    scnone_stag_max_time = max(scnone_max_time, scnone_events["Departure (minutes)"].max() + 120) if len(scnone_events) else scnone_max_time
+    scnone_stag_time_range = visuals.time_grid(scnone_stag_max_time, scnone_time_res)
+
+    # Superpose the concentration of every infector event and calculate the risk for a susceptible present from the start.
+    scnone_stag = superposition.superpose(
+        scnone_stag_time_range,
+        scnone_events["Arrival (minutes)"].to_numpy(),
+        scnone_events["Departure (minutes)"].to_numpy(),
+        superposition.emission_rates(scnone_events["Quanta emission rate (/h)"].to_numpy() / 60, scnone_events["Mask"].to_numpy(), scnone_events["Infectors"].to_numpy()),
+        scnone_Q, scnone_v, scnone_p)
+
+    st.metric("**Risk By The End Of The Graph:**", f"{scnone_stag['risk'][-1]*100:.2f}%")
+
+    st.line_chart(
+        data = pd.DataFrame({"Time (minutes)": scnone_stag_time_range, "Risk Of Infection": scnone_stag["risk"] * 100}),
+        x = "Time (minutes)",
+        y = "Risk Of Infection",
+        x_label = "Time since the first arrival (minutes)",
+        y_label = "Risk of Infection (%)"
+    )
 
     st.divider()
 
@@ -928,6 +1379,11 @@ with tab4:
     st.write("**The Residual Risk Model:**")
     st.write("Alexander Edwards, 'The Wells–Riley model revisited: Randomness, heterogeneity, and transient behaviours', Risk Analysis, Volume 44, Issue 9, September 2024, Pages 2125-2147")
 
+    st.write("")
+
+    st.write("**The Near-Field / Far-Field Model:**")
+    st.write("Mark Nicas, 'Estimating exposure intensity in an imperfectly mixed room', American Industrial Hygiene Association Journal, Volume 57, Issue 6, 1996, Pages 542-550")
+
     st.divider()
 
     st.write("### 📃 Supporting Data")
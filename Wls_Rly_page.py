@@ -4,14 +4,18 @@
 
 # This is the Python file for the Wells-Riley page of our web-app.
 
-# Importing Streamlit, Numpy and Pandas
+# Importing Streamlit, Numpy, Pandas and Plotly
 import streamlit as st
 import numpy as np
 import pandas as pd
+import plotly.express as px
 
-# Importing Math for the 'e' value within the Wells-Riley equation.
+# Importing Math for rounding up the number of new infections.
 import math
 
+# Importing the vectorised model equations, the Arrow/Parquet export, the shared preset data, the additional removal terms, the size-limited visuals, the shared result cache and the spatial room model from our engine package.
+from engine import models, export, presets, losses, visuals, cache, spatial, backend, mixtures, prevalence, comparison, history, whatif
+
 # Page configurations.
 st.set_page_config(layout = "wide", # Page will be wide by default.
                    page_title = "IARA", # Name of our web-app to be displayed in the browser tab.
@@ -81,7 +85,9 @@ with tab1:
     
     st.write("**📈 Estimated Probability of Infection Over Time:** A graph showing the estimated probability of infection over time.")
     
-    st.write("**⬆️ Increased Quanta Emission Rate Graph:** A similar graph to the one shown above, except this time the users quanta emission rate has been multiplied by 100. This will highlight to the user the effect of changing their inputs.")
+    st.write("**🗺️ Spatial Risk Map (optional):** A map of the risk of infection across the room, and the risk of each seat, for people sitting at different distances from the infectors.")
+
+    st.write("**🔀 What If?:** The graph above, overlaid with the curves you would get if one of your inputs were different. Pick an input and up to ten multipliers or values to compare, and see the effect of changing your inputs.")
 
 #====================================================================================================================================================
 # MODEL TAB:
@@ -101,6 +107,14 @@ with tab2:
     st.write("") # Gap between sub-heading and text.
     st.write("")
     
+    # A live headcount can be passed in the page address (e.g. '?headcount=250'), by a people counter or building system.
+    # Each new headcount replaces the total, but the user can still change it until the next headcount arrives.
+    wls_headcount = st.query_params.get("headcount")
+    if wls_headcount is not None and wls_headcount != st.session_state.get("wls_headcount_last"):
+        st.session_state.wls_headcount_last = wls_headcount
+        if wls_headcount.isdigit():
+            st.session_state.wls_all = max(int(wls_headcount), 2)
+
     # Numerical input for the number of individuals.
     st.number_input("Total number of individuals within the space",
                     min_value = 2,
@@ -108,6 +122,8 @@ with tab2:
                     help = "There must be at least one infector and one susceptible individual within the space.")
     st.write("")
     st.write(f"**There is a total number of {st.session_state.wls_all} individuals within the space.**")
+    if wls_headcount is not None:
+        st.caption(f"The live headcount from the page address is {wls_headcount}.")
 
     # Adding a divider to space out requested inputs.
     st.divider()
@@ -121,16 +137,32 @@ with tab2:
     st.write("")
     st.write("")
     
-    # Numerical input for the number of infectors.
-    st.number_input("Number of infectious individuals within the space",
-                    min_value = 1,
-                    key = "wls_infectors",
-                    help = "There must be at least one infector within the space.")
-    st.write("")
-    if st.session_state.wls_infectors == 1:
-        st.write("**There is 1 infector within the space.**")
+    # If the number of infectors is not known, it can be estimated from the prevalence of the disease in the community.
+    wls_from_prevalence = st.toggle("Estimate the infectors from community prevalence", value = False,
+                                    help = "*Each individual is assumed to be infectious with a probability equal to the prevalence*")
+    st.write("")
+
+    if not wls_from_prevalence:
+        # Numerical input for the number of infectors.
+        st.number_input("Number of infectious individuals within the space",
+                        min_value = 1,
+                        key = "wls_infectors",
+                        help = "There must be at least one infector within the space.")
+        st.write("")
+        if st.session_state.wls_infectors == 1:
+            st.write("**There is 1 infector within the space.**")
+        else:
+            st.write(f"**There are {st.session_state.wls_infectors} infectors within the space.**")
     else:
-        st.write(f"**There are {st.session_state.wls_infectors} infectors within the space.**")
+        wls_prevalence = st.number_input("Prevalence of the disease in the community (%)", min_value = 0.0, max_value = 100.0, value = 1.0,
+                                         step = 0.1, format = "%.3f", key = "wls_prevalence_pct") / 100
+        # The number of infectors is Binomial(total, prevalence). The graphs and other sections use the expected number, rounded and at least 1,
+        # and the Infections From Community Prevalence section sums the model over every possible number of infectors.
+        wls_expected_infectors = st.session_state.wls_all * wls_prevalence
+        st.session_state.wls_infectors = max(1, min(round(wls_expected_infectors), st.session_state.wls_all - 1))
+        st.write("")
+        st.write(f"**On average, {wls_expected_infectors:.2f} of the {st.session_state.wls_all} individuals are infectious.**")
+        st.caption(f"The other sections assume {st.session_state.wls_infectors} infector(s). The Risk Assessment tab also shows the risk averaged over every possible number of infectors.")
 
     # This if-statement checks that the number of infectors is not greater than or equal to the total number of individuals.
     if st.session_state.wls_infectors >= st.session_state.wls_all:
@@ -151,12 +183,10 @@ with tab2:
     st.write("")
 
     # Dictionary containing breathing rate data (m³/h) for various different age groups and activities.
-    breathing_dict = {
-        "Adult": {"Sleep": 0.385, "Sitting/Resting": 0.465, "Light activity (Standing/Walking)": 1.375, "Heavy activity (Exercise/Sports)": 2.85},
-        "15 Years Old": {"Sleep": 0.385, "Sitting/Resting": 0.44, "Light activity (Standing/Walking)": 1.34, "Heavy activity (Exercise/Sports)": 2.745},
-        "10 Years Old": {"Sleep": 0.31, "Sitting/Resting": 0.38, "Light activity (Standing/Walking)": 1.12, "Heavy activity (Exercise/Sports)": 2.03},
-        "5 Years Old": {"Sleep": 0.24, "Sitting/Resting": 0.32, "Light activity (Standing/Walking)": 0.57}
-    }
+    breathing_dict = presets.breathing_dict
+
+    # The susceptible groups, if the user describes a mix of age-groups and activities. None means one group with the breathing rate 'p'.
+    wls_sus_groups = None
 
     # Defining an empty area that will contain the default breathing rate and other presets.
     dflt_txt_breathing = st.empty()
@@ -178,6 +208,8 @@ with tab2:
             # The user can choose whether or not they would like to use one of our various breathing rate presets.
             # This is turned off by default.
             breathing_adjust = st.checkbox("Adjust the default Pulmonary Breathing Rate by selecting the age-group and activity of the population", False)
+            # Alternatively, the population can be described as a mix of age-groups and activities, each with its own breathing rate.
+            wls_breathing_mix = st.checkbox("Describe the population as a mix of age-groups and activities instead", False, disabled = breathing_adjust)
             st.write("")
             if breathing_adjust: # If the user would like to adjust the default breathing rate using our presets...
                 # ... the user will select the majority age group and activity of the population.
@@ -209,6 +241,28 @@ with tab2:
 
                     # Asign this value to P, for the Wells-Riley model.
                     p = st.session_state.wls_breathing_dflt
+            elif wls_breathing_mix: # If the user will describe the population as a mix of groups...
+                # ... each row is a group of susceptibles, with its age-group, activity and number of people.
+                wls_sus_table = st.data_editor(mixtures.default_susceptibles(max(st.session_state.wls_all - st.session_state.wls_infectors, 1)),
+                                               num_rows = "dynamic", hide_index = True, key = "wls_sus_mix",
+                                               column_config = {
+                                                   "Age group": st.column_config.SelectboxColumn(options = list(breathing_dict), required = True),
+                                                   "Activity": st.column_config.SelectboxColumn(options = list(breathing_dict["Adult"]), required = True),
+                                                   "People": st.column_config.NumberColumn(min_value = 0, step = 1, required = True)
+                                               })
+                try:
+                    wls_sus_groups = mixtures.susceptible_arrays(wls_sus_table)
+                except ValueError as err: # No people, or a breathing rate that is not available (Heavy activity for 5 year olds).
+                    st.error(str(err))
+                    p = 0.465
+                else:
+                    # The graphs over time use the average breathing rate, and the Risk By Group section uses each group's own rate.
+                    p = mixtures.weighted_mean(wls_sus_groups["breathing"], wls_sus_groups["people"])
+                    if wls_sus_groups["people"].sum() != st.session_state.wls_all - st.session_state.wls_infectors:
+                        st.caption("The groups do not add up to the number of susceptibles, so they are used as proportions of the susceptibles.")
+                st.write("")
+                st.write(f"**The average Pulmonary Breathing Rate of the population is {p:.3f}m³/h.**")
+                st.write("")
             else: # If the user will not be adjusting the default breathing rate using our presets...
                 p = 0.465 # ... asign the default breathing rate to P and print this to the screen.
                 st.write("**The Pulmonary Breathing Rate for your risk assessment is 0.465m³/h.**")
@@ -261,21 +315,16 @@ with tab2:
     st.write("")
 
     # Dictionary containing quanta emission data for COVID-19, Influenza, and TB
-    quanta_em_dict = {
-        "SARS-CoV-2/COVID-19": {"Resting/Oral Breathing": 0.55, "Standing/Speaking": 2.7, "Light Activity/Speaking Loudly": 46},
-        "Influenza": {"Resting/Oral Breathing": 0.035, "Standing/Speaking": 0.17, "Light Activity/Speaking Loudly": 3.0},
-        "TB (On Treatment)": {"Resting/Oral Breathing": 0.020, "Standing/Speaking": 0.098, "Light Activity/Speaking Loudly": 1.7},
-        "TB (Untreated)": {"Resting/Oral Breathing": 0.62, "Standing/Speaking": 3.1, "Light Activity/Speaking Loudly": 52}
-    }
+    quanta_em_dict = presets.quanta_em_dict
 
     # Dictionary containing mask efficiency data for various masks.
-    msk_eff_dict = {
-        "KN95": 0.05, # 95% efficiency.
-        "R95": 0.04, # 96% efficiency.
-        "Blue surgical mask": 0.53, # 47% efficiency.
-        "Cloth mask": 0.6, # 40% efficiency.
-        "No mask": 1.0 # 0% efficiency.
-    }
+    msk_eff_dict = presets.msk_eff_dict
+
+    # The infector groups, if the user describes each group's activity and mask. None means 'I' infectors with the quanta emission rate 'q'.
+    wls_inf_groups = None
+
+    # The user's (disease, activity, mask), if they picked a single preset. It is highlighted in the comparison matrix on the output tab.
+    wls_quanta_selection = None
 
     # Defining an empty area that will allow the user to pick a predefined quanta emission rate and mask usage, if any.
     dflt_quanta_em_space = st.empty()
@@ -292,19 +341,48 @@ with tab2:
             
             # The user will select what disease they're focusing on, the activity of the infector(s), and indicate the type of mask usage. 
             quanta_disease_choice = st.selectbox("Which disease are you modelling for?", ["SARS-CoV-2/COVID-19", "Influenza", "TB (On Treatment)", "TB (Untreated)"])
-            if I == 1:
+            # With several infectors, each group of infectors can have its own activity and mask.
+            wls_quanta_mix = I > 1 and st.checkbox("Describe the activity and mask of each group of infectors", False)
+            if wls_quanta_mix:
+                wls_inf_table = st.data_editor(mixtures.default_infectors(I), num_rows = "dynamic", hide_index = True, key = "wls_inf_mix",
+                                               column_config = {
+                                                   "Activity": st.column_config.SelectboxColumn(options = list(quanta_em_dict[quanta_disease_choice]), required = True),
+                                                   "Mask": st.column_config.SelectboxColumn(options = list(msk_eff_dict), required = True),
+                                                   "Infectors": st.column_config.NumberColumn(min_value = 0, step = 1, required = True)
+                                               })
+            elif I == 1:
                 quanta_activity_choice = st.selectbox("What activity is the infectious individual taking part in?", ["Resting/Oral Breathing", "Standing/Speaking", "Light Activity/Speaking Loudly"])
             else:
                 quanta_activity_choice = st.selectbox("What activity are majority of the infectors taking part in?", ["Resting/Oral Breathing", "Standing/Speaking", "Light Activity/Speaking Loudly"])
-            quanta_mask_usage = st.selectbox("What type of mask is being worn?", ["KN95", "R95", "Blue surgical mask", "Cloth mask", "No mask"],
-                                             help = "Mask efficiency is calculated in the context of COVID-19, but is assumed to be broadly applicable to other airborne diseases.")
+            if not wls_quanta_mix:
+                quanta_mask_usage = st.selectbox("What type of mask is being worn?", ["KN95", "R95", "Blue surgical mask", "Cloth mask", "No mask"],
+                                                 help = "Mask efficiency is calculated in the context of COVID-19, but is assumed to be broadly applicable to other airborne diseases.")
 
             st.write("")
 
-            # Find the corresponding values in the dictionaries based on the users input. Calculate final quanta emission rate based on mask usage and print this to the screen.
-            init_quanta = quanta_em_dict[quanta_disease_choice][quanta_activity_choice]
-            st.session_state.wls_quanta_dflt = round(init_quanta * (msk_eff_dict[quanta_mask_usage]), 5) # Rounds the final value to five decimal places, to avoid saving and printing several zeros.
-            st.write(f"**The Quanta emission rate is {st.session_state.wls_quanta_dflt}/h.**")
+            # If quanta emission rates have been calibrated on the Facility Overview page, the user can use them instead of the literature values.
+            if "calibrated_quanta" in st.session_state:
+                if st.radio("Quanta emission data", ["Literature values", "Calibrated from outbreaks"], horizontal = True) == "Calibrated from outbreaks":
+                    quanta_em_dict = st.session_state.calibrated_quanta
+                st.write("")
+
+            if wls_quanta_mix:
+                try:
+                    wls_inf_groups = mixtures.infector_arrays(wls_inf_table, quanta_disease_choice, quanta_em_dict)
+                except ValueError as err: # No infectors in the groups.
+                    st.error(str(err))
+                    st.stop()
+                # The model uses the average quanta emission rate per infector, so that 'I' infectors emit the same total as the groups.
+                st.session_state.wls_quanta_dflt = round(mixtures.weighted_mean(wls_inf_groups["emission"], wls_inf_groups["infectors"]), 5)
+                if wls_inf_groups["infectors"].sum() != I:
+                    st.caption("The groups do not add up to the number of infectors, so they are used as proportions of the infectors.")
+                st.write(f"**The average Quanta emission rate per infector is {st.session_state.wls_quanta_dflt}/h.**")
+            else:
+                # Find the corresponding values in the dictionaries based on the users input. Calculate final quanta emission rate based on mask usage and print this to the screen.
+                init_quanta = quanta_em_dict[quanta_disease_choice][quanta_activity_choice]
+                st.session_state.wls_quanta_dflt = round(init_quanta * (msk_eff_dict[quanta_mask_usage]), 5) # Rounds the final value to five decimal places, to avoid saving and printing several zeros.
+                wls_quanta_selection = (quanta_disease_choice, quanta_activity_choice, quanta_mask_usage)
+                st.write(f"**The Quanta emission rate is {st.session_state.wls_quanta_dflt}/h.**")
             st.write("")
 
             # Asign this value to q, for the Wells-Riley model.
@@ -386,16 +464,9 @@ with tab2:
     st.write("")
 
     # Dictionary containing room ventilation rate data (ACH) for various different settings.
-    ventilation_dict = {
-        "Education": {"Assembly Halls": 4, "Classrooms": 6, "Computer Rooms": 15},
-        "Healthcare": {"Dental Centres": 8, "Pharmacies": 6, "Hospital Rooms (Sterilising)": 15, "Hospital Rooms (Wards)": 6, "Hospital Rooms (X-Ray)": 10, "Medical Centres": 8, "Medical Clinics": 8, "Medical Offices": 8},
-        "Hospitality": {"Bars": 20, "Cafeterias": 12, "Cocktail Lounges": 20, "Lunch Rooms": 12, "Nightclubs": 20, "Restaurants (Dining Area)": 8, "Restaurants (Food Staging)": 10, "Restaurants (Kitchens)": 30, "Restaurants (Bars)": 15, "Tavern": 20},
-        "Commercial": {"Banks": 4, "Court Houses": 4, "Conference Rooms": 8, "Fire Stations": 4, "Offices (Public)": 3, "Offices (Business)": 6, "Office Lunch Rooms": 7, "Police Stations": 4, "Post Offices": 4, "Retail": 6, "Shopping Centres": 6, "Supermarkets": 4},
-        "Recreational": {"Auditoriums": 12, "Bowling Alleys": 10, "Clubhouses": 20, "Dance Halls": 6, "Gyms": 6, "Museums": 12, "Swimming Pools": 20, "Theatres": 8},
-        "Industrial/Technical": {"Factory Buildings": 2, "Factory Buildings with Fumes/Moisture": 10, "Laboratories": 6, "Pig Houses": 6, "Poultry Houses": 6, "Warehouses": 6}
-    }
+    ventilation_dict = presets.ventilation_dict
 
-    fiat500_size_m3 = 8.65
+    fiat500_size_m3 = presets.fiat500_size_m3
     # This is the size of a FIAT 500 in m³, rounded to two decimal places. The users can use the number of FIAT 500's that they can fit into their setting to estimate the volume of their room.
 
     # Defining an empty area that will allow the user to pick from our list of default ACH values depending on what their setting is.
@@ -523,6 +594,86 @@ with tab2:
 # Reference for recommended ACH values: https://www.axaironline.co.uk/media/attachment/attachment/Air-Change-per-Hour-Document.pdf
 # Reference for FIAT 500 dimensions: https://www.carwow.co.uk/fiat/500/specifications#gref
 
+    st.divider()
+
+#======================================================================
+# ADDITIONAL REMOVAL:
+#======================================================================
+
+    st.write("### 🌀 Additional Removal")
+
+    st.write("")
+    st.write("")
+
+    st.write("Besides ventilation, infectious particles are removed by air cleaners, filters, settling onto surfaces and natural decay.")
+    st.write("These are combined with the room ventilation rate into an **equivalent ventilation rate**, which is then used by the Wells-Riley model.")
+    st.write("")
+
+    # Dictionaries containing air cleaner and filter data.
+    air_cleaner_dict = presets.air_cleaner_dict
+    filter_eff_dict = presets.filter_eff_dict
+
+    # The room volume is needed for deposition and decay. It is only known if the ventilation rate was described using ACH.
+    if not adv_md_vent:
+        wls_vol = dflt_room_vol
+    elif wls_ventilation_unit == "ACH":
+        wls_vol = vol
+    else:
+        wls_vol = None
+
+    wls_rmvl_col1, wls_rmvl_col2 = st.columns(2)
+    with wls_rmvl_col1:
+        # The user picks the type and number of portable air cleaners in the space.
+        wls_cleaner_choice = st.selectbox("Which portable air cleaners are in the space?", list(air_cleaner_dict))
+        wls_cleaner_num = st.number_input("Number of air cleaners", min_value = 0, value = 1)
+    with wls_rmvl_col2:
+        # The user picks the filter grade and airflow of any recirculating ventilation system.
+        wls_filter_choice = st.selectbox("Which filter does the recirculating ventilation system use?", list(filter_eff_dict))
+        wls_recirc = st.number_input("Recirculated airflow in m³/h", min_value = 0.0)
+
+    if wls_vol is not None:
+        wls_deposition = st.checkbox(f"Include surface deposition ({presets.deposition_rate}/h)", False)
+        wls_decay = st.number_input("Biological decay rate (/h)", min_value = 0.0,
+                                    help = "SARS-CoV-2 decays at roughly 0.63/h, which is a half-life of 1.1 hours.")
+    else:
+        st.caption("Surface deposition and biological decay need the room volume. Describe the room ventilation rate using ACH to include them.")
+        wls_deposition, wls_decay = False, 0.0
+
+    # Every removal mechanism except the air cleaners, which are swept over in the graph below.
+    wls_removal = {"v": wls_vol,
+                   "recirculation": wls_recirc,
+                   "filter_eff": filter_eff_dict[wls_filter_choice],
+                   "deposition": presets.deposition_rate if wls_deposition else 0.0,
+                   "decay": wls_decay}
+    wls_cadr = air_cleaner_dict[wls_cleaner_choice] * wls_cleaner_num
+
+    # Keep the outdoor-air ventilation rate, and replace 'Q' with the equivalent ventilation rate for the Wells-Riley equation.
+    wls_Q_vent = Q
+    Q = float(losses.equivalent_ventilation(wls_Q_vent, cadr = wls_cadr, **wls_removal))
+
+    st.write("")
+    st.write(f"**The equivalent ventilation rate is {Q:.2f}m³/h.**")
+
+    # How much each removal mechanism adds to the equivalent ventilation rate.
+    wls_breakdown = losses.removal_breakdown(wls_Q_vent, cadr = wls_cadr, **wls_removal)
+    st.bar_chart(pd.DataFrame({"Equivalent ventilation rate (m³/h)": wls_breakdown}).rename_axis("Removal mechanism"), horizontal = True)
+
+    # Users can see how much air cleaning would be needed to lower the probability of infection.
+    if st.checkbox("Show how the probability of infection changes with the air cleaners' CADR", False):
+        wls_cadr_range = np.arange(0, 3001, 25) # 0 to 3000 m³/h of air cleaning.
+        # The whole range is evaluated in one vectorised call.
+        wls_cadr_probs = backend.wells_riley_risk(I, p, q, t, losses.equivalent_ventilation(wls_Q_vent, cadr = wls_cadr_range, **wls_removal))
+        st.line_chart(
+            data = pd.DataFrame({"CADR (m³/h)": wls_cadr_range, "Probability Of Infection": wls_cadr_probs * 100}),
+            x = "CADR (m³/h)",
+            y = "Probability Of Infection",
+            x_label = "Total air cleaner CADR (m³/h)",
+            y_label = "Probability of Infection (%)"
+        )
+
+# Reference for deposition rate: Buonanno, 2020, "Estimation of airborne viral emission: Quanta emission rate of SARS-CoV-2 for infection risk assessment", Environment International, Volume 141.
+# Reference for filter efficiencies: ANSI/ASHRAE Standard 52.2-2017.
+
 #====================================================================================================================================================
 # OUTPUT TAB:
 #====================================================================================================================================================
@@ -539,7 +690,7 @@ with tab3:
     st.write("")
     st.write("")
     
-    @st.cache_data # Caches the models output to avoid recomputing when previous inputs are used.
+    @cache.cached # Caches the models output in the shared cache, so previous inputs from any user are not recomputed.
     def wells_riley(I, p, q, t, Q):
         """
         This function calculates the probability of infection using the Wells-Riley model.
@@ -554,13 +705,26 @@ with tab3:
         Returns:
             float: The probability of infection (P)
         """
-        try:
-            P = 1 - math.exp(- (I * p * q * t) / Q)
-        except ZeroDivisionError: # If Q <= 0, instead of a ZeroDivisionError, P will equal 0.
-            P = 0
-        return P
+        return float(backend.wells_riley_risk(I, p, q, t, Q)) # If Q = 0, instead of a ZeroDivisionError, P will equal 0.
 
     st.write(f"The estimated probability of infection for one susceptible individual is: **{wells_riley(I, p, q, t, Q):.2%}**")
+
+    # With a mix of susceptibles or infectors, every susceptible group is assessed with its own breathing rate, in one vectorised call.
+    # With infectors estimated from prevalence, the expected outcomes are averaged over every possible number of infectors.
+    if wls_from_prevalence:
+        wls_prev = prevalence.outcomes(st.session_state.wls_all, wls_prevalence, wells_riley(1, p, q, t, Q))
+        st.write(f"Averaged over every possible number of infectors, the probability of infection for one susceptible individual is: **{wls_prev['mean_risk']:.2%}**")
+
+    wls_mixed = wls_sus_groups is not None or wls_inf_groups is not None
+    if wls_mixed:
+        wls_diff = max(st.session_state.wls_all - st.session_state.wls_infectors, 0) # Susceptible.
+        wls_sus = wls_sus_groups or {"label": np.array(["Everyone"]), "breathing": np.array([p]), "people": np.array([1.0])}
+        wls_sus = dict(wls_sus, people = wls_sus["people"] * wls_diff / wls_sus["people"].sum()) # The groups are proportions of the susceptibles.
+        wls_inf = wls_inf_groups or {"label": np.array(["All infectors"]), "emission": np.array([float(q)]), "infectors": np.array([float(I)])}
+        wls_group_risk = backend.wells_riley_risk(I, wls_sus["breathing"], q, t, Q) # 'I' infectors at the average rate 'q' emit the groups' total.
+        wls_group_infs = mixtures.expected_infections(wls_group_risk, wls_sus, wls_inf)
+        if wls_sus_groups is not None:
+            st.write(f"Across the groups of susceptibles, the average probability of infection is: **{wls_group_infs['by_group'].sum() / max(wls_diff, 1):.2%}**")
     
     st.divider()
 
@@ -577,12 +741,16 @@ with tab3:
     wls_prob = wells_riley(I, p, q, t, Q) # Probability of infection.
     wls_diff = st.session_state.wls_all - st.session_state.wls_infectors # Susceptible.
     wls_est_infs = math.ceil(wls_diff * wls_prob) # Number of new infections.
+    if wls_mixed:
+        wls_est_infs = math.ceil(round(wls_group_infs["by_group"].sum(), 9)) # The sum of every group's expected infections.
     # 'math.ceil' rounds the value up. For example, if the value is 2.3, you cannot have 0.3 of an infection - the value is rounded up as the third individual is still susceptible to infection.
 
     # Visualising the number of new infections among the susceptible population.
     wls_healthy = wls_diff - wls_est_infs # Susceptible - new infections = Number of uninfected.
-    st.write("🧍‍♂️" * wls_est_infs + " **|** " + "🧍" * wls_healthy)
-    st.caption("🧍‍♂️ - Infected | 🧍 - Uninfected")
+    # For large populations, each icon represents several people, so the graphic never has more than 100 icons.
+    wls_waffle, wls_waffle_caption = visuals.infection_waffle(max(wls_est_infs, 0), max(wls_healthy, 0))
+    st.write(wls_waffle)
+    st.caption(wls_waffle_caption)
 
     # This if-statement avoids printing a negative number, in case the user has entered invalid inputs.
     if wls_est_infs > 0:
@@ -592,6 +760,124 @@ with tab3:
 
     st.divider()
 
+#======================================================================
+# INFECTIONS FROM COMMUNITY PREVALENCE:
+#======================================================================
+
+    # This section is only shown when the infectors are estimated from the community prevalence.
+    if wls_from_prevalence:
+
+        st.write("### 🎲 Infections From Community Prevalence")
+
+        st.write("")
+        st.write("")
+
+        st.write("The number of infectors is uncertain, so every possible number is assessed and weighted by how likely it is.")
+
+        wls_prev_col1, wls_prev_col2, wls_prev_col3 = st.columns(3)
+        with wls_prev_col1:
+            st.metric("**Expected New Infections:**", f"{wls_prev['expected_infections']:.2f}")
+        with wls_prev_col2:
+            st.metric("**Chance Of No Infectors:**", f"{wls_prev['prob_no_infector']:.1%}")
+        with wls_prev_col3:
+            st.metric("**Chance Of At Least One Infection:**", f"{1 - wls_prev['infection_pmf'][wls_prev['infections'] == 0].sum():.1%}")
+
+        # The distribution of the number of new infections, over every possible number of infectors.
+        st.bar_chart(pd.DataFrame({"New Infections": wls_prev["infections"], "Probability (%)": wls_prev["infection_pmf"] * 100}),
+                     x = "New Infections", y = "Probability (%)", x_label = "Number of new infections", y_label = "Probability (%)")
+
+        st.divider()
+
+#======================================================================
+# RISK BY GROUP:
+#======================================================================
+
+    # This section is only shown when the susceptibles or infectors are described as a mix of groups.
+    if wls_mixed:
+
+        st.write("### 👪 Risk By Group")
+
+        st.write("")
+        st.write("")
+
+        st.dataframe(pd.DataFrame({
+            "Susceptibles": wls_sus["label"],
+            "People": wls_sus["people"],
+            "Breathing Rate (m³/h)": wls_sus["breathing"],
+            "Probability Of Infection (%)": wls_group_risk * 100,
+            "Expected Infections": wls_group_infs["by_group"]
+        }), hide_index = True)
+
+        # Which groups drive the infections: each susceptible group's expected infections, split by the infector groups that cause them.
+        wls_drivers = pd.DataFrame(wls_group_infs["matrix"], index = wls_sus["label"], columns = wls_inf["label"])
+        wls_drivers = wls_drivers.rename_axis("Susceptibles").reset_index().melt(id_vars = "Susceptibles", var_name = "Infectors", value_name = "Expected Infections")
+        st.plotly_chart(px.bar(wls_drivers, x = "Susceptibles", y = "Expected Infections", color = "Infectors"), use_container_width = True)
+
+        st.write(f"Most infections are expected among: **{wls_sus['label'][np.argmax(wls_group_infs['by_group'])]}**")
+        if wls_inf_groups is not None:
+            st.write(f"Most infections are caused by the infectors in the group: **{wls_inf['label'][np.argmax(wls_group_infs['by_infector'])]}**")
+
+        st.divider()
+
+#======================================================================
+# COMPARISON MATRIX:
+#======================================================================
+
+    st.write("### 🧮 Every Disease, Activity And Mask")
+
+    st.write("")
+    st.write("")
+
+    st.write("The probability of infection in your room, for every disease, infector activity and mask we hold data for.")
+
+    # Every preset is evaluated in one broadcast call, with the rest of the inputs held at their current values.
+    wls_presets = comparison.preset_emissions(quanta_em_dict, msk_eff_dict)
+    wls_matrix = comparison.matrix_table(backend.wells_riley_risk(I, p, wls_presets["emission"], t, Q), wls_presets)
+    st.table(comparison.styled_matrix(wls_matrix, wls_quanta_selection))
+
+    if wls_quanta_selection is not None:
+        st.caption("Your selection is outlined. Colours run from teal (lowest risk) to red (highest risk), on a logarithmic scale.")
+    else:
+        st.caption("Colours run from teal (lowest risk) to red (highest risk), on a logarithmic scale. Pick a single disease, activity and mask to see your selection outlined.")
+
+    st.divider()
+
+#======================================================================
+# ASSESSMENT HISTORY:
+#======================================================================
+
+    st.write("### 🗂️ Assessment History")
+
+    st.write("")
+    st.write("")
+
+    st.write("Save this assessment to the local history, to follow how the risk of a room changes over time. The Facility page lists the riskiest rooms across every building.")
+
+    wls_hist_col1, wls_hist_col2 = st.columns(2)
+    with wls_hist_col1:
+        wls_hist_building = st.text_input("Building", key = "wls_hist_building").strip()
+    with wls_hist_col2:
+        wls_hist_room = st.text_input("Room", key = "wls_hist_room").strip()
+
+    if st.button("Save this assessment", key = "wls_hist_save", disabled = not wls_hist_room):
+        history.shared().add("wells_riley", wls_hist_building, wls_hist_room, infectors = I, breathing = p, quanta = q, ventilation = Q,
+                             volume = wls_vol, duration = t, traditional = wls_prob)
+        st.success(f"Saved the assessment of {wls_hist_room}" + (f" ({wls_hist_building})." if wls_hist_building else "."))
+
+    # The saved risk of the room, day by day.
+    if wls_hist_room:
+        wls_hist_trend = history.shared().trend(wls_hist_building, wls_hist_room)
+        if len(wls_hist_trend):
+            wls_hist_trend[["mean_risk", "max_risk"]] *= 100
+            st.plotly_chart(px.line(wls_hist_trend, x = "day", y = ["mean_risk", "max_risk"], markers = True,
+                                    labels = {"day": "Day", "value": "Probability of infection (%)", "variable": ""}), use_container_width = True)
+        else:
+            st.caption("No saved assessments for this room yet.")
+    else:
+        st.caption("Enter a room to save this assessment and see its history.")
+
+    st.divider()
+
 #======================================================================
 # ESTIMATED PROBABILITY OF INFECTION OVER TIME:
 #======================================================================
@@ -606,12 +892,14 @@ with tab3:
     wls_max_time = t * 3
     # We want a time point every five minutes.
     wls_time_res = 5 / 60
-    # We need to calculate the number of time points we need.
-    wls_num_time_points = int(wls_max_time / wls_time_res) + 1 # Add one to ensure the final time point is included.
     # Finally, we can create a NumPy array containing the entire range of time points.
-    wls_time_range = np.linspace(0, wls_max_time, wls_num_time_points)
+    # For very long exposure times, the number of time points is capped so that the graph stays the same size.
+    wls_time_range = visuals.time_grid(wls_max_time, wls_time_res)
+
+    # The curve is served from the shared cache, which is capped in size and expires old entries (see engine/cache.py).
+    # Only the calculation is cached: the chart itself is drawn on every rerun.
+    wls_curve = cache.cached(models.wells_riley_curve)
 
-    @st.cache_data
     def wls_plot(wls_time_range, I, p, q, Q):
         """
         This function produces a line chart that plots the estimated probability of infection over time
@@ -622,16 +910,18 @@ with tab3:
             p (float): The breathing rate of any susceptible individual.
             q (int): The quanta emission rate.
             Q (float): The ventilation rate.
+
+        Returns:
+            NumPy array: The probability of infection at each time point.
         """
 
-        wls_list_probs = [] # Create an empty list to store the probability of infection at each time point.
-        for time in wls_time_range:
-            wls_list_probs.append(wells_riley(I, p, q, time, Q) * 100) # For each time point in the time range, calculate and store the probability of infection.
+        # Calculate the probability of infection at every time point in one vectorised call.
+        wls_probs = wls_curve(wls_time_range, I, p, q, Q)
 
         # Pandas DataFrame containing all time points in the time range, and their respective probability of infection.
         wls_probvtime_data = pd.DataFrame({
             "Time (hours)": wls_time_range,
-            "Probability Of Infection": wls_list_probs})
+            "Probability Of Infection": wls_probs * 100})
 
         # Plotting the DataFrame
         st.line_chart(
@@ -642,26 +932,159 @@ with tab3:
             y_label = "Probability of Infection (%)"
         )
 
+        return wls_probs
+
     # Call the above function to produce the plot.
-    wls_plot(wls_time_range, I, p, q, Q)
+    wls_curve_probs = wls_plot(wls_time_range, I, p, q, Q)
+
+    # The time range and probabilities behind the graph can be downloaded for use in other tools.
+    wls_export_cols = {"time_hours": wls_time_range, "probability_of_infection": wls_curve_probs}
+    wls_export_meta = {"model": "Wells-Riley", "units": {"time_hours": "h", "probability_of_infection": "fraction"},
+                       "inputs": {"I": I, "p_m3h": p, "q_per_h": q, "Q_m3h": Q}}
+    wls_dl_col1, wls_dl_col2 = st.columns(2)
+    with wls_dl_col1:
+        st.download_button("Download graph data (Parquet)",
+                           data = export.to_parquet_bytes(wls_export_cols, wls_export_meta),
+                           file_name = "wells_riley_curve.parquet",
+                           mime = "application/vnd.apache.parquet")
+    with wls_dl_col2:
+        st.download_button("Download graph data (Arrow IPC)",
+                           data = export.to_ipc_bytes(wls_export_cols, wls_export_meta),
+                           file_name = "wells_riley_curve.arrow",
+                           mime = "application/vnd.apache.arrow.file")
+
+    st.divider()
+
+#======================================================================
+# WHAT IF?:
+#======================================================================
+
+    st.write("### 🔀 What If?")
 
-    # Adding an alternate scenario where the Quanta Emission Rate has increased, this should encourage the user to further explore their data by changing their inputs.
     st.write("")
-    st.write("In the above graph, we have captured the relationship between the duration of exposure and the estimated probability of infection.")
-    st.write("But what would this graph look like if your data was different?")
-    wls_quanta_explr = st.checkbox("Show what would happen if we multiplied your current Quanta Emission Rate by 100", False) # User's can tick this checkbox to explore what changes an increase in Quanta emission rate would lead to.
+    st.write("")
 
-    if wls_quanta_explr: # If the checkbox is ticked...
-        q = q * 100 # ... increase the users Quanta Emission Rate...
-        st.write("")
-        st.write("### ⬆️ Increased Quanta Emission Rate")
-        st.write("")
-        wls_plot(wls_time_range, I, p, q, Q) # ... and produce a new plot using this alternate Quanta emission rate value.
+    st.write("In the above graph, we have captured the relationship between the duration of exposure and the estimated probability of infection.")
+    st.write("But what would this graph look like if your data was different? Pick one of your inputs, and the values to compare it with.")
+
+    # The inputs that can be changed, with their names on this page.
+    wls_whatif_names = {
+        "q": "Quanta Emission Rate",
+        "Q": "Room Ventilation Rate",
+        "I": "Number Of Infectors",
+        "p": "Pulmonary Breathing Rate"
+    }
+    wls_whatif_inputs = {"I": I, "p": p, "q": q, "Q": Q}
+
+    wls_wi_col1, wls_wi_col2, wls_wi_col3 = st.columns(3)
+    with wls_wi_col1:
+        wls_whatif_param = st.selectbox("Input to change", list(wls_whatif_names), format_func = lambda key: wls_whatif_names[key], key = "wls_whatif_param")
+    with wls_wi_col2:
+        wls_whatif_mode = st.radio("Compare with", ["multiply", "set"], horizontal = True, key = "wls_whatif_mode",
+                                   format_func = lambda mode: "Multiples of your value" if mode == "multiply" else "Other values")
+    with wls_wi_col3:
+        wls_whatif_text = st.text_input("Multipliers" if wls_whatif_mode == "multiply" else "Values", "0.5, 2, 10", key = "wls_whatif_values",
+                                        help = f"Up to {whatif.MAX_OVERLAYS}, separated by commas. Rates are per hour, as above.")
+
+    try:
+        wls_whatif_values = whatif.parse_values(wls_whatif_text)
+    except ValueError as err:
+        st.error(str(err))
+        wls_whatif_values = None
+
+    if wls_whatif_values is not None:
+        # Your own curve and every scenario are evaluated together, in one broadcast call over (scenarios, time points).
+        wls_whatif_labels = ["Your inputs"] + whatif.scenario_labels(wls_whatif_names[wls_whatif_param], wls_whatif_values, wls_whatif_mode)
+        wls_whatif_base = wls_whatif_inputs.pop(wls_whatif_param)
+        wls_whatif_curves = cache.cached(whatif.overlay_curves)(
+            "wells_riley", wls_time_range, wls_whatif_param,
+            np.append(wls_whatif_base, whatif.scenario_values(wls_whatif_base, wls_whatif_values, wls_whatif_mode)), **wls_whatif_inputs)
+
+        st.plotly_chart(px.line(whatif.overlay_table(wls_time_range, wls_whatif_curves, wls_whatif_labels), x = "time", y = "risk", color = "scenario",
+                                labels = {"time": "Exposure Time (hours)", "risk": "Probability of Infection (%)", "scenario": ""}), use_container_width = True)
 
-        st.write("")
-        st.write("As we can see in the above graph, raising your Quanta Emission Rate increases the estimated probability of infection.")
         st.write("Why don't you go back and see what impact changing your data has on your risk assessment?")
-    
+
+    st.divider()
+
+#======================================================================
+# SPATIAL RISK MAP:
+#======================================================================
+
+    st.write("### 🗺️ Spatial Risk Map")
+
+    st.write("")
+    st.write("")
+
+    st.write("The Wells-Riley model assumes the air is well-mixed, so everyone in the room has the same risk wherever they sit.")
+    st.write("In reality, people sitting close to an infector breathe in more quanta. The spatial model divides the room into a grid and follows the quanta as they spread out from the infectors.")
+
+    if st.checkbox("Show the spatial risk map", False):
+        wls_sp_col1, wls_sp_col2, wls_sp_col3 = st.columns(3)
+        with wls_sp_col1:
+            wls_sp_length = st.number_input("Room length (m)", min_value = 1.0, value = 10.0)
+            wls_sp_width = st.number_input("Room width (m)", min_value = 1.0, value = 8.0)
+            # The height follows from the room volume, where it is known.
+            if wls_vol:
+                wls_sp_height = wls_vol / (wls_sp_length * wls_sp_width)
+                st.caption(f"With a volume of {wls_vol:.0f}m³, the room is {wls_sp_height:.2f}m high.")
+            else:
+                wls_sp_height = st.number_input("Room height (m)", min_value = 1.0, value = 3.0)
+        with wls_sp_col2:
+            wls_sp_x = st.slider("Infector position along the length (m)", min_value = 0.0, max_value = wls_sp_length, value = wls_sp_length / 2)
+            wls_sp_y = st.slider("Infector position along the width (m)", min_value = 0.0, max_value = wls_sp_width, value = wls_sp_width / 2)
+        with wls_sp_col3:
+            wls_sp_rows = st.number_input("Rows of seats", min_value = 1, max_value = 30, value = 5)
+            wls_sp_cols = st.number_input("Seats per row", min_value = 1, max_value = 30, value = 6)
+            wls_sp_diff = st.number_input("Air mixing (eddy diffusivity, m²/s)", min_value = 0.0001, value = 0.005, format = "%.4f",
+                                          help = "Typically 0.001 m²/s in still air and 0.01 m²/s in a well-ventilated room with fans.")
+
+        wls_sp_grid = st.radio("Grid", ["Coarse (40 × 40 × 12 cells)", "Fine (100 × 100 × 30 cells)"], horizontal = True)
+        wls_sp_shape = (40, 40, 12) if wls_sp_grid.startswith("Coarse") else (100, 100, 30)
+        wls_sp_dims = (wls_sp_length, wls_sp_width, wls_sp_height)
+
+        # The simulation is served from the shared cache, and each room geometry is only set up once.
+        wls_spatial = cache.cached(spatial.simulate)
+        # All infectors are placed together, at the breathing height of a seated person.
+        wls_sp_result = wls_spatial(wls_sp_dims, wls_sp_shape, [[wls_sp_x, wls_sp_y, min(spatial.DEFAULT_BREATHING_HEIGHT, wls_sp_height)]],
+                                    I * q, Q, t, diffusivity = wls_sp_diff * 3600)
+        wls_sp_risk = spatial.dose_risk(wls_sp_result["dose"][-1], p) # Risk in the breathing zone at the end of the exposure.
+
+        # The risk of each seat is read from the cell it sits in.
+        wls_seats = spatial.seat_grid(wls_sp_dims, wls_sp_rows, wls_sp_cols)
+        wls_seat_ix, wls_seat_iy = spatial.cell_index(wls_seats, wls_sp_dims, wls_sp_shape)
+        wls_seat_risk = wls_sp_risk[wls_seat_ix, wls_seat_iy]
+        # Seats within 0.5m of the infector are taken to be the infector's own seat.
+        wls_seat_others = np.hypot(wls_seats[:, 0] - wls_sp_x, wls_seats[:, 1] - wls_sp_y) > 0.5
+        if not wls_seat_others.any():
+            wls_seat_others[:] = True
+
+        # Plot the risk map, with the seats and the infector on top.
+        wls_sp_fig = px.imshow(wls_sp_risk.T * 100, x = wls_sp_result["x"], y = wls_sp_result["y"], origin = "lower", aspect = "equal",
+                               color_continuous_scale = "Reds", labels = {"x": "Length (m)", "y": "Width (m)", "color": "Risk (%)"})
+        wls_sp_fig.add_scatter(x = wls_seats[:, 0], y = wls_seats[:, 1], mode = "markers", name = "Seats",
+                               marker = {"symbol": "square-open", "color": "black"},
+                               customdata = wls_seat_risk * 100, hovertemplate = "Seat risk: %{customdata:.2f}%<extra></extra>")
+        wls_sp_fig.add_scatter(x = [wls_sp_x], y = [wls_sp_y], mode = "markers", name = "Infector", marker = {"symbol": "x", "size": 12, "color": "#1f77b4"})
+        st.plotly_chart(wls_sp_fig, use_container_width = True)
+
+        wls_sp_mcol1, wls_sp_mcol2, wls_sp_mcol3 = st.columns(3)
+        with wls_sp_mcol1:
+            st.metric("**Well-Mixed Risk:**", f"{wells_riley(I, p, q, t, Q):.2%}")
+        with wls_sp_mcol2:
+            st.metric("**Average Seat Risk:**", f"{wls_seat_risk[wls_seat_others].mean():.2%}")
+        with wls_sp_mcol3:
+            st.metric("**Highest Seat Risk:**", f"{wls_seat_risk[wls_seat_others].max():.2%}")
+
+        st.caption("The infector's own seat (any seat within 0.5m of the infector) is not counted. Seats are shown at the breathing height of a seated person (1.2m).")
+
+        # The seat risks can be downloaded for use in other tools.
+        st.download_button("Download seat risks (Parquet)",
+                           data = export.to_parquet_bytes({"x_m": wls_seats[:, 0], "y_m": wls_seats[:, 1], "risk_of_infection": wls_seat_risk},
+                                                          {"model": "Spatial Wells-Riley", "grid": list(wls_sp_shape), "room_m": list(wls_sp_dims)}),
+                           file_name = "seat_risks.parquet",
+                           mime = "application/vnd.apache.parquet")
+
     st.divider()
 
 #======================================================================
@@ -0,0 +1,57 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the Server Status page of our web-app, for administrators.
+# It is only added to the navigation when the IARA_ADMIN environment variable is set, e.g. 'IARA_ADMIN=1 streamlit run IARA.py'.
+
+# Imports.
+import streamlit as st
+import pandas as pd
+from engine import cache
+
+# Page configurations.
+st.set_page_config(layout = "wide",
+                   page_title = "IARA",
+                   initial_sidebar_state = "expanded")
+
+# Title.
+st.title("Server Status 🛠️")
+
+#====================================================================================================================================================
+# SHARED RESULT CACHE:
+#====================================================================================================================================================
+
+st.write("### 🗄️ Shared Result Cache")
+
+st.write("")
+st.write("")
+
+st.write("Results are shared between every user of this server. The least recently used results are removed once the cache is full, and every result expires after its time-to-live.")
+
+adm_stats = cache.shared.stats()
+adm_col1, adm_col2, adm_col3, adm_col4 = st.columns(4)
+with adm_col1:
+    st.metric("**Entries:**", f"{adm_stats['entries']:,}")
+with adm_col2:
+    st.metric("**Memory Used:**", f"{adm_stats['bytes'] / 2**20:.1f} / {adm_stats['max_bytes'] / 2**20:.0f} MB")
+with adm_col3:
+    st.metric("**Hit Rate:**", f"{adm_stats['hit_rate']*100:.1f}%")
+with adm_col4:
+    st.metric("**Time-To-Live:**", f"{adm_stats['ttl'] / 60:.0f} min" if adm_stats["ttl"] > 0 else "None")
+
+st.caption(f"{adm_stats['hits']:,} hits, {adm_stats['misses']:,} misses, {adm_stats['evictions']:,} evicted, {adm_stats['expirations']:,} expired.")
+
+# The stored results, most recently used first.
+adm_entries = pd.DataFrame(cache.shared.entries(), columns = ["name", "key", "bytes", "age_seconds", "hits"])
+st.dataframe(adm_entries.rename(columns = {
+    "name": "Calculation",
+    "key": "Scenario Hash",
+    "bytes": "Size (bytes)",
+    "age_seconds": "Age (s)",
+    "hits": "Hits"
+}), hide_index = True)
+
+if st.button("Clear the shared cache"):
+    cache.shared.clear()
+    st.rerun()
@@ -0,0 +1,2 @@
+# This is the package containing the calculation engines behind our web-app.
+# The pages import from here so that the same models can also be used as a library, outside of Streamlit.
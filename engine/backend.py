@@ -0,0 +1,298 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the compute backends of the risk kernels.
+# The Wells-Riley and residual risk kernels can run on three backends, picked automatically by the size of the (broadcast) inputs:
+#   - "numpy":   plain NumPy (engine/models.py). Always available, and the fastest for small inputs such as a single scenario.
+#   - "numexpr": fused expressions, evaluated in cache-sized blocks on several threads without creating a full-size temporary per operation.
+#   - "numba":   ufuncs compiled just-in-time, run in parallel. Compiling takes a second, so this only pays off for very large batches.
+# numexpr and numba are optional. If one is not installed, or cannot run the inputs, the kernels warn once and fall back to NumPy.
+# The IARA_BACKEND environment variable forces a backend, e.g. 'IARA_BACKEND=numpy streamlit run IARA.py'.
+# Run 'python -m engine.backend' to benchmark the installed backends and print a threshold table for this machine.
+
+# Imports.
+import os
+import time
+import warnings
+
+import numpy as np
+
+from engine import metrics, models
+
+# The optional backends.
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+try:
+    import numba
+    from numba.core.errors import NumbaError
+except ImportError:
+    numba = None
+    NumbaError = None
+
+# The errors an optional backend raises when it cannot run an input, e.g. a dtype numexpr does not support or a Numba compilation error.
+# Anything else is a bug, and is raised rather than hidden by the fallback to NumPy.
+_FAILURES = {
+    "numexpr": (ValueError, TypeError, KeyError, NotImplementedError, SyntaxError),
+    "numba": (ValueError, TypeError) + ((NumbaError,) if NumbaError is not None else ()),
+}
+
+# The backends that have already warned about falling back to NumPy, so each warns once per process.
+_warned = set()
+
+# Every backend, whether or not it is installed.
+BACKENDS = ["numpy", "numexpr", "numba"]
+
+# The smallest input size (number of broadcast elements) at which each optional backend is used, largest first.
+# These come from benchmarks on a 4-core laptop. Run 'python -m engine.backend' to measure them on another machine.
+THRESHOLDS = [("numba", 2**22), ("numexpr", 2**16)]
+
+#====================================================================================================================================================
+# SELECTION:
+#====================================================================================================================================================
+
+def available():
+    """
+    This function lists the backends that can be used.
+
+    Returns:
+        list of str: The available backends, NumPy first.
+    """
+    return ["numpy"] + [name for name, module in (("numexpr", numexpr), ("numba", numba)) if module is not None]
+
+def select(size, thresholds = None):
+    """
+    This function picks the backend for an input of a given size.
+
+    Args:
+        size (int): The number of elements of the broadcast inputs.
+        thresholds (list of tuple, optional): The (backend, smallest size) table, largest first. Defaults to THRESHOLDS.
+
+    Returns:
+        str: The backend.
+    """
+    forced = os.environ.get("IARA_BACKEND")
+    if forced in available():
+        return forced
+    for name, min_size in (thresholds or THRESHOLDS):
+        if size >= min_size and name in available():
+            return name
+    return "numpy"
+
+def _size(*args):
+    """
+    This function returns the number of elements the inputs broadcast to.
+    """
+    return int(np.prod(np.broadcast_shapes(*(np.shape(a) for a in args if a is not None))))
+
+#====================================================================================================================================================
+# NUMEXPR KERNELS:
+#====================================================================================================================================================
+
+def _numexpr_wells_riley(I, p, q, t, Q):
+    Q = np.asarray(Q, dtype = float)
+    return numexpr.evaluate("where(Q == 0, 0.0, -expm1(-(I * p * q * t) / Q))")
+
+def _numexpr_residual(I, T, p, q, Q, v, t = None):
+    Q = np.asarray(Q, dtype = float)
+    v = np.asarray(v, dtype = float)
+    # The shared terms are evaluated once, then each equation is one fused expression.
+    lam = numexpr.evaluate("Q / v")
+    scale = numexpr.evaluate("p * q * I / Q")
+    decay_T = numexpr.evaluate("-expm1(-lam * T)")
+    invalid = numexpr.evaluate("(Q == 0) | (v == 0)")
+
+    P1 = numexpr.evaluate("where(invalid, 0.0, -expm1((scale / lam) * decay_T - scale * T))")
+    P_inf = numexpr.evaluate("where(invalid, 0.0, -expm1(-scale * T))")
+    if t is None:
+        return P1, None, None, P_inf
+
+    P2 = numexpr.evaluate("where(invalid, 0.0, -expm1(-(scale / lam) * decay_T * -expm1(-lam * t)))")
+    P_comb = numexpr.evaluate("where(invalid, 0.0, -expm1((scale / lam) * (exp(-lam * t) * decay_T - lam * T)))")
+    return P1, P2, P_comb, P_inf
+
+#====================================================================================================================================================
+# NUMBA KERNELS:
+#====================================================================================================================================================
+
+# The compiled ufuncs, created the first time they are needed.
+_numba_ufuncs = {}
+
+def _numba_compile():
+    """
+    This function compiles the Numba ufuncs, once per process.
+
+    Returns:
+        dict: The compiled ufuncs.
+    """
+    if _numba_ufuncs:
+        return _numba_ufuncs
+
+    import math
+    signature = "float64(" + ", ".join(["float64"] * 7) + ")"
+
+    @numba.vectorize(["float64(float64, float64, float64, float64, float64)"], target = "parallel")
+    def wells_riley(I, p, q, t, Q):
+        return 0.0 if Q == 0 else -math.expm1(-(I * p * q * t) / Q)
+
+    # One ufunc per residual risk equation. Each ufunc recomputes the shared terms, which is cheaper than storing them for large batches.
+    @numba.vectorize([signature], target = "parallel")
+    def residual_p1(I, T, p, q, Q, v, t):
+        if Q == 0 or v == 0:
+            return 0.0
+        lam, scale = Q / v, p * q * I / Q
+        return -math.expm1((scale / lam) * -math.expm1(-lam * T) - scale * T)
+
+    @numba.vectorize([signature], target = "parallel")
+    def residual_p2(I, T, p, q, Q, v, t):
+        if Q == 0 or v == 0:
+            return 0.0
+        lam, scale = Q / v, p * q * I / Q
+        return -math.expm1(-(scale / lam) * -math.expm1(-lam * T) * -math.expm1(-lam * t))
+
+    @numba.vectorize([signature], target = "parallel")
+    def residual_comb(I, T, p, q, Q, v, t):
+        if Q == 0 or v == 0:
+            return 0.0
+        lam, scale = Q / v, p * q * I / Q
+        return -math.expm1((scale / lam) * (math.exp(-lam * t) * -math.expm1(-lam * T) - lam * T))
+
+    @numba.vectorize([signature], target = "parallel")
+    def residual_inf(I, T, p, q, Q, v, t):
+        if Q == 0 or v == 0:
+            return 0.0
+        return -math.expm1(-(p * q * I / Q) * T)
+
+    _numba_ufuncs.update(wells_riley = wells_riley, p1 = residual_p1, p2 = residual_p2, comb = residual_comb, inf = residual_inf)
+    return _numba_ufuncs
+
+def _numba_wells_riley(I, p, q, t, Q):
+    return _numba_compile()["wells_riley"](*(np.asarray(x, dtype = float) for x in (I, p, q, t, Q)))
+
+def _numba_residual(I, T, p, q, Q, v, t = None):
+    ufuncs = _numba_compile()
+    args = [np.asarray(x, dtype = float) for x in (I, T, p, q, Q, v, 0.0 if t is None else t)]
+    P1, P_inf = ufuncs["p1"](*args), ufuncs["inf"](*args)
+    if t is None:
+        return P1, None, None, P_inf
+    return P1, ufuncs["p2"](*args), ufuncs["comb"](*args), P_inf
+
+#====================================================================================================================================================
+# KERNELS:
+#====================================================================================================================================================
+
+_kernels = {
+    "numpy": (models.wells_riley_risk, models.residual_risk),
+    "numexpr": (_numexpr_wells_riley, _numexpr_residual),
+    "numba": (_numba_wells_riley, _numba_residual),
+}
+
+def _run(kernel, name, *args):
+    """
+    This function runs a kernel on a backend, falling back to NumPy if the backend fails.
+    """
+    if metrics.ENABLED:
+        with metrics.timed("iara_model_seconds", model = ("wells_riley", "residual")[kernel], backend = name):
+            return _dispatch(kernel, name, *args)
+    return _dispatch(kernel, name, *args)
+
+def _fallback(name, reason):
+    """
+    This function warns, once per backend, that a backend could not be used and NumPy is used instead.
+    """
+    if name not in _warned:
+        _warned.add(name)
+        warnings.warn(f"The {name} backend {reason}. Falling back to NumPy, with the same results.", RuntimeWarning, stacklevel = 5)
+
+def _dispatch(kernel, name, *args):
+    """
+    This function runs a kernel on a backend, without recording metrics.
+    An optional backend that is not installed, or cannot run the inputs, must never stop the page, so NumPy is used instead.
+    """
+    if name != "numpy":
+        if name not in available():
+            _fallback(name, "is not installed")
+        else:
+            try:
+                return _kernels[name][kernel](*args)
+            except _FAILURES[name] as err:
+                _fallback(name, f"failed ({type(err).__name__}: {err})")
+    return _kernels["numpy"][kernel](*args)
+
+def wells_riley_risk(I, p, q, t, Q, backend = None):
+    """
+    This function calculates the probability of infection using the Wells-Riley model, on the best backend for the size of the inputs.
+    The results are the same as models.wells_riley_risk.
+
+    Args:
+        I, p, q, t, Q (float or NumPy array): The model inputs, see models.wells_riley_risk.
+        backend (str, optional): Force a backend ("numpy", "numexpr" or "numba"). Defaults to None (picked automatically).
+
+    Returns:
+        NumPy array: The probability of infection (P), broadcast over the inputs.
+    """
+    return _run(0, backend or select(_size(I, p, q, t, Q)), I, p, q, t, Q)
+
+def residual_risk(I, T, p, q, Q, v, t = None, backend = None):
+    """
+    This function calculates the risks of infection using the enhanced Wells-Riley model, on the best backend for the size of the inputs.
+    The results are the same as models.residual_risk.
+
+    Args:
+        I, T, p, q, Q, v, t (float or NumPy array): The model inputs, see models.residual_risk.
+        backend (str, optional): Force a backend ("numpy", "numexpr" or "numba"). Defaults to None (picked automatically).
+
+    Returns:
+        tuple of NumPy array: P1, P2, P_comb and P_inf, see models.residual_risk.
+    """
+    return _run(1, backend or select(_size(I, T, p, q, Q, v, t)), I, T, p, q, Q, v, t)
+
+#====================================================================================================================================================
+# BENCHMARK:
+#====================================================================================================================================================
+
+def benchmark(sizes = (2**10, 2**13, 2**16, 2**19, 2**22), repeats = 3, seed = 0):
+    """
+    This function times the residual risk kernel on every available backend, and derives a threshold table for this machine.
+
+    Args:
+        sizes (tuple of int, optional): The input sizes to time. Defaults to 1,024 to 4,194,304 elements.
+        repeats (int, optional): The number of timed runs per size, of which the fastest is kept. Defaults to 3.
+        seed (int, optional): The random seed of the inputs. Defaults to 0.
+
+    Returns:
+        dict: The fastest time (seconds) of each backend at each size.
+        list of tuple: The threshold table, in the format of THRESHOLDS.
+    """
+    rng = np.random.default_rng(seed)
+    times = {name: {} for name in available()}
+
+    for size in sizes:
+        inputs = [rng.uniform(0.5, 5, size) for _ in range(7)]
+        for name in times:
+            _run(1, name, *inputs) # A first run, which includes any compilation.
+            best = np.inf
+            for _ in range(repeats):
+                start = time.perf_counter()
+                _run(1, name, *inputs)
+                best = min(best, time.perf_counter() - start)
+            times[name][size] = best
+
+    # Each optional backend is used from the smallest size at which it beats every backend with a lower threshold, and keeps winning.
+    thresholds = []
+    for name in [n for n in ("numexpr", "numba") if n in times]:
+        wins = [size for size in sizes if times[name][size] <= min(times[other][size] for other in times)]
+        if wins and all(size in wins for size in sizes if size >= wins[0]):
+            thresholds.append((name, wins[0]))
+    return times, sorted(thresholds, key = lambda entry: -entry[1])
+
+if __name__ == "__main__":
+    times, thresholds = benchmark()
+    print(f"{'Size':>10}" + "".join(f"{name:>12}" for name in times))
+    for size in next(iter(times.values())):
+        print(f"{size:>10}" + "".join(f"{times[name][size] * 1000:>10.2f}ms" for name in times))
+    print("")
+    print(f"THRESHOLDS = {thresholds}")
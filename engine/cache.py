@@ -0,0 +1,289 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the shared result cache of our web-app.
+# Results are stored once per server process and served to every user session, keyed by a canonical hash of the scenario (the function name and
+# its inputs), so '0.1 + 0.2' and '0.3' hit the same entry. Memory is capped: each entry's size is measured when it is stored, entries expire after
+# a time-to-live, and the least recently used entries are evicted once the cache is over its size limit.
+# The limits can be set with the IARA_CACHE_MB and IARA_CACHE_TTL (seconds) environment variables.
+
+# Imports.
+import functools
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from engine import metrics
+
+# The default size limit (MB) and time-to-live (seconds) of the shared cache.
+DEFAULT_MAX_MB = float(os.environ.get("IARA_CACHE_MB", 256))
+DEFAULT_TTL = float(os.environ.get("IARA_CACHE_TTL", 3600))
+
+# The most entries kept by Streamlit's own caches, for results (such as whole timetables) that are not plain scenario inputs.
+MAX_PAGE_ENTRIES = 32
+
+# Inputs are rounded to this many significant figures before hashing, so floating-point noise does not create new entries.
+KEY_SIG_FIGS = 12
+
+#====================================================================================================================================================
+# KEYS AND SIZES:
+#====================================================================================================================================================
+
+def _canonical(value, digest):
+    """
+    This function feeds a canonical description of a value into a hash.
+
+    Args:
+        value: The value (numbers, strings, None, NumPy arrays, and lists, tuples and dictionaries of these).
+        digest (hashlib object): The hash being built.
+    """
+    if isinstance(value, np.ndarray):
+        # Arrays are hashed exactly, as they come from deterministic grids rather than from typed inputs.
+        digest.update(f"array{value.dtype.str}{value.shape}".encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (bool, np.bool_)) or value is None:
+        digest.update(repr(bool(value) if value is not None else None).encode())
+    elif isinstance(value, (int, float, np.integer, np.floating)):
+        # Integers and floats with the same value (e.g. 30 and 30.0) share an entry.
+        digest.update(f"num{float(value):.{KEY_SIG_FIGS}g}".encode())
+    elif isinstance(value, str):
+        digest.update(f"str{len(value)}:{value}".encode())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"seq{len(value)}".encode())
+        for item in value:
+            _canonical(item, digest)
+    elif isinstance(value, dict):
+        digest.update(f"map{len(value)}".encode())
+        for key in sorted(value, key = str):
+            _canonical(str(key), digest)
+            _canonical(value[key], digest)
+    else:
+        raise TypeError(f"Cannot build a cache key from a value of type {type(value).__name__}.")
+
+def scenario_key(name, *args, **kwargs):
+    """
+    This function creates the canonical hash of a scenario.
+
+    Args:
+        name (str): The name of the calculation.
+        *args, **kwargs: The inputs of the calculation.
+
+    Returns:
+        str: The hash of the scenario.
+    """
+    digest = hashlib.blake2b(digest_size = 16)
+    _canonical([name, list(args), kwargs], digest)
+    return digest.hexdigest()
+
+def nbytes(value):
+    """
+    This function estimates the memory used by a result.
+
+    Args:
+        value: The result.
+
+    Returns:
+        int: The estimated size (bytes).
+    """
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) + (0 if value.flags.owndata else value.nbytes) # Views do not count their data in getsizeof.
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(nbytes(k) + nbytes(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+def _version(func):
+    """
+    This function creates a hash of a calculation's code, default arguments and constants (including those of nested functions).
+
+    Args:
+        func (function or code object): The calculation.
+
+    Returns:
+        str: The hash of the calculation.
+    """
+    digest = hashlib.blake2b(digest_size = 8)
+
+    def feed(code):
+        digest.update(code.co_code)
+        for const in code.co_consts:
+            if hasattr(const, "co_code"):
+                feed(const) # Nested functions, lambdas and comprehensions.
+            else:
+                digest.update(repr(const).encode())
+
+    feed(func.__code__)
+    for defaults in (func.__defaults__, func.__kwdefaults__):
+        try:
+            _canonical(defaults, digest)
+        except TypeError:
+            digest.update(repr(defaults).encode())
+    return digest.hexdigest()
+
+def _freeze(value):
+    """
+    This function makes every NumPy array in a result read-only, including arrays inside lists, tuples and dictionaries.
+
+    Args:
+        value: The result.
+    """
+    if isinstance(value, np.ndarray):
+        value.setflags(write = False)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _freeze(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze(item)
+
+#====================================================================================================================================================
+# CACHE:
+#====================================================================================================================================================
+
+class ResultCache:
+    """
+    This class is a thread-safe, least-recently-used cache with a size limit in bytes and a time-to-live for every entry.
+
+    Args:
+        max_bytes (int): The most memory the stored results may use.
+        ttl (float): The number of seconds an entry is kept for. Zero or less keeps entries until they are evicted.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (value, size, stored at, name, hits), least recently used first.
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, key):
+        value, size, stored, name, hits = self._entries.pop(key)
+        self.bytes -= size
+
+    def get(self, key):
+        """
+        This function returns a stored result and marks it as recently used.
+
+        Args:
+            key (str): The scenario hash.
+
+        Returns:
+            bool: Whether the result was found.
+            The result, or None if it was not found.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 and time.monotonic() - entry[2] > self.ttl:
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries[key] = entry[:4] + (entry[4] + 1,)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value, name = ""):
+        """
+        This function stores a result, evicting the least recently used results if the cache is over its size limit.
+        Results larger than the whole cache are not stored.
+
+        Args:
+            key (str): The scenario hash.
+            value: The result.
+            name (str, optional): The name of the calculation, shown in the admin view. Defaults to "".
+        """
+        size = nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic(), name, 0)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        """
+        This function removes every stored result. The hit and miss counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """
+        This function summarises the cache for the admin view.
+
+        Returns:
+            dict: The number of entries, the bytes used and allowed, the hit rate and the eviction counters.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes, "ttl": self.ttl,
+                    "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "evictions": self.evictions, "expirations": self.expirations}
+
+    def entries(self):
+        """
+        This function lists the stored results, most recently used first.
+
+        Returns:
+            list of dict: The name, key, size, age and hits of each entry.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [{"name": name, "key": key, "bytes": size, "age_seconds": now - stored, "hits": hits}
+                    for key, (value, size, stored, name, hits) in reversed(self._entries.items())]
+
+# The cache shared by every session of the server process.
+shared = ResultCache(DEFAULT_MAX_MB * 2**20, DEFAULT_TTL)
+
+def cached(func = None, *, cache = None):
+    """
+    This function is a decorator that serves the results of a calculation from the shared cache.
+    The decorated calculation must be a pure function of its inputs, and must not draw anything on the page.
+
+    Args:
+        func (function): The calculation.
+        cache (ResultCache, optional): The cache to use. Defaults to the shared cache.
+
+    Returns:
+        function: The cached calculation.
+    """
+    if func is None:
+        return functools.partial(cached, cache = cache)
+
+    name = func.__qualname__
+    # The calculation's code, constants and default arguments are part of the key, so editing the calculation never serves results of the old version.
+    version = _version(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        store = cache or shared
+        key = scenario_key(f"{name}:{version}", *args, **kwargs)
+        found, value = store.get(key)
+        if not found:
+            with metrics.timed("iara_cached_call_seconds", function = name):
+                value = func(*args, **kwargs)
+            _freeze(value) # Stored arrays are shared between sessions, so they are read-only.
+            store.put(key, value, name)
+        metrics.inc("iara_cache_requests_total", function = name, result = "hit" if found else "miss")
+        return value
+
+    return wrapper
@@ -0,0 +1,261 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the Bayesian calibration of quanta emission rates from outbreak data.
+# Each outbreak event is a room where a known number of infectors shared the air with a known number of susceptibles, of whom some became cases.
+# The number of cases is binomial, with the Wells-Riley probability of infection, so the likelihood of every quanta emission rate on a dense grid
+# is evaluated for every event at once. Events are grouped by disease and activity, and each group gets its own posterior distribution.
+# The quanta emission rate is a single positive number per group, so a dense grid on a log scale is exact enough and needs no sampler.
+# All times are in hours, breathing rates in m³/h, quanta emission rates in quanta/h and ventilation rates in m³/h.
+
+# Imports.
+import numpy as np
+import pandas as pd
+
+from engine import backend, models, presets
+from engine.facility import DEFAULT_BREATHING_RATE
+
+# The default grid of quanta emission rates (quanta/h), evenly spaced on a log scale.
+DEFAULT_GRID = np.logspace(-3, 4, 1401)
+
+# Columns that every set of outbreak events must contain. Cases are given either as 'cases' or as 'attack_rate'.
+# Ventilation is given either as 'ventilation' (m³/h), or as 'ach' and 'volume' (m³).
+EVENT_COLUMNS = ["disease", "activity", "duration", "infectors", "susceptibles"]
+
+# The largest number of (event, grid point) pairs evaluated at once, which keeps memory bounded for large datasets.
+CHUNK_CELLS = 2**22
+
+# The spread (natural log) of the prior around the literature values, when they are used as the prior. One order of magnitude either way.
+PRESET_PRIOR_SIGMA = np.log(10)
+
+#====================================================================================================================================================
+# EVENTS:
+#====================================================================================================================================================
+
+def event_arrays(events):
+    """
+    This function checks a set of outbreak events and converts them into the NumPy arrays used by the calibration.
+
+    Args:
+        events (Pandas DataFrame or dict): One row per event with the columns in EVENT_COLUMNS, cases as 'cases' or 'attack_rate',
+            ventilation as 'ventilation' or 'ach' and 'volume', and optionally 'breathing' (m³/h) and 'mask' (a mask in presets.msk_eff_dict).
+
+    Returns:
+        dict: NumPy arrays for 'disease', 'activity', 'duration', 'infectors', 'susceptibles', 'cases', 'breathing', 'mask' (the fraction
+            of quanta passing through the mask) and 'ventilation'.
+
+    Raises:
+        ValueError: If a required column is missing, a mask is unknown, the duration, infectors or ventilation (or ach or volume) are not
+            above 0, the susceptibles are negative, or there are more cases than susceptibles.
+    """
+    events = pd.DataFrame(events)
+
+    missing = [col for col in EVENT_COLUMNS if col not in events.columns]
+    if "cases" not in events.columns and "attack_rate" not in events.columns:
+        missing.append("cases (or attack_rate)")
+    if "ventilation" not in events.columns and not {"ach", "volume"} <= set(events.columns):
+        missing.append("ventilation (or ach and volume)")
+    if missing:
+        raise ValueError(f"The outbreak events are missing the following columns: {', '.join(missing)}")
+
+    # The models give a risk of 0 without infectors, ventilation or time, so any cases would make every quanta emission rate impossible.
+    positive = ["duration", "infectors"] + (["ventilation"] if "ventilation" in events.columns else ["ach", "volume"])
+    for col in positive:
+        if not (events[col].to_numpy(dtype = float) > 0).all():
+            raise ValueError(f"Every event must have a '{col}' above 0.")
+
+    susceptibles = events["susceptibles"].to_numpy(dtype = float)
+    if not (susceptibles >= 0).all():
+        raise ValueError("Every event must have at least 0 susceptibles.")
+    if "cases" in events.columns:
+        cases = events["cases"].to_numpy(dtype = float)
+    else:
+        cases = np.round(events["attack_rate"].to_numpy(dtype = float) * susceptibles) # Attack rates are turned back into case counts.
+    if (cases > susceptibles).any() or (cases < 0).any():
+        raise ValueError("Every event must have between 0 and 'susceptibles' cases.")
+
+    if "ventilation" in events.columns:
+        ventilation = events["ventilation"].to_numpy(dtype = float)
+    else:
+        ventilation = events["ach"].to_numpy(dtype = float) * events["volume"].to_numpy(dtype = float) # Convert ACH into m³/h.
+
+    if "mask" in events.columns:
+        unknown = sorted(set(events["mask"].dropna()) - set(presets.msk_eff_dict))
+        if unknown:
+            raise ValueError(f"Unknown masks: {', '.join(map(str, unknown))}. Use one of: {', '.join(presets.msk_eff_dict)}")
+        mask = events["mask"].fillna("No mask").map(presets.msk_eff_dict).to_numpy(dtype = float)
+    else:
+        mask = np.ones(len(events))
+
+    if "breathing" in events.columns:
+        breathing = events["breathing"].to_numpy(dtype = float)
+    else:
+        breathing = np.full(len(events), DEFAULT_BREATHING_RATE)
+
+    return {
+        "disease": events["disease"].astype(str).to_numpy(),
+        "activity": events["activity"].astype(str).to_numpy(),
+        "duration": events["duration"].to_numpy(dtype = float),
+        "infectors": events["infectors"].to_numpy(dtype = float),
+        "susceptibles": susceptibles,
+        "cases": cases,
+        "breathing": breathing,
+        "mask": mask,
+        "ventilation": ventilation,
+    }
+
+def example_events(n_events = 2000, seed = 0):
+    """
+    This function simulates outbreak events from the literature quanta emission rates, for demonstrations and benchmarks.
+    Calibrating on these events should recover the values in presets.quanta_em_dict.
+
+    Args:
+        n_events (int, optional): The number of events. Defaults to 2000.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        Pandas DataFrame: The events.
+    """
+    rng = np.random.default_rng(seed)
+    groups = [(disease, activity) for disease, activities in presets.quanta_em_dict.items() for activity in activities]
+    chosen = rng.integers(len(groups), size = n_events)
+    disease = np.array([g[0] for g in groups])[chosen]
+    activity = np.array([g[1] for g in groups])[chosen]
+    q = np.array([presets.quanta_em_dict[d][a] for d, a in groups])[chosen]
+
+    events = pd.DataFrame({
+        "disease": disease,
+        "activity": activity,
+        "volume": rng.uniform(50, 1000, size = n_events),
+        "ach": rng.choice([0.5, 1, 2, 3, 6], size = n_events),
+        "duration": rng.uniform(1, 10, size = n_events),
+        "infectors": rng.integers(1, 4, size = n_events),
+        "susceptibles": rng.integers(10, 200, size = n_events),
+    })
+    P = models.wells_riley_risk(events["infectors"], DEFAULT_BREATHING_RATE, q, events["duration"], events["ach"] * events["volume"])
+    events["cases"] = rng.binomial(events["susceptibles"], P)
+    return events
+
+#====================================================================================================================================================
+# CALIBRATION:
+#====================================================================================================================================================
+
+def log_likelihood(events, grid = DEFAULT_GRID):
+    """
+    This function calculates the binomial log-likelihood of every quanta emission rate on the grid, summed over the events of each group.
+
+    Args:
+        events (Pandas DataFrame or dict): The outbreak events, see event_arrays.
+        grid (NumPy array, optional): The quanta emission rates to evaluate (quanta/h). Defaults to DEFAULT_GRID.
+
+    Returns:
+        list of tuple: The (disease, activity) of each group.
+        NumPy array: The log-likelihood, with shape (groups, grid points). Terms that do not depend on the quanta emission rate are left out.
+        NumPy array: The number of events in each group.
+    """
+    e = event_arrays(events)
+    group_idx, group_labels = pd.factorize(pd.MultiIndex.from_arrays([e["disease"], e["activity"]]), sort = True)
+    groups = list(group_labels)
+
+    grid = np.asarray(grid, dtype = float)
+    total = np.zeros((len(groups), grid.size))
+    rows = max(1, CHUNK_CELLS // grid.size)
+
+    for lo in range(0, group_idx.size, rows): # Chunks of events, each evaluated against the whole grid at once.
+        chunk = slice(lo, lo + rows)
+        P = backend.wells_riley_risk(e["infectors"][chunk, None], e["breathing"][chunk, None], grid * e["mask"][chunk, None],
+                                     e["duration"][chunk, None], e["ventilation"][chunk, None])
+        P = np.clip(P, 1e-300, 1 - 1e-16) # Keeps the logarithms finite.
+        cases = e["cases"][chunk, None]
+        ll = cases * np.log(P) + (e["susceptibles"][chunk, None] - cases) * np.log1p(-P)
+        # A one-hot matrix adds each event's row to its group's row, as one matrix product.
+        one_hot = (group_idx[chunk] == np.arange(len(groups))[:, None]).astype(float)
+        total += one_hot @ ll
+
+    return groups, total, np.bincount(group_idx, minlength = len(groups))
+
+def _weighted_quantile(grid, weights, quantiles):
+    """
+    This function finds quantiles of a distribution given as weights on a grid, for each row of weights.
+
+    Args:
+        grid (NumPy array): The grid points, in increasing order.
+        weights (NumPy array): The weights, with shape (rows, grid points). Each row sums to 1.
+        quantiles (list of float): The quantiles to find.
+
+    Returns:
+        NumPy array: The quantiles, with shape (rows, quantiles).
+    """
+    cdf = np.cumsum(weights, axis = 1)
+    log_grid = np.log(grid)
+    return np.array([[np.exp(np.interp(qu, row, log_grid)) for qu in quantiles] for row in cdf])
+
+def calibrate(events, grid = DEFAULT_GRID, prior = "flat", credible = 0.95):
+    """
+    This function infers the posterior distribution of the quanta emission rate of each disease and activity in a set of outbreak events.
+
+    Args:
+        events (Pandas DataFrame or dict): The outbreak events, see event_arrays.
+        grid (NumPy array, optional): The quanta emission rates to evaluate (quanta/h). Defaults to DEFAULT_GRID.
+        prior (str, optional): "flat" for a prior that is flat on a log scale, or "literature" for a log-normal prior around the values in
+            presets.quanta_em_dict (flat for groups that have no literature value). Defaults to "flat".
+        credible (float, optional): The probability inside the reported credible interval. Defaults to 0.95.
+
+    Returns:
+        dict: 'grid', 'posterior' (the posterior probability of each grid point, with shape (groups, grid points)), and 'summary', a dictionary
+            of NumPy arrays with one entry per group ('disease', 'activity', 'events', 'literature', 'q_map', 'q_median', 'q_mean', 'q_low', 'q_high').
+    """
+    grid = np.asarray(grid, dtype = float)
+    groups, ll, n_events = log_likelihood(events, grid)
+
+    literature = np.array([presets.quanta_em_dict.get(d, {}).get(a, np.nan) for d, a in groups])
+    log_prior = np.zeros_like(ll) # The grid is evenly spaced on a log scale, so equal weights are a flat prior on log(q).
+    if prior == "literature":
+        known = ~np.isnan(literature)
+        log_prior[known] = -0.5 * ((np.log(grid) - np.log(literature[known, None])) / PRESET_PRIOR_SIGMA)**2
+    elif prior != "flat":
+        raise ValueError(f"Unknown prior '{prior}'. Use 'flat' or 'literature'.")
+
+    # Normalise each group's posterior, subtracting the largest log value first so the exponentials do not underflow.
+    log_post = ll + log_prior
+    log_post -= log_post.max(axis = 1, keepdims = True)
+    posterior = np.exp(log_post)
+    posterior /= posterior.sum(axis = 1, keepdims = True)
+
+    tail = (1 - credible) / 2
+    q_low, q_median, q_high = _weighted_quantile(grid, posterior, [tail, 0.5, 1 - tail]).T if groups else (np.array([]),) * 3
+
+    return {
+        "grid": grid,
+        "posterior": posterior,
+        "summary": {
+            "disease": np.array([g[0] for g in groups]),
+            "activity": np.array([g[1] for g in groups]),
+            "events": n_events,
+            "literature": literature,
+            "q_map": grid[posterior.argmax(axis = 1)] if groups else np.array([]),
+            "q_median": q_median,
+            "q_mean": posterior @ grid,
+            "q_low": q_low,
+            "q_high": q_high,
+        },
+    }
+
+def calibrated_presets(result, statistic = "q_median"):
+    """
+    This function turns a calibration into a quanta emission dictionary with the same layout as presets.quanta_em_dict, so it can be used as an
+    alternative preset. Diseases and activities that were not calibrated keep their literature values.
+
+    Args:
+        result (dict): The calibration, see calibrate.
+        statistic (str, optional): Which posterior summary to use ('q_map', 'q_median' or 'q_mean'). Defaults to "q_median".
+
+    Returns:
+        dict: The quanta emission rates (quanta/h), by disease and activity.
+    """
+    calibrated = {disease: dict(activities) for disease, activities in presets.quanta_em_dict.items()}
+    summary = result["summary"]
+    for disease, activity, value in zip(summary["disease"], summary["activity"], summary[statistic]):
+        calibrated.setdefault(str(disease), {})[str(activity)] = float(value)
+    return calibrated
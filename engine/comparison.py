@@ -0,0 +1,99 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the preset comparison matrix, which shows the risk of every disease, activity and mask for the same room.
+# The quanta emission rates of every preset are laid out as one array with shape (diseases, activities, masks), so the pages evaluate the
+# whole matrix in one broadcast call of the model equations, instead of one call per preset.
+# Quanta emission rates are in quanta/h, as in presets.quanta_em_dict. The pages convert them to their own units before calling the models.
+
+# Imports.
+import numpy as np
+import pandas as pd
+
+from engine import presets
+
+# The colours at either end of the colour scale, from the lowest to the highest risk.
+LOW_COLOUR = "#4ecdc4"
+HIGH_COLOUR = "#ff6b6b"
+
+# The range of risks covered by the colour scale, which is logarithmic because the presets span several orders of magnitude.
+# Risks outside this range take the colour at its nearest end.
+COLOUR_RANGE = (1e-4, 1.0)
+
+#====================================================================================================================================================
+# PRESET EMISSIONS:
+#====================================================================================================================================================
+
+def preset_emissions(quanta = None, masks = None):
+    """
+    This function lays out the quanta emission rate of every disease, activity and mask, after the mask, as one array.
+
+    Args:
+        quanta (dict, optional): Quanta emission rates (quanta/h) by disease and activity. Defaults to presets.quanta_em_dict.
+        masks (dict, optional): The fraction of quanta that passes through each mask. Defaults to presets.msk_eff_dict.
+
+    Returns:
+        dict: Lists of the 'disease', 'activity' and 'mask' labels, and 'emission' (quanta/h), a NumPy array with shape (diseases, activities,
+            masks). Activities without a rate for a disease are NaN.
+    """
+    quanta = quanta or presets.quanta_em_dict
+    masks = masks or presets.msk_eff_dict
+
+    diseases = list(quanta)
+    activities = list(dict.fromkeys(a for d in diseases for a in quanta[d])) # Every activity, in the order they first appear.
+    rates = np.array([[quanta[d].get(a, np.nan) for a in activities] for d in diseases], dtype = float)
+
+    return {
+        "disease": diseases,
+        "activity": activities,
+        "mask": list(masks),
+        "emission": rates[:, :, None] * np.array(list(masks.values()), dtype = float),
+    }
+
+#====================================================================================================================================================
+# MATRIX TABLE:
+#====================================================================================================================================================
+
+def matrix_table(risk, emissions):
+    """
+    This function arranges the risks of every preset as a table, with one row per disease and activity, and one column per mask.
+
+    Args:
+        risk (NumPy array): The risk of each preset, with the shape of emissions['emission'].
+        emissions (dict): The preset emissions, see preset_emissions.
+
+    Returns:
+        Pandas DataFrame: The risks (%), indexed by disease and activity. Activities without a rate for a disease are left out.
+    """
+    risk = np.broadcast_to(np.asarray(risk, dtype = float), emissions["emission"].shape)
+    index = pd.MultiIndex.from_product([emissions["disease"], emissions["activity"]], names = ["Disease", "Activity"])
+    table = pd.DataFrame(risk.reshape(-1, len(emissions["mask"])) * 100, index = index, columns = emissions["mask"])
+    return table.dropna(how = "all")
+
+def _colour(risk):
+    """
+    This function returns the background colour of a risk (%), on a logarithmic scale from LOW_COLOUR to HIGH_COLOUR.
+    """
+    lo, hi = np.log10(COLOUR_RANGE)
+    frac = np.clip((np.log10(max(risk / 100, COLOUR_RANGE[0])) - lo) / (hi - lo), 0, 1)
+    low, high = (np.array([int(c[i:i + 2], 16) for i in (1, 3, 5)]) for c in (LOW_COLOUR, HIGH_COLOUR))
+    r, g, b = np.round(low + frac * (high - low)).astype(int)
+    return f"background-color: #{r:02x}{g:02x}{b:02x}"
+
+def styled_matrix(table, selected = None):
+    """
+    This function colour-codes the comparison table by risk, and outlines the user's own selection.
+
+    Args:
+        table (Pandas DataFrame): The comparison table, see matrix_table.
+        selected (tuple, optional): The user's (disease, activity, mask), if they picked a preset. Defaults to None.
+
+    Returns:
+        Pandas Styler: The styled table, with the risks shown to two decimal places.
+    """
+    styler = table.style.format("{:.2f}%", na_rep = "-").map(lambda v: _colour(v) if np.isfinite(v) else "")
+    if selected is not None and (selected[0], selected[1]) in table.index and selected[2] in table.columns:
+        styler = styler.set_properties(subset = pd.IndexSlice[[(selected[0], selected[1])], [selected[2]]],
+                                       **{"border": "3px solid black", "font-weight": "bold"})
+    return styler
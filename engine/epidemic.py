@@ -0,0 +1,289 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the community transmission simulator, which follows a population through an epidemic day by day.
+# The population is split into four compartments: Susceptible, Exposed (infected but not yet infectious), Infectious and Recovered (SEIR).
+# Every day, the population attends a set of room classes, e.g. the sessions of a facility timetable, which repeat daily.
+#
+# The infectors in a room are drawn from the community, so their number is Poisson with mean μ = occupants * prevalence * attendance.
+# If one infector gives a susceptible the risk P₁ (from the Wells-Riley or residual risk model), the risk with a Poisson number of infectors is:
+#
+#     P = 1 - e^(-μ * P₁)
+#
+# The hazard of a susceptible in the room, -ln(1 - P) = μ * P₁, is linear in the prevalence. So the community's daily force of infection is the
+# prevalence times a contact rate, which is summed over every room class once, and every day of the simulation then costs one step per scenario.
+# All times in the room classes are in hours, and all epidemic times are in days.
+
+# Imports.
+import concurrent.futures
+import multiprocessing
+import os
+
+import numpy as np
+
+from engine import backend, facility
+
+# The default number of days from infection to becoming infectious, and of being infectious.
+DEFAULT_LATENT_DAYS = 3.0
+DEFAULT_INFECTIOUS_DAYS = 5.0
+
+# The scenario inputs that can vary across an ensemble, one value per scenario.
+SCENARIO_INPUTS = ["initial_infected", "attendance", "importations", "quanta_factor", "ventilation_factor"]
+
+# The number of scenarios simulated together in an ensemble, each block with its own random stream. Results depend on the block size, but not on
+# how the blocks are spread across processes or machines.
+BLOCK_SCENARIOS = 64
+
+#====================================================================================================================================================
+# ROOM CLASSES:
+#====================================================================================================================================================
+
+def room_classes(timetable):
+    """
+    This function turns a facility timetable into room classes. Every session is a room class that is attended every day.
+    The timetable's 'infectors' column is not used, because the infectors are drawn from the community instead.
+
+    Args:
+        timetable (Pandas DataFrame or dict): The timetable, see facility.timetable_arrays.
+
+    Returns:
+        dict: NumPy arrays for 'occupants', 'breathing', 'quanta', 'duration', 'ventilation' and 'volume'.
+    """
+    s = facility.timetable_arrays(timetable)
+    return {key: s[key] for key in ("occupants", "breathing", "quanta", "duration", "ventilation", "volume")}
+
+def infector_risk(rooms, quanta_factor = 1.0, ventilation_factor = 1.0, model = "wells_riley"):
+    """
+    This function calculates the risk that one infector gives one susceptible in each room class (P₁), for each scenario.
+
+    Args:
+        rooms (dict): The room classes, see room_classes.
+        quanta_factor (float or NumPy array, optional): A factor on the quanta emission rates, one per scenario. Defaults to 1.
+        ventilation_factor (float or NumPy array, optional): A factor on the ventilation rates, one per scenario. Defaults to 1.
+        model (str, optional): "wells_riley" (steady state), or "residual" (the concentration builds up from 0, which needs the room volumes).
+            Defaults to "wells_riley".
+
+    Returns:
+        NumPy array: P₁, with shape (scenarios, room classes).
+
+    Raises:
+        ValueError: If the model is unknown, or the residual model is used without room volumes.
+    """
+    quanta_factor = np.atleast_1d(np.asarray(quanta_factor, dtype = float))[:, None]
+    ventilation_factor = np.atleast_1d(np.asarray(ventilation_factor, dtype = float))[:, None]
+    q = rooms["quanta"] * quanta_factor
+    Q = rooms["ventilation"] * ventilation_factor
+
+    if model == "wells_riley":
+        return backend.wells_riley_risk(1, rooms["breathing"], q, rooms["duration"], Q)
+    if model == "residual":
+        if np.isnan(rooms["volume"]).any():
+            raise ValueError("The residual risk model needs a 'volume' for every room class.")
+        return backend.residual_risk(1, rooms["duration"], rooms["breathing"], q, Q, rooms["volume"])[0]
+    raise ValueError(f"Unknown model '{model}'. Use 'wells_riley' or 'residual'.")
+
+#====================================================================================================================================================
+# SIMULATION:
+#====================================================================================================================================================
+
+def simulate(rooms, population, days, initial_infected = 10, latent = DEFAULT_LATENT_DAYS, infectious = DEFAULT_INFECTIOUS_DAYS,
+             attendance = 1.0, importations = 0.0, quanta_factor = 1.0, ventilation_factor = 1.0, model = "wells_riley", seed = None):
+    """
+    This function simulates the epidemic in a community that attends the room classes every day, for one or many scenarios at once.
+    The inputs marked 'per scenario' can be single values or NumPy arrays with one value per scenario.
+
+    Args:
+        rooms (dict): The room classes, see room_classes.
+        population (int): The size of the community. Must be at least the number of daily room visits (the sum of the occupants).
+        days (int): The number of days to simulate.
+        initial_infected (float, per scenario, optional): The number of infectious individuals on day 0. Defaults to 10.
+        latent (float, optional): The mean number of days from infection to becoming infectious. Defaults to 3.
+        infectious (float, optional): The mean number of days of being infectious. Defaults to 5.
+        attendance (float, per scenario, optional): The fraction of infectious individuals who still attend the rooms, e.g. 0.5 if half of
+            them isolate. Defaults to 1.
+        importations (float, per scenario, optional): The mean number of infections caught outside the rooms each day. Defaults to 0.
+        quanta_factor (float, per scenario, optional): A factor on the quanta emission rates, e.g. 0.3 for masks. Defaults to 1.
+        ventilation_factor (float, per scenario, optional): A factor on the ventilation rates. Defaults to 1.
+        model (str, optional): The room model, see infector_risk. Defaults to "wells_riley".
+        seed (int, NumPy SeedSequence or Generator, optional): If given, the numbers moving between compartments are drawn at random (binomial), otherwise
+            the expected numbers are used. Defaults to None.
+
+    Returns:
+        dict: 'day' (days + 1 values), 'S', 'E', 'I', 'R' (the compartment sizes, with shape (scenarios, days + 1)), 'incidence' (the new
+            infections each day, with shape (scenarios, days)), 'contact_rate' (the daily force of infection per unit of prevalence, one per
+            scenario) and 'room_infections' (the infections caught in each room class over the whole simulation, with shape (scenarios, rooms)).
+            The expected number of infectors in room class r on day d is occupants[r] * attendance * I[:, d] / population.
+
+    Raises:
+        ValueError: If the population is smaller than the daily room visits.
+    """
+    occupants = np.asarray(rooms["occupants"], dtype = float)
+    if population < occupants.sum():
+        raise ValueError(f"The population ({population:,}) must be at least the number of daily room visits ({occupants.sum():,.0f}).")
+
+    initial_infected, attendance, importations, quanta_factor, ventilation_factor = (
+        np.atleast_1d(np.asarray(x, dtype = float)) for x in np.broadcast_arrays(initial_infected, attendance, importations, quanta_factor, ventilation_factor))
+
+    # Each room class is attended by occupants / population of the community per day. Summed over the room classes, a susceptible's daily
+    # hazard per unit of prevalence is the contact rate (see above). Its split across the room classes is where the infections are caught.
+    room_hazard = infector_risk(rooms, quanta_factor, ventilation_factor, model) * (occupants**2 / population) # Shape (scenarios, rooms).
+    contact_rate = room_hazard.sum(axis = 1) * attendance
+    room_share = np.divide(room_hazard, room_hazard.sum(axis = 1, keepdims = True), out = np.zeros_like(room_hazard), where = room_hazard > 0)
+
+    rng = np.random.default_rng(seed) if seed is not None else None
+    become_infectious = -np.expm1(-1 / latent) # The daily probability of leaving E, and of leaving I.
+    recover = -np.expm1(-1 / infectious)
+
+    n = initial_infected.size
+    S, E, I, R = (np.zeros((n, days + 1)) for _ in range(4))
+    I[:, 0] = np.minimum(initial_infected, population)
+    S[:, 0] = population - I[:, 0]
+    incidence, in_rooms_total = np.zeros((n, days)), np.zeros(n)
+
+    for day in range(days):
+        s, e, i, r = S[:, day], E[:, day], I[:, day], R[:, day]
+        infection = -np.expm1(-contact_rate * i / population) # The probability that a susceptible is infected in the rooms today.
+
+        if rng is None:
+            in_rooms = s * infection
+            imported = np.minimum(importations, s - in_rooms)
+            to_I, to_R = e * become_infectious, i * recover
+        else:
+            in_rooms = rng.binomial(s.astype(np.int64), infection).astype(float)
+            imported = np.minimum(rng.poisson(importations), s - in_rooms)
+            to_I = rng.binomial(e.astype(np.int64), become_infectious).astype(float)
+            to_R = rng.binomial(i.astype(np.int64), recover).astype(float)
+
+        S[:, day + 1] = s - in_rooms - imported
+        E[:, day + 1] = e + in_rooms + imported - to_I
+        I[:, day + 1] = i + to_I - to_R
+        R[:, day + 1] = r + to_R
+        incidence[:, day] = in_rooms + imported
+        in_rooms_total += in_rooms
+
+    return {
+        "day": np.arange(days + 1),
+        "S": S,
+        "E": E,
+        "I": I,
+        "R": R,
+        "incidence": incidence,
+        "contact_rate": contact_rate,
+        "room_infections": in_rooms_total[:, None] * room_share, # The split across the room classes is the same every day.
+    }
+
+#====================================================================================================================================================
+# ENSEMBLES:
+#====================================================================================================================================================
+
+def scenario_arrays(scenarios):
+    """
+    This function checks the scenario inputs of an ensemble, and broadcasts them to one value per scenario.
+
+    Args:
+        scenarios (dict): Values or NumPy arrays of equal length, one value per scenario, for any of the inputs in SCENARIO_INPUTS.
+
+    Returns:
+        dict: NumPy arrays, one value per scenario.
+        int: The number of scenarios.
+
+    Raises:
+        ValueError: If a scenario input is unknown.
+    """
+    unknown = sorted(set(scenarios) - set(SCENARIO_INPUTS))
+    if unknown:
+        raise ValueError(f"Unknown scenario inputs: {', '.join(unknown)}. Use any of: {', '.join(SCENARIO_INPUTS)}")
+
+    scenarios = dict(zip(scenarios, np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype = float)) for v in scenarios.values()))))
+    return scenarios, len(next(iter(scenarios.values()))) if scenarios else 1
+
+def block_seed(seed, block):
+    """
+    This function returns the random stream of one block of an ensemble. It is the same as the block's child of SeedSequence(seed).spawn,
+    so any process or machine can derive it without the others.
+
+    Args:
+        seed (int): The ensemble's seed, or None for expected numbers.
+        block (int): The block number.
+
+    Returns:
+        NumPy SeedSequence: The block's seed, or None if the seed is None.
+    """
+    return np.random.SeedSequence(seed, spawn_key = (block,)) if seed is not None else None
+
+def simulate_block(rooms, population, days, scenarios, block, block_size = BLOCK_SCENARIOS, seed = None, **kwargs):
+    """
+    This function simulates one block of an ensemble, i.e. the scenarios block * block_size to (block + 1) * block_size.
+
+    Args:
+        rooms (dict): The room classes, see room_classes.
+        population (int): The size of the community.
+        days (int): The number of days to simulate.
+        scenarios (dict): The scenario inputs of the whole ensemble, see scenario_arrays.
+        block (int): The block number.
+        block_size (int, optional): The number of scenarios in a block. Defaults to BLOCK_SCENARIOS.
+        seed (int, optional): The ensemble's seed, see run_ensemble. Defaults to None.
+        **kwargs: The other inputs of simulate (latent, infectious, model).
+
+    Returns:
+        dict: The results of simulate, for the block's scenarios.
+    """
+    scenarios, _ = scenario_arrays(scenarios)
+    rows = slice(block * block_size, (block + 1) * block_size)
+    return simulate(rooms, population, days, **{k: v[rows] for k, v in scenarios.items()}, seed = block_seed(seed, block), **kwargs)
+
+def _simulate_block(args):
+    """
+    This function runs simulate_block in a worker process.
+    """
+    rooms, population, days, scenarios, block, block_size, seed, kwargs = args
+    return simulate_block(rooms, population, days, scenarios, block, block_size, seed, **kwargs)
+
+def concatenate(results):
+    """
+    This function joins the results of consecutive blocks of an ensemble.
+
+    Args:
+        results (list of dict): The results of simulate for each block, in order.
+
+    Returns:
+        dict: The results of simulate, for every scenario in order.
+    """
+    return {key: results[0][key] if key == "day" else np.concatenate([res[key] for res in results]) for key in results[0]}
+
+def run_ensemble(rooms, population, days, scenarios, processes = None, seed = None, block_size = BLOCK_SCENARIOS, **kwargs):
+    """
+    This function simulates an ensemble of scenarios in blocks, spread across several processes.
+    The results are the same as one call to simulate with every scenario, except that random draws use one stream per block. They are the same
+    for the same seed and block size, whatever the number of processes, and whether the blocks are run here or as shards (see engine/shards.py).
+
+    Args:
+        rooms (dict): The room classes, see room_classes.
+        population (int): The size of the community.
+        days (int): The number of days to simulate.
+        scenarios (dict): NumPy arrays of equal length, one value per scenario, for any of the inputs in SCENARIO_INPUTS.
+        processes (int, optional): The number of worker processes. Defaults to None (one per CPU). With 1, the ensemble runs in this process.
+        seed (int, optional): If given, the simulations are random and reproducible. Defaults to None.
+        block_size (int, optional): The number of scenarios simulated together. Defaults to BLOCK_SCENARIOS.
+        **kwargs: The other inputs of simulate (latent, infectious, model).
+
+    Returns:
+        dict: The results of simulate, for every scenario in order.
+
+    Raises:
+        ValueError: If a scenario input is unknown.
+    """
+    scenarios, n = scenario_arrays(scenarios)
+    blocks = -(-n // block_size)
+    processes = max(1, min(processes or os.cpu_count() or 1, blocks))
+    jobs = [(rooms, population, days, scenarios, b, block_size, seed, kwargs) for b in range(blocks)]
+
+    if processes == 1:
+        results = [_simulate_block(job) for job in jobs]
+    else:
+        # New processes are spawned rather than forked, so it is safe to call from a multithreaded server.
+        with concurrent.futures.ProcessPoolExecutor(processes, mp_context = multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(_simulate_block, jobs))
+
+    return concatenate(results)
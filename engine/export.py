@@ -0,0 +1,119 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for exporting model results to Apache Arrow IPC and Parquet.
+# Results are handed over as a dictionary of NumPy arrays (one per column). Numeric columns are wrapped as Arrow buffers without copying,
+# so no intermediate Python lists or objects are created between the model equations and the exported file.
+
+# Imports.
+import io
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+#====================================================================================================================================================
+# ARROW TABLES:
+#====================================================================================================================================================
+
+def numpy_to_arrow(values):
+    """
+    This function wraps a NumPy array as an Arrow array.
+    Contiguous numeric arrays share their memory with the Arrow array (zero-copy). 2-D numeric arrays become fixed-size lists, one list per row.
+    Anything else (for example strings or booleans, which Arrow stores differently) is converted by Arrow.
+
+    Args:
+        values (NumPy array): The column to wrap.
+
+    Returns:
+        pyarrow.Array: The Arrow array.
+    """
+    values = np.asarray(values)
+
+    if values.dtype.kind not in "iuf" or values.ndim > 2:
+        return pa.array(values.tolist() if values.ndim > 1 else values)
+
+    values = np.ascontiguousarray(values) # Only copies if the array is a non-contiguous view.
+    flat = pa.Array.from_buffers(pa.from_numpy_dtype(values.dtype), values.size, [None, pa.py_buffer(values)])
+
+    if values.ndim == 2:
+        return pa.FixedSizeListArray.from_arrays(flat, values.shape[1])
+    return flat
+
+def to_arrow_table(columns, metadata = None):
+    """
+    This function builds an Arrow table from a dictionary of NumPy arrays.
+
+    Args:
+        columns (dict): Column names mapped to NumPy arrays of equal length.
+        metadata (dict, optional): Information describing the table, such as units and model inputs. Stored as JSON in the schema. Defaults to None.
+
+    Returns:
+        pyarrow.Table: The table.
+    """
+    table = pa.table({name: numpy_to_arrow(values) for name, values in columns.items()})
+
+    if metadata:
+        table = table.replace_schema_metadata({"iara": json.dumps(metadata, default = str)})
+    return table
+
+#====================================================================================================================================================
+# FILES:
+#====================================================================================================================================================
+
+def write_parquet(columns, where, metadata = None):
+    """
+    This function writes a dictionary of NumPy arrays to a Parquet file.
+
+    Args:
+        columns (dict): Column names mapped to NumPy arrays of equal length.
+        where (str or file-like object): The path or buffer to write to.
+        metadata (dict, optional): Information describing the table. Defaults to None.
+    """
+    pq.write_table(to_arrow_table(columns, metadata), where)
+
+def write_ipc(columns, where, metadata = None):
+    """
+    This function writes a dictionary of NumPy arrays to an Arrow IPC (Feather V2) file.
+
+    Args:
+        columns (dict): Column names mapped to NumPy arrays of equal length.
+        where (str or file-like object): The path or buffer to write to.
+        metadata (dict, optional): Information describing the table. Defaults to None.
+    """
+    table = to_arrow_table(columns, metadata)
+    with ipc.new_file(where, table.schema) as writer:
+        writer.write_table(table)
+
+def to_parquet_bytes(columns, metadata = None):
+    """
+    This function returns a dictionary of NumPy arrays as the bytes of a Parquet file, for download buttons.
+
+    Args:
+        columns (dict): Column names mapped to NumPy arrays of equal length.
+        metadata (dict, optional): Information describing the table. Defaults to None.
+
+    Returns:
+        bytes: The Parquet file.
+    """
+    buffer = io.BytesIO()
+    write_parquet(columns, buffer, metadata)
+    return buffer.getvalue()
+
+def to_ipc_bytes(columns, metadata = None):
+    """
+    This function returns a dictionary of NumPy arrays as the bytes of an Arrow IPC file, for download buttons.
+
+    Args:
+        columns (dict): Column names mapped to NumPy arrays of equal length.
+        metadata (dict, optional): Information describing the table. Defaults to None.
+
+    Returns:
+        bytes: The Arrow IPC file.
+    """
+    sink = pa.BufferOutputStream()
+    write_ipc(columns, sink, metadata)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,352 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the facility-wide daily exposure aggregation.
+# A facility is described by a timetable of sessions, one row per room booking, and every session is assessed with the Wells-Riley model.
+# Sessions are then grouped by room with vectorised reductions (np.bincount), so thousands of rooms are aggregated without a Python loop.
+# All times are in hours, breathing rates in m³/h, quanta emission rates in quanta/h and ventilation rates in m³/h.
+
+# Imports.
+import numpy as np
+import pandas as pd
+
+from engine import models
+
+# The default breathing rate of an adult at rest (m³/h), as used by the pages.
+DEFAULT_BREATHING_RATE = 0.465
+
+# Columns that every timetable must contain. Ventilation is given either as 'ventilation' (m³/h), or as 'ach' and 'volume' (m³).
+TIMETABLE_COLUMNS = ["room", "start", "end", "occupants", "infectors", "quanta"]
+
+#====================================================================================================================================================
+# TIMETABLES:
+#====================================================================================================================================================
+
+def timetable_arrays(timetable):
+    """
+    This function checks a timetable and converts it into the NumPy arrays used by the aggregation.
+
+    Args:
+        timetable (Pandas DataFrame or dict): One row per session with the columns in TIMETABLE_COLUMNS, ventilation as 'ventilation' or 'ach' and 'volume',
+            and optionally 'breathing' (defaults to 0.465 m³/h).
+
+    Returns:
+        dict: NumPy arrays for 'room' (labels), 'start', 'end', 'duration', 'occupants', 'infectors', 'breathing', 'quanta', 'ventilation'
+            and 'volume' (NaN where the timetable has no 'volume' column).
+
+    Raises:
+        ValueError: If a required column is missing, a session does not end after it starts, a count or rate is negative, or a session with
+            infectors has no ventilation.
+    """
+    timetable = pd.DataFrame(timetable)
+
+    missing = [col for col in TIMETABLE_COLUMNS if col not in timetable.columns]
+    if "ventilation" not in timetable.columns and not {"ach", "volume"} <= set(timetable.columns):
+        missing.append("ventilation (or ach and volume)")
+    if missing:
+        raise ValueError(f"The timetable is missing the following columns: {', '.join(missing)}")
+
+    if "ventilation" in timetable.columns:
+        ventilation = timetable["ventilation"].to_numpy(dtype = float)
+    else:
+        ventilation = timetable["ach"].to_numpy(dtype = float) * timetable["volume"].to_numpy(dtype = float) # Convert ACH into m³/h.
+
+    if "breathing" in timetable.columns:
+        breathing = timetable["breathing"].to_numpy(dtype = float)
+    else:
+        breathing = np.full(len(timetable), DEFAULT_BREATHING_RATE)
+
+    if "volume" in timetable.columns:
+        volume = timetable["volume"].to_numpy(dtype = float)
+    else:
+        volume = np.full(len(timetable), np.nan)
+
+    start = timetable["start"].to_numpy(dtype = float)
+    end = timetable["end"].to_numpy(dtype = float)
+    occupants = timetable["occupants"].to_numpy(dtype = float)
+    infectors = timetable["infectors"].to_numpy(dtype = float)
+    quanta = timetable["quanta"].to_numpy(dtype = float)
+
+    # Sessions that end before they start, or negative counts and rates, give negative risks that would be netted into the totals.
+    checks = {
+        "end after start": end > start,
+        "occupants of at least 0": occupants >= 0,
+        "infectors of at least 0": infectors >= 0,
+        "quanta of at least 0": quanta >= 0,
+        "breathing of at least 0": breathing >= 0,
+        "ventilation of at least 0": ventilation >= 0,
+        # The models give a risk of 0 without ventilation, which would rank an unventilated room with infectors as the safest.
+        "ventilation above 0 when there are infectors": (infectors <= 0) | (ventilation > 0),
+    }
+    problems = []
+    for rule, ok in checks.items():
+        bad = timetable.index[~ok]
+        if bad.size:
+            problems.append(f"rows {', '.join(map(str, bad[:10]))}{' ...' if bad.size > 10 else ''} need {rule}")
+    if problems:
+        raise ValueError(f"The timetable has invalid sessions: {'; '.join(problems)}.")
+
+    return {
+        "room": timetable["room"].to_numpy(),
+        "start": start,
+        "end": end,
+        "duration": end - start,
+        "occupants": occupants,
+        "infectors": infectors,
+        "breathing": breathing,
+        "quanta": quanta,
+        "ventilation": ventilation,
+        "volume": volume,
+    }
+
+def example_timetable(n_rooms = 2000, sessions_per_room = 6, seed = 0):
+    """
+    This function generates a random but plausible timetable, for demonstrations and benchmarks.
+
+    Args:
+        n_rooms (int, optional): The number of rooms. Defaults to 2000.
+        sessions_per_room (int, optional): The number of back-to-back sessions in each room. Defaults to 6.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        Pandas DataFrame: The timetable.
+    """
+    rng = np.random.default_rng(seed)
+    n = n_rooms * sessions_per_room
+
+    room = np.repeat(np.arange(n_rooms), sessions_per_room)
+    length = rng.choice([0.75, 1.0, 1.5, 2.0], size = n)
+    # Sessions in a room run back-to-back from 08:00.
+    end = 8 + np.cumsum(length.reshape(n_rooms, sessions_per_room), axis = 1).ravel()
+    occupants = rng.integers(5, 60, size = n)
+    volume = np.repeat(rng.uniform(60, 600, size = n_rooms), sessions_per_room)
+
+    return pd.DataFrame({
+        "room": np.char.add("Room ", room.astype(str)),
+        "start": end - length,
+        "end": end,
+        "occupants": occupants,
+        "infectors": rng.binomial(occupants, 0.01), # Roughly 1% prevalence.
+        "quanta": rng.choice([0.55, 2.7, 46], size = n, p = [0.6, 0.35, 0.05]),
+        "ach": np.repeat(rng.choice([3, 4, 6, 8, 12], size = n_rooms), sessions_per_room),
+        "volume": volume,
+    })
+
+#====================================================================================================================================================
+# AGGREGATION:
+#====================================================================================================================================================
+
+def top_k(values, k):
+    """
+    This function finds the positions of the k largest values, largest first.
+    A partial sort (np.argpartition) is used, so only the k selected values are fully sorted.
+
+    Args:
+        values (NumPy array): The values to rank.
+        k (int): The number of positions to return.
+
+    Returns:
+        NumPy array: The positions of the k largest values.
+    """
+    values = np.asarray(values)
+    k = min(k, values.size)
+    if k <= 0:
+        return np.array([], dtype = int)
+
+    candidates = np.argpartition(values, values.size - k)[values.size - k:]
+    return candidates[np.argsort(values[candidates])[::-1]]
+
+def daily_exposure(timetable, percentiles = (50, 90, 95, 99), k = 10):
+    """
+    This function calculates the per-room and facility-level expected daily infections and risk.
+
+    Each session is assessed with the Wells-Riley model. For each room, the expected infections of its sessions are summed, and the daily risk
+    is the risk for a susceptible individual who attends every session in that room: 1 - ∏(1 - P).
+
+    Args:
+        timetable (Pandas DataFrame or dict): The timetable, see timetable_arrays.
+        percentiles (tuple, optional): The percentiles of the room daily risk to report. Defaults to (50, 90, 95, 99).
+        k (int, optional): The number of highest-risk rooms to highlight. Defaults to 10.
+
+    Returns:
+        dict: 'rooms', a dictionary of NumPy arrays with one entry per room ('room', 'sessions', 'occupant_hours', 'expected_infections',
+            'max_session_risk', 'daily_risk'), 'facility', a dictionary of facility-level totals and percentiles,
+            and 'top_rooms', the positions in 'rooms' of the k rooms with the most expected infections.
+    """
+    s = timetable_arrays(timetable)
+
+    # Assess every session in one vectorised call.
+    P = models.wells_riley_risk(s["infectors"], s["breathing"], s["quanta"], s["duration"], s["ventilation"])
+    P = np.where(s["infectors"] > 0, P, 0.0) # Sessions without infectors carry no risk.
+    susceptibles = np.maximum(s["occupants"] - s["infectors"], 0)
+    expected = susceptibles * P
+
+    # Group the sessions by room. 'room_idx' gives the room number of each session.
+    room_labels, room_idx = np.unique(s["room"], return_inverse = True)
+    n_rooms = room_labels.size
+
+    sessions = np.bincount(room_idx, minlength = n_rooms)
+    occupant_hours = np.bincount(room_idx, weights = s["occupants"] * s["duration"], minlength = n_rooms)
+    room_expected = np.bincount(room_idx, weights = expected, minlength = n_rooms)
+    # Summing log(1 - P) per room gives the probability of escaping infection across every session of the day.
+    room_log_escape = np.bincount(room_idx, weights = np.log1p(-np.minimum(P, 1 - 1e-16)), minlength = n_rooms)
+    room_daily_risk = -np.expm1(room_log_escape) + 0.0 # Adding 0 turns the -0.0 of rooms without risk into 0.
+    max_risk = np.zeros(n_rooms)
+    np.maximum.at(max_risk, room_idx, P)
+
+    rooms = {
+        "room": room_labels,
+        "sessions": sessions,
+        "occupant_hours": occupant_hours,
+        "expected_infections": room_expected,
+        "max_session_risk": max_risk,
+        "daily_risk": room_daily_risk,
+    }
+
+    facility = {
+        "rooms": int(n_rooms),
+        "sessions": int(P.size),
+        "expected_infections": float(expected.sum()),
+        "mean_session_risk": float(P.mean()) if P.size else 0.0,
+        "daily_risk_percentiles": dict(zip(percentiles, np.percentile(room_daily_risk, percentiles).tolist())) if n_rooms else {},
+    }
+
+    return {"rooms": rooms, "facility": facility, "top_rooms": top_k(room_expected, k)}
+
+#====================================================================================================================================================
+# CHANGEOVERS:
+#====================================================================================================================================================
+
+def changeover_gaps(timetable, threshold):
+    """
+    This function checks whether the gap between each session and the next session in the same room is long enough for the room to be safe to
+    re-enter, i.e. for the risk of the next session's occupants from the quanta left behind to be at or below the threshold.
+    Every changeover is checked on its own, in one vectorised call: quanta left over from earlier sessions are not carried forward.
+
+    Args:
+        timetable (Pandas DataFrame or dict): The timetable, see timetable_arrays. It must include the room 'volume'.
+        threshold (float): The highest acceptable risk for one occupant of the next session.
+
+    Returns:
+        dict: NumPy arrays with one entry per changeover: 'room', 'end' (of the outgoing session), 'next_start', 'gap',
+            'required_wait' (see models.reentry_time) and 'safe' (whether the gap is at least the required wait).
+
+    Raises:
+        ValueError: If a required column, or the room volume, is missing.
+    """
+    s = timetable_arrays(timetable)
+    if np.isnan(s["volume"]).any():
+        raise ValueError("The timetable needs the 'volume' of every room to check the changeover gaps.")
+
+    # Sort the sessions by room, then by start time. Each session is followed by the next one in the same room.
+    order = np.lexsort((s["start"], s["room"]))
+    s = {key: value[order] for key, value in s.items()}
+    first, second = slice(None, -1), slice(1, None)
+    same_room = s["room"][first] == s["room"][second]
+    outgoing = {key: value[first][same_room] for key, value in s.items()}
+    incoming = {key: value[second][same_room] for key, value in s.items()}
+
+    # The next session's occupants stay for the whole of their session.
+    wait = models.reentry_time(outgoing["infectors"], outgoing["duration"], incoming["breathing"], outgoing["quanta"],
+                               outgoing["ventilation"], outgoing["volume"], threshold, stay = incoming["duration"])
+    gap = incoming["start"] - outgoing["end"]
+
+    return {
+        "room": outgoing["room"],
+        "end": outgoing["end"],
+        "next_start": incoming["start"],
+        "gap": gap,
+        "required_wait": wait,
+        "safe": gap >= wait,
+    }
+
+#====================================================================================================================================================
+# PERIODIC STEADY STATE:
+#====================================================================================================================================================
+
+def periodic_exposure(timetable, period = 24.0):
+    """
+    This function calculates the risk of every session when the timetable repeats every period (e.g. every day), and the quanta left over from
+    earlier sessions, including those of the previous period, carry into each session (the residual term of Equation 11 on the Residual Risk page).
+
+    A room with ventilation rate Q and volume v follows v dC/dt = E(t) - Q C. Over one period, the concentration at the end is an affine function
+    of the concentration at the start, C(period) = a C(0) + b, where a is the fraction that decays away and b is what one period adds to an empty room.
+    The repeating (periodic steady state) concentration is then C(0) = b / (1 - a), found in closed form rather than by simulating many periods.
+    Each session's ventilation rate also applies to the gap after it, until the next session starts. A session without ventilation (and so, see
+    timetable_arrays, without infectors) keeps the quanta left in the room, whose concentration then stays the same until ventilation resumes.
+
+    Args:
+        timetable (Pandas DataFrame or dict): The timetable, see timetable_arrays. It must include the room 'volume'.
+        period (float, optional): The time after which the timetable repeats, in hours. Defaults to 24 (daily). Use 168 for a weekly timetable.
+
+    Returns:
+        dict: NumPy arrays with one entry per session, sorted by room and start time: 'room', 'start', 'end', 'carryover' (the concentration
+            at the start of the session, quanta/m³), 'risk' (the risk of one susceptible in the session, with carry-over), 'fresh_risk' (the risk
+            if the room started the session empty, Equation 9), 'expected_infections' (with carry-over) and 'fresh_expected_infections'.
+
+    Raises:
+        ValueError: If the timetable is invalid (see timetable_arrays), the room volume is missing or not above 0, or the sessions of a room
+            overlap or do not fit in one period.
+    """
+    s = timetable_arrays(timetable)
+    if np.isnan(s["volume"]).any():
+        raise ValueError("The timetable needs the 'volume' of every room to carry quanta over between sessions.")
+    if (s["volume"] <= 0).any():
+        raise ValueError("The 'volume' of every room must be above 0 to carry quanta over between sessions.")
+
+    # Sort the sessions by room, then by start time. Each session is followed by the next one in the same room, and the last one by the
+    # first one of the next period.
+    order = np.lexsort((s["start"], s["room"]))
+    s = {key: value[order] for key, value in s.items()}
+    room_labels, room_idx = np.unique(s["room"], return_inverse = True)
+    start = np.flatnonzero(np.r_[True, room_idx[1:] != room_idx[:-1]])
+    counts = np.diff(np.r_[start, room_idx.size])
+    last = start + counts - 1
+
+    next_start = np.r_[s["start"][1:], 0.0]
+    next_start[last] = s["start"][start] + period
+    gap = next_start - s["end"]
+    if (gap < 0).any() or (s["end"][last] > s["start"][start] + period).any():
+        raise ValueError(f"The sessions of each room must not overlap, and must fit within one period ({period:g} h).")
+
+    Q, vol = s["ventilation"], s["volume"]
+    lam = Q / vol
+    steady = np.divide(s["infectors"] * s["quanta"], Q, out = np.zeros_like(Q), where = Q > 0) # The concentration each session relaxes towards.
+    session_decay = np.exp(-lam * s["duration"])
+    gap_decay = np.exp(-lam * gap)
+
+    # Step through one period from an empty room. The k-th session of every room is stepped at once, so the loop is over the sessions of the busiest
+    # room. 'fresh' is the concentration at the start of each session, and 'decayed' is the fraction of the starting concentration still left then.
+    rank = np.arange(room_idx.size) - np.repeat(start, counts)
+    by_rank = np.split(np.argsort(rank, kind = "stable"), np.cumsum(np.bincount(rank))[:-1]) if rank.size else []
+    fresh, decayed = np.zeros(room_idx.size), np.ones(room_idx.size)
+    for i in by_rank[1:]:
+        fresh[i] = (steady[i - 1] + (fresh[i - 1] - steady[i - 1]) * session_decay[i - 1]) * gap_decay[i - 1]
+        decayed[i] = decayed[i - 1] * session_decay[i - 1] * gap_decay[i - 1]
+
+    # One whole period: C(period) = a C(0) + b, so the periodic steady state starts each period at b / (1 - a).
+    a = decayed[last] * session_decay[last] * gap_decay[last]
+    b = (steady[last] + (fresh[last] - steady[last]) * session_decay[last]) * gap_decay[last]
+    periodic = np.divide(b, 1 - a, out = np.zeros_like(b), where = a < 1)
+    carryover = fresh + np.repeat(periodic, counts) * decayed
+
+    # The dose of an occupant over the session, ∫C, from the concentration at its start. Without ventilation, the concentration stays at C0.
+    def session_risk(C0):
+        spread = np.divide(-np.expm1(-lam * s["duration"]), lam, out = s["duration"].copy(), where = lam > 0)
+        dose = steady * s["duration"] + (C0 - steady) * spread
+        return -np.expm1(-s["breathing"] * dose) + 0.0
+
+    risk, fresh_risk = session_risk(carryover), session_risk(np.zeros_like(carryover))
+    susceptibles = np.maximum(s["occupants"] - s["infectors"], 0)
+
+    return {
+        "room": s["room"],
+        "start": s["start"],
+        "end": s["end"],
+        "carryover": carryover,
+        "risk": risk,
+        "fresh_risk": fresh_risk,
+        "expected_infections": susceptibles * risk,
+        "fresh_expected_infections": susceptibles * fresh_risk,
+    }
@@ -0,0 +1,306 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the floor-plan importer, which reads the geometry of every room of an estate from GeoJSON.
+# Each room is a Polygon or MultiPolygon feature, with its ceiling height and usage category as properties. As in RFC 7946, coordinates are
+# longitudes and latitudes unless the file's legacy 'crs' member names another system (or the caller says they are metres). The areas of every room are
+# calculated at once with the shoelace formula, over one flat array holding the vertices of every ring, so thousands of rooms take milliseconds.
+# The usage category is joined to the recommended air changes per hour in presets.ventilation_dict, to give each room's ventilation rate.
+#
+# The rooms table feeds batch assessments directly: it has the 'room', 'volume' and 'ventilation' columns of the Itineraries rooms file, and
+# attach adds them to a facility timetable (see engine/facility.py).
+# Areas are in m², heights in m, volumes in m³ and ventilation rates in m³/h.
+
+# Imports.
+import json
+
+import numpy as np
+import pandas as pd
+
+from engine import presets
+
+# The mean radius of the Earth (m), to project longitude and latitude onto a local plane.
+EARTH_RADIUS = 6371008.8
+
+# The smallest plausible floor area of a room (m²). Smaller rooms mean the coordinates were read in the wrong units.
+MIN_ROOM_AREA = 0.01
+
+# The usage categories, by name in lower case, with their sector and recommended air changes per hour.
+CATEGORIES = {setting.lower(): (sector, setting, ach) for sector, settings in presets.ventilation_dict.items() for setting, ach in settings.items()}
+
+#====================================================================================================================================================
+# GEOMETRY:
+#====================================================================================================================================================
+
+def ring_areas(x, y, starts):
+    """
+    This function calculates the area of many rings at once with the shoelace formula. The vertices of every ring are laid end to end.
+    Rings may be closed (last vertex equal to the first, as in GeoJSON) or open.
+
+    Args:
+        x, y (NumPy array): The coordinates of every vertex (m).
+        starts (NumPy array): The position of the first vertex of each ring.
+
+    Returns:
+        NumPy array: The area of each ring (m²).
+    """
+    x, y = np.asarray(x, dtype = float), np.asarray(y, dtype = float)
+    starts = np.asarray(starts, dtype = np.int64)
+
+    # Each vertex is paired with the next one in its ring, and the last vertex of a ring with the first.
+    nxt = np.arange(1, x.size + 1)
+    nxt[np.append(starts[1:], x.size) - 1] = starts
+
+    # The coordinates are taken relative to the first vertex of their ring, so large map coordinates do not lose precision.
+    ring = np.repeat(np.arange(starts.size), np.diff(np.append(starts, x.size)))
+    x, y = x - x[starts][ring], y - y[starts][ring]
+    cross = x * y[nxt] - x[nxt] * y
+    return 0.5 * np.abs(np.add.reduceat(cross, starts))
+
+def _project(lon, lat, room):
+    """
+    This function projects longitudes and latitudes (degrees) onto a local plane (m), around the mean latitude of each room.
+    """
+    mean_lat = np.bincount(room, weights = lat) / np.bincount(room)
+    x = np.radians(lon) * EARTH_RADIUS * np.cos(np.radians(mean_lat[room]))
+    y = np.radians(lat) * EARTH_RADIUS
+    return x, y
+
+#====================================================================================================================================================
+# GEOJSON:
+#====================================================================================================================================================
+
+def read_features(source):
+    """
+    This function reads the features of a GeoJSON FeatureCollection.
+
+    Args:
+        source (str, bytes, dict or file-like): A path, the GeoJSON text, the parsed GeoJSON, or an open file.
+
+    Returns:
+        tuple: The list of features, and whether the coordinates are longitudes and latitudes according to the legacy 'crs' member (None if
+            the file has no 'crs' member).
+
+    Raises:
+        ValueError: If the source is not a GeoJSON Feature or FeatureCollection.
+    """
+    if hasattr(source, "read"):
+        source = source.read()
+    if isinstance(source, bytes):
+        source = source.decode("utf-8")
+    if isinstance(source, str):
+        if source.lstrip().startswith("{"):
+            source = json.loads(source)
+        else:
+            with open(source, encoding = "utf-8") as f:
+                source = json.load(f)
+
+    kind = source.get("type")
+    if kind == "FeatureCollection":
+        features = source.get("features") or []
+    elif kind == "Feature":
+        features = [source]
+    else:
+        raise ValueError(f"Expected a GeoJSON Feature or FeatureCollection, not '{kind}'.")
+
+    if "crs" not in source:
+        return features, None
+    crs = json.dumps(source["crs"]).upper()
+    return features, ("CRS84" in crs or "4326" in crs)
+
+def read_floorplan(source, default_height = None, geographic = None, room_key = "room", height_key = "height", category_key = "category",
+                   building_key = "building", ach_key = "ach"):
+    """
+    This function reads the rooms of a floor plan, and calculates their areas, volumes and ventilation rates.
+
+    Each feature is one room, or part of one: features with the same room (and building) are combined, e.g. an L-shaped room drawn as two
+    rectangles. Holes in polygons (e.g. a stairwell) are taken out of the area.
+
+    Args:
+        source (str, bytes, dict or file-like): The GeoJSON, see read_features.
+        default_height (float, optional): The ceiling height (m) of rooms without one. Defaults to None (every room needs a height).
+        geographic (bool, optional): Whether the coordinates are longitudes and latitudes (degrees) rather than metres. Defaults to None
+            (longitudes and latitudes, as in RFC 7946, unless the legacy 'crs' member names another coordinate system).
+        room_key, height_key, category_key, building_key, ach_key (str, optional): The names of the properties holding the room name, the ceiling
+            height (m), the usage category (a setting of presets.ventilation_dict, e.g. "Classrooms"), the building, and a measured air change rate
+            that overrides the category's. Rooms without a name take the feature's 'id', or their position.
+
+    Returns:
+        Pandas DataFrame: One row per room, with 'room', 'building' (if any feature has one), 'category', 'sector', 'area' (m²), 'height' (m),
+            'volume' (m³), 'ach' and 'ventilation' (m³/h). 'ach' and 'ventilation' are NaN for rooms with an unknown category and no measured rate.
+
+    Raises:
+        ValueError: If a feature is not a polygon, has a ring with fewer than three vertices, or has no positive ceiling height, or if the
+            coordinates do not fit their units.
+    """
+    features, crs_geographic = read_features(source)
+    if geographic is None:
+        geographic = crs_geographic is not False
+
+    # The properties and the rings of every feature are collected first, then the geometry is calculated in one pass.
+    names, buildings, categories, heights, measured = [], [], [], [], []
+    coords, ring_feature, ring_hole = [], [], []
+    for i, feature in enumerate(features):
+        props = feature.get("properties") or {}
+        geometry = feature.get("geometry") or {}
+        name = props.get(room_key, feature.get("id", i))
+
+        if geometry.get("type") == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            raise ValueError(f"Room '{name}' is a {geometry.get('type')}, not a Polygon or MultiPolygon.")
+        for polygon in polygons:
+            for r, ring in enumerate(polygon):
+                if len(ring) < 3:
+                    raise ValueError(f"Room '{name}' has a ring with fewer than three vertices.")
+                coords.append(np.asarray(ring, dtype = float)[:, :2])
+                ring_feature.append(i)
+                ring_hole.append(r > 0) # The first ring of a polygon is its outline, and the others are holes.
+
+        names.append(str(name))
+        buildings.append(props.get(building_key))
+        categories.append(props.get(category_key))
+        heights.append(props.get(height_key, default_height))
+        measured.append(props.get(ach_key))
+
+    if not features:
+        raise ValueError("The floor plan has no rooms.")
+    heights = np.array([np.nan if h is None else h for h in heights], dtype = float)
+    bad = [names[i] for i in np.flatnonzero(~(heights > 0))]
+    if bad:
+        raise ValueError(f"The following rooms have no positive ceiling height: {', '.join(bad[:10])}{' ...' if len(bad) > 10 else ''}. "
+                         f"Give each room a '{height_key}' property, or set a default height.")
+
+    # The vertices of every ring, laid end to end.
+    lengths = np.array([c.shape[0] for c in coords])
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    xy = np.concatenate(coords)
+    ring_feature = np.asarray(ring_feature)
+    x, y = xy[:, 0], xy[:, 1]
+    in_range = bool(np.all(np.abs(x) <= 180) and np.all(np.abs(y) <= 90))
+    if geographic:
+        if not in_range:
+            raise ValueError("The coordinates are not longitudes and latitudes, as GeoJSON expects. If the floor plan is drawn in metres, "
+                             "read its coordinates as metres (geographic = False).")
+        x, y = _project(x, y, np.repeat(ring_feature, lengths))
+
+    # Holes are subtracted from the outline of their polygon, then the parts of each feature are added together.
+    signed = ring_areas(x, y, starts) * np.where(ring_hole, -1.0, 1.0)
+    area = np.bincount(ring_feature, weights = signed, minlength = len(features))
+
+    # Longitudes and latitudes read as metres give rooms of a fraction of a square millimetre, and a risk of almost 100% in every session.
+    if not geographic and in_range and np.median(area) < MIN_ROOM_AREA:
+        raise ValueError(f"The rooms have a median floor area of {np.median(area):.2g} m², so the coordinates look like longitudes and latitudes. "
+                         "Read its coordinates as longitudes and latitudes (geographic = True).")
+
+    table = pd.DataFrame({"room": names, "building": buildings, "category": categories, "area": area, "volume": area * heights, "measured": measured})
+    keys = ["building", "room"] if table["building"].notna().any() else ["room"]
+    table["building"] = table["building"].fillna("").astype(str)
+    rooms = table.groupby(keys, sort = False).agg(category = ("category", "first"), area = ("area", "sum"), volume = ("volume", "sum"),
+                                                  measured = ("measured", "first")).reset_index()
+    rooms["height"] = rooms["volume"] / rooms["area"] # The mean ceiling height, for rooms drawn in parts.
+
+    # Join the categories to their recommended air change rates. A measured rate takes precedence.
+    found = [CATEGORIES.get(str(c).strip().lower()) if c is not None else None for c in rooms["category"]]
+    rooms["category"] = [f[1] if f else c for f, c in zip(found, rooms["category"])]
+    rooms["sector"] = [f[0] if f else None for f in found]
+    rooms["ach"] = pd.to_numeric(rooms.pop("measured"), errors = "coerce").fillna(pd.Series([f[2] if f else np.nan for f in found], dtype = float))
+    rooms["ventilation"] = rooms["ach"] * rooms["volume"] # Convert ACH into m³/h.
+
+    return rooms[keys + ["category", "sector", "area", "height", "volume", "ach", "ventilation"]]
+
+#====================================================================================================================================================
+# BATCH ASSESSMENTS:
+#====================================================================================================================================================
+
+def attach(timetable, rooms):
+    """
+    This function adds the volume and ventilation rate of each room of a floor plan to a facility timetable, for facility.daily_exposure.
+    Rooms are matched by building and name if both the floor plan and the timetable have a 'building' column, and by name otherwise. Where the
+    floor plan has no ventilation rate for a room, the timetable's own 'ventilation', or 'ach' and 'volume', are kept.
+
+    Args:
+        timetable (Pandas DataFrame): The timetable, see facility.timetable_arrays.
+        rooms (Pandas DataFrame): The rooms, see read_floorplan.
+
+    Returns:
+        Pandas DataFrame: A copy of the timetable with 'volume' (m³) and 'ventilation' (m³/h) for every session.
+
+    Raises:
+        ValueError: If a room name of the timetable is in more than one building of the floor plan and the timetable has no 'building'
+            column, or if a room has no ventilation rate in either the floor plan or the timetable.
+    """
+    timetable = pd.DataFrame(timetable).copy()
+    keys = ["building", "room"] if "building" in rooms.columns and "building" in timetable.columns else ["room"]
+    plan = rooms.assign(**{key: rooms[key].astype(str) for key in keys}).set_index(keys)
+    names = timetable["room"].astype(str)
+    if len(keys) == 2:
+        index = pd.MultiIndex.from_arrays([timetable["building"].fillna("").astype(str), names])
+    else:
+        index = pd.Index(names)
+        # The same room name in several buildings cannot be told apart without the building.
+        ambiguous = plan.index[plan.index.duplicated()].unique().intersection(index.unique())
+        if ambiguous.size:
+            raise ValueError(f"The following rooms are in more than one building of the floor plan: {', '.join(ambiguous[:10])}"
+                             f"{' ...' if ambiguous.size > 10 else ''}. Add a 'building' column to the timetable.")
+        plan = plan[~plan.index.duplicated()]
+
+    own_volume = timetable["volume"].to_numpy(dtype = float) if "volume" in timetable.columns else np.full(len(timetable), np.nan)
+    volume = plan["volume"].reindex(index).to_numpy(dtype = float)
+    volume = np.where(np.isnan(volume), own_volume, volume)
+
+    if "ventilation" in timetable.columns:
+        own_ventilation = timetable["ventilation"].to_numpy(dtype = float)
+    elif "ach" in timetable.columns:
+        own_ventilation = timetable["ach"].to_numpy(dtype = float) * volume
+    else:
+        own_ventilation = np.full(len(timetable), np.nan)
+    ventilation = plan["ventilation"].reindex(index).to_numpy(dtype = float)
+    ventilation = np.where(np.isnan(ventilation), own_ventilation, ventilation)
+
+    missing = names[np.isnan(ventilation)].unique()
+    if missing.size:
+        raise ValueError(f"The following rooms have no ventilation rate in the floor plan or the timetable: {', '.join(missing[:10])}"
+                         f"{' ...' if missing.size > 10 else ''}. Give them a known category, or an 'ach' property.")
+
+    timetable["volume"] = volume
+    timetable["ventilation"] = ventilation
+    return timetable.drop(columns = "ach", errors = "ignore")
+
+def example_floorplan(n_rooms = 2000, seed = 0):
+    """
+    This function generates a random but plausible floor plan, with the same room names as facility.example_timetable, for demonstrations
+    and benchmarks. The rooms are rectangles laid out on a grid, and some are L-shaped. Coordinates are longitudes and latitudes, as in RFC 7946.
+
+    Args:
+        n_rooms (int, optional): The number of rooms. Defaults to 2000.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        dict: The floor plan, as GeoJSON.
+    """
+    rng = np.random.default_rng(seed)
+    width, depth = rng.uniform(4, 15, size = n_rooms), rng.uniform(4, 12, size = n_rooms)
+    height = rng.choice([2.4, 2.7, 3.0, 4.5], size = n_rooms)
+    category = rng.choice(["Classrooms", "Offices (Business)", "Conference Rooms", "Laboratories", "Cafeterias"], size = n_rooms)
+    notch = rng.random(n_rooms) < 0.2 # A corner is cut out of these rooms.
+    columns = int(np.ceil(np.sqrt(n_rooms)))
+    origin = (-1.55, 53.8) # The longitude and latitude of the first room. The rooms are laid out in metres from here.
+
+    features = []
+    for i in range(n_rooms):
+        x0, y0 = (i % columns) * 16.0, (i // columns) * 13.0
+        w, d = width[i], depth[i]
+        if notch[i]:
+            ring = [[x0, y0], [x0 + w, y0], [x0 + w, y0 + d / 2], [x0 + w / 2, y0 + d / 2], [x0 + w / 2, y0 + d], [x0, y0 + d], [x0, y0]]
+        else:
+            ring = [[x0, y0], [x0 + w, y0], [x0 + w, y0 + d], [x0, y0 + d], [x0, y0]]
+        ring = np.asarray(ring)
+        ring = np.column_stack([origin[0] + np.degrees(ring[:, 0] / (EARTH_RADIUS * np.cos(np.radians(origin[1])))),
+                                origin[1] + np.degrees(ring[:, 1] / EARTH_RADIUS)]).tolist()
+        features.append({"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]},
+                         "properties": {"room": f"Room {i}", "height": float(height[i]), "category": str(category[i])}})
+    return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,351 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the assessment history, a local store of every assessment saved from the pages or from batch runs.
+# Assessments are kept in an embedded SQLite database, set with the IARA_HISTORY_DB environment variable (default 'iara_history.db' in the
+# working directory). Each assessment holds its inputs, the risks from the residual risk model (P1, P2, P_comb and P_inf) and the traditional
+# Wells-Riley model, the time it was saved, and the building and room it was for.
+#
+# Writes are buffered and inserted in batches, in one transaction each, so batch runs can save thousands of assessments per second. Each batch
+# also updates two small summary tables, one row per room and one per building per day, so portfolio queries (trends and the riskiest rooms)
+# read the summaries instead of every assessment, and stay fast over millions of rows. The assessments themselves are indexed by room, date and
+# risk, so the history and trend of one room, and the riskiest assessments, are read straight from the index.
+#
+# All inputs are stored in hours, m³ and quanta, whatever the units of the page that saved them, and named as in a facility timetable:
+#   - infectors (I), breathing (p, m³/h), quanta (q, quanta/h after masks), ventilation (Q, m³/h) and volume (v, m³).
+#   - duration (T): the time the infectors are present, i.e. the exposure time of the Wells-Riley model (h), and after (t): the time after they leave (h).
+# The headline 'risk' of an assessment is P_comb, or P1 if the susceptibles left with the infectors, or the traditional risk if neither is known.
+
+# Imports.
+import atexit
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# The database used by the pages.
+DEFAULT_PATH = os.environ.get("IARA_HISTORY_DB", "iara_history.db")
+
+# The number of buffered assessments that triggers a write.
+BATCH_ROWS = 5000
+
+# The columns of an assessment, in the order they are stored. 'id' and 'risk' are filled in by the store.
+COLUMNS = ["created", "model", "building", "room", "infectors", "breathing", "quanta", "ventilation", "volume", "duration", "after",
+           "P1", "P2", "P_comb", "P_inf", "traditional"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assessments (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    model TEXT NOT NULL,
+    building TEXT NOT NULL DEFAULT '',
+    room TEXT NOT NULL DEFAULT '',
+    infectors REAL, breathing REAL, quanta REAL, ventilation REAL, volume REAL, duration REAL, after REAL,
+    P1 REAL, P2 REAL, P_comb REAL, P_inf REAL, traditional REAL,
+    risk REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assessments_room ON assessments (room, building, created);
+CREATE INDEX IF NOT EXISTS assessments_created ON assessments (created);
+CREATE INDEX IF NOT EXISTS assessments_risk ON assessments (risk);
+
+CREATE TABLE IF NOT EXISTS rooms (
+    building TEXT NOT NULL,
+    room TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    sum_risk REAL NOT NULL,
+    max_risk REAL NOT NULL,
+    last_risk REAL NOT NULL,
+    last_created REAL NOT NULL,
+    PRIMARY KEY (building, room)
+);
+CREATE INDEX IF NOT EXISTS rooms_max_risk ON rooms (max_risk);
+
+CREATE TABLE IF NOT EXISTS daily (
+    day TEXT NOT NULL,
+    building TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    sum_risk REAL NOT NULL,
+    max_risk REAL NOT NULL,
+    PRIMARY KEY (day, building)
+);
+"""
+
+#====================================================================================================================================================
+# HELPERS:
+#====================================================================================================================================================
+
+def _timestamp(value):
+    """
+    This function converts a date, datetime, ISO string or Unix timestamp into a Unix timestamp. Dates and naive datetimes are taken as UTC.
+    """
+    if value is None or isinstance(value, (int, float, np.integer, np.floating)):
+        return value
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    if not isinstance(value, datetime.datetime): # A date.
+        value = datetime.datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo = datetime.timezone.utc)
+    return value.timestamp()
+
+def _headline(P1, P_comb, traditional):
+    """
+    This function picks the headline risk of each assessment: P_comb, or P1, or the traditional risk, whichever is known first.
+    """
+    return np.where(np.isfinite(P_comb), P_comb, np.where(np.isfinite(P1), P1, np.nan_to_num(traditional)))
+
+def _where(building = None, room = None, since = None, until = None, day_column = None):
+    """
+    This function builds the WHERE clause and parameters of a query, by room and date. With day_column, dates are compared as 'YYYY-MM-DD' days.
+    """
+    clauses, params = [], []
+    for column, value in (("building", building), ("room", room)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    for op, value in ((">=", since), ("<", until)):
+        if value is not None:
+            if day_column:
+                clauses.append(f"{day_column} {op} ?")
+                params.append(datetime.datetime.fromtimestamp(_timestamp(value), datetime.timezone.utc).date().isoformat())
+            else:
+                clauses.append(f"created {op} ?")
+                params.append(_timestamp(value))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+#====================================================================================================================================================
+# STORE:
+#====================================================================================================================================================
+
+class HistoryStore:
+    """
+    This class is a thread-safe store of assessments in an SQLite database, with buffered, batched writes.
+    Queries write any buffered assessments first, so they always see everything saved.
+
+    Args:
+        path (str): The database file. Use ":memory:" for a store that is not saved.
+        batch_rows (int, optional): The number of buffered assessments that triggers a write. Defaults to BATCH_ROWS.
+    """
+
+    def __init__(self, path, batch_rows = BATCH_ROWS):
+        self.path = path
+        self.batch_rows = int(batch_rows)
+        self._buffer = {col: [] for col in COLUMNS}
+        self._buffered = 0
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread = False) # Shared by every session, behind the lock.
+        # Write-ahead logging lets readers carry on while a batch is written, and only syncs at checkpoints.
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def add(self, model, building = "", room = "", created = None, **values):
+        """
+        This function saves one assessment. It is written with the next batch.
+
+        Args:
+            model (str): The model or page the assessment came from, e.g. "wells_riley" or "residual".
+            building (str, optional): The building. Defaults to "".
+            room (str, optional): The room. Defaults to "".
+            created (float or datetime, optional): When the assessment was made. Defaults to None (now).
+            **values: Any of the inputs and risks in COLUMNS, in hours (see above). Risks and inputs left out are stored as NULL.
+        """
+        self.add_many(dict({key: [value] for key, value in values.items()}, model = [model], building = [building], room = [room],
+                           created = [created if created is not None else time.time()]))
+
+    def add_many(self, assessments):
+        """
+        This function saves many assessments at once, e.g. from a batch run. They are written in batches of 'batch_rows'.
+
+        Args:
+            assessments (dict or Pandas DataFrame): One column per field in COLUMNS, of equal length. Scalars are repeated for every assessment,
+                and fields left out are stored as NULL ('created' defaults to now, 'building' and 'room' to "").
+        """
+        columns = dict(assessments) if not isinstance(assessments, pd.DataFrame) else {col: assessments[col].to_numpy() for col in assessments}
+        unknown = sorted(set(columns) - set(COLUMNS))
+        if unknown:
+            raise ValueError(f"Unknown assessment fields: {', '.join(unknown)}. Use any of: {', '.join(COLUMNS)}")
+        n = max((np.size(v) for v in columns.values() if np.ndim(v) > 0), default = 1)
+        defaults = {"created": time.time(), "building": "", "room": "", "model": ""}
+
+        with self._lock:
+            for col in COLUMNS:
+                value = columns.get(col, defaults.get(col))
+                self._buffer[col].extend(np.broadcast_to(np.asarray(value, dtype = object), (n,)).tolist())
+            self._buffered += n
+            if self._buffered >= self.batch_rows:
+                self.flush()
+
+    def flush(self):
+        """
+        This function writes every buffered assessment, and updates the room and daily summaries, in one transaction.
+        """
+        with self._lock:
+            if not self._buffered:
+                return
+            batch = pd.DataFrame(self._buffer)
+            self._buffer = {col: [] for col in COLUMNS}
+            self._buffered = 0
+
+            risks = batch[["P1", "P2", "P_comb", "P_inf", "traditional"]].astype(float)
+            batch["risk"] = _headline(risks["P1"].to_numpy(), risks["P_comb"].to_numpy(), risks["traditional"].to_numpy())
+            batch["created"] = batch["created"].map(_timestamp).astype(float)
+            batch["day"] = pd.to_datetime(batch["created"], unit = "s", utc = True).dt.strftime("%Y-%m-%d")
+
+            # The summaries are updated from the batch's own totals, so a batch costs one upsert per room (and building per day), not one per assessment.
+            batch = batch.sort_values("created", kind = "stable")
+            rooms = batch.groupby(["building", "room"], sort = False).agg(n = ("risk", "size"), sum_risk = ("risk", "sum"), max_risk = ("risk", "max"),
+                                                                          last_risk = ("risk", "last"), last_created = ("created", "last")).reset_index()
+            daily = batch.groupby(["day", "building"], sort = False).agg(n = ("risk", "size"), sum_risk = ("risk", "sum"), max_risk = ("risk", "max")).reset_index()
+
+            rows = batch[COLUMNS + ["risk"]].astype(object).where(batch[COLUMNS + ["risk"]].notna(), None).itertuples(index = False, name = None)
+            with self._db:
+                self._db.executemany(f"INSERT INTO assessments ({', '.join(COLUMNS)}, risk) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})", rows)
+                self._db.executemany("""
+                    INSERT INTO rooms (building, room, n, sum_risk, max_risk, last_risk, last_created) VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (building, room) DO UPDATE SET
+                        n = n + excluded.n, sum_risk = sum_risk + excluded.sum_risk, max_risk = MAX(max_risk, excluded.max_risk),
+                        last_risk = CASE WHEN excluded.last_created >= last_created THEN excluded.last_risk ELSE last_risk END,
+                        last_created = MAX(last_created, excluded.last_created)
+                """, rooms.itertuples(index = False, name = None))
+                self._db.executemany("""
+                    INSERT INTO daily (day, building, n, sum_risk, max_risk) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (day, building) DO UPDATE SET
+                        n = n + excluded.n, sum_risk = sum_risk + excluded.sum_risk, max_risk = MAX(max_risk, excluded.max_risk)
+                """, daily.itertuples(index = False, name = None))
+
+    def _query(self, sql, params = ()):
+        """
+        This function writes any buffered assessments, then runs a query and returns its rows as a DataFrame.
+        """
+        with self._lock:
+            self.flush()
+            cursor = self._db.execute(sql, params)
+            return pd.DataFrame(cursor.fetchall(), columns = [d[0] for d in cursor.description])
+
+    def close(self):
+        """
+        This function writes any buffered assessments and closes the database.
+        """
+        with self._lock:
+            self.flush()
+            self._db.close()
+
+    def assessments(self, building = None, room = None, since = None, until = None, limit = 1000):
+        """
+        This function lists the most recent assessments, optionally for one building or room and a range of dates.
+
+        Args:
+            building (str, optional): Only this building. Defaults to None (every building).
+            room (str, optional): Only this room. Defaults to None (every room).
+            since, until (datetime, date, str or float, optional): Only assessments from 'since' and before 'until'. Defaults to None.
+            limit (int, optional): The most assessments returned. Defaults to 1000.
+
+        Returns:
+            Pandas DataFrame: The assessments, most recent first, with 'created' as a UTC datetime.
+        """
+        where, params = _where(building, room, since, until)
+        table = self._query(f"SELECT * FROM assessments{where} ORDER BY created DESC LIMIT ?", params + [int(limit)])
+        table["created"] = pd.to_datetime(table["created"], unit = "s", utc = True)
+        return table
+
+    def top_assessments(self, k = 10, since = None):
+        """
+        This function lists the k riskiest assessments, optionally since a date.
+
+        Args:
+            k (int, optional): The number of assessments. Defaults to 10.
+            since (datetime, date, str or float, optional): Only assessments from this date. Defaults to None.
+
+        Returns:
+            Pandas DataFrame: The assessments, riskiest first.
+        """
+        where, params = _where(since = since)
+        table = self._query(f"SELECT * FROM assessments{where} ORDER BY risk DESC LIMIT ?", params + [int(k)])
+        table["created"] = pd.to_datetime(table["created"], unit = "s", utc = True)
+        return table
+
+    def trend(self, building = None, room = None, since = None, until = None):
+        """
+        This function summarises the risk of each day, for the whole portfolio or for one building or room.
+
+        Args:
+            building, room, since, until: The filters, see assessments.
+
+        Returns:
+            Pandas DataFrame: 'day', 'assessments', 'mean_risk' and 'max_risk', one row per day with assessments, oldest first.
+        """
+        if room is None: # The whole portfolio or one building, from the daily summary.
+            where, params = _where(building, since = since, until = until, day_column = "day")
+            table = self._query(f"""SELECT day, SUM(n) AS assessments, SUM(sum_risk) / SUM(n) AS mean_risk, MAX(max_risk) AS max_risk
+                                    FROM daily{where} GROUP BY day ORDER BY day""", params)
+        else: # One room, from its assessments through the room index.
+            where, params = _where(building, room, since, until)
+            table = self._query(f"""SELECT date(created, 'unixepoch') AS day, COUNT(*) AS assessments, AVG(risk) AS mean_risk, MAX(risk) AS max_risk
+                                    FROM assessments{where} GROUP BY day ORDER BY day""", params)
+        table["day"] = pd.to_datetime(table["day"])
+        return table
+
+    def top_rooms(self, k = 10, by = "max", building = None):
+        """
+        This function lists the k riskiest rooms.
+
+        Args:
+            k (int, optional): The number of rooms. Defaults to 10.
+            by (str, optional): Rank the rooms by their "max" (highest), "mean" or "latest" risk. Defaults to "max".
+            building (str, optional): Only rooms in this building. Defaults to None (every building).
+
+        Returns:
+            Pandas DataFrame: 'building', 'room', 'assessments', 'mean_risk', 'max_risk', 'latest_risk' and 'last_assessed', riskiest first.
+
+        Raises:
+            ValueError: If 'by' is unknown.
+        """
+        order = {"max": "max_risk", "mean": "sum_risk / n", "latest": "last_risk"}
+        if by not in order:
+            raise ValueError(f"Unknown ranking '{by}'. Use any of: {', '.join(order)}")
+        where, params = _where(building)
+        table = self._query(f"""SELECT building, room, n AS assessments, sum_risk / n AS mean_risk, max_risk, last_risk AS latest_risk,
+                                last_created AS last_assessed FROM rooms{where} ORDER BY {order[by]} DESC LIMIT ?""", params + [int(k)])
+        table["last_assessed"] = pd.to_datetime(table["last_assessed"], unit = "s", utc = True)
+        return table
+
+    def summary(self):
+        """
+        This function counts the assessments, buildings and rooms in the store.
+
+        Returns:
+            dict: 'assessments', 'buildings', 'rooms', and the 'first' and 'last' assessment times (UTC datetimes, or None if empty).
+        """
+        row = self._query("""SELECT SUM(n) AS assessments, COUNT(DISTINCT building) AS buildings, COUNT(*) AS rooms,
+                             (SELECT MIN(created) FROM assessments) AS first, MAX(last_created) AS last FROM rooms""").iloc[0]
+        to_time = lambda x: pd.to_datetime(x, unit = "s", utc = True) if pd.notna(x) else None
+        return {"assessments": int(row["assessments"] or 0), "buildings": int(row["buildings"]), "rooms": int(row["rooms"]),
+                "first": to_time(row["first"]), "last": to_time(row["last"])}
+
+#====================================================================================================================================================
+# SHARED STORE:
+#====================================================================================================================================================
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared():
+    """
+    This function returns the store shared by every session of the server process, opening it on first use.
+    Buffered assessments are written when the process exits.
+
+    Returns:
+        HistoryStore: The store at DEFAULT_PATH.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HistoryStore(DEFAULT_PATH)
+            atexit.register(_shared.flush)
+    return _shared
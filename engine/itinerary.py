@@ -0,0 +1,278 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the agent-based itinerary simulation, which adds up each person's dose across every room they visit in a day.
+# Each person has an itinerary of visits (room, arrival, departure). Infectors emit quanta into each room they visit, and every room is well-mixed,
+# with the same concentration equation as the Residual Risk page, v dC/dt = E(t) - Q C, starting empty.
+#
+# In a room, the emission rate E only changes when an infector arrives or leaves. Between two such breakpoints, tₖ and tₖ₊₁, the concentration
+# relaxes exponentially towards E / Q, so the concentration Cₖ and the cumulative concentration Gₖ = ∫₀^tₖ C at every breakpoint follow exactly from
+# the previous breakpoint. The dose of a visit from a to b is then G(b) - G(a), with G at any time found from the last breakpoint before it.
+#
+# A person's inhaled dose is the product of a sparse (person × visit) matrix with the inhaled dose of every visit. Every visit is one non-zero,
+# so the product is one np.bincount over the visits, without any dense person × room array.
+# All times are in hours, breathing rates in m³/h, quanta emission rates in quanta/h, ventilation rates in m³/h and volumes in m³.
+
+# Imports.
+import numpy as np
+import pandas as pd
+
+from engine.facility import DEFAULT_BREATHING_RATE
+
+# Columns that every rooms table must contain. Ventilation is given either as 'ventilation' (m³/h), or as 'ach'.
+ROOM_COLUMNS = ["room", "volume"]
+
+# Columns that every itinerary must contain. 'quanta' is the quanta emission rate of infectors, and 0 for everyone else.
+VISIT_COLUMNS = ["person", "room", "arrival", "departure", "quanta"]
+
+#====================================================================================================================================================
+# INPUTS:
+#====================================================================================================================================================
+
+def visit_arrays(rooms, visits):
+    """
+    This function checks a rooms table and an itinerary, and converts them into the NumPy arrays used by the simulation.
+
+    Args:
+        rooms (Pandas DataFrame or dict): One row per room with the columns in ROOM_COLUMNS, and ventilation as 'ventilation' or 'ach'.
+        visits (Pandas DataFrame or dict): One row per visit with the columns in VISIT_COLUMNS, and optionally 'breathing' (m³/h).
+
+    Returns:
+        dict: NumPy arrays for 'room_labels', 'volume' and 'ventilation' (one per room), and for 'person' (the position of the visit's person in
+            'person_labels'), 'person_labels', 'room' (the position of the visit's room), 'arrival', 'departure', 'quanta' and 'breathing' (one per visit).
+
+    Raises:
+        ValueError: If a required column is missing, a visit is in an unknown room, or a visit departs before it arrives.
+    """
+    rooms, visits = pd.DataFrame(rooms), pd.DataFrame(visits)
+
+    missing = [f"rooms: {col}" for col in ROOM_COLUMNS if col not in rooms.columns]
+    if "ventilation" not in rooms.columns and "ach" not in rooms.columns:
+        missing.append("rooms: ventilation (or ach)")
+    missing += [f"itinerary: {col}" for col in VISIT_COLUMNS if col not in visits.columns]
+    if missing:
+        raise ValueError(f"The following columns are missing: {', '.join(missing)}")
+
+    volume = rooms["volume"].to_numpy(dtype = float)
+    if "ventilation" in rooms.columns:
+        ventilation = rooms["ventilation"].to_numpy(dtype = float)
+    else:
+        ventilation = rooms["ach"].to_numpy(dtype = float) * volume # Convert ACH into m³/h.
+
+    room = pd.Index(rooms["room"]).get_indexer(visits["room"])
+    if (room < 0).any():
+        unknown = pd.unique(visits["room"][room < 0])
+        raise ValueError(f"The itinerary visits rooms that are not in the rooms table: {', '.join(map(str, unknown[:10]))}")
+
+    arrival = visits["arrival"].to_numpy(dtype = float)
+    departure = visits["departure"].to_numpy(dtype = float)
+    if (departure < arrival).any():
+        raise ValueError("Every visit must depart after it arrives.")
+
+    person, person_labels = pd.factorize(visits["person"])
+    if "breathing" in visits.columns:
+        breathing = visits["breathing"].to_numpy(dtype = float)
+    else:
+        breathing = np.full(len(visits), DEFAULT_BREATHING_RATE)
+
+    return {
+        "room_labels": rooms["room"].to_numpy(),
+        "volume": volume,
+        "ventilation": ventilation,
+        "person": person,
+        "person_labels": np.asarray(person_labels),
+        "room": room,
+        "arrival": arrival,
+        "departure": departure,
+        "quanta": visits["quanta"].to_numpy(dtype = float),
+        "breathing": breathing,
+    }
+
+def example_itinerary(n_agents = 100_000, n_rooms = 60, visits_per_agent = 6, prevalence = 0.01, seed = 0):
+    """
+    This function generates a random but plausible day of itineraries, for demonstrations and benchmarks.
+    Every person makes back-to-back visits to random rooms from 08:00, and a fraction of them are infectors.
+
+    Args:
+        n_agents (int, optional): The number of people. Defaults to 100,000.
+        n_rooms (int, optional): The number of rooms. Defaults to 60.
+        visits_per_agent (int, optional): The number of visits each person makes. Defaults to 6.
+        prevalence (float, optional): The fraction of people who are infectors. Defaults to 0.01.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        Pandas DataFrame: The rooms.
+        Pandas DataFrame: The itinerary.
+    """
+    rng = np.random.default_rng(seed)
+    rooms = pd.DataFrame({
+        "room": np.char.add("Room ", np.arange(n_rooms).astype(str)),
+        "volume": rng.uniform(200, 5000, size = n_rooms), # From classrooms to halls, as every room is shared by many people.
+        "ach": rng.choice([2, 3, 4, 6, 8], size = n_rooms),
+    })
+
+    n = n_agents * visits_per_agent
+    length = rng.choice([0.5, 0.75, 1.0, 1.5], size = n)
+    # Visits run back-to-back from 08:00, with a short walk of up to 15 minutes between rooms.
+    gap = rng.uniform(0, 0.25, size = n)
+    departure = 8 + np.cumsum((length + gap).reshape(n_agents, visits_per_agent), axis = 1).ravel()
+    infector = rng.random(n_agents) < prevalence
+    quanta = np.where(infector, rng.choice([0.55, 2.7, 46], size = n_agents, p = [0.6, 0.35, 0.05]), 0.0)
+
+    visits = pd.DataFrame({
+        "person": np.repeat(np.arange(n_agents), visits_per_agent),
+        "room": rooms["room"].to_numpy()[rng.integers(n_rooms, size = n)],
+        "arrival": departure - length,
+        "departure": departure,
+        "quanta": np.repeat(quanta, visits_per_agent),
+    })
+    return rooms, visits
+
+#====================================================================================================================================================
+# ROOM CONCENTRATIONS:
+#====================================================================================================================================================
+
+def breakpoints(v):
+    """
+    This function finds the concentration and cumulative concentration of every room at every time an infector arrives or leaves.
+
+    Args:
+        v (dict): The visit arrays, see visit_arrays.
+
+    Returns:
+        dict: NumPy arrays, sorted by room and then time, of 'room', 'time', 'emission' (the total emission rate from this breakpoint until the
+            next one in the same room), 'lam' (the room's air exchange rate), 'steady' (the concentration the room relaxes towards until the
+            next breakpoint), 'C' (the concentration at the breakpoint) and 'G' (the cumulative concentration at the breakpoint).
+    """
+    infector = v["quanta"] > 0
+    room = np.repeat(v["room"][infector], 2)
+    time = np.column_stack([v["arrival"][infector], v["departure"][infector]]).ravel()
+    change = np.column_stack([v["quanta"][infector], -v["quanta"][infector]]).ravel()
+
+    # Sort by room, then time. At equal times, departures come first so the emission rate never overshoots.
+    order = np.lexsort((change, time, room))
+    room, time, change = room[order], time[order], change[order]
+
+    # The emission rate after each breakpoint is the running total of the arrivals and departures in that room.
+    first = np.r_[True, room[1:] != room[:-1]]
+    start = np.flatnonzero(first)
+    emission = np.cumsum(change)
+    emission -= np.repeat(emission[start] - change[start], np.diff(np.r_[start, room.size]))
+    emission = np.maximum(emission, 0) # Rounding can leave a tiny negative rate once every infector has left.
+
+    Q, vol = v["ventilation"][room], v["volume"][room]
+    lam = np.divide(Q, vol, out = np.zeros_like(Q), where = vol > 0)
+    steady = np.divide(emission, Q, out = np.zeros_like(emission), where = Q > 0) # The concentration the room relaxes towards.
+
+    # The breakpoints of each room are stepped through together: step k updates the k-th breakpoint of every room at once.
+    rank = np.arange(room.size) - np.repeat(start, np.diff(np.r_[start, room.size]))
+    by_rank = np.split(np.argsort(rank, kind = "stable"), np.cumsum(np.bincount(rank))[:-1]) if room.size else []
+    C, G = np.zeros(room.size), np.zeros(room.size)
+    for i in by_rank[1:]: # The first breakpoint of every room starts empty.
+        C[i], G[i] = _advance(C[i - 1], G[i - 1], steady[i - 1], lam[i - 1], time[i] - time[i - 1])
+
+    return {"room": room, "time": time, "emission": emission, "lam": lam, "steady": steady, "C": C, "G": G}
+
+def _advance(C, G, steady, lam, tau):
+    """
+    This function advances the concentration and cumulative concentration of a well-mixed room by a time tau, with a constant emission rate.
+
+    Args:
+        C (NumPy array): The concentration at the start.
+        G (NumPy array): The cumulative concentration at the start.
+        steady (NumPy array): The concentration the room relaxes towards (E / Q).
+        lam (NumPy array): The air exchange rate (Q / v).
+        tau (NumPy array): The time to advance by.
+
+    Returns:
+        NumPy array: The concentration after tau.
+        NumPy array: The cumulative concentration after tau.
+    """
+    relaxed = -np.expm1(-lam * tau) # The fraction of the way towards the steady concentration.
+    spread = np.divide(relaxed, lam, out = np.zeros_like(relaxed), where = lam > 0)
+    return C + (steady - C) * relaxed, G + steady * tau + (C - steady) * spread
+
+def cumulative_concentration(bp, room, time):
+    """
+    This function finds the cumulative concentration (∫₀ᵗ C) of the given rooms at the given times.
+
+    Args:
+        bp (dict): The breakpoints, see breakpoints.
+        room (NumPy array): The room of each query.
+        time (NumPy array): The time of each query.
+
+    Returns:
+        NumPy array: The cumulative concentration of each query (quanta h/m³).
+    """
+    if bp["room"].size == 0:
+        return np.zeros(time.shape)
+
+    # Rooms and times are combined into one sortable key, so one search finds the last breakpoint before every query.
+    offset = np.nanmax(np.abs(np.r_[bp["time"], time])) * 2 + 1
+    k = np.searchsorted(bp["room"] * offset + bp["time"], room * offset + time, side = "right") - 1
+    valid = (k >= 0) & (bp["room"][np.maximum(k, 0)] == room) # Queries before the first breakpoint of their room see an empty room.
+    k = np.maximum(k, 0)
+
+    G = _advance(bp["C"][k], bp["G"][k], bp["steady"][k], bp["lam"][k], time - bp["time"][k])[1]
+    return np.where(valid, G, 0.0)
+
+#====================================================================================================================================================
+# SIMULATION:
+#====================================================================================================================================================
+
+def simulate(rooms, visits):
+    """
+    This function calculates the dose and risk of every person from their whole itinerary, and the expected infections caught in each room.
+    Infectors are not at risk. Rooms with no ventilation or no volume carry no risk, as on the pages.
+
+    Args:
+        rooms (Pandas DataFrame or dict): The rooms, see visit_arrays.
+        visits (Pandas DataFrame or dict): The itinerary, see visit_arrays.
+
+    Returns:
+        dict: 'people', a dictionary of NumPy arrays with one entry per person ('person', 'infector', 'visits', 'hours', 'dose' (quanta inhaled)
+            and 'risk'), 'rooms', a dictionary of NumPy arrays with one entry per room ('room', 'visits', 'dose' and 'expected_infections'),
+            and 'summary', a dictionary of totals.
+    """
+    v = visit_arrays(rooms, visits)
+    bp = breakpoints(v)
+    no_risk = (v["ventilation"] == 0) | (v["volume"] == 0)
+
+    # The inhaled dose of each visit.
+    visit_dose = v["breathing"] * (cumulative_concentration(bp, v["room"], v["departure"]) - cumulative_concentration(bp, v["room"], v["arrival"]))
+    visit_dose = np.where(no_risk[v["room"]], 0.0, np.maximum(visit_dose, 0))
+
+    # The sparse (person × visit) product, as one weighted count per person.
+    n_people, n_rooms = v["person_labels"].size, v["room_labels"].size
+    infector = np.bincount(v["person"], weights = v["quanta"] > 0, minlength = n_people) > 0
+    dose = np.where(infector, 0.0, np.bincount(v["person"], weights = visit_dose, minlength = n_people))
+    risk = -np.expm1(-dose)
+
+    # Each person's risk is split across the rooms they visited in proportion to the dose inhaled there.
+    share = np.divide(risk, dose, out = np.zeros_like(risk), where = dose > 0)[v["person"]] * visit_dose
+    room_dose = np.bincount(v["room"], weights = np.where(infector[v["person"]], 0.0, visit_dose), minlength = n_rooms)
+
+    return {
+        "people": {
+            "person": v["person_labels"],
+            "infector": infector,
+            "visits": np.bincount(v["person"], minlength = n_people),
+            "hours": np.bincount(v["person"], weights = v["departure"] - v["arrival"], minlength = n_people),
+            "dose": dose,
+            "risk": risk,
+        },
+        "rooms": {
+            "room": v["room_labels"],
+            "visits": np.bincount(v["room"], minlength = n_rooms),
+            "dose": room_dose,
+            "expected_infections": np.bincount(v["room"], weights = share, minlength = n_rooms),
+        },
+        "summary": {
+            "people": int(n_people),
+            "infectors": int(infector.sum()),
+            "visits": int(v["person"].size),
+            "expected_infections": float(risk.sum()),
+            "mean_risk": float(risk[~infector].mean()) if (~infector).any() else 0.0,
+        },
+    }
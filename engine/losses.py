@@ -0,0 +1,64 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the additional first-order loss terms: air cleaners, recirculation filters, surface deposition and biological decay.
+# Each of these removes quanta at a rate proportional to the concentration, exactly like ventilation does, so they can be added to the ventilation
+# rate as an 'equivalent ventilation rate'. The existing closed-form equations then still apply, with Q replaced by this equivalent rate.
+# All rates are per hour: flows in m³/h, deposition and decay in 1/h.
+
+# Imports.
+import numpy as np
+
+#====================================================================================================================================================
+# EQUIVALENT VENTILATION RATE:
+#====================================================================================================================================================
+
+def equivalent_ventilation(Q, v = None, cadr = 0.0, recirculation = 0.0, filter_eff = 0.0, deposition = 0.0, decay = 0.0):
+    """
+    This function calculates the equivalent ventilation rate of every removal mechanism combined.
+    All arguments can be NumPy arrays, so sweeps (for example over CADR) are evaluated in one call.
+
+    Args:
+        Q (float or NumPy array): The outdoor-air ventilation rate (m³/h).
+        v (float or NumPy array, optional): The Room Volume (m³). Only needed for deposition and decay. Defaults to None.
+        cadr (float or NumPy array, optional): The total Clean Air Delivery Rate of portable air cleaners (m³/h). Defaults to 0.
+        recirculation (float or NumPy array, optional): The recirculated airflow through the ventilation filter (m³/h). Defaults to 0.
+        filter_eff (float or NumPy array, optional): The single-pass efficiency of the recirculation filter (0 to 1). Defaults to 0.
+        deposition (float or NumPy array, optional): The surface deposition rate (1/h). Defaults to 0.
+        decay (float or NumPy array, optional): The biological decay rate (1/h). Defaults to 0.
+
+    Returns:
+        NumPy array: The equivalent ventilation rate (m³/h).
+
+    Raises:
+        ValueError: If deposition or decay is used without a room volume.
+    """
+    Q_eq = np.asarray(Q, dtype = float) + cadr + np.multiply(recirculation, filter_eff)
+
+    if np.any(np.asarray(deposition) != 0) or np.any(np.asarray(decay) != 0):
+        if v is None:
+            raise ValueError("The room volume is needed to include deposition or decay.")
+        Q_eq = Q_eq + np.add(deposition, decay) * np.asarray(v, dtype = float)
+
+    return Q_eq
+
+def removal_breakdown(Q, v = None, cadr = 0.0, recirculation = 0.0, filter_eff = 0.0, deposition = 0.0, decay = 0.0):
+    """
+    This function splits the equivalent ventilation rate into its removal mechanisms, for display.
+
+    Args:
+        See equivalent_ventilation.
+
+    Returns:
+        dict: The equivalent ventilation rate (m³/h) of each removal mechanism.
+    """
+    breakdown = {
+        "Ventilation": float(Q),
+        "Air cleaners": float(cadr),
+        "Recirculation filter": float(recirculation * filter_eff)
+    }
+    if v is not None:
+        breakdown["Deposition"] = float(deposition * v)
+        breakdown["Biological decay"] = float(decay * v)
+    return breakdown
@@ -0,0 +1,292 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the production metrics of our web-app, exposed in the Prometheus text format.
+# Metrics are off unless the IARA_METRICS_PORT environment variable is set, e.g. 'IARA_METRICS_PORT=9464 streamlit run IARA.py'. The metrics are
+# then served at http://127.0.0.1:9464/metrics (set IARA_METRICS_HOST to listen on another address). When they are off, every hook returns
+# after checking one module-level flag, so the pages and models run as fast as without them.
+#
+# The metrics recorded are:
+#   - iara_rerun_seconds: the duration of every rerun of a page script, by page.
+#   - iara_model_seconds: the duration of every risk kernel call, by model and backend (see engine/backend.py).
+#   - iara_cached_call_seconds and iara_cache_requests_total: the duration of each cached calculation when it is computed, and the hits and
+#     misses of each cached calculation (see engine/cache.py).
+#   - iara_cache_*: the size and counters of the shared result cache, and iara_active_sessions: the browser sessions connected to the server.
+
+# Imports.
+import contextlib
+import http.server
+import os
+import threading
+import time
+import warnings
+
+# The Streamlit version the active session count was tested with (pinned in requirements.txt). The count reads Streamlit's private session
+# manager, see _gauges, which tests/test_metrics.py checks against the installed Streamlit.
+TESTED_STREAMLIT = "1.46.1"
+
+# Whether metrics are recorded, and where they are served.
+PORT = int(os.environ.get("IARA_METRICS_PORT") or 0)
+HOST = os.environ.get("IARA_METRICS_HOST", "127.0.0.1")
+ENABLED = PORT > 0
+
+# The upper bounds (seconds) of the histogram buckets, from a fast model call to a slow rerun.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# The description of each recorded metric, and its Prometheus type.
+DESCRIPTIONS = {
+    "iara_rerun_seconds": ("histogram", "Duration of a page script rerun."),
+    "iara_model_seconds": ("histogram", "Duration of a risk kernel call."),
+    "iara_cached_call_seconds": ("histogram", "Duration of a cached calculation when it is not served from the cache."),
+    "iara_cache_requests_total": ("counter", "Lookups of a cached calculation in the shared result cache."),
+}
+
+#====================================================================================================================================================
+# REGISTRY:
+#====================================================================================================================================================
+
+class Registry:
+    """
+    This class is a thread-safe store of counters and histograms, keyed by metric name and labels.
+
+    Args:
+        buckets (tuple of float, optional): The upper bounds of the histogram buckets. Defaults to BUCKETS.
+    """
+
+    def __init__(self, buckets = BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {} # (name, labels) -> value
+        self._histograms = {} # (name, labels) -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def inc(self, name, value = 1, **labels):
+        """
+        This function adds to a counter.
+
+        Args:
+            name (str): The metric name.
+            value (float, optional): The amount to add. Defaults to 1.
+            **labels: The labels of the series.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """
+        This function records a duration in a histogram.
+
+        Args:
+            name (str): The metric name.
+            seconds (float): The duration.
+            **labels: The labels of the series.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self, gauges = ()):
+        """
+        This function writes every metric in the Prometheus text format.
+
+        Args:
+            gauges (list of tuple, optional): Extra (name, type, description, value) series, e.g. values read when scraped. Defaults to ().
+
+        Returns:
+            str: The metrics.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: [list(s[0]), s[1], s[2]] for key, s in self._histograms.items()}
+
+        lines = []
+        for name in sorted({key[0] for key in counters} | {key[0] for key in histograms}):
+            kind, description = DESCRIPTIONS.get(name, ("counter" if any(k[0] == name for k in counters) else "histogram", name))
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            for (series, labels), value in sorted(counters.items()):
+                if series == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            for (series, labels), (counts, total, count) in sorted(histograms.items()):
+                if series != name:
+                    continue
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        for name, kind, description, value in gauges:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+def _number(value):
+    """
+    This function formats a value exactly, as an integer where it is whole.
+    """
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def _labels(labels):
+    """
+    This function formats the labels of a series, escaping the characters the text format reserves.
+    """
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+# The registry shared by every session of the server process.
+registry = Registry()
+
+#====================================================================================================================================================
+# HOOKS:
+#====================================================================================================================================================
+
+def inc(name, value = 1, **labels):
+    """
+    This function adds to a counter of the shared registry, if metrics are enabled. See Registry.inc.
+    """
+    if ENABLED:
+        registry.inc(name, value, **labels)
+
+def observe(name, seconds, **labels):
+    """
+    This function records a duration in a histogram of the shared registry, if metrics are enabled. See Registry.observe.
+    """
+    if ENABLED:
+        registry.observe(name, seconds, **labels)
+
+@contextlib.contextmanager
+def _timer(name, labels):
+    """
+    This function times a block of code into a histogram of the shared registry.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - start, **labels)
+
+def timed(name, **labels):
+    """
+    This function times a block of code into a histogram of the shared registry, if metrics are enabled.
+    The block is timed even if it raises, e.g. when a page calls st.stop or st.rerun.
+
+    Args:
+        name (str): The metric name.
+        **labels: The labels of the series.
+
+    Returns:
+        context manager: The timer, or a context manager that does nothing if metrics are disabled.
+    """
+    return _timer(name, labels) if ENABLED else contextlib.nullcontext()
+
+#====================================================================================================================================================
+# ENDPOINT:
+#====================================================================================================================================================
+
+# Whether the missing session count has already been warned about.
+_sessions_warned = False
+
+def _gauges():
+    """
+    This function reads the values that are only known when the metrics are scraped: the shared cache and the number of sessions.
+    """
+    global _sessions_warned
+    from engine import cache # Imported here, as the cache records its own metrics through this module.
+
+    stats = cache.shared.stats()
+    gauges = [
+        ("iara_cache_entries", "gauge", "Results stored in the shared result cache.", stats["entries"]),
+        ("iara_cache_bytes", "gauge", "Memory used by the shared result cache.", stats["bytes"]),
+        ("iara_cache_max_bytes", "gauge", "Size limit of the shared result cache.", stats["max_bytes"]),
+        ("iara_cache_hits_total", "counter", "Lookups served from the shared result cache.", stats["hits"]),
+        ("iara_cache_misses_total", "counter", "Lookups not found in the shared result cache.", stats["misses"]),
+        ("iara_cache_hit_ratio", "gauge", "Fraction of lookups served from the shared result cache.", stats["hit_rate"]),
+        ("iara_cache_evictions_total", "counter", "Results evicted from the shared result cache to stay under its size limit.", stats["evictions"]),
+        ("iara_cache_expirations_total", "counter", "Results removed from the shared result cache after their time-to-live.", stats["expirations"]),
+    ]
+
+    # The number of sessions is only known when running under the Streamlit server. Streamlit has no public API for it, so it is read from the
+    # private Runtime._session_mgr (tested with Streamlit TESTED_STREAMLIT). If a later version moves it, the gauge is left out, with one warning,
+    # rather than breaking the endpoint.
+    try:
+        from streamlit import runtime
+        if runtime.exists():
+            gauges.append(("iara_active_sessions", "gauge", "Browser sessions connected to the server.",
+                           runtime.get_instance()._session_mgr.num_active_sessions()))
+    except (ImportError, AttributeError) as err:
+        if not _sessions_warned:
+            _sessions_warned = True
+            warnings.warn(f"iara_active_sessions is not reported, as Streamlit's session manager could not be read ({err}). It was tested with "
+                          f"Streamlit {TESTED_STREAMLIT}.", RuntimeWarning)
+    return gauges
+
+def render():
+    """
+    This function returns every metric of the server process in the Prometheus text format.
+
+    Returns:
+        str: The metrics.
+    """
+    return registry.render(_gauges())
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """
+    This class answers requests to the metrics endpoint.
+    """
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass # Scrapes are not logged to the console.
+
+_server = None
+_server_lock = threading.Lock()
+
+def start(port = None, host = None):
+    """
+    This function starts serving the metrics endpoint in a background thread, once per server process.
+    It does nothing if metrics are disabled, or the endpoint is already running.
+
+    Args:
+        port (int, optional): The port. Defaults to None (PORT).
+        host (str, optional): The address to listen on. Defaults to None (HOST).
+
+    Returns:
+        bool: Whether the endpoint is running.
+    """
+    global _server
+    if not ENABLED or _server is not None:
+        return bool(_server)
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = http.server.ThreadingHTTPServer((host or HOST, port or PORT), _Handler)
+            except OSError as err: # E.g. the port is taken by another server process. The metrics are still recorded.
+                warnings.warn(f"IARA metrics endpoint not started: {err}", RuntimeWarning)
+                _server = False
+                return False
+            _server.daemon_threads = True
+            threading.Thread(target = _server.serve_forever, name = "iara-metrics", daemon = True).start()
+    return bool(_server)
@@ -0,0 +1,161 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for mixtures of occupants and infectors, used instead of a single "majority" age-group and activity.
+# Susceptibles are described as groups of an age-group and activity, each with its own breathing rate, and infectors as groups of an activity and
+# mask, each with its own quanta emission rate. The room's concentration only depends on the total emission, so every susceptible group is assessed
+# in one vectorised call with an array of breathing rates, and the time taken does not grow with the number of groups.
+#
+# Each susceptible group's hazard, -ln(1 - P), is the sum of the hazards from each infector group, in proportion to their share of the emission.
+# The expected infections of each susceptible group are split across the infector groups in the same proportion, which shows which subgroup drives them.
+# Rates are in the units of the page that uses them. Breathing rates are looked up in m³/h and quanta emission rates in quanta/h.
+
+# Imports.
+import numpy as np
+import pandas as pd
+
+from engine import presets
+
+# Columns of a table of susceptible groups: the age-group and activity (keys of presets.breathing_dict), and the number of people.
+SUSCEPTIBLE_COLUMNS = ["Age group", "Activity", "People"]
+
+# Columns of a table of infector groups: the activity (a key of presets.quanta_em_dict) and mask (a key of presets.msk_eff_dict), and the number of infectors.
+INFECTOR_COLUMNS = ["Activity", "Mask", "Infectors"]
+
+#====================================================================================================================================================
+# GROUPS:
+#====================================================================================================================================================
+
+def default_susceptibles(people, age = "Adult", activity = "Sitting/Resting"):
+    """
+    This function returns a table with one group of susceptibles, as a starting point for editing.
+
+    Args:
+        people (int): The number of susceptibles.
+        age (str, optional): The age-group. Defaults to "Adult".
+        activity (str, optional): The activity. Defaults to "Sitting/Resting".
+
+    Returns:
+        Pandas DataFrame: The susceptible groups.
+    """
+    return pd.DataFrame({"Age group": [age], "Activity": [activity], "People": [people]})
+
+def default_infectors(infectors, activity = "Resting/Oral Breathing", mask = "No mask"):
+    """
+    This function returns a table with one group of infectors, as a starting point for editing.
+
+    Args:
+        infectors (int): The number of infectors.
+        activity (str, optional): The activity. Defaults to "Resting/Oral Breathing".
+        mask (str, optional): The mask. Defaults to "No mask".
+
+    Returns:
+        Pandas DataFrame: The infector groups.
+    """
+    return pd.DataFrame({"Activity": [activity], "Mask": [mask], "Infectors": [infectors]})
+
+def susceptible_arrays(groups, breathing = None):
+    """
+    This function looks up the breathing rate of each group of susceptibles.
+    Rows with no people, or left blank, are ignored.
+
+    Args:
+        groups (Pandas DataFrame): The susceptible groups, with the columns in SUSCEPTIBLE_COLUMNS.
+        breathing (dict, optional): Breathing rates (m³/h) by age-group and activity. Defaults to presets.breathing_dict.
+
+    Returns:
+        dict: NumPy arrays for 'label', 'breathing' (m³/h) and 'people', one per group.
+
+    Raises:
+        ValueError: If there are no people, or an age-group has no breathing rate for the chosen activity.
+    """
+    breathing = breathing or presets.breathing_dict
+    groups = pd.DataFrame(groups, columns = SUSCEPTIBLE_COLUMNS).dropna()
+    groups = groups[groups["People"] > 0]
+    if groups.empty:
+        raise ValueError("Add at least one group of susceptibles with at least one person.")
+
+    missing = [f"{a} ({b})" for a, b in zip(groups["Age group"], groups["Activity"]) if b not in breathing.get(a, {})]
+    if missing:
+        raise ValueError(f"There is no breathing rate for: {', '.join(missing)}")
+
+    return {
+        "label": (groups["Age group"] + ", " + groups["Activity"]).to_numpy(),
+        "breathing": np.array([breathing[a][b] for a, b in zip(groups["Age group"], groups["Activity"])], dtype = float),
+        "people": groups["People"].to_numpy(dtype = float),
+    }
+
+def infector_arrays(groups, disease, quanta = None):
+    """
+    This function looks up the quanta emission rate of each group of infectors, after their masks.
+    Rows with no infectors, or left blank, are ignored.
+
+    Args:
+        groups (Pandas DataFrame): The infector groups, with the columns in INFECTOR_COLUMNS.
+        disease (str): The disease, a key of the quanta emission dictionary.
+        quanta (dict, optional): Quanta emission rates (quanta/h) by disease and activity. Defaults to presets.quanta_em_dict.
+
+    Returns:
+        dict: NumPy arrays for 'label', 'emission' (quanta/h per infector, after the mask) and 'infectors', one per group.
+
+    Raises:
+        ValueError: If there are no infectors, or an activity or mask is unknown.
+    """
+    quanta = quanta or presets.quanta_em_dict
+    groups = pd.DataFrame(groups, columns = INFECTOR_COLUMNS).dropna()
+    groups = groups[groups["Infectors"] > 0]
+    if groups.empty:
+        raise ValueError("Add at least one group of infectors with at least one infector.")
+
+    unknown = sorted(set(groups["Activity"]) - set(quanta[disease])) + sorted(set(groups["Mask"]) - set(presets.msk_eff_dict))
+    if unknown:
+        raise ValueError(f"Unknown activities or masks: {', '.join(unknown)}")
+
+    return {
+        "label": (groups["Activity"] + ", " + groups["Mask"]).to_numpy(),
+        "emission": groups["Activity"].map(quanta[disease]).to_numpy(dtype = float) * groups["Mask"].map(presets.msk_eff_dict).to_numpy(dtype = float),
+        "infectors": groups["Infectors"].to_numpy(dtype = float),
+    }
+
+def weighted_mean(values, weights):
+    """
+    This function returns the mean of the values, weighted by the number in each group.
+    The pages use it as the single rate of the whole mixture, e.g. for the graphs over time.
+
+    Args:
+        values (NumPy array): The value of each group.
+        weights (NumPy array): The number in each group.
+
+    Returns:
+        float: The weighted mean.
+    """
+    return float(np.average(values, weights = weights))
+
+#====================================================================================================================================================
+# EXPECTED INFECTIONS:
+#====================================================================================================================================================
+
+def expected_infections(risk, susceptibles, infectors):
+    """
+    This function calculates the expected infections of each susceptible group, and splits them across the infector groups.
+
+    Args:
+        risk (NumPy array): The risk of one susceptible in each group, from the model with the group's breathing rate and the total emission.
+        susceptibles (dict): The susceptible groups, see susceptible_arrays.
+        infectors (dict): The infector groups, see infector_arrays.
+
+    Returns:
+        dict: 'by_group' (the expected infections of each susceptible group), 'by_infector' (the expected infections caused by each infector
+            group) and 'matrix' (the expected infections of each susceptible group caused by each infector group, with shape (susceptible groups,
+            infector groups)).
+    """
+    risk = np.asarray(risk, dtype = float)
+    by_group = susceptibles["people"] * risk
+
+    # Each infector group's share of the total emission is its share of every susceptible group's hazard.
+    emitted = infectors["infectors"] * infectors["emission"]
+    share = emitted / emitted.sum() if emitted.sum() > 0 else np.zeros_like(emitted)
+    matrix = by_group[:, None] * share
+
+    return {"by_group": by_group, "by_infector": matrix.sum(axis = 0), "matrix": matrix}
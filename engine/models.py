@@ -0,0 +1,292 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the vectorised model equations used by our web-app.
+# Every function accepts plain numbers or NumPy arrays, so a whole time range or a batch of rooms is evaluated in one call.
+# The units are up to the caller, as long as they are consistent (the Wells-Riley page works in hours, the Residual Risk page works in minutes).
+
+# Importing Numpy.
+import numpy as np
+
+#====================================================================================================================================================
+# TRADITIONAL WELLS-RILEY MODEL:
+#====================================================================================================================================================
+
+def wells_riley_risk(I, p, q, t, Q):
+    """
+    This function calculates the probability of infection using the Wells-Riley model.
+    Where the ventilation rate is 0, the probability is 0, as it is on the Wells-Riley page.
+
+    Args:
+        I (int or NumPy array): The number of infected individuals.
+        p (float or NumPy array): The breathing rate of any susceptible individual.
+        q (float or NumPy array): The quanta emission rate.
+        t (float or NumPy array): The exposure time.
+        Q (float or NumPy array): The ventilation rate.
+
+    Returns:
+        NumPy array: The probability of infection (P), broadcast over the inputs.
+    """
+    Q = np.asarray(Q, dtype = float)
+    with np.errstate(divide = "ignore", invalid = "ignore"): # Division by zero is handled by the mask below.
+        P = -np.expm1(-(I * p * q * t) / Q) # 'expm1' is used as 1 - e^x loses precision for very small risks.
+    return np.where(Q == 0, 0.0, P)
+
+#====================================================================================================================================================
+# RESIDUAL RISK MODEL:
+#====================================================================================================================================================
+
+def residual_risk(I, T, p, q, Q, v, t = None):
+    """
+    This function calculates the risks of infection using the enhanced Wells-Riley model from Edwards et al. (2024).
+    If t remains as None, it is assumed that the susceptibles remain indefinitely.
+    Where the ventilation rate or room volume is 0, every risk is 0, as it is on the Residual Risk page.
+
+    Args:
+        I (int or NumPy array): The number of infected individuals.
+        T (float or NumPy array): The time the infectors are present.
+        p (float or NumPy array): The breathing rate of any susceptible individual.
+        q (float or NumPy array): The quanta emission rate.
+        Q (float or NumPy array): The ventilation rate.
+        v (float or NumPy array): The Room Volume.
+        t (float or NumPy array, optional): Modelling time after the infectors leave. Defaults to None.
+
+    Returns:
+        NumPy array: Infection risk whilst infectors are present (P1)
+        NumPy array: Infection risk after infectors leave (P2). None if t is None
+        NumPy array: Combined infection risk (P_comb). None if t is None
+        NumPy array: Infection risk if susceptibles remain indefinitely (P_inf)
+    """
+    Q = np.asarray(Q, dtype = float)
+    v = np.asarray(v, dtype = float)
+    invalid = (Q == 0) | (v == 0) # Inputs that would raise a ZeroDivisionError in the scalar equations.
+
+    with np.errstate(divide = "ignore", invalid = "ignore", over = "ignore"):
+        # The air exchange rate (Q / v) and the dose scale (p * q * I / Q) are shared by every equation.
+        lam = Q / v
+        scale = p * q * I / Q
+        decay_T = -np.expm1(-lam * T) # 1 - e^(-(Q / v) * T)
+
+        # Equation 9: Risk whilst infector is present
+        P1 = -np.expm1((scale / lam) * decay_T - scale * T)
+
+        # Equation 14: Indefinite time risk
+        P_inf = -np.expm1(-scale * T)
+
+        if t is None:
+            return np.where(invalid, 0.0, P1), None, None, np.where(invalid, 0.0, P_inf)
+
+        # Equation 11: Risk after the infector leaves
+        P2 = -np.expm1(-(scale / lam) * decay_T * -np.expm1(-lam * t))
+
+        # Equation 13: Combined risk
+        P_comb = -np.expm1((scale / lam) * (np.exp(-lam * t) * decay_T - lam * T))
+
+    return np.where(invalid, 0.0, P1), np.where(invalid, 0.0, P2), np.where(invalid, 0.0, P_comb), np.where(invalid, 0.0, P_inf)
+
+def reentry_time(I, T, p, q, Q, v, threshold, stay = None):
+    """
+    This function calculates how long to wait after the infectors leave before the room is safe to re-enter, in closed form.
+    The room is safe once the risk of a new susceptible entering the room (Equation 11, starting later) is at or below the threshold.
+    The wait is 0 if the room is already safe when the infectors leave. Where the ventilation rate is 0 the room never becomes safe (infinite wait),
+    and where the room volume is 0 the air clears instantly (no wait).
+
+    Args:
+        I (int or NumPy array): The number of infected individuals.
+        T (float or NumPy array): The time the infectors were present.
+        p (float or NumPy array): The breathing rate of the new occupants.
+        q (float or NumPy array): The quanta emission rate.
+        Q (float or NumPy array): The ventilation rate.
+        v (float or NumPy array): The Room Volume.
+        threshold (float or NumPy array): The highest acceptable risk for one new occupant.
+        stay (float or NumPy array, optional): How long the new occupants stay. Defaults to None (they stay indefinitely).
+
+    Returns:
+        NumPy array: The waiting time after the infectors leave, in the same unit as T.
+    """
+    Q = np.asarray(Q, dtype = float)
+    v = np.asarray(v, dtype = float)
+
+    with np.errstate(divide = "ignore", invalid = "ignore", over = "ignore"):
+        lam = Q / v
+        scale = p * q * I / Q
+        # The exponent of Equation 11 for a new occupant entering as the infectors leave.
+        exponent = (scale / lam) * -np.expm1(-lam * T)
+        if stay is not None:
+            exponent = exponent * -np.expm1(-lam * np.asarray(stay, dtype = float))
+        # The exponent decays as e^(-(Q / v) * wait), so the wait follows from the logarithm of the ratio to the highest acceptable exponent.
+        limit = -np.log1p(-np.asarray(threshold, dtype = float))
+        wait = np.maximum(np.log(exponent / limit) / lam, 0.0)
+
+    wait = np.where(v == 0, 0.0, wait)
+    return np.where(Q == 0, np.inf, wait)
+
+#====================================================================================================================================================
+# RISK OVER TIME:
+#====================================================================================================================================================
+
+def wells_riley_curve(time_range, I, p, q, Q):
+    """
+    This function calculates the probability of infection at every point of a time range using the Wells-Riley model.
+
+    Args:
+        time_range (NumPy array): A NumPy array of time points.
+        I (int): The number of infected individuals.
+        p (float): The breathing rate of any susceptible individual.
+        q (float): The quanta emission rate.
+        Q (float): The ventilation rate.
+
+    Returns:
+        NumPy array: The probability of infection at each time point.
+    """
+    return wells_riley_risk(I, p, q, np.asarray(time_range, dtype = float), Q)
+
+def residual_risk_curve(time_range, I, T, p, q, Q, v):
+    """
+    This function calculates the risk of infection at every point of a time range using the enhanced Wells-Riley model.
+    Time points up to T use the risk whilst the infectors are present (Equation 9), later time points use the risk after departure (Equation 11).
+
+    Args:
+        time_range (NumPy array): A NumPy array of time points.
+        I (int): The number of infected individuals.
+        T (float): The time the infectors are present.
+        p (float): The breathing rate of any susceptible individual.
+        q (float): The quanta emission rate.
+        Q (float): The ventilation rate.
+        v (float): The Room Volume.
+
+    Returns:
+        NumPy array: The risk of infection at each time point.
+    """
+    time_range = np.asarray(time_range, dtype = float)
+    present = time_range <= T
+
+    # Both phases are evaluated over the whole range, then the right one is picked for each time point.
+    P1_at_time, _, _, _ = residual_risk(I, np.minimum(time_range, T), p, q, Q, v)
+    _, P2_at_time, _, _ = residual_risk(I, T, p, q, Q, v, np.maximum(time_range - T, 0))
+
+    return np.where(present, P1_at_time, P2_at_time)
+
+#====================================================================================================================================================
+# NEAR-FIELD / FAR-FIELD (TWO-BOX) MODEL:
+#====================================================================================================================================================
+
+def near_field_geometry(r, s):
+    """
+    This function calculates the volume of a spherical near-field around the infectors, and the airflow between it and the rest of the room.
+    Half of the random air speed is taken to cross the surface of the near-field in each direction (Nicas, 1996).
+
+    Args:
+        r (float or NumPy array): The radius of the near-field (m).
+        s (float or NumPy array): The random air speed in the room (m per unit of time).
+
+    Returns:
+        NumPy array: The near-field volume (m³).
+        NumPy array: The interzonal airflow (m³ per unit of time).
+    """
+    r = np.asarray(r, dtype = float)
+    return 4 / 3 * np.pi * r**3, 0.5 * 4 * np.pi * r**2 * np.asarray(s, dtype = float)
+
+def _two_box_modes(Q, v, v_n, beta):
+    """
+    This function calculates the two eigenvalues of the two-box model, and the near-field to far-field ratio of each eigenvector.
+
+    Args:
+        Q (NumPy array): The ventilation rate, which removes air from the far-field.
+        v (NumPy array): The room volume.
+        v_n (NumPy array): The near-field volume.
+        beta (NumPy array): The interzonal airflow.
+
+    Returns:
+        tuple of NumPy array: The slow and fast eigenvalues (both negative).
+        tuple of NumPy array: The far-field concentration of each eigenvector, for a near-field concentration of 1.
+    """
+    v_f = v - v_n
+    c = beta / v_n + (beta + Q) / v_f
+    d = beta * Q / (v_n * v_f)
+    root = np.sqrt(c**2 - 4 * d) # Always real, as the two zones exchange air symmetrically.
+    fast = -(c + root) / 2
+    slow = -2 * d / (c + root) # Written this way to avoid cancellation when the room is slow to ventilate.
+    return (slow, fast), (1 + slow * v_n / beta, 1 + fast * v_n / beta)
+
+def two_box_risk(I, T, p, q, Q, v, v_n, beta, t = None):
+    """
+    This function calculates the risks of infection using the near-field / far-field (two-box) model.
+    The infectors emit into a small, well-mixed near-field around them, which exchanges air with the rest of the room (the far-field), and the
+    ventilation removes air from the far-field. The risks mirror those of the residual risk model (P1, P2, P_comb and P_inf), for a susceptible in
+    each zone. As the interzonal airflow grows, both zones tend to the residual risk model.
+    Where the ventilation rate, room volume, near-field volume or interzonal airflow is 0, or the near-field fills the room, every risk is 0.
+
+    Args:
+        I (int or NumPy array): The number of infected individuals.
+        T (float or NumPy array): The time the infectors are present.
+        p (float or NumPy array): The breathing rate of any susceptible individual.
+        q (float or NumPy array): The quanta emission rate.
+        Q (float or NumPy array): The ventilation rate.
+        v (float or NumPy array): The Room Volume.
+        v_n (float or NumPy array): The near-field volume, see near_field_geometry.
+        beta (float or NumPy array): The interzonal airflow, see near_field_geometry.
+        t (float or NumPy array, optional): Modelling time after the infectors leave. Defaults to None.
+
+    Returns:
+        tuple: For a susceptible in the near-field, (P1, P2, P_comb, P_inf), with P2 and P_comb None if t is None.
+        tuple: The same for a susceptible in the far-field.
+    """
+    Q, v, v_n, beta = (np.asarray(x, dtype = float) for x in (Q, v, v_n, beta))
+    invalid = (Q <= 0) | (v <= 0) | (v_n <= 0) | (beta <= 0) | (v_n >= v)
+
+    with np.errstate(divide = "ignore", invalid = "ignore", over = "ignore"):
+        (l1, l2), (u1, u2) = _two_box_modes(Q, v, v_n, beta)
+        G = I * q # Total emission into the near-field.
+
+        # Whilst the infectors are present: steady state plus two decaying modes, starting from clean air.
+        near_ss, far_ss = G / Q + G / beta, G / Q
+        a1 = (G / v_n + l2 * near_ss) / (l1 - l2)
+        a2 = -(G / v_n + l1 * near_ss) / (l1 - l2)
+        grow1, grow2 = np.expm1(l1 * T) / l1, np.expm1(l2 * T) / l2 # The integral of each mode over the presence.
+        near_dose_T = near_ss * T + a1 * grow1 + a2 * grow2
+        far_dose_T = far_ss * T + a1 * u1 * grow1 + a2 * u2 * grow2
+
+        # The concentrations when the infectors leave, which then decay without a source.
+        near_T = near_ss + a1 * np.exp(l1 * T) + a2 * np.exp(l2 * T)
+        far_T = far_ss + a1 * u1 * np.exp(l1 * T) + a2 * u2 * np.exp(l2 * T)
+        b1 = ((beta / v_n) * (far_T - near_T) - l2 * near_T) / (l1 - l2)
+        b2 = near_T - b1
+
+        # The dose after the infectors leave, until time t, or forever.
+        after = lambda decay1, decay2: (b1 * decay1 + b2 * decay2, b1 * u1 * decay1 + b2 * u2 * decay2)
+        near_inf, far_inf = after(-1 / l1, -1 / l2)
+
+    clean = lambda dose: np.where(invalid, 0.0, -np.expm1(-p * dose))
+    near = [clean(near_dose_T), None, None, clean(near_dose_T + near_inf)]
+    far = [clean(far_dose_T), None, None, clean(far_dose_T + far_inf)]
+
+    if t is not None:
+        with np.errstate(divide = "ignore", invalid = "ignore", over = "ignore"):
+            near_t, far_t = after(np.expm1(l1 * t) / l1, np.expm1(l2 * t) / l2)
+        near[1], near[2] = clean(near_t), clean(near_dose_T + near_t)
+        far[1], far[2] = clean(far_t), clean(far_dose_T + far_t)
+
+    return tuple(near), tuple(far)
+
+def two_box_curve(time_range, I, T, p, q, Q, v, v_n, beta):
+    """
+    This function calculates the near-field and far-field risk of infection at every point of a time range using the two-box model.
+    As in residual_risk_curve, time points up to T use the risk whilst the infectors are present, later time points use the risk after departure.
+
+    Args:
+        time_range (NumPy array): A NumPy array of time points.
+        I, T, p, q, Q, v, v_n, beta: The model inputs, see two_box_risk.
+
+    Returns:
+        NumPy array: The near-field risk at each time point.
+        NumPy array: The far-field risk at each time point.
+    """
+    time_range = np.asarray(time_range, dtype = float)
+    present = time_range <= T
+
+    near_pres, far_pres = two_box_risk(I, np.minimum(time_range, T), p, q, Q, v, v_n, beta)
+    near_dep, far_dep = two_box_risk(I, T, p, q, Q, v, v_n, beta, np.maximum(time_range - T, 0))
+
+    return np.where(present, near_pres[0], near_dep[1]), np.where(present, far_pres[0], far_dep[1])
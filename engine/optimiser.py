@@ -0,0 +1,307 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the cost-constrained mitigation optimiser.
+# A mitigation plan is one choice from each of five option lists: mask policy, ventilation uplift, air cleaners, occupancy cap and session length.
+# Every plan is evaluated with the Wells-Riley model by broadcasting the option lists against each other (and against the rooms of an estate),
+# so there is no Python loop over plans. Air cleaner and mask options that are both dearer and less effective than another option are pruned first.
+# Costs are per day: masks, extra ventilation and lost occupant-hours are paid for every session, while an air cleaner is paid for once a day
+# (see presets.mitigation_cost_dict). A room therefore gets one plan for all of its sessions of the day.
+# All times are in hours, breathing rates in m³/h, quanta emission rates in quanta/h and ventilation rates in m³/h.
+
+# Imports.
+import itertools
+
+import numpy as np
+
+from engine import backend, presets
+
+# The default option lists.
+default_options = {
+    "mask": list(presets.msk_eff_dict),
+    "ventilation": [1.0, 1.25, 1.5, 2.0, 3.0], # Multiples of the current ventilation rate.
+    "air_cleaner": list(presets.air_cleaner_dict),
+    "air_cleaner_count": [0, 1, 2, 3, 4],
+    "occupancy": [1.0, 0.9, 0.75, 0.5], # Fraction of the usual occupancy allowed in.
+    "session_length": [1.0, 0.75, 0.5] # Fraction of the usual session length.
+}
+
+# The largest number of (room, plan) pairs evaluated at once in a batch, which keeps memory bounded for large estates.
+CHUNK_CELLS = 2**23
+
+#====================================================================================================================================================
+# OPTIONS:
+#====================================================================================================================================================
+
+def _undominated(cost, effect):
+    """
+    This function finds the options that are not dominated, i.e. no other option is at most as expensive and at least as effective.
+    Lower 'effect' is better (it multiplies the dose).
+
+    Args:
+        cost (NumPy array): The cost of each option.
+        effect (NumPy array): The factor each option applies to the dose.
+
+    Returns:
+        NumPy array: The positions of the undominated options, cheapest first.
+    """
+    order = np.lexsort((effect, cost)) # Sort by cost, then by effect.
+    best_so_far = np.minimum.accumulate(effect[order])
+    # An option is kept if it is strictly more effective than every cheaper option.
+    keep = np.concatenate([[True], effect[order][1:] < best_so_far[:-1]])
+    return order[keep]
+
+def option_axes(options = None, costs = None):
+    """
+    This function builds the option axes, pruning dominated mask and air cleaner options.
+
+    Args:
+        options (dict, optional): The option lists, with the same keys as default_options. Defaults to default_options.
+        costs (dict, optional): The costs, with the same keys as presets.mitigation_cost_dict. Defaults to presets.mitigation_cost_dict.
+
+    Returns:
+        dict: For each axis ('mask', 'ventilation', 'air_cleaner', 'occupancy', 'session_length'), a dictionary of 'label', 'effect' and 'cost' arrays.
+    """
+    options = {**default_options, **(options or {})}
+    costs = {**presets.mitigation_cost_dict, **(costs or {})}
+
+    # Masks: the effect is the fraction of quanta passing through the mask, the cost is per person.
+    mask_label = np.array(options["mask"])
+    mask_effect = np.array([presets.msk_eff_dict[m] for m in mask_label])
+    mask_cost = np.array([costs["mask"][m] for m in mask_label])
+    mask_keep = _undominated(mask_cost, mask_effect)
+
+    # Air cleaners: every type and count, described by the CADR they add and the cost per day.
+    combos = list(itertools.product(options["air_cleaner"], options["air_cleaner_count"]))
+    cleaner_label = np.array([f"{n} x {name}" if n and presets.air_cleaner_dict[name] else "None" for name, n in combos])
+    cleaner_cadr = np.array([presets.air_cleaner_dict[name] * n for name, n in combos], dtype = float)
+    cleaner_cost = np.array([costs["air_cleaner"][name] * n for name, n in combos], dtype = float)
+    cleaner_keep = _undominated(cleaner_cost, -cleaner_cadr) # More CADR is better.
+
+    return {
+        "mask": {"label": mask_label[mask_keep], "effect": mask_effect[mask_keep], "cost": mask_cost[mask_keep]},
+        "ventilation": {"label": np.array([f"x{m:g}" for m in options["ventilation"]]), "effect": np.array(options["ventilation"], dtype = float)},
+        "air_cleaner": {"label": cleaner_label[cleaner_keep], "effect": cleaner_cadr[cleaner_keep], "cost": cleaner_cost[cleaner_keep]},
+        "occupancy": {"label": np.array([f"{o:.0%}" for o in options["occupancy"]]), "effect": np.array(options["occupancy"], dtype = float)},
+        "session_length": {"label": np.array([f"{s:.0%}" for s in options["session_length"]]), "effect": np.array(options["session_length"], dtype = float)},
+        "unit_costs": {"ventilation": costs["ventilation"], "occupant_hour": costs["occupant_hour"]}
+    }
+
+AXES = ["mask", "ventilation", "air_cleaner", "occupancy", "session_length"]
+
+#====================================================================================================================================================
+# EVALUATION:
+#====================================================================================================================================================
+
+def _evaluate(occupants, infectors, p, q, t, Q, axes):
+    """
+    This function calculates the per-session cost and the risk of every mitigation plan for one or more sessions, in one broadcast, and the
+    daily cost of each plan's air cleaners.
+
+    Returns:
+        NumPy array: The cost of each plan paid for every session, with shape (sessions, plans).
+        NumPy array: The cost of each plan paid once a day (its air cleaners), with shape (plans,).
+        NumPy array: The risk of each plan for one susceptible, with shape (sessions, plans).
+    """
+    # Session inputs get a leading axis, and each option axis gets its own trailing axis.
+    room = [np.atleast_1d(np.asarray(x, dtype = float)).reshape(-1, 1, 1, 1, 1, 1) for x in (occupants, infectors, p, q, t, Q)]
+    N, I, p, q, t, Q = room
+    shape = lambda i: tuple(-1 if k == i else 1 for k in range(5))
+    mask, vent, cadr, occ, length = (axes[name]["effect"].reshape(shape(i)) for i, name in enumerate(AXES))
+    mask_cost = axes["mask"]["cost"].reshape(shape(0))
+    cleaner_cost = axes["air_cleaner"]["cost"].reshape(shape(2))
+    unit = axes["unit_costs"]
+
+    risk = backend.wells_riley_risk(I * occ, p, q * mask, t * length, Q * vent + cadr)
+    session_cost = (mask_cost * N * occ
+                    + unit["ventilation"] * Q * (vent - 1) * t * length
+                    + unit["occupant_hour"] * N * t * (1 - occ * length))
+
+    n_sessions = max(np.size(x) for x in room)
+    session_cost, risk = np.broadcast_arrays(session_cost, risk)
+    daily_cost = np.broadcast_to(cleaner_cost, risk.shape[1:]).ravel()
+    return session_cost.reshape(n_sessions, -1), daily_cost, risk.reshape(n_sessions, -1)
+
+def evaluate(occupants, infectors, p, q, t, Q, axes, sessions = 1):
+    """
+    This function calculates the daily cost and the risk of every mitigation plan for one or more rooms, in one broadcast.
+    Each room runs a number of identical sessions a day. The infectors are assumed to be capped in proportion with the occupancy.
+
+    Args:
+        occupants (float or NumPy array): The usual number of people in each room.
+        infectors (float or NumPy array): The usual number of infectors in each room.
+        p (float or NumPy array): The breathing rate of the susceptibles.
+        q (float or NumPy array): The unmasked quanta emission rate of the infectors.
+        t (float or NumPy array): The usual session length.
+        Q (float or NumPy array): The current ventilation rate.
+        axes (dict): The option axes, see option_axes.
+        sessions (int or NumPy array, optional): The number of sessions a day in each room. Defaults to 1.
+
+    Returns:
+        NumPy array: The cost of each plan per day, with shape (rooms, plans).
+        NumPy array: The risk of each plan for one susceptible in each session, with shape (rooms, plans).
+    """
+    session_cost, daily_cost, risk = _evaluate(occupants, infectors, p, q, t, Q, axes)
+    sessions = np.atleast_1d(np.asarray(sessions, dtype = float)).reshape(-1, 1)
+    return daily_cost + sessions * session_cost, risk
+
+def plan_labels(plan, axes):
+    """
+    This function describes plans (positions in the flattened plan axis) by the option chosen on each axis.
+
+    Args:
+        plan (NumPy array): The plan positions.
+        axes (dict): The option axes, see option_axes.
+
+    Returns:
+        dict: The chosen option label on each axis.
+    """
+    sizes = [axes[name]["label"].size for name in AXES]
+    chosen = np.unravel_index(plan, sizes)
+    return {name: axes[name]["label"][idx] for name, idx in zip(AXES, chosen)}
+
+#====================================================================================================================================================
+# OPTIMISATION:
+#====================================================================================================================================================
+
+def pareto_front(cost, risk):
+    """
+    This function finds the plans on the Pareto front of cost vs. risk, for each room.
+    A plan is on the front if every cheaper plan has a higher risk.
+
+    Args:
+        cost (NumPy array): The cost of each plan, with shape (rooms, plans).
+        risk (NumPy array): The risk of each plan, with shape (rooms, plans).
+
+    Returns:
+        NumPy array: The room of each plan on the front.
+        NumPy array: The plan positions on the front, cheapest first within each room.
+    """
+    # Sort each room's plans by cost. Ties in cost are broken by risk, so the first plan of each cost is the best one.
+    order = np.lexsort((risk, cost), axis = 1)
+
+    sorted_risk = np.take_along_axis(risk, order, axis = 1)
+    best_so_far = np.minimum.accumulate(sorted_risk, axis = 1)
+    on_front = np.concatenate([np.ones((risk.shape[0], 1), dtype = bool), sorted_risk[:, 1:] < best_so_far[:, :-1]], axis = 1)
+
+    rooms, position = np.nonzero(on_front)
+    return rooms, order[rooms, position]
+
+def _cheapest(cost, risk, risk_cap):
+    """
+    This function finds the cheapest plan of each room that meets the risk cap. Ties in cost are broken by the lower risk.
+    Rooms where no plan meets the cap get their lowest-risk plan among the cheapest.
+
+    Returns:
+        NumPy array: The plan position, the cost and the risk of each room.
+    """
+    capped_cost = np.where(risk <= risk_cap, cost, np.inf)
+    cheapest = capped_cost.min(axis = 1, keepdims = True)
+    plan = np.where(capped_cost == cheapest, risk, np.inf).argmin(axis = 1)
+    return plan, np.take_along_axis(cost, plan[:, None], axis = 1)[:, 0], np.take_along_axis(risk, plan[:, None], axis = 1)[:, 0]
+
+def _best(plan, cost, risk, risk_cap, axes):
+    """
+    This function describes the cheapest plan of each room, blanking the rooms where no plan meets the risk cap.
+    """
+    feasible = risk <= risk_cap
+    return {"feasible": feasible,
+            "cost": np.where(feasible, cost, np.nan),
+            "risk": np.where(feasible, risk, np.nan),
+            **{name: np.where(feasible, labels, "") for name, labels in plan_labels(plan, axes).items()}}
+
+def optimise(occupants, infectors, p, q, t, Q, risk_cap, options = None, costs = None, front = True, sessions = 1):
+    """
+    This function finds the cheapest mitigation plan that keeps the risk of each room at or below a risk cap, and the Pareto front of cost vs. risk.
+    Rooms are processed in chunks, so estates of any size can be optimised in one call.
+
+    Args:
+        occupants, infectors, p, q, t, Q (float or NumPy array): The room inputs, see evaluate.
+        risk_cap (float): The highest acceptable risk for one susceptible.
+        options (dict, optional): The option lists, see option_axes. Defaults to None.
+        costs (dict, optional): The costs, see option_axes. Defaults to None.
+        front (bool, optional): Whether to also return the Pareto front of each room. Defaults to True.
+        sessions (int or NumPy array, optional): The number of identical sessions a day in each room. Defaults to 1.
+
+    Returns:
+        dict: 'best', a dictionary of arrays with one entry per room ('feasible', 'cost' per day, 'risk' per session, and the label chosen on each axis),
+            'front', a dictionary of arrays with one entry per plan on the fronts ('room', 'cost', 'risk' and labels), or None if front is False,
+            and 'plans', the number of plans evaluated per room after pruning.
+    """
+    axes = option_axes(options, costs)
+    n_plans = int(np.prod([axes[name]["label"].size for name in AXES]))
+    inputs = np.broadcast_arrays(*[np.atleast_1d(np.asarray(x, dtype = float)) for x in (occupants, infectors, p, q, t, Q, sessions)])
+    n_rooms = inputs[0].size
+    rows = max(1, CHUNK_CELLS // n_plans)
+
+    best_plan = np.empty(n_rooms, dtype = int)
+    best_cost = np.empty(n_rooms)
+    best_risk = np.empty(n_rooms)
+    front_parts = []
+
+    for lo in range(0, n_rooms, rows): # Chunks of rooms, each evaluated against every plan at once.
+        cost, risk = evaluate(*[x[lo:lo + rows] for x in inputs[:-1]], axes, sessions = inputs[-1][lo:lo + rows])
+
+        # The cheapest plan under the risk cap.
+        best_plan[lo:lo + rows], best_cost[lo:lo + rows], best_risk[lo:lo + rows] = _cheapest(cost, risk, risk_cap)
+
+        if front:
+            rooms, plans = pareto_front(cost, risk)
+            front_parts.append((rooms + lo, plans, cost[rooms, plans], risk[rooms, plans]))
+
+    best = _best(best_plan, best_cost, best_risk, risk_cap, axes)
+
+    front_result = None
+    if front:
+        rooms, plans, cost, risk = (np.concatenate(part) for part in zip(*front_parts))
+        front_result = {"room": rooms, "cost": cost, "risk": risk, **plan_labels(plans, axes)}
+
+    return {"best": best, "front": front_result, "plans": n_plans}
+
+def optimise_days(room, occupants, infectors, p, q, t, Q, risk_cap, options = None, costs = None):
+    """
+    This function finds the cheapest mitigation plan for the day of each room of a timetable, applied to every session in that room, that
+    keeps the risk of every session at or below a risk cap. The cost of a plan is its air cleaners, paid once, plus its per-session costs
+    summed over the room's sessions. The sessions are grouped by room with vectorised reductions, in chunks of whole rooms.
+
+    Args:
+        room (NumPy array): The room of each session.
+        occupants, infectors, p, q, t, Q (NumPy array): The session inputs, see evaluate.
+        risk_cap (float): The highest acceptable risk for one susceptible, in any session.
+        options (dict, optional): The option lists, see option_axes. Defaults to None.
+        costs (dict, optional): The costs, see option_axes. Defaults to None.
+
+    Returns:
+        dict: 'best', a dictionary of arrays with one entry per room ('room', 'sessions', 'feasible', 'cost' per day, 'risk' of the riskiest
+            session, and the label chosen on each axis), and 'plans', the number of plans evaluated per room after pruning.
+    """
+    axes = option_axes(options, costs)
+    n_plans = int(np.prod([axes[name]["label"].size for name in AXES]))
+    inputs = np.broadcast_arrays(*[np.atleast_1d(np.asarray(x, dtype = float)) for x in (occupants, infectors, p, q, t, Q)])
+
+    # The sessions are sorted by room, so each room's sessions are contiguous.
+    labels, room_idx = np.unique(np.asarray(room), return_inverse = True)
+    order = np.argsort(room_idx, kind = "stable")
+    counts = np.bincount(room_idx, minlength = labels.size)
+    starts = np.concatenate([[0], np.cumsum(counts)])
+    n_rooms = labels.size
+    rows = max(1, CHUNK_CELLS // n_plans) # Sessions per chunk.
+
+    best_plan = np.empty(n_rooms, dtype = int)
+    best_cost = np.empty(n_rooms)
+    best_risk = np.empty(n_rooms)
+
+    lo = 0
+    while lo < n_rooms: # Chunks of whole rooms, each evaluated against every plan at once.
+        hi = min(n_rooms, max(lo + 1, int(np.searchsorted(starts, starts[lo] + rows, side = "right")) - 1))
+        sessions = order[starts[lo]:starts[hi]]
+        session_cost, daily_cost, risk = _evaluate(*[x[sessions] for x in inputs], axes)
+
+        offsets = starts[lo:hi] - starts[lo]
+        cost = np.add.reduceat(session_cost, offsets, axis = 0) + daily_cost
+        risk = np.maximum.reduceat(risk, offsets, axis = 0) # A plan meets the cap only if every session does.
+        best_plan[lo:hi], best_cost[lo:hi], best_risk[lo:hi] = _cheapest(cost, risk, risk_cap)
+        lo = hi
+
+    return {"best": {"room": labels, "sessions": counts, **_best(best_plan, best_cost, best_risk, risk_cap, axes)}, "plans": n_plans}
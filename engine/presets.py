@@ -0,0 +1,121 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the preset data shared by the pages and engines of our web-app.
+
+#====================================================================================================================================================
+# PULMONARY BREATHING RATE:
+#====================================================================================================================================================
+
+# Dictionary containing breathing rate data (m³/h) for various different age groups and activities.
+breathing_dict = {
+    "Adult": {"Sleep": 0.385, "Sitting/Resting": 0.465, "Light activity (Standing/Walking)": 1.375, "Heavy activity (Exercise/Sports)": 2.85},
+    "15 Years Old": {"Sleep": 0.385, "Sitting/Resting": 0.44, "Light activity (Standing/Walking)": 1.34, "Heavy activity (Exercise/Sports)": 2.745},
+    "10 Years Old": {"Sleep": 0.31, "Sitting/Resting": 0.38, "Light activity (Standing/Walking)": 1.12, "Heavy activity (Exercise/Sports)": 2.03},
+    "5 Years Old": {"Sleep": 0.24, "Sitting/Resting": 0.32, "Light activity (Standing/Walking)": 0.57}
+}
+
+# Reference: https://www.icrp.org/publication.asp?id=ICRP%20Supporting%20Guidance%203
+
+#====================================================================================================================================================
+# QUANTA EMISSION:
+#====================================================================================================================================================
+
+# Dictionary containing quanta emission data (quanta/h) for COVID-19, Influenza, and TB
+quanta_em_dict = {
+    "SARS-CoV-2/COVID-19": {"Resting/Oral Breathing": 0.55, "Standing/Speaking": 2.7, "Light Activity/Speaking Loudly": 46},
+    "Influenza": {"Resting/Oral Breathing": 0.035, "Standing/Speaking": 0.17, "Light Activity/Speaking Loudly": 3.0},
+    "TB (On Treatment)": {"Resting/Oral Breathing": 0.020, "Standing/Speaking": 0.098, "Light Activity/Speaking Loudly": 1.7},
+    "TB (Untreated)": {"Resting/Oral Breathing": 0.62, "Standing/Speaking": 3.1, "Light Activity/Speaking Loudly": 52}
+}
+
+# Dictionary containing mask efficiency data for various masks. Each value is the fraction of quanta that passes through the mask.
+msk_eff_dict = {
+    "KN95": 0.05, # 95% efficiency.
+    "R95": 0.04, # 96% efficiency.
+    "Blue surgical mask": 0.53, # 47% efficiency.
+    "Cloth mask": 0.6, # 40% efficiency.
+    "No mask": 1.0 # 0% efficiency.
+}
+
+# Reference for quanta emission rate data: Mikszewski, 2022, "The airborne contagiousness of respiratory viruses: A comparative analysis and implications for mitigation", Volume 13, Issue 6.
+# Reference for mask efficiency data: Shah, 2021, "Experimental investigation of indoor aerosol dispersion and accumulation in the context of COVID-19: Effects of masks and ventilation", Volume 33, Issue 7.
+
+#====================================================================================================================================================
+# ROOM VENTILATION RATE AND VOLUME:
+#====================================================================================================================================================
+
+# Dictionary containing room ventilation rate data (ACH) for various different settings.
+ventilation_dict = {
+    "Education": {"Assembly Halls": 4, "Classrooms": 6, "Computer Rooms": 15},
+    "Healthcare": {"Dental Centres": 8, "Pharmacies": 6, "Hospital Rooms (Sterilising)": 15, "Hospital Rooms (Wards)": 6, "Hospital Rooms (X-Ray)": 10, "Medical Centres": 8, "Medical Clinics": 8, "Medical Offices": 8},
+    "Hospitality": {"Bars": 20, "Cafeterias": 12, "Cocktail Lounges": 20, "Lunch Rooms": 12, "Nightclubs": 20, "Restaurants (Dining Area)": 8, "Restaurants (Food Staging)": 10, "Restaurants (Kitchens)": 30, "Restaurants (Bars)": 15, "Tavern": 20},
+    "Commercial": {"Banks": 4, "Court Houses": 4, "Conference Rooms": 8, "Fire Stations": 4, "Offices (Public)": 3, "Offices (Business)": 6, "Office Lunch Rooms": 7, "Police Stations": 4, "Post Offices": 4, "Retail": 6, "Shopping Centres": 6, "Supermarkets": 4},
+    "Recreational": {"Auditoriums": 12, "Bowling Alleys": 10, "Clubhouses": 20, "Dance Halls": 6, "Gyms": 6, "Museums": 12, "Swimming Pools": 20, "Theatres": 8},
+    "Industrial/Technical": {"Factory Buildings": 2, "Factory Buildings with Fumes/Moisture": 10, "Laboratories": 6, "Pig Houses": 6, "Poultry Houses": 6, "Warehouses": 6}
+}
+
+# Reference for recommended ACH values: https://www.axaironline.co.uk/media/attachment/attachment/Air-Change-per-Hour-Document.pdf
+
+fiat500_size_m3 = 8.65
+# This is the size of a FIAT 500 in m³, rounded to two decimal places. The users can use the number of FIAT 500's that they can fit into their setting to estimate the volume of their room.
+
+# Reference for FIAT 500 dimensions: https://www.carwow.co.uk/fiat/500/specifications#gref
+
+#====================================================================================================================================================
+# ADDITIONAL REMOVAL:
+#====================================================================================================================================================
+
+# Dictionary containing the Clean Air Delivery Rate (CADR, m³/h) of typical air cleaners.
+air_cleaner_dict = {
+    "None": 0,
+    "Small portable HEPA air cleaner": 150,
+    "Medium portable HEPA air cleaner": 300,
+    "Large portable HEPA air cleaner": 600,
+    "DIY box-fan filter (Corsi-Rosenthal box)": 600
+}
+
+# Dictionary containing the single-pass efficiency of recirculation filters for 1-3 µm particles (ASHRAE 52.2 minimum E2 efficiency).
+filter_eff_dict = {
+    "No filter": 0.0,
+    "MERV 8": 0.2,
+    "MERV 11": 0.65,
+    "MERV 13": 0.85,
+    "MERV 14": 0.9,
+    "HEPA": 0.9997
+}
+
+deposition_rate = 0.24
+# This is the rate (/h) at which respiratory particles settle onto surfaces.
+
+# Reference for deposition rate: Buonanno, 2020, "Estimation of airborne viral emission: Quanta emission rate of SARS-CoV-2 for infection risk assessment", Environment International, Volume 141.
+# Reference for filter efficiencies: ANSI/ASHRAE Standard 52.2-2017, "Method of Testing General Ventilation Air-Cleaning Devices for Removal Efficiency by Particle Size".
+
+#====================================================================================================================================================
+# NEAR-FIELD / FAR-FIELD MODEL:
+#====================================================================================================================================================
+
+near_field_radius = 1.0
+# This is the radius (m) of the near-field around the infectors, within which people are in close contact.
+
+near_field_air_speed = 0.05
+# This is the typical random air speed (m/s) in an occupied room, which drives the air exchange between the near-field and the rest of the room.
+
+# Reference for the near-field / far-field model: Nicas, 1996, "Estimating exposure intensity in an imperfectly mixed room", American Industrial Hygiene Association Journal, Volume 57, Issue 6.
+
+#====================================================================================================================================================
+# MITIGATION COSTS:
+#====================================================================================================================================================
+
+# Dictionary containing indicative costs (£) of each mitigation, used by the mitigation optimiser. These are placeholders to be replaced with local prices.
+mitigation_cost_dict = {
+    # Cost of one mask, per person, per session.
+    "mask": {"KN95": 0.75, "R95": 1.2, "Blue surgical mask": 0.1, "Cloth mask": 0.05, "No mask": 0.0},
+    # Cost of running one air cleaner for a day, including its purchase, filters and electricity spread over its life.
+    "air_cleaner": {"None": 0.0, "Small portable HEPA air cleaner": 1.0, "Medium portable HEPA air cleaner": 1.5, "Large portable HEPA air cleaner": 2.5, "DIY box-fan filter (Corsi-Rosenthal box)": 0.8},
+    # Cost of heating or cooling one additional m³/h of outdoor air, per hour.
+    "ventilation": 0.002,
+    # Value of one lost occupant-hour, when occupancy is capped or sessions are shortened.
+    "occupant_hour": 5.0
+}
@@ -0,0 +1,140 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for infector counts driven by community prevalence, used when the number of infectors in a space is not known.
+# If each of the N occupants is infectious with probability p (the prevalence), the number of infectors I is Binomial(N, p). The risk of each
+# susceptible, given I infectors, is 1 - (1 - P₁)^I, where P₁ is the risk from one infector, for the Wells-Riley and residual risk models alike.
+# The expected risk, and the distribution of new infections, are then sums over every possible I, weighted by its probability.
+#
+# Only the values of I (and of the new infections) that carry non-negligible probability are kept, so the sums stay fast for occupancies in the
+# tens of thousands. The probabilities come from a table of log-factorials, so no special functions are needed.
+
+# Imports.
+import math
+
+import numpy as np
+
+# The most probability that may be dropped from the tails of a distribution.
+TAIL_MASS = 1e-12
+
+# The number of standard deviations either side of the mean that is evaluated before the tails are dropped. Far beyond TAIL_MASS.
+WINDOW_SD = 12
+
+# The largest number of (infector count, new infections) pairs evaluated at once, which keeps memory bounded for large occupancies.
+CHUNK_CELLS = 2**22
+
+#====================================================================================================================================================
+# BINOMIAL DISTRIBUTIONS:
+#====================================================================================================================================================
+
+def _log_factorials(n):
+    """
+    This function returns ln(k!) for k = 0 to n.
+    """
+    return np.r_[0.0, np.cumsum(np.log(np.arange(1, n + 1)))]
+
+def _window(n, p):
+    """
+    This function returns the range of counts [lo, hi] that holds all but a negligible part of Binomial(n, p).
+    """
+    mean, sd = n * p, np.sqrt(n * p * (1 - p))
+    lo = np.clip(np.floor(mean - WINDOW_SD * sd - WINDOW_SD), 0, n).astype(int)
+    hi = np.clip(np.ceil(mean + WINDOW_SD * sd + WINDOW_SD), 0, n).astype(int)
+    return lo, hi
+
+def _log_pmf(k, n, p, log_fact):
+    """
+    This function returns the log-probability of k successes from Binomial(n, p), broadcast over the inputs. Counts outside [0, n] get -inf.
+    """
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        valid = (k >= 0) & (k <= n)
+        k_, nk = np.where(valid, k, 0), np.where(valid, n - k, 0)
+        # The terms k ln(p) and (n - k) ln(1 - p) are 0 when their count is 0, even if p is 0 or 1.
+        log_p = np.where(k_ > 0, k_ * np.log(p), 0.0) + np.where(nk > 0, nk * np.log1p(-p), 0.0)
+        return np.where(valid, log_fact[n] - log_fact[k_] - log_fact[nk] + log_p, -np.inf)
+
+def _trim(k, pmf, tail):
+    """
+    This function drops the values at either end of a distribution whose total probability is below the tail mass, and renormalises the rest.
+    """
+    cdf = np.cumsum(pmf)
+    keep = (cdf > tail / 2) & (cdf[-1] - cdf + pmf > tail / 2)
+    k, pmf = k[keep], pmf[keep]
+    return k, pmf / pmf.sum()
+
+def infector_pmf(occupancy, prevalence, tail = TAIL_MASS):
+    """
+    This function returns the distribution of the number of infectors among the occupants, Binomial(occupancy, prevalence).
+
+    Args:
+        occupancy (int): The number of occupants.
+        prevalence (float): The probability that any occupant is infectious.
+        tail (float, optional): The most probability that may be dropped from the tails. Defaults to TAIL_MASS.
+
+    Returns:
+        NumPy array: The numbers of infectors with non-negligible probability.
+        NumPy array: Their probabilities, which sum to 1.
+    """
+    occupancy = int(occupancy)
+    lo, hi = _window(occupancy, prevalence)
+    k = np.arange(lo, hi + 1)
+    pmf = np.exp(_log_pmf(k, occupancy, prevalence, _log_factorials(occupancy)))
+    return _trim(k, pmf, tail)
+
+#====================================================================================================================================================
+# EXPECTED OUTCOMES:
+#====================================================================================================================================================
+
+def outcomes(occupancy, prevalence, risk_one, tail = TAIL_MASS, distribution = True):
+    """
+    This function calculates the expected infectors, risk and new infections when the number of infectors is Binomial(occupancy, prevalence).
+
+    Args:
+        occupancy (int): The number of occupants, infectors and susceptibles alike.
+        prevalence (float): The probability that any occupant is infectious.
+        risk_one (float): The risk of one susceptible from one infector (P₁), from the model.
+        tail (float, optional): The most probability that may be dropped from the tails. Defaults to TAIL_MASS.
+        distribution (bool, optional): Whether to calculate the distribution of new infections. Defaults to True.
+
+    Returns:
+        dict: 'infectors' and 'infector_pmf' (see infector_pmf), 'risk' (the risk of one susceptible for each number of infectors),
+            'expected_infectors', 'prob_no_infector', 'expected_infections', 'mean_risk' (the expected infections per expected susceptible), and,
+            if requested, 'infections' and 'infection_pmf' (the distribution of new infections, including the chance of no infectors at all).
+    """
+    occupancy = int(occupancy)
+    counts, weights = infector_pmf(occupancy, prevalence, tail)
+
+    # Each infector adds the same hazard, -ln(1 - P₁), so the risk with I infectors is 1 - e^(-I * hazard).
+    hazard = -math.log1p(-min(float(risk_one), 1 - 1e-16))
+    risk = -np.expm1(-counts * hazard)
+    susceptibles = occupancy - counts
+    expected_infections = float(np.sum(weights * susceptibles * risk))
+    expected_susceptibles = float(np.sum(weights * susceptibles))
+
+    result = {
+        "infectors": counts,
+        "infector_pmf": weights,
+        "risk": risk,
+        "expected_infectors": occupancy * prevalence,
+        "prob_no_infector": math.exp(occupancy * math.log1p(-prevalence)) if prevalence < 1 else 0.0,
+        "expected_infections": expected_infections,
+        "mean_risk": expected_infections / expected_susceptibles if expected_susceptibles > 0 else 0.0,
+    }
+    if not distribution:
+        return result
+
+    # For each number of infectors, the new infections are Binomial(susceptibles, risk). Their mixture is evaluated over the range of new
+    # infections that any of them can reach, in chunks of rows to bound memory.
+    lo, hi = _window(susceptibles, risk)
+    grid = np.arange(lo.min(), hi.max() + 1)
+    log_fact = _log_factorials(occupancy)
+    pmf = np.zeros(grid.size)
+    rows = max(1, CHUNK_CELLS // grid.size)
+    for start in range(0, counts.size, rows):
+        chunk = slice(start, start + rows)
+        log_pmf = _log_pmf(grid, susceptibles[chunk, None], risk[chunk, None], log_fact)
+        pmf += weights[chunk] @ np.exp(log_pmf)
+
+    result["infections"], result["infection_pmf"] = _trim(grid, pmf, tail)
+    return result
@@ -0,0 +1,296 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for sharded jobs, which split a large sweep (engine/sweep.py) or ensemble (engine/epidemic.py) across several machines.
+# A job is a JSON file that fully describes the work. It is split into N shards, each a self-contained JSON file with a contiguous range of the
+# job's work units: the chunks of a sweep, or the blocks of scenarios of an ensemble. Every unit is evaluated exactly as it would be on one
+# machine, with the same inputs and the same random stream, so the merged results are bit-identical to a single-machine run.
+#
+# No cluster service is needed. Copy the shard files to the machines (or use a shared filesystem), run one command per shard, copy the outputs
+# back next to the shard files, and merge:
+#
+#     python -m engine.shards split job.json --shards 8 --dir shards
+#     python -m engine.shards run shards/shard-0003.json          (on each machine, for each shard)
+#     python -m engine.shards merge shards
+
+# Imports.
+import argparse
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from engine import epidemic, sweep
+
+# The kinds of job that can be sharded.
+KINDS = ["sweep", "ensemble"]
+
+#====================================================================================================================================================
+# JOBS:
+#====================================================================================================================================================
+
+def sweep_job(model, axes, outputs = None, dtype = "float32", chunk_cells = sweep.CHUNK_CELLS, backend = "numpy"):
+    """
+    This function describes a sweep as a job. The inputs are the same as sweep.run. The backend is pinned in the job, so every shard computes
+    with the same kernels whatever the size of its chunks or the backends installed on its machine.
+
+    Returns:
+        dict: The job.
+
+    Raises:
+        ValueError: If the sweep is invalid, see sweep.plan.
+    """
+    return {"kind": "sweep", "sweep": sweep.plan(model, axes, outputs, dtype, chunk_cells, backend)}
+
+def ensemble_job(rooms, population, days, scenarios, seed = None, block_size = epidemic.BLOCK_SCENARIOS, **kwargs):
+    """
+    This function describes an ensemble as a job. The inputs are the same as epidemic.run_ensemble.
+
+    Returns:
+        dict: The job.
+
+    Raises:
+        ValueError: If a scenario input is unknown.
+    """
+    scenarios, _ = epidemic.scenario_arrays(scenarios)
+    return {
+        "kind": "ensemble",
+        "rooms": {key: np.asarray(vals, dtype = float).tolist() for key, vals in rooms.items()},
+        "population": int(population),
+        "days": int(days),
+        "scenarios": {key: vals.tolist() for key, vals in scenarios.items()},
+        "seed": seed,
+        "block_size": int(block_size),
+        "options": kwargs,
+    }
+
+def job_id(job):
+    """
+    This function returns a short fingerprint of a job, which ties its shards and their outputs together.
+
+    Args:
+        job (dict): The job.
+
+    Returns:
+        str: The fingerprint.
+    """
+    return hashlib.sha256(json.dumps(job, sort_keys = True).encode()).hexdigest()[:16]
+
+def units(job):
+    """
+    This function returns the number of work units of a job: the chunks of a sweep, or the blocks of scenarios of an ensemble.
+
+    Args:
+        job (dict): The job.
+
+    Returns:
+        int: The number of work units.
+
+    Raises:
+        ValueError: If the kind of job is unknown.
+    """
+    if job["kind"] == "sweep":
+        return job["sweep"]["chunks"]
+    if job["kind"] == "ensemble":
+        _, n = epidemic.scenario_arrays(job["scenarios"])
+        return -(-n // job["block_size"])
+    raise ValueError(f"Unknown kind of job '{job['kind']}'. Use any of: {', '.join(KINDS)}")
+
+def _ensemble_inputs(job):
+    """
+    This function returns the inputs of epidemic.simulate_block for an ensemble job, with the room classes as NumPy arrays.
+    """
+    rooms = {key: np.asarray(vals, dtype = float) for key, vals in job["rooms"].items()}
+    return rooms, job["population"], job["days"], job["scenarios"]
+
+#====================================================================================================================================================
+# SPLITTING:
+#====================================================================================================================================================
+
+def split(job, shards, directory):
+    """
+    This function splits a job into shards, and writes the job and one self-contained file per shard into a directory.
+    Each shard gets a contiguous range of the work units, and the ranges are as even as possible.
+
+    Args:
+        job (dict): The job, see sweep_job and ensemble_job.
+        shards (int): The number of shards. There are never more shards than work units.
+        directory (str): The directory to write to. It is created if it does not exist.
+
+    Returns:
+        list of str: The shard files.
+    """
+    total = units(job)
+    shards = max(1, min(int(shards), total))
+    os.makedirs(directory, exist_ok = True)
+    with open(os.path.join(directory, "job.json"), "w") as f:
+        json.dump(job, f)
+
+    files = []
+    for i in range(shards):
+        shard = {"job_id": job_id(job), "shard": i, "shards": shards, "start": i * total // shards, "stop": (i + 1) * total // shards, "job": job}
+        files.append(os.path.join(directory, f"shard-{i:04d}.json"))
+        with open(files[-1], "w") as f:
+            json.dump(shard, f)
+    return files
+
+#====================================================================================================================================================
+# RUNNING:
+#====================================================================================================================================================
+
+def _chunk_offset(meta, index):
+    """
+    This function returns the position of the first result of a sweep chunk in the flattened result cube.
+    """
+    shape = sweep.cube_shape(meta)
+    start = tuple(i.start if isinstance(i, slice) else i for i in index) + (0,) * (len(shape) - len(index))
+    return int(np.ravel_multi_index(start, shape))
+
+def run_shard(shard_file, directory = None):
+    """
+    This function runs one shard, and writes its output and a completion marker next to the shard file (or into another directory).
+    The output of a sweep shard is its contiguous part of the flattened result cube, written one chunk at a time. The output of an ensemble shard
+    is the results of its blocks of scenarios.
+
+    Args:
+        shard_file (str): The shard file, see split.
+        directory (str, optional): The directory to write to. Defaults to None (the shard file's directory).
+
+    Returns:
+        str: The output file.
+    """
+    with open(shard_file) as f:
+        shard = json.load(f)
+    job = shard["job"]
+    directory = directory or os.path.dirname(os.path.abspath(shard_file))
+    name = os.path.join(directory, f"shard-{shard['shard']:04d}")
+
+    if job["kind"] == "sweep":
+        meta = job["sweep"]
+        split_axis, index = sweep.chunk_index(meta)
+        chunks = index[shard["start"]:shard["stop"]]
+        first = _chunk_offset(meta, chunks[0])
+        last = _chunk_offset(meta, index[shard["stop"]]) if shard["stop"] < len(index) else int(np.prod(sweep.cube_shape(meta)))
+        output = name + ".npy"
+        part = np.lib.format.open_memmap(output, mode = "w+", dtype = meta["dtype"], shape = (last - first,))
+        for chunk in chunks:
+            results = sweep.evaluate(meta, split_axis, chunk).ravel()
+            offset = _chunk_offset(meta, chunk) - first
+            part[offset:offset + results.size] = results
+        part.flush()
+        del part
+    else:
+        rooms, population, days, scenarios = _ensemble_inputs(job)
+        results = epidemic.concatenate([epidemic.simulate_block(rooms, population, days, scenarios, b, job["block_size"], job["seed"], **job["options"])
+                                        for b in range(shard["start"], shard["stop"])])
+        output = name + ".npz"
+        np.savez(output, **results)
+
+    # The marker is only written once the output is complete, so merge never uses a partial output.
+    with open(name + ".done.json", "w") as f:
+        json.dump({key: shard[key] for key in ("job_id", "shard", "shards", "start", "stop")}, f)
+    return output
+
+#====================================================================================================================================================
+# MERGING:
+#====================================================================================================================================================
+
+def merge(directory, out = None):
+    """
+    This function combines the outputs of every shard of a job into the results of a single-machine run.
+    A sweep is merged into a result cube (see sweep.open_cube) identical to the one sweep.run writes. An ensemble is merged into the results of
+    epidemic.run_ensemble, saved as a .npz file.
+
+    Args:
+        directory (str): The directory with the job, the shard outputs and their completion markers.
+        out (str, optional): Where to write the merged results. Defaults to None ('cube' or 'ensemble.npz' in the directory).
+
+    Returns:
+        str: The merged results.
+
+    Raises:
+        ValueError: If a shard is missing or incomplete, or belongs to another job.
+    """
+    with open(os.path.join(directory, "job.json")) as f:
+        job = json.load(f)
+    total = units(job)
+
+    markers = []
+    for path in sorted(glob.glob(os.path.join(directory, "shard-*.done.json"))):
+        with open(path) as f:
+            markers.append(json.load(f))
+    others = [m["shard"] for m in markers if m["job_id"] != job_id(job)]
+    if others:
+        raise ValueError(f"The outputs of shards {others} belong to another job.")
+    markers.sort(key = lambda m: m["start"])
+    covered = [(m["start"], m["stop"]) for m in markers]
+    expected = list(zip([0] + [stop for _, stop in covered], [start for start, _ in covered] + [total]))
+    gaps = [f"{a}-{b}" for a, b in expected if a != b]
+    if gaps or not markers:
+        raise ValueError(f"Some work units have no complete shard output: {', '.join(gaps) or f'0-{total}'}. Run the missing shards first.")
+
+    if job["kind"] == "sweep":
+        meta = dict(job["sweep"], chunks_done = job["sweep"]["chunks"])
+        out = out or os.path.join(directory, "cube")
+        os.makedirs(out, exist_ok = True)
+        cube = np.lib.format.open_memmap(os.path.join(out, sweep.DATA_FILE), mode = "w+", dtype = meta["dtype"], shape = sweep.cube_shape(meta))
+        flat = cube.reshape(-1)
+        offset = 0
+        # Each output is copied in pieces, so memory stays bounded however large the cube.
+        for m in markers:
+            part = np.load(os.path.join(directory, f"shard-{m['shard']:04d}.npy"), mmap_mode = "r")
+            for start in range(0, part.size, sweep.CHUNK_CELLS):
+                piece = part[start:start + sweep.CHUNK_CELLS]
+                flat[offset + start:offset + start + piece.size] = piece
+            offset += part.size
+        cube.flush()
+        sweep.write_meta(out, meta)
+    else:
+        out = out or os.path.join(directory, "ensemble.npz")
+        parts = []
+        for m in markers:
+            with np.load(os.path.join(directory, f"shard-{m['shard']:04d}.npz")) as part:
+                parts.append({key: part[key] for key in part.files})
+        np.savez(out, **epidemic.concatenate(parts))
+
+    return out
+
+#====================================================================================================================================================
+# COMMAND LINE:
+#====================================================================================================================================================
+
+def main(argv = None):
+    """
+    This function splits, runs or merges a sharded job from the command line.
+
+    Args:
+        argv (list of str, optional): The command-line arguments. Defaults to None (sys.argv).
+    """
+    parser = argparse.ArgumentParser(description = "Split a sweep or ensemble into shards, run a shard, or merge the shards' outputs.")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    split_parser = commands.add_parser("split", help = "Split a job file into shard files.")
+    split_parser.add_argument("job", help = "The job file (JSON), see sweep_job and ensemble_job.")
+    split_parser.add_argument("--shards", type = int, required = True, help = "Number of shards.")
+    split_parser.add_argument("--dir", required = True, help = "Directory for the shard files.")
+    run_parser = commands.add_parser("run", help = "Run one shard.")
+    run_parser.add_argument("shard", help = "The shard file.")
+    run_parser.add_argument("--dir", help = "Directory for the output. Defaults to the shard file's directory.")
+    merge_parser = commands.add_parser("merge", help = "Merge the outputs of every shard.")
+    merge_parser.add_argument("dir", help = "Directory with the job, the shard outputs and their completion markers.")
+    merge_parser.add_argument("--out", help = "Where to write the merged results.")
+    args = parser.parse_args(argv)
+
+    if args.command == "split":
+        with open(args.job) as f:
+            files = split(json.load(f), args.shards, args.dir)
+        print(f"Wrote {len(files)} shards to {args.dir}")
+    elif args.command == "run":
+        print(f"Wrote {run_shard(args.shard, args.dir)}")
+    else:
+        print(f"Wrote {merge(args.dir, args.out)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the spatially resolved room model.
+# Instead of assuming the air is well-mixed, the room is divided into a 2D or 3D grid of cells, and quanta spread from each infector by (eddy)
+# diffusion and an optional uniform airflow, while ventilation and the other loss terms remove them everywhere in the room.
+#
+# The walls, floor and ceiling do not let quanta through, so the diffusion operator is diagonalised by a cosine basis on every axis. In that
+# basis each mode simply decays exponentially, so between two changes of the sources (infectors arriving or leaving) the concentration and the dose
+# are integrated exactly. There is no time step and no stability limit. A uniform airflow is added by operator splitting: the air is shifted along
+# the flow in real space (semi-Lagrangian advection, also unconditionally stable), with clean supply air entering on the upstream walls.
+# The average concentration over the room is exactly that of the well-mixed model, which is a useful check.
+# All times are in hours, lengths in m, emission rates in quanta/h and ventilation rates in m³/h.
+
+# Imports.
+import functools
+
+import numpy as np
+
+# The default eddy diffusivity of indoor air (m²/h). 0.005 m²/s is typical of a mechanically ventilated room.
+DEFAULT_DIFFUSIVITY = 0.005 * 3600
+
+# The default height of the breathing zone of a seated person (m).
+DEFAULT_BREATHING_HEIGHT = 1.2
+
+# The default time step (h) when there is an airflow, which is the only case that needs time steps.
+DEFAULT_ADVECTION_STEP = 5 / 60
+
+#====================================================================================================================================================
+# GEOMETRY:
+#====================================================================================================================================================
+
+def cosine_basis(n):
+    """
+    This function creates the orthonormal cosine basis (the DCT-II matrix) of one axis of 'n' cells with zero-flux walls.
+
+    Args:
+        n (int): The number of cells.
+
+    Returns:
+        NumPy array: The basis, with shape (n modes, n cells). Its transpose is its inverse.
+    """
+    k = np.arange(n)[:, None]
+    basis = np.cos(np.pi * k * (np.arange(n) + 0.5) / n) * np.sqrt(2 / n)
+    basis[0] /= np.sqrt(2)
+    return basis
+
+@functools.lru_cache(maxsize = 16) # Every room geometry is only set up once.
+def geometry(lengths, shape):
+    """
+    This function sets up the grid of a room: the cell size, the cell centres, and the cosine basis and diffusion eigenvalues of each axis.
+
+    Args:
+        lengths (tuple of float): The length, width and height of the room (m).
+        shape (tuple of int): The number of cells along each axis. Use one cell in height for a 2D model.
+
+    Returns:
+        dict: 'cell' (the cell size along each axis), 'centres' (the cell centres along each axis), 'bases' (the cosine basis of each axis)
+            and 'eigen' (the eigenvalues of the negative Laplacian on the grid, broadcast to the shape of the grid).
+    """
+    cell = tuple(length / n for length, n in zip(lengths, shape))
+    bases = tuple(cosine_basis(n) for n in shape)
+    # The eigenvalues of the finite-volume Laplacian with zero-flux walls, so the scheme is exactly the implicit scheme integrated in time.
+    axis_eigen = [(2 / h**2) * (1 - np.cos(np.pi * np.arange(n) / n)) for h, n in zip(cell, shape)]
+    eigen = axis_eigen[0][:, None, None] + axis_eigen[1][None, :, None] + axis_eigen[2][None, None, :]
+    centres = tuple((np.arange(n) + 0.5) * h for h, n in zip(cell, shape))
+    return {"cell": cell, "centres": centres, "bases": bases, "eigen": eigen}
+
+def cell_index(position, lengths, shape):
+    """
+    This function finds the grid cell that contains each position.
+
+    Args:
+        position (NumPy array): The positions, with shape (..., 3) or (..., 2) (m). Missing heights are not indexed.
+        lengths (tuple of float): The length, width and height of the room (m).
+        shape (tuple of int): The number of cells along each axis.
+
+    Returns:
+        tuple of NumPy array: The cell index along each axis given.
+    """
+    position = np.asarray(position, dtype = float)
+    return tuple(np.clip((position[..., i] / lengths[i] * shape[i]).astype(int), 0, shape[i] - 1) for i in range(position.shape[-1]))
+
+def _transform(values, bases, inverse = False):
+    """
+    This function applies the cosine basis of every axis to a grid, i.e. a 3D DCT-II, or its inverse.
+
+    Args:
+        values (NumPy array): The grid, with shape (nx, ny, nz).
+        bases (tuple of NumPy array): The cosine basis of each axis.
+        inverse (bool, optional): Whether to go from modes back to cells. Defaults to False.
+
+    Returns:
+        NumPy array: The transformed grid.
+    """
+    for axis, basis in enumerate(bases):
+        values = np.moveaxis(np.tensordot(basis.T if inverse else basis, values, axes = (1, axis)), 0, axis)
+    return values
+
+def _advect(values, shift):
+    """
+    This function moves a grid along a uniform airflow by linear interpolation. Air entering from outside the room is clean.
+
+    Args:
+        values (NumPy array): The grid, with shape (nx, ny, nz).
+        shift (tuple of float): The distance moved along each axis, in cells.
+
+    Returns:
+        NumPy array: The moved grid.
+    """
+    for axis, s in enumerate(shift):
+        if s == 0:
+            continue
+        n = values.shape[axis]
+        origin = np.arange(n) - s # Where the air in each cell came from.
+        lo = np.floor(origin).astype(int)
+        frac = (origin - lo).reshape([-1 if a == axis else 1 for a in range(values.ndim)])
+        padded = np.concatenate([np.zeros_like(values.take([0], axis)), values, np.zeros_like(values.take([0], axis))], axis = axis)
+        take = lambda idx: padded.take(np.clip(idx, -1, n) + 1, axis = axis) # Indices outside the room read the clean padding.
+        values = (1 - frac) * take(lo) + frac * take(lo + 1)
+    return values
+
+#====================================================================================================================================================
+# EXACT INTEGRATION:
+#====================================================================================================================================================
+
+def _decay_integrals(rate, duration):
+    """
+    This function calculates the integrals needed to step each mode exactly, for a mode that decays at 'rate' under a constant source.
+    Small rates use a series, so the uniform mode of a room without any removal is also exact.
+
+    Args:
+        rate (NumPy array): The decay rate of each mode (/h).
+        duration (float): The length of the step (h).
+
+    Returns:
+        NumPy array: exp(-rate * duration).
+        NumPy array: The integral of exp(-rate * s) over the step.
+        NumPy array: The integral of (1 - exp(-rate * s)) / rate over the step.
+    """
+    x = rate * duration
+    small = x < 1e-6
+    safe = np.where(small, 1.0, rate)
+    decay = np.exp(-x)
+    first = np.where(small, duration * (1 - x / 2), -np.expm1(-x) / safe)
+    second = np.where(small, duration**2 / 2 * (1 - x / 3), (duration - first) / safe)
+    return decay, first, second
+
+#====================================================================================================================================================
+# SIMULATION:
+#====================================================================================================================================================
+
+def simulate(lengths, shape, positions, emission, Q, end, arrival = 0.0, departure = None, diffusivity = DEFAULT_DIFFUSIVITY, velocity = None,
+             breathing_height = DEFAULT_BREATHING_HEIGHT, output_times = None, step = DEFAULT_ADVECTION_STEP):
+    """
+    This function simulates the concentration of quanta and the inhaled dose across a room with one or more infectors.
+
+    Args:
+        lengths (tuple of float): The length, width and height of the room (m).
+        shape (tuple of int): The number of cells along each axis, e.g. (100, 100, 30). Use one cell in height for a 2D model.
+        positions (NumPy array): The position (x, y, z) of each infector, with shape (infectors, 3) (m).
+        emission (float or NumPy array): The quanta emission rate of each infector (quanta/h).
+        Q (float): The equivalent ventilation rate of the room (m³/h), see losses.equivalent_ventilation.
+        end (float): The end of the simulation (h).
+        arrival (float or NumPy array, optional): When each infector arrives (h). Defaults to 0.
+        departure (float or NumPy array, optional): When each infector leaves (h). Defaults to None (they stay until the end).
+        diffusivity (float, optional): The eddy diffusivity of the air (m²/h). Defaults to DEFAULT_DIFFUSIVITY.
+        velocity (tuple of float, optional): A uniform airflow from supply to exhaust along each axis (m/h). Defaults to None.
+            The air carried out of the room by this flow is part of the ventilation rate Q, not in addition to it.
+        breathing_height (float, optional): The height of the breathing zone reported on the maps (m). Defaults to DEFAULT_BREATHING_HEIGHT.
+        output_times (NumPy array, optional): When to report the maps (h). Defaults to None (only at the end).
+        step (float, optional): The time step when there is an airflow (h). Defaults to DEFAULT_ADVECTION_STEP.
+
+    Returns:
+        dict: 'x' and 'y' (the cell centres, m), 'times' (the output times, h),
+            'concentration' and 'dose' (the concentration, quanta/m³, and the dose, quanta.h/m³, in the breathing zone at each output time,
+            with shape (times, nx, ny)), 'mean_concentration' (the room average at each output time), and
+            'room_dose' (the dose in every cell at the end, with shape (nx, ny, nz)).
+    """
+    lengths, shape = tuple(float(x) for x in lengths), tuple(int(n) for n in shape)
+    grid = geometry(lengths, shape)
+    bases = grid["bases"]
+    V = np.prod(lengths)
+
+    # Each infector is a source of quanta in the cell it occupies, expressed in the cosine basis.
+    positions = np.atleast_2d(np.asarray(positions, dtype = float))
+    n_sources = positions.shape[0]
+    emission, arrival = (np.broadcast_to(np.asarray(x, dtype = float), (n_sources,)) for x in (emission, arrival))
+    departure = np.broadcast_to(np.asarray(end if departure is None else departure, dtype = float), (n_sources,))
+    ix, iy, iz = cell_index(positions, lengths, shape)
+    source_modes = np.einsum("j,aj,bj,cj->jabc", emission / np.prod(grid["cell"]), bases[0][:, ix], bases[1][:, iy], bases[2][:, iz])
+
+    # Air carried through the room by the airflow counts towards the ventilation rate. The rest of the removal acts uniformly.
+    velocity = np.zeros(3) if velocity is None else np.asarray(velocity, dtype = float)
+    through_flow = np.sum(np.abs(velocity) * V / np.array(lengths))
+    rate = diffusivity * grid["eigen"] + max(Q - through_flow, 0.0) / V
+
+    # The breathing zone is one horizontal plane of cells.
+    iz_breathing = cell_index([[0, 0, breathing_height]], lengths, shape)[2][0]
+    plane = lambda modes: bases[0].T @ np.tensordot(modes, bases[2][:, iz_breathing], axes = (2, 0)) @ bases[1]
+
+    output_times = np.unique(np.clip(np.atleast_1d(np.asarray(end if output_times is None else output_times, dtype = float)), 0, end))
+    # The sources only change when an infector arrives or leaves, and the airflow needs regular steps.
+    breaks = [output_times, arrival, departure, [0.0, end]]
+    if velocity.any():
+        breaks.append(np.arange(0, end, step))
+    breaks = np.unique(np.clip(np.concatenate([np.atleast_1d(b) for b in breaks]), 0, end))
+
+    modes = np.zeros(shape)
+    dose_modes = np.zeros(shape)
+    conc_out, dose_out, mean_out = [], [], []
+    norm = np.sqrt(np.prod(shape)) # The uniform mode, divided by this, is the room average.
+    cells_per_hour = velocity / np.array(grid["cell"])
+    pending = np.zeros(3) # Airflow not yet applied, in cells. Consecutive half steps are applied together, saving two transforms per step.
+    integrals = {} # The decay integrals of each step length, as most steps have the same length.
+
+    def flush(modes, pending):
+        if not pending.any():
+            return modes
+        return _transform(_advect(_transform(modes, bases, inverse = True), tuple(pending)), bases)
+
+    def report(modes):
+        conc_out.append(plane(modes))
+        dose_out.append(plane(dose_modes))
+        mean_out.append(modes[0, 0, 0] / norm)
+
+    for t0, t1 in zip(breaks[:-1], breaks[1:]):
+        if t0 in output_times:
+            modes, pending = flush(modes, pending), np.zeros(3)
+            report(modes)
+        duration = t1 - t0
+
+        active = (arrival <= t0) & (departure > t0)
+        source = np.tensordot(active.astype(float), source_modes, axes = (0, 0))
+
+        # Half of the airflow before the diffusion step and half after (Strang splitting).
+        half = cells_per_hour * duration / 2
+        modes, pending = flush(modes, pending + half), half
+
+        if duration not in integrals:
+            integrals[duration] = _decay_integrals(rate, duration)
+        decay, first, second = integrals[duration]
+        dose_modes += modes * first + source * second
+        modes = modes * decay + source * first
+
+    modes = flush(modes, pending)
+    if end in output_times:
+        report(modes)
+
+    return {
+        "x": grid["centres"][0],
+        "y": grid["centres"][1],
+        "times": output_times,
+        "concentration": np.array(conc_out),
+        "dose": np.array(dose_out),
+        "mean_concentration": np.array(mean_out),
+        "room_dose": _transform(dose_modes, bases, inverse = True),
+    }
+
+def dose_risk(dose, p):
+    """
+    This function converts an inhaled dose of quanta into a probability of infection, as in the Wells-Riley model.
+
+    Args:
+        dose (float or NumPy array): The time-integrated concentration (quanta.h/m³).
+        p (float): The breathing rate of the susceptibles (m³/h).
+
+    Returns:
+        float or NumPy array: The probability of infection.
+    """
+    return -np.expm1(-p * np.asarray(dose))
+
+def seat_grid(lengths, rows, columns, margin = 0.5):
+    """
+    This function spaces seats evenly across the floor of a room, in rows and columns.
+
+    Args:
+        lengths (tuple of float): The length and width of the room (m).
+        rows (int): The number of rows of seats, along the length of the room.
+        columns (int): The number of seats in each row, along the width of the room.
+        margin (float, optional): The gap between the seats and the walls (m). Defaults to 0.5.
+
+    Returns:
+        NumPy array: The (x, y) position of each seat, with shape (rows * columns, 2).
+    """
+    xs = np.linspace(margin, lengths[0] - margin, rows) if rows > 1 else np.array([lengths[0] / 2])
+    ys = np.linspace(margin, lengths[1] - margin, columns) if columns > 1 else np.array([lengths[1] / 2])
+    return np.stack(np.meshgrid(xs, ys, indexing = "ij"), axis = -1).reshape(-1, 2)
@@ -0,0 +1,134 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the superposition engine, which handles infectors that arrive and depart at different times.
+# The well-mixed concentration equation, v dC/dt = E(t) - Q C, is linear, so the concentration produced by several infectors is the sum of the
+# concentrations produced by each one. An infector emitting e quanta per unit time between its arrival a and departure d adds:
+#
+#     C(t) = (e / Q) * [S(t - a) - S(t - d)],              S(s) = 1 - e^(-(Q / v) * s) for s > 0, otherwise 0
+#     ∫₀ᵗ C = (e / Q) * [F(t - a) - F(t - d)],            F(s) = s - (1 - e^(-(Q / v) * s)) / (Q / v) for s > 0, otherwise 0
+#
+# Every infector event is evaluated at every time point as one matrix product, so there is no loop over time steps or infectors.
+# With a single event that arrives at 0 and departs at T, the risk equals Equations 9 and 11 of the Residual Risk page.
+
+# Imports.
+import numpy as np
+
+from engine import presets
+
+# The largest number of (time point, infector event) pairs evaluated at once, which keeps memory bounded for long schedules.
+CHUNK_CELLS = 2**22
+
+#====================================================================================================================================================
+# INFECTOR EVENTS:
+#====================================================================================================================================================
+
+def mask_factors(mask):
+    """
+    This function converts mask choices into the fraction of quanta that passes through the mask.
+
+    Args:
+        mask (float, str or array-like): Fractions, names from presets.msk_eff_dict, or a mixture of both.
+
+    Returns:
+        NumPy array: The fraction of quanta passing through each mask.
+    """
+    mask = np.asarray(mask, dtype = object)
+    return np.vectorize(lambda m: presets.msk_eff_dict[m] if isinstance(m, str) else float(m), otypes = [float])(mask)
+
+def emission_rates(quanta, mask = 1.0, count = 1):
+    """
+    This function calculates the quanta emission rate of each infector event.
+
+    Args:
+        quanta (float or array-like): The unmasked quanta emission rate of one infector.
+        mask (float, str or array-like, optional): The mask worn, see mask_factors. Defaults to 1.0 (no mask).
+        count (int or array-like, optional): The number of identical infectors in each event. Defaults to 1.
+
+    Returns:
+        NumPy array: The total emission rate of each event.
+    """
+    return np.asarray(quanta, dtype = float) * mask_factors(mask) * np.asarray(count, dtype = float)
+
+#====================================================================================================================================================
+# SUPERPOSITION:
+#====================================================================================================================================================
+
+def _responses(lags, lam):
+    """
+    This function evaluates the step response S and its integral F (see above) for a matrix of time lags.
+
+    Args:
+        lags (NumPy array): Time since the start of each step.
+        lam (float): The air exchange rate (Q / v).
+
+    Returns:
+        NumPy array: S(lags)
+        NumPy array: F(lags)
+    """
+    lags = np.maximum(lags, 0) # S(s) and F(s) are 0 before the step starts.
+    S = -np.expm1(-lam * lags)
+    return S, lags - S / lam
+
+def superpose(time_range, arrival, departure, emission, Q, v, p, start = None, end = None):
+    """
+    This function calculates the combined concentration, dose and risk produced by many infector events.
+    If the ventilation rate or room volume is 0, the results are 0, as they are on the pages.
+
+    Args:
+        time_range (NumPy array): A NumPy array of time points.
+        arrival (array-like): The arrival time of each infector event.
+        departure (array-like): The departure time of each infector event.
+        emission (array-like): The emission rate of each infector event, see emission_rates.
+        Q (float): The ventilation rate.
+        v (float): The Room Volume.
+        p (float): The breathing rate of any susceptible individual.
+        start (float, optional): The time the susceptible arrives. Defaults to None (the start of the time range).
+        end (float, optional): The time the susceptible leaves. Defaults to None (stays until the end of the time range).
+
+    Returns:
+        dict: NumPy arrays of 'concentration' (quanta per unit volume), 'dose' (quanta inhaled so far) and 'risk' at each time point.
+
+    Raises:
+        ValueError: If an event departs before it arrives, or has a negative emission rate.
+    """
+    time_range = np.asarray(time_range, dtype = float)
+    arrival, departure, emission = np.broadcast_arrays(np.asarray(arrival, dtype = float), np.asarray(departure, dtype = float), np.asarray(emission, dtype = float))
+    arrival, departure, emission = arrival.ravel(), departure.ravel(), emission.ravel()
+
+    # An event that departs before it arrives, or emits negative quanta, would take dose away from the others.
+    backwards = np.flatnonzero(departure < arrival)
+    if backwards.size:
+        raise ValueError(f"The infector events {', '.join(map(str, backwards))} depart before they arrive.")
+    negative = np.flatnonzero(emission < 0)
+    if negative.size:
+        raise ValueError(f"The infector events {', '.join(map(str, negative))} have a negative emission rate.")
+
+    if Q == 0 or v == 0 or emission.size == 0:
+        zeros = np.zeros_like(time_range)
+        return {"concentration": zeros, "dose": zeros.copy(), "risk": zeros.copy()}
+
+    lam = Q / v
+    weights = emission / Q
+
+    # The susceptible only inhales whilst present, so the integral is evaluated at the clipped times and measured from their arrival.
+    start = time_range[0] if start is None else start
+    end = time_range[-1] if end is None else end
+    clipped = np.clip(time_range, start, end)
+    eval_times = np.concatenate([time_range, clipped, [start]])
+
+    concentration = np.empty(eval_times.size)
+    integral = np.empty(eval_times.size)
+    rows = max(1, CHUNK_CELLS // max(1, emission.size))
+
+    for lo in range(0, eval_times.size, rows): # Chunks of time points, each evaluated against every event at once.
+        t = eval_times[lo:lo + rows, None]
+        S_on, F_on = _responses(t - arrival, lam)
+        S_off, F_off = _responses(t - departure, lam)
+        concentration[lo:lo + rows] = (S_on - S_off) @ weights
+        integral[lo:lo + rows] = (F_on - F_off) @ weights
+
+    n = time_range.size
+    dose = p * (integral[n:2 * n] - integral[-1])
+    return {"concentration": concentration[:n], "dose": dose, "risk": -np.expm1(-dose)}
@@ -0,0 +1,408 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for out-of-core parameter sweeps, whose results are too large to hold in memory.
+# A sweep evaluates a model over every combination of its swept inputs, and writes the results straight into a result cube on disk. A cube is a
+# directory with two files: 'cube.npy', a NumPy array with one axis per swept input and a last axis for the model outputs, and 'axes.json', the
+# model, the values along each axis, the inputs held fixed, and how many chunks have been written.
+#
+# The cube is opened as a memory map, so only the chunk being written, sliced or aggregated is ever in memory. Each chunk is a contiguous block of
+# the cube (a run of the first axes' indices, followed by every value of the remaining axes), so it is written and read sequentially.
+# A sweep that is interrupted can be resumed from the last chunk written. With the default of float32 results, a 10⁹-cell cube with one output
+# takes 4 GB on disk, and about 100 MB of memory while it is written.
+#
+# Usage:
+#     axes = {"Q": np.linspace(10, 1000, 100), "v": np.linspace(20, 2000, 100), "T": np.linspace(0.25, 8, 100), "I": [1, 2, 5], "p": 0.5, ...}
+#     sweep.run("cubes/residual", "residual", axes, outputs = ["P_comb"])
+#     sweep.aggregate("cubes/residual", over = ["T", "t"], how = "max")
+
+# Imports.
+import json
+import os
+
+import numpy as np
+
+from engine import backend as backends
+
+# The inputs and outputs of each model, in the order the backend takes and returns them. Units are up to the caller, as in engine/models.py.
+MODELS = {
+    "wells_riley": {"inputs": ["I", "p", "q", "t", "Q"], "outputs": ["P"]},
+    "residual": {"inputs": ["I", "T", "p", "q", "Q", "v", "t"], "outputs": ["P1", "P2", "P_comb", "P_inf"]},
+}
+
+# The default number of cells evaluated at once, which bounds memory (about 100 MB in float64, with the intermediate arrays).
+CHUNK_CELLS = 2**22
+
+# The aggregations supported by aggregate, with the NumPy reduction and how partial results are combined.
+AGGREGATIONS = {
+    "sum": (np.sum, np.add),
+    "mean": (np.sum, np.add), # The sum, divided by the number of cells at the end.
+    "min": (np.min, np.minimum),
+    "max": (np.max, np.maximum),
+}
+
+# The names of the files in a cube directory.
+DATA_FILE = "cube.npy"
+META_FILE = "axes.json"
+
+#====================================================================================================================================================
+# CHUNKS:
+#====================================================================================================================================================
+
+def chunks(shape, chunk_cells = CHUNK_CELLS):
+    """
+    This function splits an array into contiguous chunks of at most 'chunk_cells' cells (or one row of the last axis, if that is larger).
+    Each chunk is a run of indices along one axis (the split axis), with single indices on the axes before it and every index on the axes after it.
+
+    Args:
+        shape (tuple of int): The shape of the array.
+        chunk_cells (int, optional): The most cells in a chunk. Defaults to CHUNK_CELLS.
+
+    Returns:
+        int: The split axis.
+        list of tuple: The index of each chunk, in the order they are stored.
+    """
+    # The split axis is the first axis whose trailing axes fit in one chunk.
+    trailing = np.cumprod((list(shape[1:]) + [1])[::-1])[::-1] # The number of cells after each axis.
+    split = next((k for k in range(len(shape)) if trailing[k] <= chunk_cells), len(shape) - 1)
+    block = int(max(1, min(shape[split], chunk_cells // trailing[split])))
+
+    index = []
+    for prefix in np.ndindex(*shape[:split]):
+        for start in range(0, shape[split], block):
+            index.append(tuple(int(i) for i in prefix) + (slice(start, min(start + block, shape[split])),))
+    return split, index
+
+def _chunk_inputs(values, split, index):
+    """
+    This function returns the swept values of one chunk, shaped to broadcast over it. The chunk has one axis for the split axis and one for each
+    axis after it, so the axes before the split axis are single values.
+    """
+    ndim = len(values) - split
+    inputs = []
+    for axis, vals in enumerate(values):
+        if axis < split:
+            inputs.append(vals[index[axis]])
+        else:
+            shape = [1] * ndim
+            shape[axis - split] = -1
+            inputs.append((vals[index[axis]] if axis == split else vals).reshape(shape))
+    return inputs
+
+#====================================================================================================================================================
+# RESULT CUBES:
+#====================================================================================================================================================
+
+def read_meta(path):
+    """
+    This function reads the metadata of a result cube.
+    """
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+def write_meta(path, meta):
+    """
+    This function writes the metadata of a result cube. It is written to a temporary file first, so an interrupted write never corrupts it.
+    """
+    tmp = os.path.join(path, META_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent = 1)
+    os.replace(tmp, os.path.join(path, META_FILE))
+
+def open_cube(path, mode = "r"):
+    """
+    This function opens a result cube as a memory map, without reading its results.
+
+    Args:
+        path (str): The cube directory.
+        mode (str, optional): "r" to read, or "r+" to read and write. Defaults to "r".
+
+    Returns:
+        NumPy memmap: The results, with one axis per swept input and a last axis for the outputs.
+        dict: The metadata: 'model', 'axes' (the values along each swept axis, in order), 'outputs', 'fixed' (the inputs held fixed), 'dtype',
+            'chunk_cells', 'backend', 'chunks' and 'chunks_done'.
+    """
+    return np.load(os.path.join(path, DATA_FILE), mmap_mode = mode), read_meta(path)
+
+#====================================================================================================================================================
+# SWEEPS:
+#====================================================================================================================================================
+
+def plan(model, axes, outputs = None, dtype = "float32", chunk_cells = CHUNK_CELLS, backend = "numpy"):
+    """
+    This function checks the inputs of a sweep, and describes it as the metadata of its result cube.
+    The sweep is fully determined by its metadata, so a sweep run from it anywhere (see run and engine/shards.py) gives the same results.
+
+    Args:
+        model (str): "wells_riley" or "residual", see MODELS.
+        axes (dict): The value, or array of values, of every input of the model. For the residual model, 't' may be left out, in which case
+            only P1 and P_inf are available.
+        outputs (list of str, optional): The outputs to store. Defaults to None (every available output).
+        dtype (str, optional): The data type of the results. Defaults to "float32", which halves the size on disk.
+        chunk_cells (int, optional): The most cells of the swept axes evaluated at once. Defaults to CHUNK_CELLS.
+        backend (str, optional): The compute backend, see engine/backend.py. It is pinned rather than picked by chunk size (or IARA_BACKEND), as
+            the backends may differ in the last bits, and a sweep must give the same bytes on every machine. Defaults to "numpy".
+
+    Returns:
+        dict: The metadata, see open_cube, with no chunks done.
+
+    Raises:
+        ValueError: If the model, an input, an output or the backend is unknown, an input is missing, or no input is swept.
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown model '{model}'. Use any of: {', '.join(MODELS)}")
+    inputs = MODELS[model]["inputs"]
+    optional = {"t"} if model == "residual" else set()
+
+    unknown = sorted(set(axes) - set(inputs))
+    missing = [name for name in inputs if name not in axes and name not in optional]
+    if unknown or missing:
+        raise ValueError(f"Unknown inputs: {', '.join(unknown) or 'none'}. Missing inputs: {', '.join(missing) or 'none'}.")
+
+    available = MODELS[model]["outputs"] if model != "residual" or "t" in axes else ["P1", "P_inf"]
+    outputs = list(outputs or available)
+    if not set(outputs) <= set(available):
+        raise ValueError(f"Unknown outputs: {', '.join(sorted(set(outputs) - set(available)))}. Use any of: {', '.join(available)}")
+
+    swept = {name: np.atleast_1d(np.asarray(vals, dtype = float)) for name, vals in axes.items() if np.ndim(vals) > 0}
+    fixed = {name: float(vals) for name, vals in axes.items() if np.ndim(vals) == 0}
+    if not swept:
+        raise ValueError("Sweep at least one input, by giving it an array of values.")
+    if backend not in backends.BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Use any of: {', '.join(backends.BACKENDS)}")
+
+    meta = {
+        "model": model,
+        "axes": {name: vals.tolist() for name, vals in swept.items()},
+        "outputs": outputs,
+        "fixed": fixed,
+        "dtype": np.dtype(dtype).name,
+        "chunk_cells": int(chunk_cells),
+        "backend": backend,
+        "chunks": 0,
+        "chunks_done": 0,
+    }
+    meta["chunks"] = len(chunk_index(meta)[1])
+    return meta
+
+def cube_shape(meta):
+    """
+    This function returns the shape of a result cube, with one axis per swept input and a last axis for the outputs.
+
+    Args:
+        meta (dict): The metadata, see plan.
+
+    Returns:
+        tuple of int: The shape.
+    """
+    return tuple(len(vals) for vals in meta["axes"].values()) + (len(meta["outputs"]),)
+
+def chunk_index(meta):
+    """
+    This function returns the split axis and the index of every chunk of a sweep, see chunks.
+
+    Args:
+        meta (dict): The metadata, see plan.
+
+    Returns:
+        int: The split axis.
+        list of tuple: The index of each chunk, in the order they are stored.
+    """
+    return chunks(cube_shape(meta)[:-1], max(1, meta["chunk_cells"]))
+
+def evaluate(meta, split, index):
+    """
+    This function evaluates the model over one chunk of a sweep.
+
+    Args:
+        meta (dict): The metadata, see plan.
+        split (int): The split axis, see chunk_index.
+        index (tuple): The index of the chunk, see chunk_index.
+
+    Returns:
+        NumPy array: The results of the chunk, in the sweep's data type, with the outputs on the last axis.
+
+    Raises:
+        ValueError: If the sweep's backend is not installed here.
+    """
+    model = meta["model"]
+    backend = meta.get("backend", "numpy") # Cubes written before the backend was recorded were run with NumPy.
+    if backend not in backends.available():
+        raise ValueError(f"The sweep was planned for the '{backend}' backend, which is not installed here. Install it, or plan the sweep again.")
+    values = [np.asarray(vals, dtype = float) for vals in meta["axes"].values()]
+    chunk = dict(meta["fixed"], **dict(zip(meta["axes"], _chunk_inputs(values, split, index))))
+    args = [chunk.get(name) for name in MODELS[model]["inputs"]]
+    if model == "wells_riley":
+        results = (backends.wells_riley_risk(*args, backend = backend),)
+    else:
+        results = backends.residual_risk(*args, backend = backend)
+
+    # Each output is broadcast to the full chunk, in case it does not depend on every swept input (e.g. P1 does not depend on t).
+    dims = np.broadcast_shapes(*(np.shape(a) for a in chunk.values()))
+    picks = [MODELS[model]["outputs"].index(name) for name in meta["outputs"]]
+    return np.stack([np.broadcast_to(results[pick], dims) for pick in picks], axis = -1).astype(meta["dtype"])
+
+def run(path, model, axes, outputs = None, dtype = "float32", chunk_cells = CHUNK_CELLS, resume = True, progress = None, backend = "numpy"):
+    """
+    This function evaluates a model over every combination of the swept inputs, and writes the results into a result cube on disk.
+    Inputs given as a single value are held fixed. The swept axes are stored in the order given, so put the inputs that later slices fix first.
+
+    Args:
+        path (str): The cube directory. It is created if it does not exist.
+        model, axes, outputs, dtype, chunk_cells, backend: The sweep, see plan.
+        resume (bool, optional): Whether to carry on from the last chunk written, if the cube exists for the same sweep. Defaults to True.
+        progress (callable, optional): Called after each chunk with the number of chunks done and the total. Defaults to None.
+
+    Returns:
+        NumPy memmap: The results, see open_cube.
+        dict: The metadata, see open_cube.
+
+    Raises:
+        ValueError: If the sweep is invalid, see plan.
+    """
+    meta = plan(model, axes, outputs, dtype, chunk_cells, backend)
+    split, index = chunk_index(meta)
+
+    # An existing cube is only resumed if it is for exactly the same sweep.
+    os.makedirs(path, exist_ok = True)
+    data_path = os.path.join(path, DATA_FILE)
+    done = 0
+    if resume and os.path.exists(data_path) and os.path.exists(os.path.join(path, META_FILE)):
+        old = read_meta(path)
+        if {k: v for k, v in old.items() if k != "chunks_done"} == {k: v for k, v in meta.items() if k != "chunks_done"}:
+            done = old["chunks_done"]
+    if done:
+        cube = np.load(data_path, mmap_mode = "r+")
+    else:
+        cube = np.lib.format.open_memmap(data_path, mode = "w+", dtype = meta["dtype"], shape = cube_shape(meta))
+    meta["chunks_done"] = done
+    write_meta(path, meta)
+
+    for n in range(done, len(index)):
+        cube[index[n]] = evaluate(meta, split, index[n])
+
+        # The chunk is flushed to disk before it is marked as done, so a resumed sweep never skips unwritten results.
+        cube.flush()
+        meta["chunks_done"] = n + 1
+        write_meta(path, meta)
+        if progress is not None:
+            progress(n + 1, len(index))
+
+    return cube, meta
+
+#====================================================================================================================================================
+# SLICES AND AGGREGATES:
+#====================================================================================================================================================
+
+def _axis_index(meta, name, value):
+    """
+    This function finds the index (or indices) of a value (or list of values) along a swept axis. A slice of values is kept as given.
+    """
+    vals = np.asarray(meta["axes"][name])
+    if isinstance(value, slice):
+        return value
+    wanted = np.atleast_1d(np.asarray(value, dtype = float))
+    found = [np.flatnonzero(np.isclose(vals, w)) for w in wanted]
+    if any(f.size == 0 for f in found):
+        raise ValueError(f"Axis '{name}' has no value {value}. Its values run from {vals.min():g} to {vals.max():g}.")
+    index = np.array([f[0] for f in found])
+    return int(index[0]) if np.ndim(value) == 0 else index
+
+def select(path, output = None, **where):
+    """
+    This function reads a slice of a result cube, picking values along any of the swept axes. Only the slice is read from disk.
+
+    Args:
+        path (str): The cube directory.
+        output (str, optional): The output to read. Defaults to None (every output, on the last axis).
+        **where: For any swept axis, a value (which drops the axis), a list of values, or a slice of indices.
+
+    Returns:
+        NumPy array: The slice.
+        dict: The values along each remaining axis.
+
+    Raises:
+        ValueError: If an axis or output is unknown, or a value is not on its axis.
+    """
+    cube, meta = open_cube(path)
+    unknown = sorted(set(where) - set(meta["axes"]))
+    if unknown:
+        raise ValueError(f"Unknown axes: {', '.join(unknown)}. The cube's axes are: {', '.join(meta['axes'])}")
+
+    index = [_axis_index(meta, name, where[name]) if name in where else slice(None) for name in meta["axes"]]
+    out = slice(None) if output is None else _output_index(meta, output)
+
+    # Lists of indices are applied one axis at a time, as NumPy would otherwise pair them up.
+    result = cube[tuple(i if not isinstance(i, np.ndarray) else slice(None) for i in index) + (out,)]
+    axis = 0
+    for i in index:
+        if isinstance(i, np.ndarray):
+            result = np.take(result, i, axis = axis)
+        if not isinstance(i, int):
+            axis += 1
+
+    remaining = {name: np.asarray(meta["axes"][name])[i] for name, i in zip(meta["axes"], index) if not isinstance(i, int)}
+    return np.array(result), remaining
+
+def _output_index(meta, output):
+    """
+    This function finds the position of an output on the last axis of a result cube.
+    """
+    if output not in meta["outputs"]:
+        raise ValueError(f"Unknown output '{output}'. The cube's outputs are: {', '.join(meta['outputs'])}")
+    return meta["outputs"].index(output)
+
+def aggregate(path, over, how = "mean", output = None, chunk_cells = CHUNK_CELLS):
+    """
+    This function reduces a result cube over some of its swept axes, e.g. the worst risk over every exposure time, reading it one chunk at a time.
+
+    Args:
+        path (str): The cube directory.
+        over (list of str): The swept axes to reduce over.
+        how (str, optional): "mean", "sum", "min" or "max". Defaults to "mean".
+        output (str, optional): The output to reduce. Defaults to None (every output, on the last axis).
+        chunk_cells (int, optional): The most cells read at once. Defaults to CHUNK_CELLS.
+
+    Returns:
+        NumPy array: The result, with the axes that were not reduced over.
+        dict: The values along each remaining axis.
+
+    Raises:
+        ValueError: If an axis, output or aggregation is unknown, or the cube is not complete.
+    """
+    if how not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation '{how}'. Use any of: {', '.join(AGGREGATIONS)}")
+    cube, meta = open_cube(path)
+    names = list(meta["axes"])
+    unknown = sorted(set(over) - set(names))
+    if unknown:
+        raise ValueError(f"Unknown axes: {', '.join(unknown)}. The cube's axes are: {', '.join(names)}")
+    if meta["chunks_done"] < meta["chunks"]:
+        raise ValueError(f"The cube is not complete ({meta['chunks_done']} of {meta['chunks']} chunks). Resume the sweep first.")
+
+    reduce, combine = AGGREGATIONS[how]
+    out = slice(None) if output is None else slice(_output_index(meta, output), _output_index(meta, output) + 1)
+    n_out = len(range(*out.indices(len(meta["outputs"]))))
+    reduced = [axis for axis, name in enumerate(names) if name in over]
+    kept = [axis for axis in range(len(names)) if axis not in reduced]
+
+    shape = cube.shape[:-1]
+    split, index = chunks(shape, max(1, chunk_cells // n_out))
+    result = None
+    for chunk in index:
+        block = np.asarray(cube[chunk + (Ellipsis, out)], dtype = float)
+        # Within a chunk, the split axis and the axes after it are array axes. The axes before it are single indices.
+        partial = reduce(block, axis = tuple(axis - split for axis in reduced if axis >= split)) if any(a >= split for a in reduced) else block
+        target = tuple(chunk[axis] for axis in kept if axis <= split) # The part of the result this chunk contributes to.
+        if result is None:
+            fill = {"min": np.inf, "max": -np.inf}.get(how, 0.0)
+            result = np.full(tuple(shape[axis] for axis in kept) + (n_out,), fill)
+        result[target] = combine(result[target], partial)
+
+    if how == "mean":
+        result /= np.prod([shape[axis] for axis in reduced])
+    if output is not None:
+        result = result[..., 0]
+
+    return result, {names[axis]: np.asarray(meta["axes"][names[axis]]) for axis in kept}
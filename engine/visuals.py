@@ -0,0 +1,99 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the size limits and scaled visuals used by the pages of our web-app.
+# No output element should grow with the numbers a user types in, so every graphic, graph and table shown on a page is capped here.
+
+# Imports.
+import math
+
+import numpy as np
+
+# The most icons drawn in a waffle graphic. Above this, each icon represents several people.
+MAX_ICONS = 100
+
+# The most time points in any graph.
+MAX_TIME_POINTS = 1000
+
+# The most rows shown in any table. Full results remain available as downloads.
+MAX_TABLE_ROWS = 1000
+
+#====================================================================================================================================================
+# WAFFLE GRAPHICS:
+#====================================================================================================================================================
+
+def scaled_units(counts, max_icons = MAX_ICONS):
+    """
+    This function shares a fixed number of icons between groups of people, in proportion with the size of each group.
+    Any group with at least one person gets at least one icon, so a single infection among thousands is still visible.
+
+    Args:
+        counts (list of int): The number of people in each group.
+        max_icons (int, optional): The most icons to draw in total. Defaults to MAX_ICONS.
+
+    Returns:
+        list of int: The number of icons for each group.
+        int: The number of people each icon represents.
+    """
+    counts = np.maximum(np.asarray(counts, dtype = float), 0)
+    total = counts.sum()
+    if total == 0:
+        return [0] * counts.size, 1
+
+    per_icon = max(1, math.ceil(total / max_icons))
+    n_icons = math.ceil(total / per_icon)
+
+    # Largest remainder method: round each share down, then hand out the remaining icons to the largest remainders.
+    quotas = counts / total * n_icons
+    icons = np.floor(quotas).astype(int)
+    for i in np.argsort(quotas - icons)[::-1][:n_icons - icons.sum()]:
+        icons[i] += 1
+
+    # Groups that would otherwise vanish take an icon from the largest group.
+    for i in np.nonzero((counts > 0) & (icons == 0))[0]:
+        icons[np.argmax(icons)] -= 1
+        icons[i] += 1
+
+    return icons.tolist(), per_icon
+
+def infection_waffle(infected, uninfected, max_icons = MAX_ICONS):
+    """
+    This function builds the infected/uninfected graphic with a fixed maximum number of icons, whatever the population size.
+
+    Args:
+        infected (int): The number of new infections.
+        uninfected (int): The number of susceptibles who remain uninfected.
+        max_icons (int, optional): The most icons to draw. Defaults to MAX_ICONS.
+
+    Returns:
+        str: The graphic, as markdown.
+        str: A caption explaining the icons and giving the exact counts.
+    """
+    (infected_icons, uninfected_icons), per_icon = scaled_units([infected, uninfected], max_icons)
+    graphic = "🧍‍♂️" * infected_icons + " **|** " + "🧍" * uninfected_icons
+
+    if per_icon == 1:
+        caption = "🧍‍♂️ - Infected | 🧍 - Uninfected"
+    else:
+        caption = f"🧍‍♂️ - Infected | 🧍 - Uninfected | Each icon represents about {per_icon:,} people ({infected:,} infected, {uninfected:,} uninfected)"
+    return graphic, caption
+
+#====================================================================================================================================================
+# GRAPHS:
+#====================================================================================================================================================
+
+def time_grid(max_time, resolution, max_points = MAX_TIME_POINTS):
+    """
+    This function creates the time range for a graph, with one time point every 'resolution', but no more than 'max_points' time points.
+
+    Args:
+        max_time (float): The last time point.
+        resolution (float): The preferred time between time points.
+        max_points (int, optional): The most time points. Defaults to MAX_TIME_POINTS.
+
+    Returns:
+        NumPy array: The time points.
+    """
+    num_time_points = min(int(max_time / resolution) + 1, max_points) # Add one to ensure the final time point is included.
+    return np.linspace(0, max_time, num_time_points)
@@ -0,0 +1,147 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the what-if overlays, which show how the risk over time would change if one input were different.
+# The user picks an input and a set of multipliers or values. Each value is a scenario, and every scenario is evaluated together with the
+# user's own inputs in one broadcast call of the curve equations, over a grid of (scenarios, time points). Ten overlays therefore cost about the
+# same as one curve, and are drawn on a single chart.
+# The inputs keep the units of the page that calls this module.
+
+# Imports.
+import numpy as np
+import pandas as pd
+
+from engine import models
+
+# The curve of each model, and the inputs a what-if can change.
+CURVES = {
+    "wells_riley": models.wells_riley_curve,
+    "residual": models.residual_risk_curve,
+}
+PARAMETERS = {
+    "wells_riley": ["I", "p", "q", "Q"],
+    "residual": ["I", "T", "p", "q", "Q", "v"],
+}
+
+# How the chosen values are applied to the user's input.
+MODES = ["multiply", "set"]
+
+# The most scenarios shown at once, so the chart stays readable.
+MAX_OVERLAYS = 10
+
+#====================================================================================================================================================
+# SCENARIOS:
+#====================================================================================================================================================
+
+def parse_values(text):
+    """
+    This function reads the multipliers or values of the what-if scenarios, typed as a list separated by commas or spaces.
+
+    Args:
+        text (str): The values, e.g. "0.5, 2, 10".
+
+    Returns:
+        list of float: The values, without repeats, in the order typed.
+
+    Raises:
+        ValueError: If a value is not a number or is negative, or if there are no values or more than MAX_OVERLAYS.
+    """
+    items = text.replace(",", " ").replace(";", " ").split()
+    try:
+        values = list(dict.fromkeys(float(item) for item in items))
+    except ValueError:
+        raise ValueError(f"Could not read '{text}' as a list of numbers, e.g. 0.5, 2, 10.") from None
+    if not values:
+        raise ValueError("Enter at least one value, e.g. 0.5, 2, 10.")
+    if len(values) > MAX_OVERLAYS:
+        raise ValueError(f"Enter at most {MAX_OVERLAYS} values.")
+    if any(not np.isfinite(value) or value < 0 for value in values):
+        raise ValueError("Every value must be zero or more.")
+    return values
+
+def scenario_values(base, values, mode = "multiply"):
+    """
+    This function applies the what-if values to the user's input.
+
+    Args:
+        base (float): The user's value of the input.
+        values (list of float): The multipliers or values, see parse_values.
+        mode (str, optional): "multiply" to multiply the user's value, or "set" to replace it. Defaults to "multiply".
+
+    Returns:
+        NumPy array: The value of the input in each scenario.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}'. Use any of: {', '.join(MODES)}")
+    values = np.asarray(values, dtype = float)
+    return base * values if mode == "multiply" else values
+
+def scenario_labels(name, values, mode = "multiply"):
+    """
+    This function names each scenario for the chart legend, e.g. "Quanta Emission Rate × 2".
+
+    Args:
+        name (str): The name of the input.
+        values (list of float): The multipliers or values.
+        mode (str, optional): See scenario_values. Defaults to "multiply".
+
+    Returns:
+        list of str: The names.
+    """
+    return [f"{name} {'×' if mode == 'multiply' else '='} {value:g}" for value in values]
+
+#====================================================================================================================================================
+# CURVES:
+#====================================================================================================================================================
+
+def overlay_curves(model, time_range, parameter, values, **inputs):
+    """
+    This function calculates the risk over time of every scenario in one broadcast call of the model's curve equations.
+    The scenario values run along the first axis and the time points along the second.
+
+    Args:
+        model (str): The model, a key of CURVES.
+        time_range (NumPy array): The time points.
+        parameter (str): The input that changes, one of PARAMETERS[model].
+        values (NumPy array): The value of that input in each scenario, see scenario_values.
+        **inputs: Every other input of the curve, e.g. I, p, q and Q for "wells_riley".
+
+    Returns:
+        NumPy array: The risk at each time point, with shape (scenarios, time points).
+
+    Raises:
+        ValueError: If the model or the input is unknown.
+    """
+    if model not in CURVES:
+        raise ValueError(f"Unknown model '{model}'. Use any of: {', '.join(CURVES)}")
+    if parameter not in PARAMETERS[model]:
+        raise ValueError(f"Unknown input '{parameter}' for the {model} model. Use any of: {', '.join(PARAMETERS[model])}")
+
+    time_range = np.asarray(time_range, dtype = float)
+    values = np.asarray(values, dtype = float)
+    inputs[parameter] = values[:, None] # A column of scenarios, broadcast against the row of time points.
+    risk = CURVES[model](time_range[None, :], **inputs)
+    return np.broadcast_to(risk, (values.size, time_range.size))
+
+def overlay_table(time_range, curves, labels):
+    """
+    This function arranges the curves of every scenario as one long table, for a chart with one line per scenario.
+
+    Args:
+        time_range (NumPy array): The time points.
+        curves (NumPy array): The risk of each scenario at each time point, see overlay_curves.
+        labels (list of str): The name of each scenario.
+
+    Returns:
+        Pandas DataFrame: 'time', 'risk' (%) and 'scenario', one row per scenario and time point.
+    """
+    curves = np.asarray(curves)
+    return pd.DataFrame({
+        "time": np.tile(np.asarray(time_range, dtype = float), len(labels)),
+        "risk": curves.ravel() * 100,
+        "scenario": np.repeat(labels, curves.shape[1]),
+    })
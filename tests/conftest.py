@@ -0,0 +1,5 @@
+# The tests import the engine package from the root of the repository, as the pages do.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
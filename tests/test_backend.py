@@ -0,0 +1,42 @@
+# Tests for engine/backend.py.
+
+import warnings
+
+import numpy as np
+import pytest
+
+from engine import backend, models
+
+class FailingNumexpr:
+    """A stand-in for numexpr that raises the given error for every expression."""
+
+    def __init__(self, error):
+        self.error = error
+
+    def evaluate(self, expression):
+        raise self.error
+
+@pytest.fixture(autouse = True)
+def fresh_warnings(monkeypatch):
+    monkeypatch.setattr(backend, "_warned", set())
+
+def test_missing_backend_warns_once_and_falls_back():
+    q = np.linspace(0, 100, 7)
+    with warnings.catch_warnings(record = True) as caught:
+        warnings.simplefilter("always")
+        for _ in range(3):
+            risk = backend.wells_riley_risk(1, 0.5, q, 1, 100, backend = "not-installed")
+    assert len(caught) == 1 and "not installed" in str(caught[0].message)
+    np.testing.assert_array_equal(risk, models.wells_riley_risk(1, 0.5, q, 1, 100))
+
+def test_expected_failure_falls_back(monkeypatch):
+    monkeypatch.setattr(backend, "numexpr", FailingNumexpr(TypeError("unsupported dtype")))
+    with pytest.warns(RuntimeWarning, match = "numexpr backend failed"):
+        risks = backend.residual_risk(1, 2, 0.5, 10, 300, 150, 1.5, backend = "numexpr")
+    for risk, expected in zip(risks, models.residual_risk(1, 2, 0.5, 10, 300, 150, 1.5)):
+        np.testing.assert_array_equal(risk, expected)
+
+def test_unexpected_failure_is_raised(monkeypatch):
+    monkeypatch.setattr(backend, "numexpr", FailingNumexpr(ZeroDivisionError("bug")))
+    with pytest.raises(ZeroDivisionError):
+        backend.wells_riley_risk(1, 0.5, 10, 1, 100, backend = "numexpr")
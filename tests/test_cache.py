@@ -0,0 +1,112 @@
+# Tests for engine/cache.py.
+
+import numpy as np
+import pytest
+
+from engine import cache
+
+def block(kilobytes):
+    """An array whose stored size is the given number of kilobytes, plus the array header."""
+    return np.zeros(kilobytes * 128)
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A fake monotonic clock, moved forward by setting clock.now."""
+    class Clock:
+        now = 0.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: Clock.now)
+    return Clock
+
+def test_lru_evicts_by_bytes():
+    size = cache.nbytes(block(10))
+    store = cache.ResultCache(3 * size, ttl = 0)
+    for key in "abc":
+        store.put(key, block(10))
+    assert store.bytes == 3 * size
+    store.get("a") # "b" is now the least recently used.
+    store.put("d", block(10))
+    assert [entry["key"] for entry in store.entries()] == ["d", "a", "c"]
+    assert store.stats()["evictions"] == 1 and store.bytes == 3 * size
+
+    # One large entry evicts as many small entries as it needs.
+    store.put("e", block(25))
+    assert [entry["key"] for entry in store.entries()] == ["e"]
+    assert store.stats()["evictions"] == 4 and store.bytes == cache.nbytes(block(25))
+
+def test_replacing_an_entry_counts_its_size_once():
+    store = cache.ResultCache(10**6, ttl = 0)
+    store.put("a", block(10))
+    store.put("a", block(20))
+    assert store.bytes == cache.nbytes(block(20)) and store.stats()["entries"] == 1
+
+def test_entries_expire_after_the_ttl(clock):
+    store = cache.ResultCache(10**6, ttl = 60)
+    store.put("a", 1)
+    clock.now = 60
+    assert store.get("a") == (True, 1)
+    clock.now = 60.5
+    assert store.get("a") == (False, None)
+    assert store.stats()["expirations"] == 1 and store.bytes == 0
+
+def test_zero_ttl_keeps_entries(clock):
+    store = cache.ResultCache(10**6, ttl = 0)
+    store.put("a", 1)
+    clock.now = 10**9
+    assert store.get("a") == (True, 1)
+
+def test_entry_larger_than_the_cache_is_not_stored():
+    store = cache.ResultCache(cache.nbytes(block(10)), ttl = 0)
+    store.put("a", block(10))
+    store.put("b", block(11))
+    assert store.get("b") == (False, None)
+    assert [entry["key"] for entry in store.entries()] == ["a"] and store.stats()["evictions"] == 0
+
+@pytest.mark.parametrize("a, b", [(30, 30.0), (0.1 + 0.2, 0.3), (np.float32(2.5), 2.5), ([1, 2], (1.0, 2.0)), ({"x": 1, "y": 2}, {"y": 2.0, "x": 1})])
+def test_equal_inputs_share_a_key(a, b):
+    assert cache.scenario_key("f", a) == cache.scenario_key("f", b)
+    assert cache.scenario_key("f", x = a) == cache.scenario_key("f", x = b)
+
+@pytest.mark.parametrize("a, b", [(0.3, 0.3001), ("1", 1), (True, 1), (None, 0), (np.array([1.0, 2.0]), np.array([[1.0, 2.0]]))])
+def test_different_inputs_do_not_share_a_key(a, b):
+    assert cache.scenario_key("f", a) != cache.scenario_key("f", b)
+
+def test_keys_depend_on_the_name_and_argument_names():
+    assert cache.scenario_key("f", 1) != cache.scenario_key("g", 1)
+    assert cache.scenario_key("f", x = 1) != cache.scenario_key("f", y = 1)
+
+def test_unhashable_inputs_raise():
+    with pytest.raises(TypeError):
+        cache.scenario_key("f", object())
+
+def test_cached_serves_hits_and_freezes_nested_arrays():
+    store = cache.ResultCache(10**6, ttl = 0)
+    calls = []
+
+    @cache.cached(cache = store)
+    def simulate(n):
+        calls.append(n)
+        return {"dose": np.arange(n, dtype = float), "steps": (np.zeros(2), [np.ones(3)])}
+
+    first = simulate(3)
+    assert simulate(3.0) is first and calls == [3]
+    for array in (first["dose"], first["steps"][0], first["steps"][1][0]):
+        with pytest.raises(ValueError):
+            array[0] = -1
+
+def test_version_depends_on_constants_and_defaults():
+    def scale(x, factor = 2):
+        return x * 3
+    def other_constant(x, factor = 2):
+        return x * 4
+    def other_default(x, factor = 5):
+        return x * 3
+    def other_keyword_default(x, *, factor = 2):
+        return x * 3
+    versions = {cache._version(func) for func in (scale, other_constant, other_default, other_keyword_default)}
+    assert len(versions) == 4
+
+    def nested(x):
+        return (lambda y: y + 1)(x)
+    def other_nested(x):
+        return (lambda y: y + 2)(x)
+    assert cache._version(nested) != cache._version(other_nested)
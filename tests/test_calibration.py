@@ -0,0 +1,44 @@
+# Tests for engine/calibration.py.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import calibration
+
+EVENTS = pd.DataFrame({"disease": "COVID-19", "activity": "Resting", "duration": [2.0, 4.0], "infectors": [1, 2], "susceptibles": [20, 30],
+                       "cases": [3, 0], "ach": [1.0, 3.0], "volume": [200.0, 50.0]})
+
+def test_event_arrays_converts_ach_and_attack_rates():
+    arrays = calibration.event_arrays(EVENTS.drop(columns = "cases").assign(attack_rate = [0.15, 0.1]))
+    np.testing.assert_array_equal(arrays["ventilation"], [200, 150])
+    np.testing.assert_array_equal(arrays["cases"], [3, 3])
+    np.testing.assert_array_equal(arrays["mask"], [1, 1])
+
+def test_zero_susceptibles_are_allowed():
+    arrays = calibration.event_arrays(EVENTS.assign(susceptibles = [0, 30], cases = [0, 1]))
+    np.testing.assert_array_equal(arrays["susceptibles"], [0, 30])
+
+@pytest.mark.parametrize("column", ["duration", "infectors", "ach", "volume"])
+@pytest.mark.parametrize("value", [0, -1, np.nan])
+def test_non_positive_inputs_raise(column, value):
+    with pytest.raises(ValueError, match = f"'{column}' above 0"):
+        calibration.event_arrays(EVENTS.assign(**{column: [value, 1]}))
+
+@pytest.mark.parametrize("value", [0, -10])
+def test_non_positive_ventilation_raises(value):
+    with pytest.raises(ValueError, match = "'ventilation' above 0"):
+        calibration.event_arrays(EVENTS.drop(columns = ["ach", "volume"]).assign(ventilation = [100, value]))
+
+def test_negative_susceptibles_raise():
+    with pytest.raises(ValueError, match = "at least 0 susceptibles"):
+        calibration.event_arrays(EVENTS.assign(susceptibles = [-5, 30], cases = [0, 0]))
+
+@pytest.mark.parametrize("cases", [[21, 0], [-1, 0]])
+def test_cases_outside_the_susceptibles_raise(cases):
+    with pytest.raises(ValueError, match = "between 0 and 'susceptibles' cases"):
+        calibration.event_arrays(EVENTS.assign(cases = cases))
+
+def test_missing_columns_raise():
+    with pytest.raises(ValueError, match = "ventilation \\(or ach and volume\\)"):
+        calibration.event_arrays(EVENTS.drop(columns = "volume"))
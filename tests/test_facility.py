@@ -0,0 +1,122 @@
+# Tests for engine/facility.py.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import facility, models
+
+# Rooms with several sessions, given out of order. Room C's ventilation is off after its first session, which has the only infector.
+TIMETABLE = pd.DataFrame({
+    "room": ["A", "B", "A", "A", "B", "C", "C"],
+    "start": [13.0, 9.0, 8.0, 10.5, 14.0, 9.0, 11.0],
+    "end": [17.0, 12.0, 10.0, 12.0, 15.5, 10.0, 12.5],
+    "occupants": [30, 12, 25, 20, 8, 10, 15],
+    "infectors": [1, 2, 1, 0, 1, 1, 0],
+    "quanta": [25.0, 10.0, 25.0, 25.0, 40.0, 25.0, 25.0],
+    "ventilation": [150.0, 60.0, 150.0, 300.0, 60.0, 100.0, 0.0],
+    "volume": [200.0, 90.0, 200.0, 200.0, 90.0, 50.0, 50.0],
+})
+
+def brute_force(timetable, period, periods = 200, steps = 2000):
+    """The concentration at the start of each session and the dose over it, by stepping every room through many periods on a fine grid."""
+    carryover, dose = {}, {}
+    for room, sessions in timetable.sort_values("start").groupby("room"):
+        rows = list(sessions.itertuples())
+        C = 0.0
+        for n in range(periods):
+            for k, row in enumerate(rows):
+                after = rows[k + 1].start if k + 1 < len(rows) else rows[0].start + period
+                lam = row.ventilation / row.volume
+                steady = row.infectors * row.quanta / row.ventilation if row.ventilation > 0 else 0.0
+                if n == periods - 1:
+                    carryover[row.Index] = C
+                    times = np.linspace(0, row.end - row.start, steps)
+                    curve = steady + (C - steady) * np.exp(-lam * times)
+                    dose[row.Index] = np.trapz(curve, times)
+                C = steady + (C - steady) * np.exp(-lam * (row.end - row.start))
+                C *= np.exp(-lam * (after - row.end))
+    return carryover, dose
+
+def test_periodic_exposure_matches_many_periods():
+    timetable = TIMETABLE
+    result = facility.periodic_exposure(timetable, period = 24.0)
+    carryover, dose = brute_force(timetable, 24.0)
+
+    order = np.lexsort((timetable["start"], timetable["room"]))
+    index = timetable.index[order]
+    np.testing.assert_array_equal(result["room"], timetable["room"].to_numpy()[order])
+    np.testing.assert_allclose(result["carryover"], [carryover[i] for i in index], rtol = 1e-9, atol = 1e-15)
+    risk = -np.expm1(-facility.DEFAULT_BREATHING_RATE * np.array([dose[i] for i in index]))
+    np.testing.assert_allclose(result["risk"], risk, rtol = 1e-5)
+    assert (result["risk"] >= result["fresh_risk"]).all()
+
+def test_fresh_risk_is_equation_9():
+    result = facility.periodic_exposure(TIMETABLE)
+    s = facility.timetable_arrays(TIMETABLE)
+    order = np.lexsort((s["start"], s["room"]))
+    P1 = models.residual_risk(s["infectors"], s["duration"], s["breathing"], s["quanta"], s["ventilation"], s["volume"])[0][order]
+    np.testing.assert_allclose(result["fresh_risk"], P1, rtol = 1e-12)
+    susceptibles = np.maximum(s["occupants"] - s["infectors"], 0)[order]
+    np.testing.assert_allclose(result["fresh_expected_infections"], susceptibles * P1, rtol = 1e-12)
+
+def test_unventilated_session_keeps_the_quanta_left():
+    result = facility.periodic_exposure(TIMETABLE)
+    C0, risk = result["carryover"][-1], result["risk"][-1]
+    assert result["room"][-1] == "C" and C0 > 0 and result["fresh_risk"][-1] == 0
+    assert risk == pytest.approx(-np.expm1(-facility.DEFAULT_BREATHING_RATE * C0 * 1.5), rel = 1e-12)
+
+def test_infectors_need_ventilation():
+    unventilated = TIMETABLE.assign(ventilation = [150.0, 60.0, 150.0, 300.0, 60.0, 0.0, 0.0])
+    for func in (facility.timetable_arrays, facility.daily_exposure, facility.periodic_exposure):
+        with pytest.raises(ValueError, match = r"rows 5 need ventilation above 0 when there are infectors"):
+            func(unventilated)
+
+def test_daily_risk_is_never_negative_zero():
+    rooms = facility.daily_exposure(TIMETABLE.assign(infectors = 0))["rooms"]
+    assert not np.signbit(rooms["daily_risk"]).any() and (rooms["daily_risk"] == 0).all()
+
+def test_long_period_has_no_carryover_into_the_first_session():
+    # Room C's ventilation stays off after its last session, so its quanta never decay away.
+    result = facility.periodic_exposure(TIMETABLE[TIMETABLE["room"] != "C"], period = 24.0 * 365)
+    first = np.r_[True, result["room"][1:] != result["room"][:-1]]
+    np.testing.assert_allclose(result["carryover"][first], 0, atol = 1e-12)
+    np.testing.assert_allclose(result["risk"][first], result["fresh_risk"][first], rtol = 1e-9)
+
+@pytest.mark.parametrize("change, message", [
+    ({"end": [17.0, 12.0, 11.0, 12.0, 15.5, 10.0, 12.5]}, "must not overlap"),
+    ({"end": [33.0, 12.0, 10.0, 12.0, 15.5, 10.0, 12.5]}, "within one period"),
+])
+def test_invalid_timetables_raise(change, message):
+    with pytest.raises(ValueError, match = message):
+        facility.periodic_exposure(TIMETABLE.assign(**change))
+
+def test_volume_is_required():
+    with pytest.raises(ValueError, match = "volume"):
+        facility.periodic_exposure(TIMETABLE.drop(columns = "volume"))
+
+def test_changeover_gaps_pair_consecutive_sessions_in_each_room():
+    gaps = facility.changeover_gaps(TIMETABLE, threshold = 0.01)
+    # Room A's sessions are given out of order, and room C's first session has the only infector of its room.
+    assert list(gaps["room"]) == ["A", "A", "B", "C"]
+    np.testing.assert_array_equal(gaps["end"], [10.0, 12.0, 12.0, 10.0])
+    np.testing.assert_array_equal(gaps["next_start"], [10.5, 13.0, 14.0, 11.0])
+    np.testing.assert_array_equal(gaps["gap"], [0.5, 1.0, 2.0, 1.0])
+
+    s = facility.timetable_arrays(TIMETABLE)
+    for k, (out, nxt) in enumerate([(2, 3), (3, 0), (1, 4), (5, 6)]):
+        wait = models.reentry_time(s["infectors"][out], s["duration"][out], s["breathing"][nxt], s["quanta"][out], s["ventilation"][out],
+                                   s["volume"][out], 0.01, stay = s["duration"][nxt])
+        assert gaps["required_wait"][k] == pytest.approx(wait, rel = 1e-12)
+    assert gaps["required_wait"][1] == 0 # Nobody infectious in the outgoing session.
+    np.testing.assert_array_equal(gaps["safe"], gaps["gap"] >= gaps["required_wait"])
+
+def test_changeover_gaps_safe_flags_follow_the_threshold():
+    strict = facility.changeover_gaps(TIMETABLE, threshold = 1e-6)
+    lenient = facility.changeover_gaps(TIMETABLE, threshold = 0.5)
+    assert not strict["safe"][[0, 2, 3]].any() and strict["safe"][1]
+    assert lenient["safe"].all()
+
+def test_changeover_gaps_need_the_volume():
+    with pytest.raises(ValueError, match = "volume"):
+        facility.changeover_gaps(TIMETABLE.drop(columns = "volume"), threshold = 0.01)
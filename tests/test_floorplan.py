@@ -0,0 +1,87 @@
+# Tests for engine/floorplan.py.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import floorplan
+
+def shoelace(x, y):
+    """The area of one ring, one vertex at a time."""
+    return 0.5 * abs(sum(x[i] * y[(i + 1) % len(x)] - x[(i + 1) % len(x)] * y[i] for i in range(len(x))))
+
+def lay_end_to_end(rings):
+    x = np.concatenate([ring[0] for ring in rings])
+    y = np.concatenate([ring[1] for ring in rings])
+    starts = np.cumsum([0] + [len(ring[0]) for ring in rings[:-1]])
+    return x, y, starts
+
+def test_simple_shapes():
+    rings = [
+        ([0, 4, 4, 0], [0, 0, 3, 3]),                 # An open 4 × 3 rectangle.
+        ([0, 4, 4, 0, 0], [0, 0, 3, 3, 0]),           # The same rectangle, closed as in GeoJSON.
+        ([0, 0, 4, 4, 0], [0, 3, 3, 0, 0]),           # Clockwise.
+        ([0, 6, 0], [0, 0, 2]),                       # A triangle.
+        ([0, 2, 2, 1, 1, 0], [0, 0, 2, 2, 1, 1]),     # An L-shape.
+        ([1, 1, 1], [0, 5, 9]),                       # A degenerate ring.
+    ]
+    np.testing.assert_allclose(floorplan.ring_areas(*lay_end_to_end(rings)), [12, 12, 12, 6, 3, 0], atol = 1e-12)
+
+def test_random_polygons_match_one_at_a_time():
+    rng = np.random.default_rng(0)
+    rings = []
+    for n in rng.integers(3, 40, size = 300):
+        # Star-shaped polygons around a random centre, so every ring is simple.
+        angle = np.sort(rng.uniform(0, 2 * np.pi, n))
+        radius = rng.uniform(1, 20, n)
+        centre = rng.uniform(-1000, 1000, 2)
+        rings.append((centre[0] + radius * np.cos(angle), centre[1] + radius * np.sin(angle)))
+    expected = [shoelace(x, y) for x, y in rings]
+    np.testing.assert_allclose(floorplan.ring_areas(*lay_end_to_end(rings)), expected, rtol = 1e-9)
+
+def test_large_map_coordinates_keep_their_precision():
+    # A 3.7 × 2.1 m room at projected coordinates of several thousand kilometres.
+    x0, y0 = 6_378_137.0, 5_900_000.0
+    x, y, starts = lay_end_to_end([([x0, x0 + 3.7, x0 + 3.7, x0, x0], [y0, y0, y0 + 2.1, y0 + 2.1, y0])])
+    assert floorplan.ring_areas(x, y, starts)[0] == pytest.approx(3.7 * 2.1, rel = 1e-9)
+
+def rectangle(lon, lat, width, depth):
+    """A closed rectangle of width × depth metres with its corner at (lon, lat), in degrees."""
+    dlon = np.degrees(width / (floorplan.EARTH_RADIUS * np.cos(np.radians(lat))))
+    dlat = np.degrees(depth / floorplan.EARTH_RADIUS)
+    return [[lon, lat], [lon + dlon, lat], [lon + dlon, lat + dlat], [lon, lat + dlat], [lon, lat]]
+
+def feature(name, rings, building = None, **props):
+    properties = dict(props, room = name, **({"building": building} if building else {}))
+    return {"type": "Feature", "properties": properties, "geometry": {"type": "Polygon", "coordinates": rings}}
+
+def test_floorplan_areas_in_longitudes_and_latitudes():
+    plan = {"type": "FeatureCollection", "features": [
+        feature("Hall", [rectangle(-1.55, 53.8, 10, 8), rectangle(-1.5499, 53.80002, 2, 2)], height = 3), # With a 2 × 2 m stairwell.
+        feature("Office", [rectangle(-1.54, 53.8, 5, 4)], height = 2.5),
+        feature("Office", [rectangle(-1.5399, 53.8, 3, 2)], height = 2.5), # The other half of an L-shaped office.
+    ]}
+    rooms = floorplan.read_floorplan(plan).set_index("room")
+    np.testing.assert_allclose(rooms.loc[["Hall", "Office"], "area"], [76, 26], rtol = 1e-4)
+    np.testing.assert_allclose(rooms.loc[["Hall", "Office"], "volume"], [228, 65], rtol = 1e-4)
+
+def test_floorplan_units_must_fit_the_coordinates():
+    degrees = {"type": "FeatureCollection", "features": [feature("Hall", [rectangle(-1.55, 53.8, 10, 8)], height = 3)]}
+    with pytest.raises(ValueError):
+        floorplan.read_floorplan(degrees, geographic = False)
+    metres = {"type": "FeatureCollection", "features": [feature("Hall", [[[400000, 5900000], [400010, 5900000], [400010, 5900008],
+                                                                           [400000, 5900008], [400000, 5900000]]], height = 3)]}
+    with pytest.raises(ValueError):
+        floorplan.read_floorplan(metres)
+    assert floorplan.read_floorplan(metres, geographic = False)["area"].iloc[0] == pytest.approx(80)
+
+def test_attach_matches_rooms_by_building():
+    rooms = pd.DataFrame({"room": ["R1", "R1", "R2"], "building": ["North", "South", "North"], "volume": [100.0, 200.0, 300.0],
+                          "ventilation": [10.0, 20.0, 30.0]})
+    timetable = pd.DataFrame({"room": ["R1", "R1", "R2"], "building": ["South", "North", "North"], "start": 9, "end": 10,
+                              "occupants": 10, "infectors": 1, "quanta": 25})
+    attached = floorplan.attach(timetable, rooms)
+    np.testing.assert_array_equal(attached["volume"], [200, 100, 300])
+    np.testing.assert_array_equal(attached["ventilation"], [20, 10, 30])
+    with pytest.raises(ValueError, match = "more than one building"):
+        floorplan.attach(timetable.drop(columns = "building"), rooms)
@@ -0,0 +1,112 @@
+# Tests for engine/history.py.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import history
+
+DAY = 86400
+START = 1.7e9 # 2023-11-14, in seconds.
+
+def random_assessments(n, seed):
+    """Assessments of 3 buildings and 5 rooms over a week, in random order, with some risks unknown so the headline falls back."""
+    rng = np.random.default_rng(seed)
+    P1, P_comb, traditional = rng.uniform(0, 0.3, (3, n))
+    P_comb[rng.random(n) < 0.3] = np.nan
+    P1[rng.random(n) < 0.3] = np.nan
+    return {"model": "residual", "building": rng.choice(["North", "South", "East"], n), "room": rng.choice(list("ABCDE"), n),
+            "created": START + rng.permutation(n) * 7 * DAY / n, "P1": P1, "P_comb": P_comb, "traditional": traditional}
+
+@pytest.fixture(scope = "module")
+def store():
+    """A store filled in several out-of-order batches, some of which end with a partial buffer."""
+    store = history.HistoryStore(":memory:", batch_rows = 97)
+    for seed in range(4):
+        store.add_many(random_assessments(250, seed))
+        store.flush()
+    yield store
+    store.close()
+
+def sql(store, query, params = ()):
+    return store._query(query, params)
+
+def room_truth(store):
+    """Every room's count, mean, max and latest risk, straight from the assessments."""
+    return sql(store, """SELECT building, room, COUNT(*) AS assessments, AVG(risk) AS mean_risk, MAX(risk) AS max_risk,
+                         (SELECT risk FROM assessments AS b WHERE b.building = a.building AND b.room = a.room ORDER BY created DESC LIMIT 1)
+                         AS latest_risk, MAX(created) AS last_assessed FROM assessments AS a GROUP BY building, room""")
+
+@pytest.mark.parametrize("by, column", [("max", "max_risk"), ("mean", "mean_risk"), ("latest", "latest_risk")])
+def test_top_rooms_match_the_assessments(store, by, column):
+    truth = room_truth(store).sort_values(column, ascending = False, ignore_index = True)
+    top = store.top_rooms(k = 100, by = by)
+    assert len(top) == len(truth) == 15
+    np.testing.assert_allclose(top[column], truth[column], rtol = 1e-12)
+
+    merged = top.merge(truth, on = ["building", "room"], suffixes = ("", "_truth"))
+    assert len(merged) == 15
+    np.testing.assert_array_equal(merged["assessments"], merged["assessments_truth"])
+    for name in ["mean_risk", "max_risk", "latest_risk"]:
+        np.testing.assert_allclose(merged[name], merged[f"{name}_truth"], rtol = 1e-12)
+    np.testing.assert_allclose(merged["last_assessed"].astype("int64") / 1e9, merged["last_assessed_truth"], rtol = 1e-12)
+
+    assert store.top_rooms(k = 4, by = by)[["building", "room"]].equals(top[["building", "room"]].head(4))
+
+def test_top_rooms_by_building(store):
+    top = store.top_rooms(k = 100, building = "South")
+    truth = room_truth(store)
+    assert set(top["room"]) == set(truth.loc[truth["building"] == "South", "room"]) and (top["building"] == "South").all()
+
+def test_unknown_ranking_raises(store):
+    with pytest.raises(ValueError, match = "Unknown ranking"):
+        store.top_rooms(by = "median")
+
+@pytest.mark.parametrize("building, room", [(None, None), ("East", None), ("North", "C")])
+def test_trend_matches_the_assessments(store, building, room):
+    where, params = history._where(building, room)
+    truth = sql(store, f"""SELECT date(created, 'unixepoch') AS day, COUNT(*) AS assessments, AVG(risk) AS mean_risk, MAX(risk) AS max_risk
+                           FROM assessments{where} GROUP BY day ORDER BY day""", params)
+    trend = store.trend(building = building, room = room)
+    assert list(trend["day"].dt.strftime("%Y-%m-%d")) == list(truth["day"])
+    np.testing.assert_array_equal(trend["assessments"], truth["assessments"])
+    np.testing.assert_allclose(trend[["mean_risk", "max_risk"]], truth[["mean_risk", "max_risk"]], rtol = 1e-12)
+
+def test_trend_date_range(store):
+    trend = store.trend(since = START + 2 * DAY, until = START + 4 * DAY)
+    days = pd.to_datetime(sql(store, "SELECT DISTINCT date(created, 'unixepoch') AS day FROM assessments ORDER BY day")["day"])
+    assert list(trend["day"]) == [day for day in days if pd.Timestamp("2023-11-16") <= day < pd.Timestamp("2023-11-18")]
+
+def test_summary_matches_the_assessments(store):
+    truth = sql(store, """SELECT COUNT(*) AS n, COUNT(DISTINCT building) AS buildings, COUNT(DISTINCT building || '/' || room) AS rooms,
+                          MIN(created) AS first, MAX(created) AS last FROM assessments""").iloc[0]
+    summary = store.summary()
+    assert (summary["assessments"], summary["buildings"], summary["rooms"]) == (1000, truth["buildings"], truth["rooms"])
+    assert summary["first"].timestamp() == pytest.approx(truth["first"]) and summary["last"].timestamp() == pytest.approx(truth["last"])
+
+def test_empty_summary():
+    summary = history.HistoryStore(":memory:").summary()
+    assert summary == {"assessments": 0, "buildings": 0, "rooms": 0, "first": None, "last": None}
+
+def test_latest_risk_follows_the_newest_assessment_across_batches():
+    store = history.HistoryStore(":memory:")
+    store.add("residual", room = "A", created = START + 10, P_comb = 0.2)
+    store.flush()
+    store.add("residual", room = "A", created = START, P_comb = 0.5) # Older, but written later.
+    store.flush()
+    room = store.top_rooms().iloc[0]
+    assert room["latest_risk"] == 0.2 and room["max_risk"] == 0.5 and room["last_assessed"].timestamp() == START + 10
+
+    store.add("residual", room = "A", created = START + 20, P_comb = 0.1)
+    assert store.top_rooms().iloc[0]["latest_risk"] == 0.1
+
+def test_headline_falls_back_from_P_comb_to_P1_to_traditional():
+    store = history.HistoryStore(":memory:")
+    store.add_many({"model": "residual", "created": START + np.arange(5), "P_comb": [0.4, None, None, np.nan, None],
+                    "P1": [0.3, 0.2, None, 0.25, None], "traditional": [0.1, 0.1, 0.05, 0.1, None]})
+    risks = store.assessments().sort_values("created")["risk"]
+    assert list(risks) == [0.4, 0.2, 0.05, 0.25, 0.0]
+
+def test_unknown_fields_raise():
+    with pytest.raises(ValueError, match = "Unknown assessment fields: risk"):
+        history.HistoryStore(":memory:").add("residual", risk = 0.1)
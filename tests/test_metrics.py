@@ -0,0 +1,55 @@
+# Tests for engine/metrics.py.
+
+import socket
+import warnings
+
+import pytest
+from streamlit import runtime
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.memory_uploaded_file_manager import MemoryUploadedFileManager
+
+from engine import metrics
+
+@pytest.fixture
+def streamlit_runtime(monkeypatch):
+    """A Streamlit runtime of the installed version, created as 'streamlit run' does but not started, and removed afterwards."""
+    monkeypatch.setattr(runtime.Runtime, "_instance", None)
+    return runtime.Runtime(runtime.RuntimeConfig("IARA.py", None, MemoryMediaFileStorage("/media"), MemoryUploadedFileManager("/upload")))
+
+def test_active_sessions_are_read_from_the_runtime(streamlit_runtime, monkeypatch):
+    # The active session count reads Streamlit's private session manager, so this fails if the installed Streamlit moves it.
+    monkeypatch.setattr(metrics, "_sessions_warned", False)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        gauges = {gauge[0]: gauge[3] for gauge in metrics._gauges()}
+        assert gauges["iara_active_sessions"] == 0
+
+        monkeypatch.setattr(streamlit_runtime._session_mgr, "num_active_sessions", lambda: 3)
+        assert "iara_active_sessions 3" in metrics.render().splitlines()
+
+def test_no_active_sessions_outside_the_server(monkeypatch):
+    monkeypatch.setattr(runtime.Runtime, "_instance", None)
+    assert "iara_active_sessions" not in [gauge[0] for gauge in metrics._gauges()]
+
+def test_taken_port_warns(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics, "_server", None)
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        with pytest.warns(RuntimeWarning, match = "endpoint not started"):
+            assert metrics.start(port = taken.getsockname()[1], host = "127.0.0.1") is False
+
+def test_missing_session_manager_warns_once(monkeypatch):
+    class Runtime:
+        """A runtime from a Streamlit version without the private session manager."""
+
+    monkeypatch.setattr(metrics, "_sessions_warned", False)
+    monkeypatch.setattr(runtime, "exists", lambda: True)
+    monkeypatch.setattr(runtime, "get_instance", Runtime)
+    with warnings.catch_warnings(record = True) as caught:
+        warnings.simplefilter("always")
+        for _ in range(3):
+            names = [gauge[0] for gauge in metrics._gauges()]
+    assert "iara_active_sessions" not in names and "iara_cache_entries" in names
+    assert len(caught) == 1 and "session manager" in str(caught[0].message)
@@ -0,0 +1,87 @@
+# Tests for engine/mixtures.py.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import mixtures, models, presets
+
+DISEASE = "SARS-CoV-2/COVID-19"
+
+SUSCEPTIBLES = pd.DataFrame({
+    "Age group": ["Adult", "15 Years Old", "Adult", None, "Adult"],
+    "Activity": ["Sitting/Resting", "Light activity (Standing/Walking)", "Heavy activity (Exercise/Sports)", "Sleep", "Sleep"],
+    "People": [20, 8, 5, 3, 0],
+})
+
+INFECTORS = pd.DataFrame({
+    "Activity": ["Resting/Oral Breathing", "Standing/Speaking", "Light Activity/Speaking Loudly"],
+    "Mask": ["No mask", "Blue surgical mask", "KN95"],
+    "Infectors": [2, 1, 1],
+})
+
+def test_susceptible_arrays_look_up_breathing_rates():
+    groups = mixtures.susceptible_arrays(SUSCEPTIBLES)
+    # The blank row and the row without people are dropped.
+    np.testing.assert_array_equal(groups["people"], [20, 8, 5])
+    np.testing.assert_array_equal(groups["breathing"], [presets.breathing_dict["Adult"]["Sitting/Resting"],
+                                                        presets.breathing_dict["15 Years Old"]["Light activity (Standing/Walking)"],
+                                                        presets.breathing_dict["Adult"]["Heavy activity (Exercise/Sports)"]])
+    assert groups["label"][0] == "Adult, Sitting/Resting"
+
+def test_infector_arrays_apply_masks():
+    groups = mixtures.infector_arrays(INFECTORS, DISEASE)
+    quanta = presets.quanta_em_dict[DISEASE]
+    np.testing.assert_allclose(groups["emission"], [quanta["Resting/Oral Breathing"] * presets.msk_eff_dict["No mask"],
+                                                    quanta["Standing/Speaking"] * presets.msk_eff_dict["Blue surgical mask"],
+                                                    quanta["Light Activity/Speaking Loudly"] * presets.msk_eff_dict["KN95"]])
+    np.testing.assert_array_equal(groups["infectors"], [2, 1, 1])
+
+@pytest.mark.parametrize("func, table, message", [
+    (mixtures.susceptible_arrays, SUSCEPTIBLES.assign(People = 0), "at least one group"),
+    (mixtures.susceptible_arrays, SUSCEPTIBLES.assign(Activity = "Flying"), "no breathing rate"),
+    (lambda table: mixtures.infector_arrays(table, DISEASE), INFECTORS.assign(Infectors = 0), "at least one group"),
+    (lambda table: mixtures.infector_arrays(table, DISEASE), INFECTORS.assign(Mask = "Visor"), "Unknown activities or masks"),
+])
+def test_invalid_groups_raise(func, table, message):
+    with pytest.raises(ValueError, match = message):
+        func(table)
+
+def test_expected_infections_split_by_emission():
+    I, t, Q = 4, 2.0, 300.0
+    sus = mixtures.susceptible_arrays(SUSCEPTIBLES)
+    inf = mixtures.infector_arrays(INFECTORS, DISEASE)
+    q = mixtures.weighted_mean(inf["emission"], inf["infectors"])
+
+    # Every susceptible group in one vectorised call, at the total emission, as the pages do.
+    risk = models.wells_riley_risk(I, sus["breathing"], q, t, Q)
+    result = mixtures.expected_infections(risk, sus, inf)
+
+    # The hazards of the infector groups add up, so the risk is that of escaping every group, each assessed on its own.
+    alone = models.wells_riley_risk(inf["infectors"][None, :], sus["breathing"][:, None], inf["emission"][None, :], t, Q)
+    np.testing.assert_allclose(risk, -np.expm1(np.log1p(-alone).sum(axis = 1)), rtol = 1e-12)
+
+    np.testing.assert_allclose(result["by_group"], sus["people"] * risk, rtol = 1e-12)
+    np.testing.assert_allclose(result["matrix"].sum(axis = 1), result["by_group"], rtol = 1e-12)
+    np.testing.assert_allclose(result["by_infector"].sum(), result["by_group"].sum(), rtol = 1e-12)
+    # Each infector group causes the same share of every susceptible group's infections as its share of the emission, i.e. of the hazard.
+    share = inf["infectors"] * inf["emission"] / np.sum(inf["infectors"] * inf["emission"])
+    np.testing.assert_allclose(result["matrix"] / result["by_group"][:, None], np.broadcast_to(share, result["matrix"].shape), rtol = 1e-12)
+    np.testing.assert_allclose(np.log1p(-alone) / np.log1p(-alone).sum(axis = 1, keepdims = True), result["matrix"] / result["by_group"][:, None],
+                               rtol = 1e-12)
+
+def test_single_groups_match_the_single_group_model():
+    sus = mixtures.susceptible_arrays(mixtures.default_susceptibles(30))
+    inf = mixtures.infector_arrays(mixtures.default_infectors(2), DISEASE)
+    risk = models.wells_riley_risk(2, sus["breathing"], inf["emission"][0], 1.5, 200.0)
+    result = mixtures.expected_infections(risk, sus, inf)
+    expected = 30 * models.wells_riley_risk(2, presets.breathing_dict["Adult"]["Sitting/Resting"],
+                                            presets.quanta_em_dict[DISEASE]["Resting/Oral Breathing"], 1.5, 200.0)
+    np.testing.assert_allclose(result["by_group"], [expected], rtol = 1e-12)
+    np.testing.assert_allclose(result["by_infector"], [expected], rtol = 1e-12)
+
+def test_no_emission_gives_no_infections():
+    sus = mixtures.susceptible_arrays(mixtures.default_susceptibles(10))
+    inf = {"label": np.array(["Silent"]), "emission": np.array([0.0]), "infectors": np.array([1.0])}
+    result = mixtures.expected_infections(np.zeros(1), sus, inf)
+    np.testing.assert_array_equal(result["matrix"], [[0.0]])
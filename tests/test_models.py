@@ -0,0 +1,55 @@
+# Tests for engine/models.py.
+
+import numpy as np
+import pytest
+
+from engine import models
+
+def entry_risk(wait, I, T, p, q, Q, v, stay = None):
+    """The risk of a new occupant who enters 'wait' after the infectors leave and stays for 'stay', from the doses of Equation 11."""
+    dose = lambda t: -np.log1p(-models.residual_risk(I, T, p, q, Q, v, t = t)[1])
+    return -np.expm1(-(dose(np.inf if stay is None else wait + stay) - dose(wait)))
+
+def bisect_wait(threshold, *args, stay = None):
+    """The wait at which the entry risk falls to the threshold, by bisection."""
+    if entry_risk(0.0, *args, stay = stay) <= threshold:
+        return 0.0
+    lo, hi = 0.0, 1.0
+    while entry_risk(hi, *args, stay = stay) > threshold:
+        lo, hi = hi, hi * 2
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        lo, hi = (mid, hi) if entry_risk(mid, *args, stay = stay) > threshold else (lo, mid)
+    return (lo + hi) / 2
+
+CASES = [
+    # I, T, p, q, Q, v, threshold, stay
+    (1, 2.0, 0.5, 25.0, 150.0, 200.0, 0.01, None),
+    (3, 8.0, 0.5, 100.0, 60.0, 90.0, 0.001, 1.5),
+    (1, 0.5, 0.8, 970.0, 300.0, 1000.0, 0.05, 4.0),
+    (2, 1.0, 0.5, 10.0, 500.0, 50.0, 1e-4, None),
+]
+
+@pytest.mark.parametrize("I, T, p, q, Q, v, threshold, stay", CASES)
+def test_reentry_time_matches_a_bisection_on_equation_11(I, T, p, q, Q, v, threshold, stay):
+    wait = models.reentry_time(I, T, p, q, Q, v, threshold, stay = stay)
+    assert wait > 0
+    assert wait == pytest.approx(bisect_wait(threshold, I, T, p, q, Q, v, stay = stay), rel = 1e-9)
+    assert entry_risk(wait, I, T, p, q, Q, v, stay = stay) == pytest.approx(threshold, rel = 1e-9)
+
+def test_reentry_time_broadcasts():
+    cases = [case[:7] for case in CASES if case[7] is None]
+    waits = models.reentry_time(*map(np.array, zip(*cases)))
+    np.testing.assert_allclose(waits, [models.reentry_time(*case) for case in cases], rtol = 1e-12)
+
+def test_no_wait_when_already_safe():
+    assert models.reentry_time(1, 0.1, 0.5, 1.0, 1000.0, 100.0, 0.5) == 0
+    assert models.reentry_time(0, 2.0, 0.5, 25.0, 150.0, 200.0, 0.01) == 0
+
+def test_no_ventilation_never_clears():
+    assert np.isinf(models.reentry_time(1, 2.0, 0.5, 25.0, 0.0, 200.0, 0.01))
+    np.testing.assert_array_equal(models.reentry_time(1, 2.0, 0.5, 25.0, [0.0, 150.0, 0.0], [200.0, 200.0, 0.0], 0.01) == np.inf,
+                                  [True, False, True])
+
+def test_no_volume_clears_instantly():
+    assert models.reentry_time(1, 2.0, 0.5, 25.0, 150.0, 0.0, 0.01) == 0
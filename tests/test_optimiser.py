@@ -0,0 +1,82 @@
+# Tests for engine/optimiser.py.
+
+import numpy as np
+import pytest
+
+from engine import facility, optimiser
+
+def sessions(n_rooms = 30, seed = 1):
+    """Sessions of a timetable, with a different number of sessions in each room, given in no particular order."""
+    timetable = facility.example_timetable(n_rooms = n_rooms, sessions_per_room = 6, seed = seed)
+    timetable = timetable.sample(frac = 0.6, random_state = seed)
+    s = facility.timetable_arrays(timetable)
+    return s["room"], s["occupants"], np.maximum(s["infectors"], 1), s["breathing"], s["quanta"], s["duration"], s["ventilation"]
+
+def brute_force(room, occupants, infectors, p, q, t, Q, risk_cap, axes):
+    """The cost and risk of the cheapest plan of each room, from every plan of every session, one room at a time."""
+    costs, risks = [], []
+    for label in np.unique(room):
+        mine = room == label
+        session_cost, daily_cost, risk = optimiser._evaluate(occupants[mine], infectors[mine], p[mine], q[mine], t[mine], Q[mine], axes)
+        cost, risk = daily_cost + session_cost.sum(axis = 0), risk.max(axis = 0)
+        feasible = risk <= risk_cap
+        if not feasible.any():
+            costs.append(np.nan), risks.append(np.nan)
+            continue
+        cheapest = cost[feasible].min()
+        costs.append(cheapest), risks.append(risk[feasible & (cost == cheapest)].min())
+    return np.array(costs), np.array(risks)
+
+@pytest.mark.parametrize("risk_cap", [1e-5, 0.002, 0.05])
+@pytest.mark.parametrize("chunk_plans", [1, 3, 7.5, None])
+def test_optimise_days_matches_brute_force(monkeypatch, risk_cap, chunk_plans):
+    axes = optimiser.option_axes()
+    n_plans = int(np.prod([axes[name]["label"].size for name in optimiser.AXES]))
+    if chunk_plans is not None: # Chunks of one session, of a few sessions, and of a number of cells that is not a whole number of plans.
+        monkeypatch.setattr(optimiser, "CHUNK_CELLS", int(n_plans * chunk_plans))
+    inputs = sessions()
+
+    best = optimiser.optimise_days(*inputs, risk_cap)["best"]
+    cost, risk = brute_force(*inputs, risk_cap, axes)
+    np.testing.assert_array_equal(best["room"], np.unique(inputs[0]))
+    np.testing.assert_array_equal(best["sessions"], [np.sum(inputs[0] == label) for label in best["room"]])
+    np.testing.assert_array_equal(best["feasible"], ~np.isnan(cost))
+    np.testing.assert_allclose(best["cost"], cost, rtol = 1e-12)
+    np.testing.assert_allclose(best["risk"], risk, rtol = 1e-12)
+    assert best["feasible"].any() and (risk_cap > 1e-5 or not best["feasible"].all()) # The tightest cap leaves some rooms without a plan.
+
+@pytest.mark.parametrize("risk_cap", [1e-5, 0.002, 0.05])
+def test_pruning_keeps_the_cheapest_plan(monkeypatch, risk_cap):
+    inputs = sessions()
+    pruned = optimiser.optimise_days(*inputs, risk_cap)
+
+    # Without pruning, every mask and air cleaner option is kept.
+    monkeypatch.setattr(optimiser, "_undominated", lambda cost, effect: np.arange(cost.size))
+    full = optimiser.optimise_days(*inputs, risk_cap)
+    assert full["plans"] > pruned["plans"]
+    np.testing.assert_array_equal(pruned["best"]["feasible"], full["best"]["feasible"])
+    np.testing.assert_allclose(pruned["best"]["cost"], full["best"]["cost"], rtol = 1e-12)
+    np.testing.assert_allclose(pruned["best"]["risk"], full["best"]["risk"], rtol = 1e-12)
+
+def test_undominated_options():
+    cost = np.array([0.0, 1.0, 1.0, 2.0, 3.0, 3.0])
+    effect = np.array([1.0, 0.5, 0.4, 0.6, 0.1, 0.1])
+    # 0.5 costs as much as 0.4 but is less effective, 0.6 is dearer and less effective than 0.4, and the two 0.1 options are the same.
+    np.testing.assert_array_equal(optimiser._undominated(cost, effect), [0, 2, 4])
+
+def test_optimise_pays_for_air_cleaners_once_a_day():
+    axes = optimiser.option_axes()
+    room = (30, 1, 0.465, 25, 2.0, 600.0)
+    for per_day in (1, 4):
+        best = optimiser.optimise(*room, 0.01, sessions = per_day)["best"]
+        session_cost, daily_cost, risk = optimiser._evaluate(*room, axes)
+        cost = daily_cost + per_day * session_cost[0]
+        feasible = risk[0] <= 0.01
+        assert best["cost"][0] == pytest.approx(cost[feasible].min(), rel = 1e-12)
+
+def test_pareto_front():
+    cost = np.array([[3.0, 1.0, 2.0, 1.0, 4.0]])
+    risk = np.array([[0.1, 0.5, 0.2, 0.4, 0.1]])
+    rooms, plans = optimiser.pareto_front(cost, risk)
+    np.testing.assert_array_equal(rooms, [0, 0, 0])
+    np.testing.assert_array_equal(plans, [3, 2, 0])
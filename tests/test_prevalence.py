@@ -0,0 +1,58 @@
+# Tests for engine/prevalence.py.
+
+import math
+
+import numpy as np
+import pytest
+
+from engine import prevalence
+
+def binomial(n, p):
+    """The exact Binomial(n, p) probabilities of 0 to n successes."""
+    return np.array([math.comb(n, k) * p**k * (1 - p)**(n - k) for k in range(n + 1)])
+
+def expected_infections(n, p, risk_one):
+    """The closed form of E[(n - I)(1 - (1 - P₁)^I)] for I ~ Binomial(n, p): n (1 - p) (1 - (1 - p P₁)^(n - 1))."""
+    return n * (1 - p) * (1 - (1 - p * risk_one)**(n - 1))
+
+@pytest.mark.parametrize("n, p", [(1, 0.3), (30, 0.1), (60, 0.5), (200, 0.01)])
+def test_infector_pmf_matches_binomial(n, p):
+    counts, pmf = prevalence.infector_pmf(n, p)
+    exact = binomial(n, p)
+    assert pmf.sum() == pytest.approx(1, abs = 1e-12)
+    np.testing.assert_allclose(pmf, exact[counts], rtol = 1e-9, atol = 1e-15)
+    assert exact[np.setdiff1d(np.arange(n + 1), counts)].sum() < prevalence.TAIL_MASS
+
+@pytest.mark.parametrize("n, p, risk_one", [(1, 0.3, 0.2), (12, 0.05, 0.3), (40, 0.2, 0.01), (80, 0.5, 0.9)])
+def test_outcomes_match_brute_force(n, p, risk_one):
+    result = prevalence.outcomes(n, p, risk_one)
+    weights = binomial(n, p)
+
+    # The new infections are a mixture, over every number of infectors I, of Binomial(n - I, 1 - (1 - P₁)^I).
+    infections = np.zeros(n + 1)
+    for I, weight in enumerate(weights):
+        infections[:n - I + 1] += weight * binomial(n - I, 1 - (1 - risk_one)**I)
+
+    assert result["expected_infectors"] == pytest.approx(n * p)
+    assert result["prob_no_infector"] == pytest.approx(weights[0], rel = 1e-12)
+    assert result["expected_infections"] == pytest.approx(expected_infections(n, p, risk_one), rel = 1e-9)
+    assert result["expected_infections"] == pytest.approx(np.sum(np.arange(n + 1) * infections), rel = 1e-9)
+    assert result["mean_risk"] == pytest.approx(result["expected_infections"] / (n * (1 - p)), rel = 1e-9)
+    np.testing.assert_allclose(result["infection_pmf"], infections[result["infections"]], rtol = 1e-7, atol = 1e-14)
+    assert infections[np.setdiff1d(np.arange(n + 1), result["infections"])].sum() < prevalence.TAIL_MASS
+
+def test_large_occupancy_matches_closed_form():
+    result = prevalence.outcomes(50000, 0.002, 0.05)
+    assert result["expected_infections"] == pytest.approx(expected_infections(50000, 0.002, 0.05), rel = 1e-9)
+    assert result["infection_pmf"].sum() == pytest.approx(1, abs = 1e-12)
+    assert np.sum(result["infections"] * result["infection_pmf"]) == pytest.approx(result["expected_infections"], rel = 1e-6)
+
+def test_no_prevalence_means_no_infections():
+    result = prevalence.outcomes(100, 0.0, 0.5)
+    assert result["prob_no_infector"] == 1 and result["expected_infections"] == 0 and result["mean_risk"] == 0
+    np.testing.assert_array_equal(result["infections"], [0])
+
+def test_everyone_infectious_leaves_no_susceptibles():
+    result = prevalence.outcomes(25, 1.0, 0.5, distribution = False)
+    assert result["prob_no_infector"] == 0 and result["expected_infections"] == 0 and result["mean_risk"] == 0
+    assert "infection_pmf" not in result
@@ -0,0 +1,61 @@
+# Tests for engine/shards.py.
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from engine import epidemic, shards, sweep
+
+AXES = {"Q": np.linspace(10, 1000, 7), "v": np.linspace(20, 2000, 5), "T": [0.5, 1, 3], "I": 1, "p": 0.5, "q": 25, "t": [1, 4]}
+
+# Three room classes, and ten scenarios in blocks of four, so the last block is partly filled.
+ROOMS = {"occupants": [30, 12, 20], "breathing": [0.5, 0.5, 0.8], "quanta": [25, 10, 40], "duration": [2, 3, 1.5], "ventilation": [150, 60, 300],
+         "volume": [200, 90, 250]}
+SCENARIOS = {"initial_infected": np.linspace(1, 20, 10), "quanta_factor": [1, 0.3] * 5, "ventilation_factor": np.repeat([1, 2], 5),
+             "importations": 0.5}
+
+@pytest.mark.parametrize("n_shards", [1, 3, 8])
+def test_merged_shards_match_sweep_run(tmp_path, monkeypatch, n_shards):
+    # A different machine may have other backends installed, or force one, which must not change the results of a pinned sweep.
+    monkeypatch.setenv("IARA_BACKEND", "numexpr")
+    _, meta = sweep.run(str(tmp_path / "single"), "residual", AXES, chunk_cells = 11)
+    job = shards.sweep_job("residual", AXES, chunk_cells = 11)
+    assert job["sweep"]["backend"] == meta["backend"] == "numpy"
+
+    files = shards.split(json.loads(json.dumps(job)), n_shards, str(tmp_path / "shards"))
+    for shard_file in files:
+        shards.run_shard(shard_file)
+    out = shards.merge(str(tmp_path / "shards"))
+
+    with open(tmp_path / "single" / sweep.DATA_FILE, "rb") as a, open(os.path.join(out, sweep.DATA_FILE), "rb") as b:
+        assert a.read() == b.read()
+    assert sweep.read_meta(out) == sweep.read_meta(str(tmp_path / "single"))
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match = "Unknown backend"):
+        shards.sweep_job("residual", AXES, backend = "cuda")
+
+def test_missing_backend_is_rejected():
+    meta = sweep.plan("wells_riley", {"I": 1, "p": 0.5, "q": [1, 2], "t": 1, "Q": 100})
+    meta["backend"] = "not-installed"
+    split, index = sweep.chunk_index(meta)
+    with pytest.raises(ValueError, match = "not installed"):
+        sweep.evaluate(meta, split, index[0])
+
+@pytest.mark.parametrize("n_shards", [1, 2, 3])
+@pytest.mark.parametrize("seed", [7, None])
+def test_merged_shards_match_run_ensemble(tmp_path, n_shards, seed):
+    options = {"population": 500, "days": 30, "block_size": 4, "model": "residual"}
+    expected = epidemic.run_ensemble(ROOMS, scenarios = SCENARIOS, processes = 1, seed = seed, **options)
+    job = shards.ensemble_job(ROOMS, scenarios = SCENARIOS, seed = seed, **options)
+
+    files = shards.split(json.loads(json.dumps(job)), n_shards, str(tmp_path / "shards"))
+    for shard_file in files:
+        shards.run_shard(shard_file)
+    with np.load(shards.merge(str(tmp_path / "shards"))) as merged:
+        assert sorted(merged.files) == sorted(expected)
+        for key in expected:
+            assert merged[key].dtype == expected[key].dtype and merged[key].shape == expected[key].shape
+            assert merged[key].tobytes() == expected[key].tobytes()
@@ -0,0 +1,67 @@
+# Tests for engine/superposition.py.
+
+import numpy as np
+import pytest
+
+from engine import models, superposition
+
+# Two infectors who both arrive at 0 and leave at T, in hours, m³/h and quanta/h.
+T, q, Q, v, p = 2.0, 25.0, 300.0, 150.0, 0.5
+TIMES = np.linspace(0, 8, 161)
+
+@pytest.fixture(params = [1, 7, 2**22])
+def chunk_cells(request, monkeypatch):
+    monkeypatch.setattr(superposition, "CHUNK_CELLS", request.param)
+    return request.param
+
+def test_matches_equations_9_and_13(chunk_cells):
+    result = superposition.superpose(TIMES, [0, 0], [T, T], [q, q], Q, v, p)
+    during = TIMES <= T
+    expected_during = models.residual_risk(2, TIMES[during], p, q, Q, v)[0]
+    expected_after = models.residual_risk(2, T, p, q, Q, v, t = TIMES[~during] - T)[2]
+    np.testing.assert_allclose(result["risk"][during], expected_during, rtol = 1e-10, atol = 1e-15)
+    np.testing.assert_allclose(result["risk"][~during], expected_after, rtol = 1e-10)
+
+def test_arriving_after_the_infectors_leave_matches_equation_11(chunk_cells):
+    result = superposition.superpose(TIMES, [0, 0], [T, T], [q, q], Q, v, p, start = T)
+    after = TIMES >= T
+    np.testing.assert_allclose(result["risk"][after], models.residual_risk(2, T, p, q, Q, v, t = TIMES[after] - T)[1], rtol = 1e-10, atol = 1e-15)
+    np.testing.assert_array_equal(result["risk"][~after], 0)
+
+def test_concentration_matches_the_step_response():
+    result = superposition.superpose(TIMES, [0, 0], [T, T], [q, q], Q, v, p)
+    lam = Q / v
+    steady = 2 * q / Q
+    expected = np.where(TIMES <= T, steady * -np.expm1(-lam * TIMES), steady * -np.expm1(-lam * T) * np.exp(-lam * (TIMES - T)))
+    np.testing.assert_allclose(result["concentration"], expected, rtol = 1e-10, atol = 1e-15)
+
+def test_dose_stops_when_the_susceptible_leaves():
+    result = superposition.superpose(TIMES, 0, T, q, Q, v, p, end = 3.0)
+    left = TIMES >= 3.0
+    np.testing.assert_allclose(result["dose"][left], result["dose"][TIMES == 3.0][0], rtol = 1e-12)
+    assert np.all(np.diff(result["dose"][~left]) > 0)
+
+def test_events_add_up():
+    # One infector present from 0 to 3 gives the same room as the same infector leaving at 1 and coming back until 3.
+    whole = superposition.superpose(TIMES, 0, 3, q, Q, v, p)
+    split = superposition.superpose(TIMES, [0, 1], [1, 3], [q, q], Q, v, p)
+    for key in whole:
+        np.testing.assert_allclose(split[key], whole[key], rtol = 1e-10, atol = 1e-15)
+
+@pytest.mark.parametrize("Q, v", [(0, v), (Q, 0)])
+def test_no_ventilation_or_volume_gives_zero(Q, v):
+    result = superposition.superpose(TIMES, 0, T, q, Q, v, p)
+    for key in result:
+        np.testing.assert_array_equal(result[key], 0)
+
+def test_departure_before_arrival_raises():
+    with pytest.raises(ValueError, match = "infector events 1 depart before they arrive"):
+        superposition.superpose(TIMES, [0, 3], [T, 2], q, Q, v, p)
+
+def test_negative_emission_raises():
+    with pytest.raises(ValueError, match = "infector events 0, 2 have a negative emission rate"):
+        superposition.superpose(TIMES, 0, T, [-1, q, -q], Q, v, p)
+
+def test_emission_rates_apply_masks_and_counts():
+    rates = superposition.emission_rates([10, 10, 10], mask = [1.0, 0.5, "No mask"], count = [1, 2, 3])
+    np.testing.assert_allclose(rates, [10, 10, 30])
@@ -0,0 +1,72 @@
+# Tests for engine/sweep.py.
+
+import itertools
+
+import numpy as np
+import pytest
+
+from engine import models, sweep
+
+AXES = {"I": [1, 2, 5], "T": [0.5, 1, 3, 8], "p": 0.5, "q": [1, 25, 250], "Q": np.linspace(10, 1000, 7), "v": [30, 150, 600, 2000, 5000],
+        "t": [0.25, 4]}
+OUTPUTS = ["P1", "P2", "P_comb", "P_inf"]
+
+def dense(axes = AXES):
+    """The residual risk of every combination of the swept inputs, evaluated in one broadcast call, with the outputs on the last axis."""
+    swept = [name for name in axes if np.ndim(axes[name]) > 0]
+    grids = dict(zip(swept, np.meshgrid(*(np.asarray(axes[name], dtype = float) for name in swept), indexing = "ij")))
+    inputs = {name: grids.get(name, axes[name]) for name in ["I", "T", "p", "q", "Q", "v", "t"]}
+    return np.stack(np.broadcast_arrays(*models.residual_risk(**inputs)), axis = -1)
+
+@pytest.fixture(scope = "module", params = [1, 13, 10**6])
+def cube(request, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("cube"))
+    sweep.run(path, "residual", AXES, chunk_cells = request.param)
+    return path
+
+def test_run_matches_dense(cube):
+    data, meta = sweep.open_cube(cube)
+    assert meta["outputs"] == OUTPUTS and meta["chunks_done"] == meta["chunks"]
+    np.testing.assert_array_equal(data, dense().astype(np.float32))
+
+@pytest.mark.parametrize("how", ["mean", "sum", "min", "max"])
+@pytest.mark.parametrize("over", [["I"], ["t"], ["T", "t"], ["I", "Q"], ["q", "v"], ["I", "T", "q", "Q", "v", "t"]])
+@pytest.mark.parametrize("chunk_cells", [1, 11, 97, 10**6])
+def test_aggregate_matches_dense(cube, over, how, chunk_cells):
+    data = np.asarray(sweep.open_cube(cube)[0], dtype = float)
+    names = [name for name in AXES if np.ndim(AXES[name]) > 0]
+    expected = getattr(np, how)(data, axis = tuple(names.index(name) for name in over))
+
+    result, remaining = sweep.aggregate(cube, over, how = how, chunk_cells = chunk_cells)
+    np.testing.assert_allclose(result, expected, rtol = 1e-12, atol = 0)
+    assert list(remaining) == [name for name in names if name not in over]
+
+    single, _ = sweep.aggregate(cube, over, how = how, output = "P_comb", chunk_cells = chunk_cells)
+    np.testing.assert_allclose(single, expected[..., OUTPUTS.index("P_comb")], rtol = 1e-12, atol = 0)
+
+def test_select_matches_dense(cube):
+    expected = dense().astype(np.float32)
+    risk, remaining = sweep.select(cube, output = "P_comb", I = 2, q = [250, 1], v = slice(1, 4))
+    np.testing.assert_array_equal(risk, expected[1][:, [2, 0]][:, :, :, 1:4][..., OUTPUTS.index("P_comb")])
+    assert list(remaining) == ["T", "q", "Q", "v", "t"]
+    np.testing.assert_array_equal(remaining["q"], [250, 1])
+
+    for I, t in itertools.product(AXES["I"], AXES["t"]):
+        risk, remaining = sweep.select(cube, I = I, t = t)
+        np.testing.assert_array_equal(risk, expected[AXES["I"].index(I), ..., AXES["t"].index(t), :])
+        assert list(remaining) == ["T", "q", "Q", "v"]
+
+def test_select_rejects_unknown_values(cube):
+    with pytest.raises(ValueError, match = "no value"):
+        sweep.select(cube, I = 3)
+    with pytest.raises(ValueError, match = "Unknown axes"):
+        sweep.select(cube, x = 1)
+    with pytest.raises(ValueError, match = "Unknown output"):
+        sweep.select(cube, output = "P")
+
+def test_aggregate_rejects_incomplete_cube(tmp_path):
+    sweep.run(str(tmp_path), "wells_riley", {"I": 1, "p": 0.5, "q": [1, 2, 3], "t": [1, 2], "Q": 100}, chunk_cells = 2)
+    meta = sweep.read_meta(str(tmp_path))
+    sweep.write_meta(str(tmp_path), dict(meta, chunks_done = meta["chunks"] - 1))
+    with pytest.raises(ValueError, match = "not complete"):
+        sweep.aggregate(str(tmp_path), ["q"])
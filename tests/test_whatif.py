@@ -0,0 +1,76 @@
+# Tests for engine/whatif.py.
+
+import numpy as np
+import pytest
+
+from engine import models, whatif
+
+TIMES = np.linspace(0, 6, 121)
+INPUTS = {
+    "wells_riley": {"I": 2, "p": 0.5, "q": 25.0, "Q": 150.0},
+    "residual": {"I": 2, "T": 2.5, "p": 0.5, "q": 25.0, "Q": 150.0, "v": 200.0},
+}
+VALUES = [0.0, 0.5, 1.0, 2.0, 7.5]
+
+@pytest.mark.parametrize("model, parameter", [(model, parameter) for model in whatif.PARAMETERS for parameter in whatif.PARAMETERS[model]])
+@pytest.mark.parametrize("mode", whatif.MODES)
+def test_overlay_curves_match_one_curve_per_scenario(model, parameter, mode):
+    inputs = INPUTS[model]
+    values = whatif.scenario_values(inputs[parameter], VALUES, mode)
+    curves = whatif.overlay_curves(model, TIMES, parameter, values, **{k: v for k, v in inputs.items() if k != parameter})
+    assert curves.shape == (len(VALUES), TIMES.size)
+    for row, value in zip(curves, values):
+        expected = whatif.CURVES[model](TIMES, **dict(inputs, **{parameter: value}))
+        np.testing.assert_allclose(row, expected, rtol = 1e-12, atol = 0)
+
+def test_changing_T_moves_the_departure():
+    inputs = {k: v for k, v in INPUTS["residual"].items() if k != "T"}
+    curves = whatif.overlay_curves("residual", TIMES, "T", [1.0, 4.0], **inputs)
+    for row, T in zip(curves, [1.0, 4.0]):
+        np.testing.assert_allclose(row, models.residual_risk_curve(TIMES, T = T, **inputs), rtol = 1e-12)
+        # The risk stops rising once the infectors leave.
+        assert np.all(np.diff(row[TIMES <= T]) > 0) and np.all(np.diff(row[TIMES > T]) >= 0)
+        assert row[-1] < models.residual_risk(T = TIMES[-1], **inputs)[0]
+
+def test_unknown_model_or_input_raises():
+    with pytest.raises(ValueError, match = "Unknown model"):
+        whatif.overlay_curves("two_box", TIMES, "Q", [1.0], **INPUTS["wells_riley"])
+    with pytest.raises(ValueError, match = "Unknown input 'v' for the wells_riley model"):
+        whatif.overlay_curves("wells_riley", TIMES, "v", [1.0], **INPUTS["wells_riley"])
+
+@pytest.mark.parametrize("text, values", [
+    ("0.5, 2, 10", [0.5, 2.0, 10.0]),
+    ("0.5 2;10", [0.5, 2.0, 10.0]),
+    ("2, 0.5, 2, 2.0", [2.0, 0.5]),
+    ("0", [0.0]),
+    (", ".join(map(str, range(10))) + ", 3", list(map(float, range(10)))), # Repeats do not count towards the limit.
+])
+def test_parse_values(text, values):
+    assert whatif.parse_values(text) == values
+
+@pytest.mark.parametrize("text, message", [
+    ("", "at least one value"),
+    (" , ;", "at least one value"),
+    ("0.5, two", "Could not read"),
+    (", ".join(map(str, range(whatif.MAX_OVERLAYS + 1))), f"at most {whatif.MAX_OVERLAYS}"),
+    ("1, -2", "zero or more"),
+    ("1, inf", "zero or more"),
+    ("nan", "zero or more"),
+])
+def test_parse_values_errors(text, message):
+    with pytest.raises(ValueError, match = message):
+        whatif.parse_values(text)
+
+def test_scenario_values_and_labels():
+    np.testing.assert_array_equal(whatif.scenario_values(25.0, [0.5, 2], "multiply"), [12.5, 50])
+    np.testing.assert_array_equal(whatif.scenario_values(25.0, [0.5, 2], "set"), [0.5, 2])
+    assert whatif.scenario_labels("Quanta", [0.5, 2], "multiply") == ["Quanta × 0.5", "Quanta × 2"]
+    assert whatif.scenario_labels("Quanta", [10], "set") == ["Quanta = 10"]
+    with pytest.raises(ValueError, match = "Unknown mode"):
+        whatif.scenario_values(25.0, [1], "add")
+
+def test_overlay_table_is_long():
+    curves = whatif.overlay_curves("wells_riley", TIMES, "Q", [100.0, 200.0], I = 1, p = 0.5, q = 25.0)
+    table = whatif.overlay_table(TIMES, curves, ["a", "b"])
+    assert len(table) == 2 * TIMES.size and list(table["scenario"].unique()) == ["a", "b"]
+    np.testing.assert_allclose(table.loc[table["scenario"] == "b", "risk"], curves[1] * 100)
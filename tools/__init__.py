@@ -0,0 +1 @@
+# This is the package containing developer tools for our web-app, such as the load-testing harness.
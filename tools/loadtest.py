@@ -0,0 +1,304 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for the load-testing harness of our web-app.
+# It runs N concurrent headless sessions of the pages, each in its own process, using Streamlit's AppTest to rerun the page scripts exactly as the
+# server would after a widget change. Sessions either follow a synthetic mix of random widget changes, or replay traces recorded with tools/trace.py.
+# It reports the rerun latency (p50/p95/p99), and the CPU time and resident memory of every session.
+#
+# Usage (from the repository root):
+#     python -m tools.loadtest --sessions 8 --steps 25
+#     python -m tools.loadtest --sessions 8 --trace traces/*.jsonl --json report.json
+#
+# Note: each session runs in its own process, so caches are not shared between sessions the way they are in one server process.
+# The figures are therefore an upper bound on the cost of a rerun, and memory per session includes the Python interpreter (see 'baseline').
+
+# Imports.
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+
+# The repository root, from which the page files are run.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The pages driven by the synthetic mix, with their relative weights.
+default_mix = {"Wls_Rly_page.py": 0.45, "Scn_One_page.py": 0.45, "home_page.py": 0.1}
+
+# The widget types changed by the synthetic mix.
+WIDGET_TYPES = ["number_input", "slider", "selectbox", "radio", "checkbox", "toggle"]
+
+#====================================================================================================================================================
+# MEASUREMENTS:
+#====================================================================================================================================================
+
+def rss_mb():
+    """
+    This function returns the current resident memory of this process in MB, falling back to the peak where /proc is unavailable.
+
+    Returns:
+        float: The resident memory (MB).
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10 # macOS reports bytes, Linux reports KB.
+
+def percentiles(latencies):
+    """
+    This function summarises a list of latencies.
+
+    Args:
+        latencies (list of float): The latencies (seconds).
+
+    Returns:
+        dict: The count, mean, p50, p95, p99 and maximum latency (milliseconds).
+    """
+    if not latencies:
+        return {"count": 0}
+    ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"count": int(ms.size), "mean": float(ms.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(ms.max())}
+
+#====================================================================================================================================================
+# SESSIONS:
+#====================================================================================================================================================
+
+def random_change(at, rng):
+    """
+    This function makes one random but valid widget change on a page.
+
+    Args:
+        at (AppTest): The page.
+        rng (random.Random): The random number generator.
+
+    Returns:
+        bool: Whether a widget was changed.
+    """
+    widgets = [(kind, w) for kind in WIDGET_TYPES for w in getattr(at, kind) if not w.disabled]
+    if not widgets:
+        return False
+
+    kind, w = rng.choice(widgets)
+    if kind in ("checkbox", "toggle"):
+        w.set_value(not w.value)
+    elif kind in ("selectbox", "radio"):
+        w.set_value(rng.choice(w.options))
+    elif kind == "slider":
+        steps = int(round((w.max - w.min) / w.step))
+        w.set_value(type(w.value)(w.min + rng.randint(0, steps) * w.step))
+    else: # number_input
+        lo = w.min if w.min is not None else 0
+        hi = w.max if w.max is not None else max(lo, 1) * 200
+        value = rng.uniform(lo, min(hi, lo + 200))
+        w.set_value(int(value) if isinstance(w.value, int) else round(value, 2))
+    return True
+
+def apply_event(at, event):
+    """
+    This function applies one recorded trace event to a page.
+    Recorded events set a widget by its key. Hand-written events can instead give the widget type and label.
+
+    Args:
+        at (AppTest): The page.
+        event (dict): The event, with 'key' and 'value', or 'widget', 'label' and 'value'.
+    """
+    if "key" in event:
+        at.session_state[event["key"]] = event["value"]
+    else:
+        matches = [w for w in getattr(at, event["widget"]) if w.label == event["label"]]
+        if matches:
+            matches[0].set_value(event["value"])
+
+def run_session(index, args, barrier, results):
+    """
+    This function runs one headless session and puts its measurements on the results queue.
+
+    Args:
+        index (int): The session number.
+        args (argparse.Namespace): The command-line arguments.
+        barrier (multiprocessing.Barrier): Makes every session start at the same time.
+        results (multiprocessing.Queue): Where the measurements are sent.
+    """
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    import logging
+    logging.disable(logging.CRITICAL) # Streamlit logs a warning for every bare-mode script run.
+    from streamlit.testing.v1 import AppTest
+    from tools import trace
+
+    rng = random.Random(args.seed + index)
+    baseline = rss_mb()
+    pages = {}
+    latencies, errors = {}, 0
+
+    if args.trace:
+        events = trace.load(args.trace[index % len(args.trace)])
+        steps = [(event["page"], event) for event in events]
+    else:
+        mix = list(default_mix)
+        steps = [(page, None) for page in rng.choices(mix, weights = [default_mix[p] for p in mix], k = args.steps)]
+
+    try:
+        barrier.wait(timeout = args.timeout)
+    except threading.BrokenBarrierError: # Another session failed to start, so start without it.
+        pass
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    previous_t = 0.0
+
+    for page, event in steps:
+        first_visit = page not in pages # The first visit to a page is a full script run, like opening it in the browser.
+        if first_visit:
+            pages[page] = AppTest.from_file(page, default_timeout = args.timeout)
+        at = pages[page]
+
+        if event is not None:
+            if args.realtime: # Wait as long as the user did between changes.
+                time.sleep(max(0.0, event["t"] - previous_t))
+                previous_t = event["t"]
+            apply_event(at, event)
+        elif not first_visit: # Widgets only exist once the page has been run.
+            random_change(at, rng)
+
+        start = time.perf_counter()
+        at.run()
+        latencies.setdefault(page, []).append(time.perf_counter() - start)
+        errors += len(at.exception)
+
+        if args.think:
+            time.sleep(args.think)
+
+    results.put({
+        "session": index,
+        "latencies": latencies,
+        "errors": errors,
+        "cpu_seconds": time.process_time() - cpu_start,
+        "wall_seconds": time.perf_counter() - wall_start,
+        "baseline_rss_mb": baseline,
+        "rss_mb": rss_mb(),
+    })
+
+#====================================================================================================================================================
+# REPORT:
+#====================================================================================================================================================
+
+def summarise(sessions):
+    """
+    This function combines the measurements of every session into a report.
+
+    Args:
+        sessions (list of dict): The measurements of each session.
+
+    Returns:
+        dict: The overall and per-page latencies, and the CPU and memory of each session.
+    """
+    all_latencies = [lat for s in sessions for lats in s["latencies"].values() for lat in lats]
+    pages = sorted({page for s in sessions for page in s["latencies"]})
+    wall = max(s["wall_seconds"] for s in sessions)
+
+    return {
+        "sessions": len(sessions),
+        "reruns": len(all_latencies),
+        "reruns_per_second": len(all_latencies) / wall if wall else 0.0,
+        "errors": sum(s["errors"] for s in sessions),
+        "latency_ms": percentiles(all_latencies),
+        "latency_ms_by_page": {page: percentiles([lat for s in sessions for lat in s["latencies"].get(page, [])]) for page in pages},
+        "per_session": [{
+            "session": s["session"],
+            "reruns": sum(len(lats) for lats in s["latencies"].values()),
+            "cpu_seconds": round(s["cpu_seconds"], 3),
+            "cpu_ms_per_rerun": round(1000 * s["cpu_seconds"] / max(1, sum(len(lats) for lats in s["latencies"].values())), 1),
+            "baseline_rss_mb": round(s["baseline_rss_mb"], 1),
+            "rss_mb": round(s["rss_mb"], 1),
+            "session_rss_mb": round(s["rss_mb"] - s["baseline_rss_mb"], 1),
+        } for s in sorted(sessions, key = lambda s: s["session"])],
+    }
+
+def print_report(report):
+    """
+    This function prints a report as readable tables.
+
+    Args:
+        report (dict): The report, see summarise.
+    """
+    lat = report["latency_ms"]
+    print(f"{report['sessions']} sessions, {report['reruns']} reruns, {report['reruns_per_second']:.1f} reruns/s, {report['errors']} errors")
+    print(f"Rerun latency (ms): p50 {lat.get('p50', 0):.0f} | p95 {lat.get('p95', 0):.0f} | p99 {lat.get('p99', 0):.0f} | max {lat.get('max', 0):.0f}")
+    print("")
+    print(f"{'Page':<20}{'reruns':>8}{'p50':>8}{'p95':>8}{'p99':>8}")
+    for page, p in report["latency_ms_by_page"].items():
+        print(f"{page:<20}{p['count']:>8}{p['p50']:>8.0f}{p['p95']:>8.0f}{p['p99']:>8.0f}")
+    print("")
+    print(f"{'Session':<10}{'reruns':>8}{'CPU s':>8}{'CPU ms/rerun':>14}{'RSS MB':>8}{'session MB':>12}")
+    for s in report["per_session"]:
+        print(f"{s['session']:<10}{s['reruns']:>8}{s['cpu_seconds']:>8.2f}{s['cpu_ms_per_rerun']:>14.1f}{s['rss_mb']:>8.0f}{s['session_rss_mb']:>12.1f}")
+
+#====================================================================================================================================================
+# COMMAND LINE:
+#====================================================================================================================================================
+
+def main(argv = None):
+    """
+    This function runs the load test from the command line.
+
+    Args:
+        argv (list of str, optional): The command-line arguments. Defaults to None (sys.argv).
+
+    Returns:
+        dict: The report.
+    """
+    parser = argparse.ArgumentParser(description = "Drive concurrent headless IARA sessions and report rerun latency, CPU and memory.")
+    parser.add_argument("--sessions", type = int, default = 4, help = "Number of concurrent sessions.")
+    parser.add_argument("--steps", type = int, default = 20, help = "Reruns per session for the synthetic mix.")
+    parser.add_argument("--trace", nargs = "*", default = [], help = "Recorded trace files to replay, shared round-robin between sessions.")
+    parser.add_argument("--realtime", action = "store_true", help = "Replay traces with their recorded timing.")
+    parser.add_argument("--think", type = float, default = 0.0, help = "Seconds to wait between reruns.")
+    parser.add_argument("--seed", type = int, default = 0, help = "Random seed of the synthetic mix.")
+    parser.add_argument("--timeout", type = float, default = 120, help = "Longest a single rerun may take, in seconds.")
+    parser.add_argument("--json", help = "Also write the report to this JSON file.")
+    args = parser.parse_args(argv)
+    args.trace = [path for pattern in args.trace for path in sorted(glob.glob(pattern))]
+
+    ctx = multiprocessing.get_context("spawn") # A fresh interpreter per session, as Streamlit's script runner is not safe to share between threads.
+    barrier = ctx.Barrier(args.sessions)
+    results = ctx.Queue()
+    workers = [ctx.Process(target = run_session, args = (i, args, barrier, results)) for i in range(args.sessions)]
+    for worker in workers:
+        worker.start()
+
+    # Collect the measurements, without waiting forever for a session that crashed.
+    sessions = []
+    while len(sessions) < len(workers):
+        try:
+            sessions.append(results.get(timeout = 1))
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers) and results.empty():
+                break
+    for worker in workers:
+        worker.join()
+    if len(sessions) < len(workers):
+        print(f"{len(workers) - len(sessions)} of {len(workers)} sessions crashed, see the errors above.")
+    if not sessions:
+        sys.exit(1)
+
+    report = summarise(sessions)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as report_file:
+            json.dump(report, report_file, indent = 2)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#====================================================================================================================================================
+# GENERAL:
+#====================================================================================================================================================
+
+# This is the Python file for recording interaction traces, which the load-testing harness (tools/loadtest.py) can replay.
+# Recording is off unless the IARA_TRACE_DIR environment variable is set, e.g. 'IARA_TRACE_DIR=traces streamlit run IARA.py'.
+# Each browser session writes one JSON Lines file, with one line for every keyed widget whose value changed before a rerun:
+#
+#     {"t": 12.5, "page": "Wls_Rly_page.py", "key": "wls_all", "value": 30}
+
+# Imports.
+import json
+import os
+import time
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# The last recorded widget values and the start time of each session, keyed by session id.
+_sessions = {}
+
+#====================================================================================================================================================
+# RECORDING:
+#====================================================================================================================================================
+
+def page_file(url_path):
+    """
+    This function converts the URL path of a page into its Python file. The default page (an empty URL path) is the home page.
+
+    Args:
+        url_path (str): The URL path of the page.
+
+    Returns:
+        str: The Python file of the page.
+    """
+    return f"{url_path or 'home_page'}.py"
+
+def record(page):
+    """
+    This function appends the widget changes of the current rerun to the session's trace file.
+    Only keyed widgets with plain values (numbers, strings and booleans) are recorded.
+
+    Args:
+        page (StreamlitPage): The page about to be run, as returned by st.navigation.
+    """
+    directory = os.environ.get("IARA_TRACE_DIR")
+    ctx = get_script_run_ctx()
+    if not directory or ctx is None:
+        return
+
+    started, previous = _sessions.setdefault(ctx.session_id, (time.time(), {}))
+    current = {key: value for key, value in st.session_state.to_dict().items() if isinstance(value, (bool, int, float, str))}
+    changes = {key: value for key, value in current.items() if previous.get(key) != value}
+    previous.update(current)
+
+    if not changes:
+        return
+
+    os.makedirs(directory, exist_ok = True)
+    elapsed = round(time.time() - started, 3)
+    with open(os.path.join(directory, f"{ctx.session_id}.jsonl"), "a") as trace_file:
+        for key, value in changes.items():
+            trace_file.write(json.dumps({"t": elapsed, "page": page_file(page.url_path), "key": key, "value": value}) + "\n")
+
+def load(path):
+    """
+    This function reads a trace file.
+
+    Args:
+        path (str): The path of the JSON Lines trace file.
+
+    Returns:
+        list of dict: The events, in the order they were recorded.
+    """
+    with open(path) as trace_file:
+        return [json.loads(line) for line in trace_file if line.strip()]